@@ -1,6 +1,7 @@
 # fileinfo in used in the fbx exporter
 # it is pretty good for storing data in a maya file persistently
 # the data is readable if you use .ma and can be used to batch
+# fbxexporters/fbx_exporter_mafile.py reads the exporter data from a .ma without maya
 
 import pymel.core as pm
 import pprint
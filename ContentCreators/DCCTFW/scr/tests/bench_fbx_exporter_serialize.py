@@ -0,0 +1,62 @@
+"""
+benchmark for the fileInfo serialization, legacy xml vs json
+
+run outside of Maya:
+    python bench_fbx_exporter_serialize.py [model count]
+
+fileInfo values are stored MEL escaped in the .ma, the escaped size is what ends up on disk.
+"""
+
+import sys
+import timeit
+
+from scr.tools.fbxexporters import fbx_exporter_serialize
+from scr.tools.fbxexporters import Identifiers
+from scr.tools.fbxexporters import LayerData
+from scr.tools.fbxexporters import ModelData
+
+
+def make_layer(count):
+    layer = LayerData()
+    layer.name = 'bench'
+    layer.path = 'Assets/Bench'
+
+    for i in range(count):
+        model = ModelData()
+        model.name = 'model_{0}'.format(i)
+        model.uuid = '5C3A2B1E-4F2D-1A2B-9C8D-{0:012d}'.format(i)
+        model.path = 'Assets/Bench/model_{0}.fbx'.format(i)
+        model.export_items = ['model_{0}_geo'.format(i), 'model_{0}_lod1'.format(i)]
+        layer.models.append(model)
+
+    return layer
+
+
+def mel_escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def run(count=5000, number=5):
+    layer = make_layer(count)
+    key = Identifiers.model_layer_identifier + layer.name
+
+    xml_value = fbx_exporter_serialize.to_xml(layer)
+    json_value = fbx_exporter_serialize.encode(layer)
+
+    results = (
+        ('xml', xml_value, lambda: fbx_exporter_serialize.to_xml(layer)),
+        ('json', json_value, lambda: fbx_exporter_serialize.encode(layer)),
+    )
+
+    print('{0} models, best of {1}'.format(count, number))
+    print('{0:<6}{1:>12}{2:>12}{3:>14}{4:>14}'.format('format', 'encode ms', 'decode ms', 'bytes', 'escaped bytes'))
+    for name, value, encode in results:
+        encode_time = min(timeit.repeat(encode, number=1, repeat=number))
+        decode_time = min(timeit.repeat(lambda: fbx_exporter_serialize.decode(value, key),
+                                        number=1, repeat=number))
+        print('{0:<6}{1:>12.2f}{2:>12.2f}{3:>14}{4:>14}'.format(name, encode_time * 1000, decode_time * 1000,
+                                                                 len(value), len(mel_escape(value))))
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,85 @@
+import scr
+import logging
+from scr.tests.test_fbx_exporter_project_index import make_props
+from scr.tests.test_fbx_exporter_project_index import make_rig
+from scr.tests.test_fbx_exporter_sidecar import get_values
+from scr.tools.fbxexporters import fbx_exporter_compact
+from scr.tools.fbxexporters import fbx_exporter_mafile
+from scr.tools.fbxexporters import fbx_exporter_serialize
+from scr.tools.fbxexporters import Identifiers
+from scr.tools.fbxexporters import LayerData
+
+"""
+tests for compaction of exporter fileInfo data, these do not need Maya
+"""
+
+test_log = logging.getLogger(scr.logger_name)
+
+
+def apply_changes(values, changes):
+    values = dict(values)
+    for key, value in changes.items():
+        if value is None:
+            values.pop(key)
+        else:
+            values[key] = value
+
+    return values
+
+
+def test_find_garbage():
+    test_log.info('testing exporter data compaction')
+    props_key, props = make_props(['crate', 'barrel', 'gone'])
+    rig_key, rig = make_rig()
+    empty = LayerData()
+
+    # a rename that left the old layer behind, an orphaned chunk and an empty key
+    values = get_values([(Identifiers.model_layer_identifier + 'props_old', make_props(['crate', 'barrel', 'gone'])[1]),
+                         (Identifiers.model_layer_identifier + 'empty', empty),
+                         (Identifiers.model_layer_identifier + 'empty_2', LayerData()),
+                         (rig_key, rig), (props_key, props)])
+    orphan_key = fbx_exporter_serialize.get_chunk_key(props_key, 'deleted')
+    values[orphan_key] = values[fbx_exporter_serialize.get_chunk_key(props_key, 'crate')]
+    values[Identifiers.actor_identifier + 'nobody'] = ''
+    values['_fbx_export_settings'] = 'not exporter layer data'
+
+    resolved = []
+
+    def resolve(uuids, names):
+        # crate was renamed in the scene but its uuid still resolves, barrel is found by name, gone is gone
+        resolved.append((uuids, names))
+        return ['crate-uuid'], ['barrel', 'hero_mesh']
+
+    report = fbx_exporter_compact.find_garbage(values, resolve)
+    assert report.duplicate_layers == [(Identifiers.model_layer_identifier + 'props_old', props_key)]
+    assert report.stale_models == [(props_key, 'gone')]
+    assert sorted(report.orphaned_keys) == [Identifiers.actor_identifier + 'nobody', orphan_key]
+    assert report.errors == []
+    # one scene query for all layers
+    assert resolved == [(['barrel-uuid', 'crate-uuid', 'gone-uuid'], ['barrel', 'crate', 'gone', 'hero_mesh'])]
+    assert len(report) == 4
+
+    compacted = apply_changes(values, report.changes)
+    assert set(compacted) == {props_key, rig_key, '_fbx_export_settings',
+                              Identifiers.model_layer_identifier + 'empty',
+                              Identifiers.model_layer_identifier + 'empty_2',
+                              fbx_exporter_serialize.get_chunk_key(props_key, 'crate'),
+                              fbx_exporter_serialize.get_chunk_key(props_key, 'barrel'),
+                              fbx_exporter_serialize.get_chunk_key(rig_key, 'hero_mesh')}
+    layers = fbx_exporter_mafile.decode_fileInfo(compacted)
+    assert [m.name for m in layers[Identifiers.model_layer_identifier][-1].models] == ['crate', 'barrel']
+
+    # the report can put everything back and a second pass finds nothing
+    assert apply_changes(compacted, report.previous) == values
+    assert len(fbx_exporter_compact.find_garbage(compacted, resolve)) == 0
+
+
+def test_unreadable_layers_are_kept():
+    test_log.info('testing compaction of unreadable data')
+    props_key, props = make_props(['crate'])
+    values = get_values([(props_key, props)])
+    values[props_key] = '{not json'
+
+    report = fbx_exporter_compact.find_garbage(values)
+    assert [key for key, error in report.errors] == [props_key]
+    assert report.changes == {}
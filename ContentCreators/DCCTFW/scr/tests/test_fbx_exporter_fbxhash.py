@@ -0,0 +1,145 @@
+import os
+import scr
+import logging
+from scr.tools.fbxexporters import fbx_exporter_fbxhash
+
+"""
+tests for the normalized fbx comparison, these do not need Maya
+"""
+
+test_log = logging.getLogger(scr.logger_name)
+
+fbx_template = '''; FBX 7.5.0 project file
+; Copyright (C) 1997-2015 Autodesk Inc. and/or its licensors.
+; All rights reserved.
+; ----------------------------------------------------
+
+FBXHeaderExtension:  {{
+	FBXHeaderVersion: 1003
+	FBXVersion: 7500
+	CreationTimeStamp:  {{
+		Version: 1000
+		Year: {year}
+		Month: 10
+		Second: {second}
+	}}
+	Creator: "FBX SDK/FBX Plugins version 2020.3"
+	SceneInfo: "SceneInfo::GlobalInfo", "UserData" {{
+		Properties70:  {{
+			P: "DocumentUrl", "KString", "Url", "", "{path}"
+			P: "SrcDocumentUrl", "KString", "Url", "", "{path}"
+			P: "Original|ApplicationName", "KString", "", "", "Maya"
+			P: "Original|FileName", "KString", "", "", "{path}"
+			P: "LastSaved|DateTime_GMT", "DateTime", "", "", "{year}/10/18 10:00:{second}.000"
+		}}
+	}}
+}}
+FileId: "{file_id}"
+CreationTime: "{year}-10-18 10:00:{second}:000"
+Creator: "FBX SDK/FBX Plugins version 2020.3"
+
+; Object properties
+;------------------------------------------------------------------
+
+Objects:  {{
+	Geometry: {geometry}, "Geometry::", "Mesh" {{
+		Vertices: *3 {{
+			a: {vertices}
+		}}
+	}}
+	Model: {model}, "Model::crate", "Mesh" {{
+		Version: 232
+	}}
+	Pose: {pose}, "Pose::bindPose", "BindPose" {{
+		PoseNode:  {{
+			Node: {model}
+		}}
+	}}
+}}
+
+; Object connections
+;------------------------------------------------------------------
+
+Connections:  {{
+	;Model::crate, Model::RootNode
+	C: "OO",{model},0
+	;Geometry::, Model::crate
+	C: "OO",{geometry},{model}
+}}
+'''
+
+
+def write_fbx(path, vertices='0,0,0', year=2026, second=1, geometry=2094129248, model=2094133568, pose=2094140000,
+              file_id='(5\\x12'):
+    with open(path, 'w', newline='\n') as fbx_file:
+        fbx_file.write(fbx_template.format(vertices=vertices, year=year, second=second, geometry=geometry, model=model,
+                                           pose=pose, file_id=file_id, path=path.replace('\\', '/')))
+    return path
+
+
+def test_normalized_content(tmp_path):
+    test_log.info('testing normalized fbx comparison')
+    published = write_fbx(str(tmp_path / 'crate.fbx'))
+
+    # a new export of the same scene, only the volatile fields and object ids differ
+    staged = write_fbx(fbx_exporter_fbxhash.get_staging_path(published), year=2027, second=42, geometry=1, model=2,
+                       pose=3, file_id='xx')
+    assert os.path.basename(staged).startswith(fbx_exporter_fbxhash.staging_prefix) and staged != published
+    assert fbx_exporter_fbxhash.is_same_content(staged, published)
+    assert fbx_exporter_fbxhash.get_normalized_hash(staged) == fbx_exporter_fbxhash.get_normalized_hash(published)
+    assert fbx_exporter_fbxhash.publish(staged, published)
+    assert not os.path.exists(staged)
+
+    # the ids are numbered by first appearance, which ids the SDK picked does not matter
+    swapped = write_fbx(str(tmp_path / 'swapped.fbx'), geometry=2094133568, model=2094129248)
+    assert fbx_exporter_fbxhash.is_same_content(swapped, published)
+    changed = write_fbx(str(tmp_path / 'changed.fbx'), vertices='0,0,1')
+    assert not fbx_exporter_fbxhash.is_same_content(changed, published)
+    assert fbx_exporter_fbxhash.get_normalized_hash(changed) != fbx_exporter_fbxhash.get_normalized_hash(published)
+
+    # binary files are compared byte for byte
+    binary = str(tmp_path / 'binary.fbx')
+    with open(binary, 'wb') as fbx_file:
+        fbx_file.write(fbx_exporter_fbxhash.binary_magic + b'\x00\x1a\x00')
+    assert fbx_exporter_fbxhash.is_binary_fbx(binary)
+    assert not fbx_exporter_fbxhash.is_same_content(binary, published)
+    assert fbx_exporter_fbxhash.is_same_content(binary, binary)
+
+
+def test_publish(tmp_path):
+    test_log.info('testing fbx publish')
+    published = write_fbx(str(tmp_path / 'crate.fbx'))
+    os.utime(published, ns=(1000000000, 1000000000))
+
+    # same content, the published file is not touched and the staging file is removed
+    staged = write_fbx(fbx_exporter_fbxhash.get_staging_path(published), second=30, model=7)
+    assert fbx_exporter_fbxhash.publish(staged, published)
+    assert os.stat(published).st_mtime_ns == 1000000000
+    assert os.listdir(str(tmp_path)) == ['crate.fbx']
+
+    # changed content replaces it
+    staged = write_fbx(fbx_exporter_fbxhash.get_staging_path(published), vertices='1,1,1')
+    assert not fbx_exporter_fbxhash.publish(staged, published)
+    with open(published) as fbx_file:
+        assert 'a: 1,1,1' in fbx_file.read()
+
+    # first export
+    new = str(tmp_path / 'new.fbx')
+    assert not fbx_exporter_fbxhash.publish(write_fbx(fbx_exporter_fbxhash.get_staging_path(new)), new)
+    assert sorted(os.listdir(str(tmp_path))) == ['crate.fbx', 'new.fbx']
+
+
+def test_staging_files_are_not_shared(tmp_path):
+    test_log.info('testing staging files of one folder')
+    published = write_fbx(str(tmp_path / 'crate.fbx'))
+    other = str(tmp_path / 'barrel.fbx')
+
+    # publishing one output does not remove the staging of another output in the same folder
+    staged = fbx_exporter_fbxhash.get_staging_path(published)
+    assert not fbx_exporter_fbxhash.publish(write_fbx(fbx_exporter_fbxhash.get_staging_path(other)), other)
+    assert not fbx_exporter_fbxhash.publish(write_fbx(staged, vertices='1,1,1'), published)
+    assert sorted(os.listdir(str(tmp_path))) == ['barrel.fbx', 'crate.fbx']
+
+    # every call gets its own file
+    staged = fbx_exporter_fbxhash.get_staging_path(published)
+    assert staged != fbx_exporter_fbxhash.get_staging_path(published)
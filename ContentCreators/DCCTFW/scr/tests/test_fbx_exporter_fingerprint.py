@@ -0,0 +1,88 @@
+import os
+import scr
+import logging
+from scr.tests.test_fbx_exporter_project_index import make_props
+from scr.tools.fbxexporters import fbx_exporter_fingerprint
+from scr.tools.fbxexporters import fbx_exporter_planner
+from scr.tools.fbxexporters import GlobalExportOptions
+from scr.tools.fbxexporters import Identifiers
+
+"""
+tests for incremental export, these do not need Maya. the scene content hash is faked
+"""
+
+test_log = logging.getLogger(scr.logger_name)
+
+
+def test_unchanged_jobs_are_skipped(tmp_path):
+    test_log.info('testing incremental export')
+    project = str(tmp_path)
+    os.makedirs(os.path.join(project, 'Assets', 'Props'))
+    key, props = make_props(['crate', 'barrel', 'tri'])
+
+    # the scene content of each model, changing it changes the fingerprint
+    content = {'crate': 'a', 'barrel': 'b', 'tri': 'c'}
+    exported = []
+
+    def run_job(job):
+        exported.append(job.name)
+        if job.name == 'tri' and content['tri'] == 'broken':
+            return False
+        with open(job.path, 'w') as f:
+            f.write(content[job.name])
+        return True
+
+    def export(force=False):
+        del exported[:]
+        plan = fbx_exporter_planner.plan_exports({Identifiers.model_layer_identifier: [props]}, project,
+                                                 GlobalExportOptions())
+        incremental = fbx_exporter_fingerprint.IncrementalExport(lambda job: content[job.name], force)
+        results, cancelled = fbx_exporter_planner.run_plan(plan, incremental.wrap(run_job))
+        incremental.update(results)
+        return sorted(result.job.name for result in results if result.job.skipped)
+
+    assert export() == [] and exported == ['crate', 'barrel', 'tri']
+    assert os.path.isfile(os.path.join(project, 'Assets', 'Props', fbx_exporter_fingerprint.manifest_name))
+
+    # nothing changed
+    assert export() == ['barrel', 'crate', 'tri'] and exported == []
+
+    # content, options, a touched output file and force all export again
+    content['crate'] = 'moved'
+    props.models[1].fbx_export_override_layer_options = True
+    props.models[1].fbx_export_triangulate = True
+    with open(os.path.join(project, 'Assets', 'Props', 'tri.fbx'), 'a') as f:
+        f.write('edited by hand')
+    assert export() == [] and sorted(exported) == ['barrel', 'crate', 'tri']
+    assert export(force=True) == [] and len(exported) == 3
+    assert export() == ['barrel', 'crate', 'tri']
+
+    # a failed export is forgotten, the next export tries again even though the content did not change
+    content['tri'] = 'broken'
+    export()
+    assert exported == ['tri']
+    assert export() == ['barrel', 'crate'] and exported == ['tri']
+
+
+def test_fingerprint_inputs(tmp_path):
+    test_log.info('testing export fingerprints')
+    key, props = make_props(['crate'])
+    job = fbx_exporter_planner.plan_models(key, props, str(tmp_path), GlobalExportOptions(), check_folders=False)[0]
+    fingerprint = fbx_exporter_fingerprint.get_fingerprint(job, 'content')
+
+    assert fbx_exporter_fingerprint.get_fingerprint(job, 'other content') != fingerprint
+    job.staging = fbx_exporter_planner.stage_zero
+    assert fbx_exporter_fingerprint.get_fingerprint(job, 'content') != fingerprint
+
+    # a job that can not be fingerprinted is exported
+    def broken_hash(job):
+        raise RuntimeError('no scene')
+
+    assert not fbx_exporter_fingerprint.IncrementalExport(broken_hash).is_current(job)
+    assert job.fingerprint is None
+
+    # an unreadable manifest is empty
+    manifest_path = os.path.join(str(tmp_path), fbx_exporter_fingerprint.manifest_name)
+    with open(manifest_path, 'w') as f:
+        f.write('{not json')
+    assert fbx_exporter_fingerprint.FingerprintManifest(str(tmp_path)).load().outputs == {}
@@ -0,0 +1,101 @@
+import scr
+import logging
+from scr.tools.fbxexporters import fbx_exporter_index
+from scr.tools.fbxexporters import fbx_exporter_serialize
+from scr.tools.fbxexporters import Identifiers
+from scr.tools.fbxexporters import LayerData
+from scr.tools.fbxexporters import ModelData
+from scr.tools.fbxexporters import ActorLayerData
+from scr.tools.fbxexporters import AnimationData
+
+"""
+tests for the exporter data index, these do not need Maya
+"""
+
+test_log = logging.getLogger(scr.logger_name)
+
+
+def make_model_layer(name, count=3):
+    layer = LayerData()
+    layer.name = name
+
+    for i in range(count):
+        model = ModelData()
+        model.name = 'crate_{0}'.format(i)
+        model.uuid = '{0}-uuid-{1}'.format(name, i)
+        model.export_items = ['crate_{0}_geo'.format(i), 'shared_geo']
+        layer.models.append(model)
+
+    return layer
+
+
+def test_lookups():
+    test_log.info('testing index lookups')
+    index = fbx_exporter_index.ExporterDataIndex()
+    props = make_model_layer('props')
+    sets = make_model_layer('sets', 2)
+    index.add_layer(Identifiers.model_layer_identifier + 'props', props)
+    index.add_layer(Identifiers.model_layer_identifier + 'sets', sets)
+
+    key = Identifiers.model_layer_identifier + 'props'
+    assert index.get_layer(key) is props
+    assert index.get_child(key, 'crate_1') is props.models[1]
+    assert index.get_child(key, 'missing') is None
+    assert index.get_child(Identifiers.model_layer_identifier + 'missing', 'crate_1') is None
+    assert index.find_uuid('sets-uuid-1') == [(Identifiers.model_layer_identifier + 'sets', sets.models[1])]
+    assert index.find_export_item('crate_2_geo') == [(key, props.models[2])]
+    assert len(index.find_export_item('shared_geo')) == 5
+
+
+def test_reindex_after_rename_and_remove():
+    test_log.info('testing index updates')
+    index = fbx_exporter_index.ExporterDataIndex()
+    layer = make_model_layer('props')
+    key = Identifiers.model_layer_identifier + 'props'
+    index.add_layer(key, layer)
+
+    layer.models[0].name = 'barrel'
+    layer.models[0].export_items = ['barrel_geo']
+    layer.models.pop(1)
+    index.add_layer(key, layer)
+
+    assert index.get_child(key, 'crate_0') is None
+    assert index.get_child(key, 'barrel') is layer.models[0]
+    assert index.find_export_item('crate_0_geo') == []
+    assert index.find_uuid('props-uuid-1') == []
+    assert len(index.find_export_item('shared_geo')) == 1
+
+    index.remove_layer(key)
+    assert not index.has_layer(key)
+    assert index.uuids == {} and index.export_items == {}
+
+
+def test_duplicate_names_and_animations():
+    test_log.info('testing index duplicate names')
+    index = fbx_exporter_index.ExporterDataIndex()
+    layer = make_model_layer('props')
+    layer.models[2].name = 'crate_0'
+    key = Identifiers.model_layer_identifier + 'props'
+    index.add_layer(key, layer)
+    assert index.get_children(key, 'crate_0') == [layer.models[0], layer.models[2]]
+
+    char = ActorLayerData()
+    char.name = 'hero'
+    anim = AnimationData()
+    anim.anim_name = 'run'
+    char.animations.append(anim)
+    index.add_layer(Identifiers.actor_identifier + 'hero', char)
+    assert index.get_child(Identifiers.actor_identifier + 'hero', 'run') is anim
+
+
+def test_indexing_loads_lazy_children():
+    test_log.info('testing index with lazy children')
+    layer = make_model_layer('props')
+    key = Identifiers.model_layer_identifier + 'props'
+    manifest, chunks = fbx_exporter_serialize.encode_chunked(layer, key)
+    out = fbx_exporter_serialize.decode(manifest, key, dict(chunks).get, lazy=True)
+
+    index = fbx_exporter_index.ExporterDataIndex()
+    index.add_layer(key, out)
+    assert fbx_exporter_serialize.is_loaded(out.models)
+    assert index.get_child(key, 'crate_1').uuid == 'props-uuid-1'
@@ -0,0 +1,84 @@
+import os
+import scr
+import logging
+from scr.tests.test_fbx_exporter_mafile import file_info
+from scr.tests.test_fbx_exporter_mafile import write_scene
+from scr.tools.fbxexporters import fbx_exporter_ma_editor
+from scr.tools.fbxexporters import fbx_exporter_mafile
+from scr.tools.fbxexporters import fbx_exporter_serialize
+from scr.tools.fbxexporters import Identifiers
+from scr.tools.fbxexporters import LayerData
+from scr.tools.fbxexporters import ModelData
+
+"""
+tests for editing exporter data in .ma files, these do not need Maya
+"""
+
+test_log = logging.getLogger(scr.logger_name)
+
+
+def test_remap_paths(tmp_path):
+    test_log.info('testing .ma path remap')
+    path = str(tmp_path / 'test.ma')
+    write_scene(path)
+    with open(path, 'rb') as ma_file:
+        before = ma_file.read()
+
+    results = fbx_exporter_ma_editor.edit_scenes(
+        [str(tmp_path)], [fbx_exporter_ma_editor.PathRemap('assets\\props', 'Assets/Env/Props')], workers=1)
+    assert results == [(path, 1, None)]
+
+    data = fbx_exporter_mafile.read_exporter_data(path)
+    layer = data[Identifiers.model_layer_identifier][0]
+    assert layer.path == 'Assets/Env/Props'
+    assert [m.name for m in layer.models] == ['crate_0', 'crate_1', 'crate_2']
+    assert data[Identifiers.actor_identifier][0].animations[0].end_frame == '24'
+
+    # only the layer statement changed, everything else is byte for byte the same
+    with open(path, 'rb') as ma_file:
+        after = ma_file.read()
+    changed = [(a, b) for a, b in zip(before.splitlines(), after.splitlines()) if a != b]
+    assert len(before.splitlines()) == len(after.splitlines())
+    assert len(changed) == 1 and b'Assets/Env/Props' in changed[0][1]
+
+    # no temporary files are left behind and a second run changes nothing
+    assert os.listdir(str(tmp_path)) == ['test.ma']
+    mtime = os.stat(path).st_mtime_ns
+    assert fbx_exporter_ma_editor.edit_scenes([path], [fbx_exporter_ma_editor.PathRemap('Assets/Props', 'x')]) == \
+        [(path, 0, None)]
+    assert os.stat(path).st_mtime_ns == mtime
+
+
+def test_set_option_on_chunks_and_legacy(tmp_path):
+    test_log.info('testing .ma option edit')
+    layer = LayerData()
+    layer.name = 'old'
+    model = ModelData()
+    model.name = 'crate'
+    model.path = 'Assets/Props/Old'
+    layer.models.append(model)
+
+    path = str(tmp_path / 'legacy.ma')
+    with open(path, 'w') as ma_file:
+        ma_file.write('//Maya ASCII 2024 scene\n')
+        ma_file.write(file_info(Identifiers.model_layer_identifier + 'old', fbx_exporter_serialize.to_xml(layer)))
+        ma_file.write('createNode transform -n "a";\n')
+
+    edits = [fbx_exporter_ma_editor.SetOption('fbx_export_triangulate', 'True'),
+             fbx_exporter_ma_editor.PathRemap('Assets/Props', 'Assets/Env')]
+    assert fbx_exporter_ma_editor.edit_scene(path, edits, dry_run=True) == (path, 1, None)
+    assert fbx_exporter_mafile.read_exporter_data(path)[Identifiers.model_layer_identifier][0].models[0].path == \
+        'Assets/Props/Old'
+
+    assert fbx_exporter_ma_editor.edit_scene(path, edits) == (path, 1, None)
+    out = fbx_exporter_mafile.read_exporter_data(path)[Identifiers.model_layer_identifier][0]
+    assert out.fbx_export_triangulate and out.models[0].fbx_export_triangulate
+    assert out.models[0].path == 'Assets/Env/Old'
+
+    chunk_path = str(tmp_path / 'chunked.ma')
+    write_scene(chunk_path)
+    path, changed, error = fbx_exporter_ma_editor.edit_scene(chunk_path, edits[:1])
+    # the layer manifest and its three model chunks
+    assert (changed, error) == (4, None)
+    out = fbx_exporter_mafile.read_exporter_data(chunk_path)[Identifiers.model_layer_identifier][0]
+    assert all(m.fbx_export_triangulate for m in out.models)
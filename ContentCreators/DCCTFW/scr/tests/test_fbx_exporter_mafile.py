@@ -0,0 +1,102 @@
+import scr
+import logging
+from scr.tools.fbxexporters import fbx_exporter_mafile
+from scr.tools.fbxexporters import fbx_exporter_serialize
+from scr.tools.fbxexporters import Identifiers
+from scr.tools.fbxexporters import LayerData
+from scr.tools.fbxexporters import ModelData
+from scr.tools.fbxexporters import ActorLayerData
+from scr.tools.fbxexporters import AnimationData
+
+"""
+tests for reading exporter data from .ma files, these do not need Maya
+"""
+
+test_log = logging.getLogger(scr.logger_name)
+
+
+def mel_string(value):
+    return '"{0}"'.format(value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+
+
+def file_info(key, value, split=None):
+    if split:
+        # maya splits long strings over lines
+        value = '\n\t\t+ '.join(mel_string(value[i:i + split]) for i in range(0, len(value), split))
+    else:
+        value = mel_string(value)
+    return 'fileInfo {0} {1};\n'.format(mel_string(key), value)
+
+
+def write_scene(path):
+    layer = LayerData()
+    layer.name = 'props'
+    layer.path = 'Assets/Props'
+    for i in range(3):
+        model = ModelData()
+        model.name = 'crate_{0}'.format(i)
+        model.export_items = ['crate_{0}_geo'.format(i), 'odd "quoted"; name']
+        layer.models.append(model)
+
+    char = ActorLayerData()
+    char.name = 'hero'
+    anim = AnimationData()
+    anim.anim_name = 'run'
+    anim.end_frame = '24'
+    char.animations.append(anim)
+
+    lines = ['//Maya ASCII 2024 scene\n',
+             '//Name: test.ma\n',
+             '//Codeset: UTF-8\n',
+             'file -rdi 1 -ns "rig" -rfn "rigRN" -op "v=0;" -typ "mayaAscii" "C:/rig.ma";\n',
+             'requires maya "2024";\n',
+             'currentUnit -l centimeter -a degree -t film;\n',
+             'fileInfo "application" "maya";\n']
+
+    for key, data in ((Identifiers.model_layer_identifier + layer.name, layer),
+                      (Identifiers.actor_identifier + char.name, char)):
+        manifest, chunks = fbx_exporter_serialize.encode_chunked(data, key)
+        for chunk_key, value in chunks:
+            lines.append(file_info(chunk_key, value))
+        lines.append(file_info(key, manifest))
+
+    lines.append('createNode transform -n "crate_0_geo";\n')
+    lines.append('fileInfo "{0}not_header" "ignored";\n'.format(Identifiers.model_layer_identifier))
+
+    with open(path, 'w') as ma_file:
+        ma_file.writelines(lines)
+
+
+def test_read_exporter_data(tmp_path):
+    test_log.info('testing .ma reader')
+    path = str(tmp_path / 'test.ma')
+    write_scene(path)
+
+    values = fbx_exporter_mafile.read_fileInfo(path)
+    assert 'application' not in values
+    # reading stops at the first createNode
+    assert Identifiers.model_layer_identifier + 'not_header' not in values
+
+    data = fbx_exporter_mafile.read_exporter_data(path)
+    layer = data[Identifiers.model_layer_identifier][0]
+    assert layer.path == 'Assets/Props'
+    assert [m.name for m in layer.models] == ['crate_0', 'crate_1', 'crate_2']
+    assert layer.models[1].export_items == ['crate_1_geo', 'odd "quoted"; name']
+
+    char = data[Identifiers.actor_identifier][0]
+    assert char.name == 'hero'
+    assert char.animations[0].end_frame == '24'
+    assert data[Identifiers.rig_layer_identifier] == []
+
+
+def test_split_strings():
+    test_log.info('testing .ma split strings')
+    value = '{"n":"props","p":"Assets/Props"}'
+    lines = ['//Maya ASCII 2024 scene\n', file_info('_fbx_export_model_layer_props', value, split=7),
+             'createNode transform -n "a";\n']
+    statements = list(fbx_exporter_mafile.iter_header_statements(line.encode() for line in lines))
+
+    assert len(statements) == 1
+    command, args = statements[0]
+    assert command == 'fileInfo'
+    assert fbx_exporter_serialize.unescape_fileInfo_value(args[1]) == value
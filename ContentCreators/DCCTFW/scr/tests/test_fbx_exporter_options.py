@@ -0,0 +1,30 @@
+import scr
+import logging
+from scr.tools.fbxexporters import fbx_exporter_options
+
+"""
+tests for the FBX option state, these do not need Maya
+"""
+
+test_log = logging.getLogger(scr.logger_name)
+
+
+def test_only_changes_are_sent():
+    test_log.info('testing fbx option diffing')
+    state = fbx_exporter_options.FBXOptionState()
+    model = {'FBXExportScaleFactor': 1, 'FBXExportConvertUnitString': 'cm', 'FBXExportTriangulate': False}
+
+    # unknown state, reset and send everything in one script
+    assert state.get_script(model) == \
+        'FBXResetExport; FBXExportScaleFactor 1; FBXExportConvertUnitString -v "cm"; FBXExportTriangulate -v false;'
+
+    # same options again, nothing to send. one changed option is sent on its own
+    assert state.get_script(dict(model)) == ''
+    assert state.get_script(dict(model, FBXExportTriangulate=True)) == 'FBXExportTriangulate -v true;'
+    assert state.get_script(dict(model, FBXExportTriangulate=True, FBXExportSkins=True)) == 'FBXExportSkins -v true;'
+
+    # an option set without FBXExportSkins needs it back at its default, that takes a reset
+    assert state.get_script(model).startswith('FBXResetExport;')
+
+    state.invalidate()
+    assert state.get_script(model).startswith('FBXResetExport;')
@@ -0,0 +1,119 @@
+import os
+import scr
+import logging
+from scr.tests.test_fbx_exporter_project_index import make_props
+from scr.tests.test_fbx_exporter_project_index import make_rig
+from scr.tools.fbxexporters import fbx_exporter_planner
+from scr.tools.fbxexporters import GlobalExportOptions
+from scr.tools.fbxexporters import Identifiers
+
+"""
+tests for the export planner, these do not need Maya
+"""
+
+test_log = logging.getLogger(scr.logger_name)
+
+
+def test_plan_groups_jobs(tmp_path):
+    test_log.info('testing export plan')
+    project = str(tmp_path)
+    os.makedirs(os.path.join(project, 'Assets', 'Props'))
+    os.makedirs(os.path.join(project, 'Assets', 'Rigs'))
+
+    key, props = make_props(['crate', 'barrel', 'tri', 'zeroed'])
+    props.models[2].fbx_export_override_layer_options = True
+    props.models[2].fbx_export_triangulate = True
+    props.models[3].fbx_export_zero = True
+    rig_key, rig = make_rig()
+    rig.models[0].name = '|grp|hero_mesh'
+
+    plan = fbx_exporter_planner.plan_exports({Identifiers.rig_layer_identifier: [rig],
+                                              Identifiers.model_layer_identifier: [props]},
+                                             project, GlobalExportOptions())
+
+    assert [job.path for job in plan.jobs[:2]] == [project + '/Assets/Props/crate.fbx',
+                                                   project + '/Assets/Props/barrel.fbx']
+    assert plan.jobs[-1].path == project + '/Assets/Rigs/hero_mesh.fbx'
+    assert plan.jobs[2].options['FBXExportTriangulate'] and not plan.jobs[0].options['FBXExportTriangulate']
+
+    # models with the same options run together, staged models after them and rigs last
+    groups = [(staging, [job.name for job in jobs]) for staging, profile, jobs in plan.get_groups()]
+    assert groups == [('', ['crate', 'barrel']), ('', ['tri']), ('zero', ['zeroed']), ('rig', ['|grp|hero_mesh'])]
+
+    ran = []
+
+    def run_job(job):
+        ran.append(job.name)
+        if job.name == 'tri':
+            raise RuntimeError('no mesh')
+        return True
+
+    results, cancelled = fbx_exporter_planner.run_plan(plan, run_job)
+    assert not cancelled and ran == ['crate', 'barrel', 'tri', 'zeroed', '|grp|hero_mesh']
+    assert [(r.job.name, r.error) for r in results if not r.success] == [('tri', 'RuntimeError: no mesh')]
+
+    # cancel after two jobs
+    results, cancelled = fbx_exporter_planner.run_plan(plan, run_job, lambda done, total, job: done < 2)
+    assert cancelled and len(results) == 2
+
+
+def test_missing_folders_are_errors(tmp_path):
+    test_log.info('testing export plan errors')
+    key, props = make_props(['crate'])
+    plan = fbx_exporter_planner.plan_exports({Identifiers.model_layer_identifier: [props]}, str(tmp_path),
+                                             GlobalExportOptions())
+
+    assert plan.jobs[0].error.startswith('export folder not found')
+    assert plan.get_groups() == []
+    results, cancelled = fbx_exporter_planner.run_plan(plan, lambda job: True)
+    assert [r.success for r in results] == [False]
+
+
+def test_duplicates_are_exported_once(tmp_path):
+    test_log.info('testing export deduplication')
+    project = str(tmp_path)
+    os.makedirs(os.path.join(project, 'Assets', 'Props'))
+    os.makedirs(os.path.join(project, 'Assets', 'Kits'))
+
+    # the same meshes in two layers, a third model with other meshes
+    key, props = make_props(['crate', 'barrel'])
+    kit_key, kit = make_props(['kit_crate'])
+    kit.name = 'kit'
+    kit.path = 'Assets/Kits'
+    props.models[0].export_items = ['crate_geo', 'lid_geo']
+    props.models[1].export_items = ['barrel_geo']
+    kit.models[0].export_items = ['crate_geo', 'lid_geo']
+
+    plan = fbx_exporter_planner.plan_exports({Identifiers.model_layer_identifier: [props, kit]}, project,
+                                             GlobalExportOptions())
+    assert [job.name for job in plan.get_duplicates()] == ['kit_crate']
+    assert plan.get_duplicates()[0].source.name == 'crate'
+    assert sorted(job.name for group in plan.get_groups() for job in group[2]) == ['barrel', 'crate']
+
+    exported = []
+
+    def run_job(job):
+        exported.append(job.name)
+        with open(job.path, 'w') as f:
+            f.write(job.name)
+        return True
+
+    results, cancelled = fbx_exporter_planner.run_plan(plan, run_job)
+    assert sorted(exported) == ['barrel', 'crate'] and len(results) == 3
+    assert all(result.success for result in results)
+    with open(os.path.join(project, 'Assets', 'Kits', 'kit_crate.fbx')) as f:
+        assert f.read() == 'crate'
+
+    # other options are another fbx
+    kit.models[0].fbx_export_override_layer_options = True
+    kit.models[0].fbx_export_triangulate = True
+    plan = fbx_exporter_planner.plan_exports({Identifiers.model_layer_identifier: [props, kit]}, project,
+                                             GlobalExportOptions())
+    assert plan.get_duplicates() == []
+
+    # a duplicate of a failed export fails
+    kit.models[0].fbx_export_override_layer_options = False
+    plan = fbx_exporter_planner.plan_exports({Identifiers.model_layer_identifier: [props, kit]}, project,
+                                             GlobalExportOptions())
+    results, cancelled = fbx_exporter_planner.run_plan(plan, lambda job: job.name != 'crate')
+    assert sorted(result.job.name for result in results if not result.success) == ['crate', 'kit_crate']
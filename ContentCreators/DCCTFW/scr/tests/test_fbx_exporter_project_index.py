@@ -0,0 +1,87 @@
+import os
+import scr
+import logging
+from scr.tests.test_fbx_exporter_mafile import file_info
+from scr.tools.fbxexporters import fbx_exporter_project_index
+from scr.tools.fbxexporters import fbx_exporter_serialize
+from scr.tools.fbxexporters import Identifiers
+from scr.tools.fbxexporters import LayerData
+from scr.tools.fbxexporters import ModelData
+from scr.tools.fbxexporters import RigLayerData
+from scr.tools.fbxexporters import RigModelData
+
+"""
+tests for the project export index, these do not need Maya
+"""
+
+test_log = logging.getLogger(scr.logger_name)
+
+
+def write_scene(path, layers):
+    lines = ['//Maya ASCII 2024 scene\n', 'requires maya "2024";\n']
+    for key, data in layers:
+        manifest, chunks = fbx_exporter_serialize.encode_chunked(data, key)
+        lines.extend(file_info(chunk_key, value) for chunk_key, value in chunks)
+        lines.append(file_info(key, manifest))
+    lines.append('createNode transform -n "a";\n')
+
+    with open(path, 'w') as ma_file:
+        ma_file.writelines(lines)
+
+
+def make_props(model_names):
+    layer = LayerData()
+    layer.name = 'props'
+    layer.path = 'Assets\\Props'
+    for name in model_names:
+        model = ModelData()
+        model.name = name
+        model.uuid = name + '-uuid'
+        layer.models.append(model)
+
+    return Identifiers.model_layer_identifier + layer.name, layer
+
+
+def make_rig():
+    rig = RigLayerData()
+    rig.name = 'hero'
+    rig.root = 'root_jnt'
+    rig.rig_path = 'Assets/Rigs'
+    rig.animation_path = 'Assets/Anims/Hero'
+    model = RigModelData()
+    model.name = 'hero_mesh'
+    rig.models.append(model)
+
+    return Identifiers.rig_layer_identifier + rig.name, rig
+
+
+def test_scan_and_query(tmp_path):
+    test_log.info('testing project index')
+    project = tmp_path / 'project'
+    (project / 'scenes').mkdir(parents=True)
+    write_scene(str(project / 'scenes' / 'props.ma'), [make_props(['crate', 'barrel'])])
+    write_scene(str(project / 'scenes' / 'hero.ma'), [make_rig()])
+    (project / 'scenes' / 'broken.ma').write_text('fileInfo "_fbx_export_model_layer_x" "{not json";\n')
+
+    index = fbx_exporter_project_index.ProjectIndex(str(tmp_path / 'index.sqlite'))
+    assert index.update(str(project), workers=2) == (3, 0, 0)
+
+    results = index.find_by_output_path('assets/props/crate.fbx', str(project))
+    assert [(os.path.basename(r.scene), r.item) for r in results] == [('props.ma', 'crate')]
+    assert len(index.find_by_layer('props')) == 2
+    assert index.find_by_uuid('barrel-uuid')[0].item == 'barrel'
+
+    results = index.find_by_output_folder('Assets/Anims/Hero', str(project))
+    assert [(r.kind, r.root) for r in results] == [(fbx_exporter_project_index.rig_animations_kind, 'root_jnt')]
+    assert [r.item for r in index.find_by_root('root_jnt')] == [None, 'hero_mesh']
+    assert [os.path.basename(path) for path, error in index.get_errors()] == ['broken.ma']
+
+    # only changed scenes are read again, removed scenes are dropped
+    write_scene(str(project / 'scenes' / 'props.ma'), [make_props(['crate'])])
+    os.remove(str(project / 'scenes' / 'broken.ma'))
+    assert index.update(str(project), workers=1) == (1, 1, 1)
+    assert index.find_by_uuid('barrel-uuid') == []
+    assert index.get_errors() == []
+    assert len(index.find_by_root('root_jnt')) == 2
+
+    index.close()
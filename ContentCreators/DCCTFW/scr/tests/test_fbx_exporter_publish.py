@@ -0,0 +1,113 @@
+import os
+import scr
+import logging
+from scr.tests.test_fbx_exporter_fbxhash import write_fbx
+from scr.tests.test_fbx_exporter_project_index import make_props
+from scr.tools.fbxexporters import fbx_exporter_fbxhash
+from scr.tools.fbxexporters import fbx_exporter_planner
+from scr.tools.fbxexporters import fbx_exporter_publish
+from scr.tools.fbxexporters import fbx_exporter_telemetry
+from scr.tools.fbxexporters import GlobalExportOptions
+from scr.tools.fbxexporters import Identifiers
+
+"""
+tests for publishing exports from local storage, these do not need Maya
+"""
+
+test_log = logging.getLogger(scr.logger_name)
+
+
+def test_publish_local(tmp_path):
+    test_log.info('testing local publish')
+    project = tmp_path / 'project'
+    (project / 'props').mkdir(parents=True)
+    (project / 'kits').mkdir()
+    published = str(project / 'props' / 'crate.fbx')
+
+    # outputs with the same name in different folders are staged apart, away from the project
+    local = fbx_exporter_fbxhash.get_local_staging_path(published)
+    assert local != fbx_exporter_fbxhash.get_local_staging_path(str(project / 'kits' / 'crate.fbx'))
+    assert not local.startswith(str(project))
+
+    # first publish, nothing is left behind in the project or the local staging folder
+    assert not fbx_exporter_fbxhash.publish_local(write_fbx(local), published)
+    assert not os.path.exists(local)
+    assert os.listdir(str(project / 'props')) == ['crate.fbx']
+
+    # same content keeps the published file
+    os.utime(published, ns=(1000000000, 1000000000))
+    local = write_fbx(fbx_exporter_fbxhash.get_local_staging_path(published), second=30, model=7)
+    assert fbx_exporter_fbxhash.publish_local(local, published)
+    assert os.stat(published).st_mtime_ns == 1000000000
+
+    # changed content replaces it
+    local = write_fbx(fbx_exporter_fbxhash.get_local_staging_path(published), vertices='1,1,1')
+    assert not fbx_exporter_fbxhash.publish_local(local, published)
+    with open(published) as fbx_file:
+        assert 'a: 1,1,1' in fbx_file.read()
+    assert os.listdir(str(project / 'props')) == ['crate.fbx'] and not os.path.exists(local)
+
+
+def test_publish_queue(tmp_path):
+    test_log.info('testing background publish')
+    project = str(tmp_path)
+    os.makedirs(os.path.join(project, 'Assets', 'Props'))
+    key, props = make_props(['crate', 'barrel', 'lost'])
+    for model in props.models:
+        model.export_items = [model.name + '_geo']
+    plan = fbx_exporter_planner.plan_exports({Identifiers.model_layer_identifier: [props]}, project,
+                                             GlobalExportOptions())
+    # planned fine but the folder is a file by the time the fbx is published
+    with open(os.path.join(project, 'blocked'), 'w') as f:
+        f.write('')
+    plan.jobs[2].path = os.path.join(project, 'blocked', 'lost.fbx')
+    # a second target for crate, it gets the fbx once crate is published
+    duplicate = fbx_exporter_planner.ExportJob(plan.jobs[0].kind, key, props, plan.jobs[0].data,
+                                               os.path.join(project, 'Assets', 'Props', 'crate_copy.fbx'),
+                                               plan.jobs[0].options)
+    plan.jobs.append(duplicate)
+    plan.find_duplicates()
+
+    publisher = fbx_exporter_publish.PublishQueue(workers=1)
+    recorder = fbx_exporter_telemetry.ExportTelemetry()
+
+    def run_job(job):
+        with recorder.job(job.kind, job.name, job.path) as record:
+            job.telemetry = record
+            local = write_fbx(fbx_exporter_fbxhash.get_local_staging_path(job.path), vertices=str(len(job.name)))
+            publisher.submit(local, job.path, record)
+        return True
+
+    def finish(results):
+        futures = publisher.wait()
+        return [fbx_exporter_planner.ExportResult(result.job, False, 'publish failed')
+                if futures[publisher.get_output_key(result.job.path)].exception() else result for result in results]
+
+    results, cancelled = fbx_exporter_planner.run_plan(plan, run_job, finish=finish)
+    assert sorted((result.job.name, result.success) for result in results) == [
+        ('barrel', True), ('crate', True), ('crate', True), ('lost', False)]
+    assert sorted(os.listdir(os.path.join(project, 'Assets', 'Props'))) == ['barrel.fbx', 'crate.fbx',
+                                                                          'crate_copy.fbx']
+    assert not os.path.exists(fbx_exporter_fbxhash.get_local_staging_path(plan.jobs[2].path))
+    assert plan.jobs[0].telemetry.stages[fbx_exporter_telemetry.publish_stage] > 0
+    assert publisher.get(plan.jobs[0].path) is None
+
+
+def test_local_staging_folders(tmp_path):
+    test_log.info('testing local staging folders')
+    project = tmp_path / 'project'
+    (project / 'props').mkdir(parents=True)
+    crate = str(project / 'props' / 'crate.fbx')
+    barrel = str(project / 'props' / 'barrel.fbx')
+
+    # the folder of an output that is about to be exported survives the publish of another output in it
+    publisher = fbx_exporter_publish.PublishQueue(workers=1)
+    publisher.submit(write_fbx(fbx_exporter_fbxhash.get_local_staging_path(crate)), crate).result()
+    local = fbx_exporter_fbxhash.get_local_staging_path(barrel)
+    assert os.path.isdir(os.path.dirname(local))
+    publisher.submit(write_fbx(local), barrel).result()
+
+    # and is removed once nothing is left to publish
+    publisher.wait()
+    assert not os.path.exists(os.path.dirname(local))
+    assert sorted(os.listdir(str(project / 'props'))) == ['barrel.fbx', 'crate.fbx']
@@ -0,0 +1,303 @@
+import scr
+import copy
+import logging
+from scr.tools.fbxexporters import fbx_exporter_serialize
+from scr.tools.fbxexporters import Identifiers
+from scr.tools.fbxexporters import LayerData
+from scr.tools.fbxexporters import ModelData
+from scr.tools.fbxexporters import RigLayerData
+from scr.tools.fbxexporters import RigModelData
+from scr.tools.fbxexporters import ActorLayerData
+from scr.tools.fbxexporters import AnimationData
+
+"""
+tests for the fileInfo serialization, these do not need Maya
+"""
+
+test_log = logging.getLogger(scr.logger_name)
+
+
+def make_model_layer():
+    layer = LayerData()
+    layer.name = 'props'
+    layer.path = 'Assets/Props'
+    layer.fbx_export_zero = True
+
+    for i in range(3):
+        model = ModelData()
+        model.name = 'crate_{0}'.format(i)
+        model.uuid = 'uuid-{0}'.format(i)
+        model.path = 'Assets/Props/crate_{0}.fbx'.format(i)
+        model.export_items = ['crate_{0}_geo'.format(i), 'odd, name']
+        model.fbx_export_triangulate = True
+        layer.models.append(model)
+
+    return layer
+
+
+def test_model_layer_json_round_trip():
+    test_log.info('testing model layer json round trip')
+    layer = make_model_layer()
+    key = Identifiers.model_layer_identifier + layer.name
+
+    value = fbx_exporter_serialize.encode(layer)
+    out = fbx_exporter_serialize.decode(value, key)
+
+    assert not fbx_exporter_serialize.is_legacy_value(value)
+    assert out.name == layer.name
+    assert out.path == layer.path
+    assert out.fbx_export_zero
+    assert [m.name for m in out.models] == [m.name for m in layer.models]
+    # lists are real json lists, a name containing the old separator survives
+    assert out.models[0].export_items == ['crate_0_geo', 'odd, name']
+    assert out.models[2].fbx_export_triangulate
+    # encoding is canonical
+    assert fbx_exporter_serialize.encode(out) == value
+
+
+def test_model_layer_legacy_xml():
+    test_log.info('testing model layer legacy xml')
+    layer = make_model_layer()
+    layer.models[0].export_items = ['crate_0_geo']
+    key = Identifiers.model_layer_identifier + layer.name
+
+    value = fbx_exporter_serialize.to_xml(layer)
+    out = fbx_exporter_serialize.decode(value, key)
+
+    assert fbx_exporter_serialize.is_legacy_value(value)
+    assert out.name == layer.name
+    assert out.models[0].export_items == ['crate_0_geo']
+    assert out.models[1].uuid == 'uuid-1'
+    assert out.fbx_export_zero
+
+
+def test_rig_layer_round_trip():
+    test_log.info('testing rig layer round trip')
+    rig = RigLayerData()
+    rig.name = 'hero'
+    rig.model_name = 'hero_mesh'
+    rig.root = 'root_jnt'
+    rig.uuid = 'rig-uuid'
+    rig.export_items = ['body', 'head']
+    model = RigModelData()
+    model.name = 'body'
+    model.influences = '4'
+    model.export_items = ['body_geo']
+    rig.models.append(model)
+
+    for value in (fbx_exporter_serialize.encode(rig), fbx_exporter_serialize.to_xml(rig)):
+        out = fbx_exporter_serialize.decode(value, Identifiers.rig_layer_identifier + rig.name)
+        assert out.name == 'hero'
+        assert out.root == 'root_jnt'
+        assert out.uuid == 'rig-uuid'
+        assert out.export_items == ['body', 'head']
+        assert out.models[0].export_items == ['body_geo']
+
+
+def test_actor_layer_round_trip():
+    test_log.info('testing actor layer round trip')
+    char = ActorLayerData()
+    char.name = 'hero'
+    char.path = 'Assets/Anims'
+    char.root = 'root_jnt'
+    anim = AnimationData()
+    anim.anim_name = 'run'
+    anim.start_frame = '1'
+    anim.end_frame = '24'
+    char.animations.append(anim)
+
+    key = Identifiers.actor_identifier + char.name
+    for value in (fbx_exporter_serialize.encode(char), fbx_exporter_serialize.to_xml(char)):
+        out = fbx_exporter_serialize.decode(value, key)
+        assert out.name == 'hero'
+        assert out.path == 'Assets/Anims'
+        assert out.animations[0].anim_name == 'run'
+        assert out.animations[0].end_frame == '24'
+
+
+def test_json_is_smaller_than_xml():
+    test_log.info('testing json size')
+    layer = make_model_layer()
+    assert len(fbx_exporter_serialize.encode(layer)) < len(
+        fbx_exporter_serialize.to_xml(layer))
+
+
+def test_containers_are_slotted():
+    test_log.info('testing container slots')
+    model = ModelData()
+    assert not hasattr(model, '__dict__')
+    assert model.export_items == [] and model.export_items is not ModelData().export_items
+    assert model.fbx_export_smoothing_groups
+
+    try:
+        model.not_a_field = True
+    except AttributeError:
+        pass
+    else:
+        assert False, 'undeclared attribute was set'
+
+
+def test_missing_fields_get_defaults():
+    test_log.info('testing missing fields')
+    key = Identifiers.model_layer_identifier + 'props'
+    out = fbx_exporter_serialize.decode('{"m":[{"n":"crate"}],"v":1}', key)
+
+    assert out.path is None
+    assert out.fbx_export_tangents
+    assert out.models[0].name == 'crate'
+    assert out.models[0].export_items == []
+    assert not out.models[0].fbx_export_zero
+
+
+def test_chunked_round_trip():
+    test_log.info('testing chunked layers')
+    layer = make_model_layer()
+    layer.models[2].name = 'crate_0'
+    key = Identifiers.model_layer_identifier + layer.name
+
+    manifest, chunks = fbx_exporter_serialize.encode_chunked(layer, key)
+    store = dict(chunks)
+    store[key] = manifest
+
+    # duplicate names still get their own chunk
+    assert len(store) == 4
+    assert fbx_exporter_serialize.get_chunk_keys(manifest, key) == [chunk_key for chunk_key, value in chunks]
+    assert all(chunk_key.startswith(Identifiers.chunk_identifier) for chunk_key, value in chunks)
+
+    out = fbx_exporter_serialize.decode(manifest, key, store.get)
+    assert [m.name for m in out.models] == ['crate_0', 'crate_1', 'crate_0']
+    assert out.models[1].uuid == 'uuid-1'
+    assert out.fbx_export_zero
+
+
+def test_chunked_edit_changes_one_chunk():
+    test_log.info('testing chunked edit')
+    layer = make_model_layer()
+    key = Identifiers.model_layer_identifier + layer.name
+
+    manifest, chunks = fbx_exporter_serialize.encode_chunked(layer, key)
+    layer.models[1].path = 'Assets/Other/crate_1.fbx'
+    new_manifest, new_chunks = fbx_exporter_serialize.encode_chunked(layer, key)
+
+    assert new_manifest == manifest
+    assert [a == b for a, b in zip(chunks, new_chunks)] == [True, False, True]
+
+
+def test_format_version():
+    test_log.info('testing format version')
+    layer = make_model_layer()
+    key = Identifiers.model_layer_identifier + layer.name
+
+    assert fbx_exporter_serialize.get_format_version(fbx_exporter_serialize.to_xml(layer)) == 0
+    assert fbx_exporter_serialize.get_format_version('{"n":"props"}') == 1
+    assert fbx_exporter_serialize.get_format_version(fbx_exporter_serialize.encode_chunked(layer, key)[0]) == \
+        fbx_exporter_serialize.format_version
+
+
+def test_lazy_children():
+    test_log.info('testing lazy children')
+    layer = make_model_layer()
+    key = Identifiers.model_layer_identifier + layer.name
+    manifest, chunks = fbx_exporter_serialize.encode_chunked(layer, key)
+    store = dict(chunks)
+
+    reads = []
+
+    def get_value(chunk_key):
+        reads.append(chunk_key)
+        return store.get(chunk_key)
+
+    out = fbx_exporter_serialize.decode(manifest, key, get_value, lazy=True)
+    assert out.path == layer.path
+    assert not fbx_exporter_serialize.is_loaded(out.models)
+    assert fbx_exporter_serialize.get_child_count(out.models) == 3
+    assert not reads
+
+    # writing a layer whose children were never read keeps its chunks as they are
+    assert fbx_exporter_serialize.encode_chunked(out, key) == (manifest, [])
+
+    assert out.models[1].name == 'crate_1'
+    assert len(reads) == 3
+    assert fbx_exporter_serialize.encode_chunked(out, key) == (manifest, chunks)
+
+
+def test_lazy_children_copy_and_concat():
+    test_log.info('testing lazy children copy and concatenation')
+    layer = make_model_layer()
+    key = Identifiers.model_layer_identifier + layer.name
+    manifest, chunks = fbx_exporter_serialize.encode_chunked(layer, key)
+    store = dict(chunks)
+
+    out = fbx_exporter_serialize.decode(manifest, key, store.get, lazy=True)
+    assert [model.name for model in [] + out.models] == ['crate_0', 'crate_1', 'crate_2']
+
+    out = fbx_exporter_serialize.decode(manifest, key, store.get, lazy=True)
+    models = copy.copy(out.models)
+    assert len(models) == 3
+    assert len(out.models) == 3
+    assert isinstance(models, list)
+
+
+def test_container_copy():
+    test_log.info('testing container copy')
+    layer = make_model_layer()
+    key = Identifiers.model_layer_identifier + layer.name
+    manifest, chunks = fbx_exporter_serialize.encode_chunked(layer, key)
+
+    # an export with a missing item works on a copy, the cached layer and what it writes back are unchanged
+    cached = fbx_exporter_serialize.decode(manifest, key, dict(chunks).get)
+    model = cached.models[0]
+    export_model = model.copy()
+    export_model.export_items.remove('odd, name')
+    export_model.export_items[0] = 'renamed_geo'
+
+    assert type(export_model) is ModelData and export_model.uuid == model.uuid
+    assert model.export_items == ['crate_0_geo', 'odd, name']
+    assert fbx_exporter_serialize.encode_chunked(cached, key) == (manifest, chunks)
+
+
+def test_chunk_keys_do_not_collide():
+    test_log.info('testing chunk keys of names with the chunk separator')
+    # layer a|b with model c and layer a with model b|c
+    first = LayerData()
+    first.name = 'a|b'
+    first.models = [ModelData()]
+    first.models[0].name = 'c'
+    second = LayerData()
+    second.name = 'a'
+    second.models = [ModelData()]
+    second.models[0].name = 'b|c'
+    first_key = Identifiers.model_layer_identifier + first.name
+    second_key = Identifiers.model_layer_identifier + second.name
+
+    first_manifest, first_chunks = fbx_exporter_serialize.encode_chunked(first, first_key)
+    second_manifest, second_chunks = fbx_exporter_serialize.encode_chunked(second, second_key)
+    assert first_chunks[0][0] != second_chunks[0][0]
+    assert fbx_exporter_serialize.get_chunk_key(Identifiers.model_layer_identifier + 'a', '%7C') != \
+        fbx_exporter_serialize.get_chunk_key(Identifiers.model_layer_identifier + 'a', '|')
+
+    store = dict(first_chunks + second_chunks)
+    assert fbx_exporter_serialize.decode(first_manifest, first_key, store.get).models[0].name == 'c'
+    assert fbx_exporter_serialize.decode(second_manifest, second_key, store.get).models[0].name == 'b|c'
+
+
+def test_version_2_chunk_keys():
+    test_log.info('testing version 2 chunk keys')
+    key = Identifiers.model_layer_identifier + 'a|b'
+    model = ModelData()
+    model.name = 'c'
+    chunk = fbx_exporter_serialize.encode_chunk(model)
+    manifest = '{"c":["c"],"n":"a|b","v":2}'
+    store = {'_fbx_export_chunk_model_layer_a|b|c': chunk}
+
+    # version 2 manifests read their chunks with unquoted keys
+    assert fbx_exporter_serialize.get_chunk_keys(manifest, key) == list(store)
+    assert len(fbx_exporter_serialize.decode(manifest, key, store.get).models) == 1
+
+    # a layer whose children were not read keeps its version and chunks, a loaded one is written with quoted keys
+    lazy = fbx_exporter_serialize.decode(manifest, key, store.get, lazy=True)
+    assert fbx_exporter_serialize.encode_chunked(lazy, key) == (manifest, [])
+    fbx_exporter_serialize.load_children(lazy)
+    new_manifest, chunks = fbx_exporter_serialize.encode_chunked(lazy, key)
+    assert fbx_exporter_serialize.get_format_version(new_manifest) == fbx_exporter_serialize.format_version
+    assert [chunk_key for chunk_key, value in chunks] == ['_fbx_export_chunk_model_layer_a%7Cb|c']
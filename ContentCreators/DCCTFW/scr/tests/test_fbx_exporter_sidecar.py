@@ -0,0 +1,83 @@
+import os
+import scr
+import logging
+import threading
+from scr.tests.test_fbx_exporter_project_index import make_props
+from scr.tests.test_fbx_exporter_project_index import make_rig
+from scr.tools.fbxexporters import fbx_exporter_serialize
+from scr.tools.fbxexporters import fbx_exporter_sidecar
+from scr.tools.fbxexporters import Identifiers
+
+"""
+tests for the sidecar export manifest, these do not need Maya
+"""
+
+test_log = logging.getLogger(scr.logger_name)
+
+
+def get_values(layers):
+    values = {}
+    for key, data in layers:
+        manifest, chunks = fbx_exporter_serialize.encode_chunked(data, key)
+        values.update(chunks)
+        values[key] = manifest
+
+    return values
+
+
+def test_sidecar_write_and_read(tmp_path):
+    test_log.info('testing sidecar manifest')
+    scene_path = str(tmp_path / 'hero.mb')
+    values = get_values([make_props(['crate', 'barrel']), make_rig()])
+
+    writer = fbx_exporter_sidecar.SidecarWriter()
+    writer.submit(scene_path, values)
+    writer.wait()
+
+    data = fbx_exporter_sidecar.read_exporter_data(scene_path)
+    assert [m.name for m in data[Identifiers.model_layer_identifier][0].models] == ['crate', 'barrel']
+    assert data[Identifiers.rig_layer_identifier][0].models[0].name == 'hero_mesh'
+    assert sorted(os.listdir(str(tmp_path))) == ['hero.mb.fbx_export.json']
+
+    # saving again with the same data does not touch the file, a new writer compares with the file on disk
+    sidecar_path = fbx_exporter_sidecar.get_sidecar_path(scene_path)
+    mtime = os.stat(sidecar_path).st_mtime_ns
+    assert writer.write(scene_path, dict(values)) == 0
+    assert fbx_exporter_sidecar.SidecarWriter().write(scene_path, dict(values)) == 0
+    assert os.stat(sidecar_path).st_mtime_ns == mtime
+
+    # a removed model drops its chunk and rewrites the manifest
+    changed = get_values([make_props(['crate']), make_rig()])
+    assert writer.write(scene_path, changed) == 2
+    assert fbx_exporter_sidecar.read_sidecar(scene_path) == changed
+
+
+def test_sidecar_writes_are_merged(tmp_path, monkeypatch):
+    test_log.info('testing sidecar queue')
+    scene_path = str(tmp_path / 'props.ma')
+    write_sidecar = fbx_exporter_sidecar.write_sidecar
+    started = threading.Event()
+    release = threading.Event()
+    written = []
+
+    def held_write(path, values):
+        started.set()
+        release.wait(10)
+        written.append(len(values))
+        return write_sidecar(path, values)
+
+    monkeypatch.setattr(fbx_exporter_sidecar, 'write_sidecar', held_write)
+
+    # saves made while the first write is still running are merged into one write of the latest data
+    writer = fbx_exporter_sidecar.SidecarWriter()
+    writer.submit(scene_path, get_values([make_props(['a'])]))
+    assert started.wait(10)
+    for names in (['a', 'b'], ['a', 'b', 'c'], ['a', 'b', 'c', 'd']):
+        writer.submit(scene_path, get_values([make_props(names)]))
+    release.set()
+    writer.wait()
+
+    assert written == [2, 5]
+    layer = fbx_exporter_sidecar.read_exporter_data(scene_path)[Identifiers.model_layer_identifier][0]
+    assert [m.name for m in layer.models] == ['a', 'b', 'c', 'd']
+    assert fbx_exporter_sidecar.read_exporter_data(str(tmp_path / 'missing.ma')) is None
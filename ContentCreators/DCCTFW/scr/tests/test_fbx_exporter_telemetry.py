@@ -0,0 +1,89 @@
+import os
+import time
+import scr
+import logging
+from scr.tests.test_fbx_exporter_project_index import make_props
+from scr.tools.fbxexporters import fbx_exporter_planner
+from scr.tools.fbxexporters import fbx_exporter_telemetry
+from scr.tools.fbxexporters import GlobalExportOptions
+from scr.tools.fbxexporters import Identifiers
+
+"""
+tests for export telemetry, these do not need Maya
+"""
+
+test_log = logging.getLogger(scr.logger_name)
+
+
+def test_stages_are_counted_once():
+    test_log.info('testing export stage timers')
+    recorder = fbx_exporter_telemetry.ExportTelemetry()
+
+    # no job, nothing is recorded
+    with recorder.stage(fbx_exporter_telemetry.write_stage):
+        pass
+    recorder.count(items=3)
+    assert recorder.current is None
+
+    with recorder.job('model', 'crate', 'crate.fbx') as record:
+        with recorder.stage(fbx_exporter_telemetry.scene_stage):
+            time.sleep(0.01)
+            # a stage inside a stage pauses the outer one
+            with recorder.stage(fbx_exporter_telemetry.options_stage):
+                time.sleep(0.02)
+            time.sleep(0.01)
+        with recorder.job('model', 'nested', 'nested.fbx') as nested:
+            assert nested is record
+        recorder.count(items=2)
+        recorder.count(items=1)
+
+    assert recorder.current is None
+    assert record.stages['options'] >= 0.02 and record.stages['stage'] >= 0.02
+    assert record.total >= sum(record.stages.values())
+    assert record.items == 3 and record.bytes == 0
+
+    copy = fbx_exporter_telemetry.JobRecord.from_dict(record.to_dict())
+    assert copy.to_dict() == record.to_dict()
+    assert fbx_exporter_telemetry.JobRecord.from_dict(None) is None
+
+
+def test_batch_report(tmp_path):
+    test_log.info('testing export batch report')
+    project = str(tmp_path)
+    os.makedirs(os.path.join(project, 'Assets', 'Props'))
+    key, props = make_props(['crate', 'barrel', 'broken'])
+    plan = fbx_exporter_planner.plan_exports({Identifiers.model_layer_identifier: [props]}, project,
+                                             GlobalExportOptions())
+    recorder = fbx_exporter_telemetry.Recorder
+
+    def run_job(job):
+        if job.name == 'broken':
+            return False
+        with recorder.stage(fbx_exporter_telemetry.write_stage):
+            with open(job.path, 'w') as f:
+                f.write(job.name * 100)
+            time.sleep(0.01 if job.name == 'barrel' else 0)
+        recorder.count(items=1, path=job.path)
+        return True
+
+    results, cancelled = fbx_exporter_planner.run_plan(plan, recorder.wrap(run_job))
+    telemetry_path = str(tmp_path / 'telemetry.jsonl')
+    summary = fbx_exporter_telemetry.write_batch(results, 1.0, plan.plan_time, 'props.ma', 'local', telemetry_path)
+
+    assert (summary['jobs'], summary['exported'], summary['failed']) == (3, 2, 1)
+    assert summary['bytes'] == 1100 and summary['items'] == 2
+    assert summary['jobs_per_minute'] == 120.0 and summary['bytes_per_second'] == 1100.0
+    assert summary['slowest'][0][1] == 'barrel'
+    assert summary['stages']['write'] >= 0.01
+    lines = fbx_exporter_telemetry.format_summary(summary)
+    assert lines[0].startswith('3 jobs') and lines[-1].startswith('slowest :: model barrel')
+
+    # every run is appended, the batches can be compared over time
+    fbx_exporter_telemetry.write_batch(results, 2.0, path=telemetry_path)
+    with open(telemetry_path, 'a') as f:
+        f.write('{truncated\n')
+    batches = fbx_exporter_telemetry.read_batches(telemetry_path)
+    assert [batch['wall_time'] for batch in batches] == [1.0, 2.0]
+    assert batches[0]['scene'] == 'props.ma' and batches[0]['mode'] == 'local'
+    with open(telemetry_path) as f:
+        assert sum(1 for line in f if '"type": "job"' in line) == 6
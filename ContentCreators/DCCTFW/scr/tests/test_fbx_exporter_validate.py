@@ -0,0 +1,139 @@
+import os
+import scr
+import logging
+from scr.tools.fbxexporters import fbx_exporter_fbxhash
+from scr.tools.fbxexporters import fbx_exporter_planner
+from scr.tools.fbxexporters import fbx_exporter_validate
+
+"""
+tests for the exported fbx validator, these do not need Maya
+"""
+
+test_log = logging.getLogger(scr.logger_name)
+
+# a skinned cube with two joints and a take from frame 1 to 24 at 30 fps, the index array is split over two lines
+fbx_text = '''; FBX 7.5.0 project file
+; ----------------------------------------------------
+
+GlobalSettings:  {
+	Version: 1000
+	Properties70:  {
+		P: "UpAxis", "int", "Integer", "",1
+		P: "TimeMode", "enum", "", "",6
+		P: "CustomFrameRate", "double", "Number", "",-1
+	}
+}
+
+Objects:  {
+	Geometry: 100, "Geometry::", "Mesh" {
+		Vertices: *24 {
+			a: -0.5,-0.5,0.5,0.5,-0.5,0.5,-0.5,0.5,0.5,0.5,0.5,0.5,-0.5,0.5,-0.5,0.5,0.5,-0.5,-0.5,-0.5,-0.5,0.5,-0.5,-0.5
+		}
+		PolygonVertexIndex: *24 {
+			a: 0,1,3,-3,2,3,5,-5,4,5,7,-7,
+			6,7,1,-1,1,7,5,-4,6,0,2,-5
+		}
+		LayerElementNormal: 0 {
+			Normals: *72 {
+				a: 0,0,-1,0,0,-1
+			}
+		}
+	}
+	Model: 200, "Model::ns:crate", "Mesh" {
+		Version: 232
+	}
+	Model: 300, "Model::root_jnt", "LimbNode" {
+		Version: 232
+	}
+	Model: 400, "Model::spine_jnt", "LimbNode" {
+		Version: 232
+	}
+	Deformer: 500, "Deformer::skinCluster1", "Skin" {
+		Version: 101
+	}
+	AnimationStack: 600, "AnimStack::Take 001", "" {
+		Properties70:  {
+			P: "LocalStart", "KTime", "Time", "",1539538600
+			P: "LocalStop", "KTime", "Time", "",36948926400
+		}
+	}
+}
+
+Connections:  {
+	;Model::crate, Model::RootNode
+	C: "OO",200,0
+	;Geometry::, Model::crate
+	C: "OO",100,200
+	C: "OO",400,300
+}
+'''
+
+
+def write_fbx(path, text=fbx_text):
+    with open(path, 'w', newline='\n') as fbx_file:
+        fbx_file.write(text)
+    return path
+
+
+def test_read_and_check(tmp_path):
+    test_log.info('testing fbx validation')
+    path = write_fbx(str(tmp_path / 'crate.fbx'))
+
+    with open(path) as fbx_file:
+        contents = fbx_exporter_validate.read_fbx(fbx_file)
+    assert contents.get_meshes() == {'crate': (8, 6)}
+    assert contents.get_names('LimbNode') == {'root_jnt', 'spine_jnt'}
+    assert contents.deformers == {'Skin': 1}
+    assert contents.frame_rate == 30.0
+    start, end = contents.get_frame_ranges()['Take 001']
+    assert round(start, 3) == 1.0 and round(end, 3) == 24.0
+
+    # the fbx holds what the scene has, names are compared without namespaces
+    expected = fbx_exporter_validate.ExportExpectation({'crate': (8, 6)}, ['rig:root_jnt', 'spine_jnt'], True,
+                                                      ('1', '24'))
+    assert fbx_exporter_validate.validate_fbx(path, expected) == []
+
+    # a triangulated export is not checked for polygons
+    expected.meshes = {'crate': (8, None)}
+    assert fbx_exporter_validate.validate_fbx(path, expected) == []
+
+    expected = fbx_exporter_validate.ExportExpectation({'crate': (9, 12), 'lid': (4, 1)},
+                                                      ['root_jnt', 'arm_jnt', 'leg_jnt'], True, (0, 48))
+    assert fbx_exporter_validate.validate_fbx(path, expected) == [
+        'mesh missing :: lid', 'mesh crate has 8 vertices, expected 9', 'mesh crate has 6 polygons, expected 12',
+        '2 joints missing :: arm_jnt, leg_jnt', 'take covers frames 1-24, expected 0-48']
+
+    # a model export without joints, skins or a take
+    path = write_fbx(str(tmp_path / 'static.fbx'), fbx_text.split('\tModel: 300')[0] + '}\n' +
+                     fbx_text[fbx_text.index('Connections:'):])
+    expected = fbx_exporter_validate.ExportExpectation(skinned=True, frame_range=(1, 24), has_joints=True)
+    assert fbx_exporter_validate.validate_fbx(path, expected) == ['no joints', 'no skin deformer',
+                                                                   'no animation take']
+
+    # binary files are not read
+    binary = str(tmp_path / 'binary.fbx')
+    with open(binary, 'wb') as fbx_file:
+        fbx_file.write(fbx_exporter_fbxhash.binary_magic + b'\x00\x1a\x00')
+    assert fbx_exporter_validate.validate_fbx(binary, expected) == []
+
+
+def test_validator_thread(tmp_path):
+    test_log.info('testing background fbx validation')
+    validator = fbx_exporter_validate.FbxValidator()
+
+    def make_job(name):
+        return fbx_exporter_planner.ExportJob(fbx_exporter_planner.model_kind, 'layer', None, None,
+                                              str(tmp_path / (name + '.fbx')), {})
+
+    good, bad, missing = make_job('good'), make_job('bad'), make_job('missing')
+    write_fbx(good.path)
+    write_fbx(bad.path)
+    validator.submit(good, fbx_exporter_validate.ExportExpectation({'crate': (8, 6)}))
+    validator.submit(bad, fbx_exporter_validate.ExportExpectation({'barrel': (8, 6)}))
+    validator.submit(missing, fbx_exporter_validate.ExportExpectation())
+    validator.wait()
+
+    assert good.issues == []
+    assert bad.issues == ['mesh missing :: barrel']
+    assert len(missing.issues) == 1 and missing.issues[0].startswith('could not read the fbx :: FileNotFoundError')
+    assert not os.path.exists(missing.path)
@@ -0,0 +1,69 @@
+import os
+import marshal
+import scr
+import logging
+from scr.tools.fbxexporters import fbx_exporter_vcs
+
+"""
+tests for batched version control of exported fbx files, these use the in memory backend and do not need Maya or p4
+"""
+
+test_log = logging.getLogger(scr.logger_name)
+
+
+def write(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+    return path
+
+
+def test_batch(tmp_path):
+    test_log.info('testing batched p4 operations')
+    crate = write(str(tmp_path / 'crate.fbx'), 'crate')
+    barrel = write(str(tmp_path / 'barrel.fbx'), 'barrel')
+    lid = str(tmp_path / 'lid.fbx')
+    backend = fbx_exporter_vcs.FakeBackend(versioned=[crate, barrel])
+    version_control = fbx_exporter_vcs.ExportVersionControl(backend)
+    description = fbx_exporter_vcs.get_description(str(tmp_path / 'props.ma'))
+    assert description == 'FBX Exporter :: props.ma'
+
+    # one fstat of every output and one edit of the versioned ones, a path given twice is stated once
+    batch = version_control.open_batch([crate, barrel, lid, crate], description)
+    assert backend.calls == [('fstat', 3), ('change', 0), ('edit', 2)]
+    assert batch.is_versioned(crate) and not batch.is_versioned(lid)
+
+    # crate changed, barrel was kept and lid is new
+    write(crate, 'crate v2')
+    write(lid, 'lid')
+    batch.close([crate, barrel, lid])
+    assert backend.calls[3:] == [('add', 1), ('revert', 2)]
+    assert sorted((os.path.basename(path), action) for path, (action, change) in backend.opened.items()) == [
+        ('crate.fbx', 'edit'), ('lid.fbx', 'add')]
+    assert batch.errors == []
+
+    # the next batch of the scene goes into the same changelist, opened files are not edited again
+    batch = version_control.open_batch([crate, lid], description)
+    assert backend.calls[5:] == [('fstat', 2)]
+    assert set(change for action, change in backend.opened.values()) == {'1'} and len(backend.changes) == 1
+
+
+def test_not_configured(tmp_path):
+    test_log.info('testing p4 without a workspace')
+    crate = write(str(tmp_path / 'crate.fbx'), 'crate')
+
+    # no backend and a backend without a workspace both do nothing
+    for backend in (None, fbx_exporter_vcs.FakeBackend(versioned=[crate], configured=False)):
+        version_control = fbx_exporter_vcs.ExportVersionControl(backend)
+        batch = version_control.open_batch([crate], 'FBX Exporter :: untitled')
+        batch.close([crate])
+        assert not batch.is_versioned(crate) and batch.edited == [] and batch.added == []
+        if backend is not None:
+            assert backend.calls == [] and backend.opened == {}
+
+    # p4 -G writes marshalled dicts with bytes keys and values
+    data = marshal.dumps({b'code': b'stat', b'clientFile': b'/ws/crate.fbx', b'headRev': b'3'}, 0) + \
+        marshal.dumps({b'code': b'error', b'data': b'lid.fbx - no such file(s).\n'}, 0)
+    records = fbx_exporter_vcs.parse_records(data)
+    assert records[0] == {'code': 'stat', 'clientFile': '/ws/crate.fbx', 'headRev': '3'}
+    assert fbx_exporter_vcs.P4CommandBackend.get_errors(records) == ['lid.fbx - no such file(s).']
+    assert fbx_exporter_vcs.escape_path('/ws/crate@2#1.fbx') == '/ws/crate%402%231.fbx'
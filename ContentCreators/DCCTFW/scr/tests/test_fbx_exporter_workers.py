@@ -0,0 +1,123 @@
+import os
+import sys
+import json
+import scr
+import logging
+from scr.tests.test_fbx_exporter_project_index import make_props
+from scr.tests.test_fbx_exporter_project_index import make_rig
+from scr.tools.fbxexporters import fbx_exporter_planner
+from scr.tools.fbxexporters import fbx_exporter_workers
+from scr.tools.fbxexporters import GlobalExportOptions
+from scr.tools.fbxexporters import Identifiers
+
+"""
+tests for the export worker pool, these run the stand-in worker and do not need Maya
+"""
+
+test_log = logging.getLogger(scr.logger_name)
+
+stand_in_command = [sys.executable, fbx_exporter_workers.__file__, '--stand-in']
+
+
+def make_plan(project, names):
+    os.makedirs(os.path.join(project, 'Assets', 'Props'))
+    os.makedirs(os.path.join(project, 'Assets', 'Rigs'))
+    key, props = make_props(names)
+    rig_key, rig = make_rig()
+
+    return fbx_exporter_planner.plan_exports({Identifiers.model_layer_identifier: [props],
+                                              Identifiers.rig_layer_identifier: [rig]},
+                                             project, GlobalExportOptions())
+
+
+def test_pool_runs_plan(tmp_path):
+    test_log.info('testing export worker pool')
+    project = str(tmp_path)
+    plan = make_plan(project, ['crate', 'barrel', 'tri', 'zeroed', 'lost'])
+    plan.jobs[2].options['FBXExportTriangulate'] = True
+    plan.jobs[3].staging = fbx_exporter_planner.stage_zero
+    # planned fine but the folder is gone by the time the worker exports
+    plan.jobs[4].path = os.path.join(project, 'gone', 'lost.fbx')
+    # could not be planned, never sent to a worker
+    plan.jobs.append(fbx_exporter_planner.ExportJob(fbx_exporter_planner.model_kind, plan.jobs[0].layer_key,
+                                                    plan.jobs[0].layer, plan.jobs[0].data, None, {}))
+    plan.jobs[-1].error = 'no export path set'
+
+    calls = []
+
+    def progress(done, total, job):
+        calls.append((done, total))
+
+    pool = fbx_exporter_workers.WorkerPool(stand_in_command, workers=2)
+    results, cancelled = pool.run(plan, os.path.join(project, 'hero.ma'), progress)
+
+    assert not cancelled
+    assert sorted((r.job.name, r.success) for r in results) == [
+        ('barrel', True), ('crate', False), ('crate', True), ('hero_mesh', True), ('lost', False), ('tri', True),
+        ('zeroed', True)]
+    assert [r.error for r in results if r.job.name == 'lost'][0].startswith('FileNotFoundError')
+    assert all(done <= total == 6 for done, total in calls)
+
+    # each worker got a contiguous share of the plan order, options are sent in order
+    exported = {}
+    for result in results:
+        if result.success:
+            with open(result.job.path) as f:
+                exported[result.job.name] = json.load(f)
+    assert len(set(message['pid'] for message in exported.values())) == 2
+    assert exported['crate']['pid'] == exported['barrel']['pid'] != exported['hero_mesh']['pid']
+    assert exported['tri']['options'] == [list(item) for item in plan.jobs[2].options.items()]
+    assert exported['hero_mesh']['staging'] == fbx_exporter_planner.stage_rig
+    assert exported['crate']['scene'] == os.path.join(project, 'hero.ma')
+
+    # the stage timings of each job come back with its result
+    record = [r.job.telemetry for r in results if r.job.name == 'tri'][0]
+    assert record.name == 'tri' and record.items == 1 and record.bytes == os.path.getsize(plan.jobs[2].path)
+    assert 'write' in record.stages and record.total >= record.stages['write']
+
+
+def test_pool_worker_failures(tmp_path):
+    test_log.info('testing export worker failures')
+    project = str(tmp_path)
+    plan = make_plan(project, ['crate', 'barrel'])
+
+    # a worker that dies without answering fails its jobs with its output
+    crash = [sys.executable, '-c', 'import sys; print("license error"); sys.exit(3)']
+    results, cancelled = fbx_exporter_workers.WorkerPool(crash, workers=2).run(plan, 'hero.ma')
+    assert not cancelled and len(results) == 3
+    assert all(not r.success and r.error == 'worker exited with code 3 :: license error' for r in results)
+
+    # cancelling stops the workers
+    results, cancelled = fbx_exporter_workers.WorkerPool(stand_in_command).run(plan, 'hero.ma',
+                                                                             lambda done, total, job: False)
+    assert cancelled and results == []
+
+    assert fbx_exporter_workers.split_jobs(list(range(5)), 2) == [[0, 1, 2], [3, 4]]
+    assert fbx_exporter_workers.split_jobs([0], 4) == [[0]]
+    assert fbx_exporter_workers.decode_message('Maya 2024 ready') is None
+
+
+def test_pool_kills_started_workers_when_a_start_fails(tmp_path):
+    test_log.info('testing export worker start failure')
+    project = str(tmp_path)
+    plan = make_plan(project, ['crate', 'barrel'])
+    started = []
+
+    class FailingPool(fbx_exporter_workers.WorkerPool):
+        def start_worker(self, index, request, messages):
+            if started:
+                raise OSError('mayapy not found')
+            worker = super(FailingPool, self).start_worker(index, request, messages)
+            started.append(worker[0])
+            return worker
+
+    sleeper = [sys.executable, '-c', 'import time; time.sleep(60)']
+    try:
+        FailingPool(sleeper, workers=2).run(plan, 'hero.ma')
+    except OSError:
+        pass
+    else:
+        assert False, 'the start error is raised'
+
+    assert len(started) == 1
+    assert started[0].wait(timeout=10) is not None
@@ -13,10 +13,6 @@ used various ways to do the same thing in the different exporters
 -rt open FBX file in current Maya session
 -color to tell if export setting (or other stuff) have been changed
 
--After you add a new variable to fbx_exporter_data it will not exist to read until data is initialized this will cause 
-errors. Figure out a way to add vars so that no errors are thrown. Add a new variable to a class and be able to open 
-tool and populate UI without errors. There is an example of how to do this in refresh_model_tree_ui for 
-model.triangulate
 -Custom tag to show what version of the exporter you are using
 
 Model Tree
@@ -41,9 +37,18 @@ Anim Tree
 
 Data flow:
 
-The authoritative version of the data is in fileInfo. We are using ElementTree (an xml writer/parser) for this. 
-The data as stored in fileInfo is a standard xml format so it san be written to disk and used as you would normally
-use an xml file 
+The authoritative version of the data is in fileInfo. The data is stored as compact json (see 
+fbx_exporter_serialize). Older scenes stored it as ElementTree xml, that is still read and export_xml still writes it 
+so it can be written to disk and used as you would normally use an xml file
+
+Each layer key holds a small manifest (the layer fields and the names of its models/animations). Every model or
+animation is stored under its own chunk key so editing one model only rewrites that chunk
+
+    pm.fileInfo['_fbx_export_model_layer_Default Layer']
+    pm.fileInfo['_fbx_export_chunk_model_layer_Default Layer|crate']
+
+With UserOptionsData.lazy_load only the manifests are read when the tool opens. The models/animations of a layer are a
+LazyChildren list that reads its chunks the first time it is used (the tree item is expanded, an export...)
 
 To see the data you can use the pm.fileInfo commands in the script editor
 
@@ -51,6 +56,9 @@ To see the data you can use the pm.fileInfo commands in the script editor
     pm.fileInfo.has_key('_fbx_model_layer_Default Layer')
     pm.fileInfo['_fbx_model_layer_Default Layer'] 
     
+With UserOptionsData.save_to_disk (File > Write Manifest On Save) the same values are also written next to the scene
+on every save as <scene>.fbx_export.json, see fbx_exporter_sidecar. Tools outside Maya can read .mb scenes from it
+
 There is a command to remove all data from fileInfo .clear(). This will wipe all data used in the UI so should only be
 used if you are willing to lose all export and option data.
 
@@ -63,8 +71,50 @@ function to do it
 4. When data is changed in the UI the containers are updated and the data is feed back into fileInfo
 5. Then the these steps are repeated from step 1.    
 
+Parsed containers are cached in FBXExporterData.cache keyed by fileInfo key. Step 1 only re-reads fileInfo for keys 
+that are not cached. Writes go through the write_*_to_fileinfo functions which update the cache as well, so the cache 
+and fileInfo stay in step. The cache is emptied on file open/new and when the tool is opened. If you edit fileInfo by 
+hand from the script editor call 
+
+    fbx_exporter_data.ExporterData.invalidate_cache()
+
+Writes are grouped with FBXExporterData.transaction(). Everything written or removed inside the block is flushed to 
+fileInfo once when the block closes, values that did not change are not rewritten, and the scene is marked modified 
+with cmds.file(modified=True) instead of creating and deleting a node. Use it when a user action makes several changes
+
+    with fbx_exporter_data.ExporterData.transaction('Edit multiple entries'):
+        ...
+
 When an operation (like export) is called the container data is used not the user facing data in the UI
 
+File > Export All In Background runs the export plan in headless mayapy workers that open the saved scene, see
+fbx_exporter_workers. The scene staging the workers share with the UI (animation and rig prep) is in
+fbx_exporter_staging. A rig export flattens and cleans the scene inside one undo chunk and undoes it after the fbx is
+written, the scene file is not saved or reopened
+
+Exports are incremental. Every target is fingerprinted (scene content, FBX options, exporter version) and the
+fingerprint is kept in .fbx_export_fingerprints.json next to the fbx, a target whose fingerprint and fbx did not change
+is skipped. File > Force Export exports everything, see fbx_exporter_fingerprint
+
+A new fbx is written to local temp storage, Maya goes on as soon as the write is done. The fbx is published on a
+background thread (fbx_exporter_publish): copied to a staging file next to the output and moved over the published
+fbx, only when its content changed. ASCII fbx files are compared without their time stamps, file paths and object
+ids, see fbx_exporter_fbxhash
+
+Targets in one export with the same inputs and options (the same meshes in two model layers) are exported once, the
+others get a copy of that fbx, see fbx_exporter_planner.fan_out_duplicates
+
+Every export job is timed by stage (resolve, fingerprint, stage, options, select, write, post, publish) with the size
+of the fbx and the number of exported items. Each batch is appended to fbx_exporter_telemetry.telemetry_path as json
+lines and a summary (time per stage, slowest jobs, throughput) is written to the script editor
+
+Exported ASCII fbx files are read back on a background thread and checked against the scene (mesh and joint names,
+vertex and polygon counts, skin deformers, take frame range), mismatches are logged as warnings after the export, see
+fbx_exporter_validate
+
+When P4 is configured the outputs of an export are checked out with one fstat and one edit into a pending changelist
+named after the scene, new files are added and unchanged ones reverted after the export, see fbx_exporter_vcs
+
 You can see both the UI and container data from the script editor as well
 
     import fbxexporters
@@ -85,8 +135,9 @@ How to add a new variable to data:
 <Using AnimationData.start_frame as an example>
 
 in __init__ module <__init__.py>
--add variable to data class <AnimationData>
--add to __str__ for data class <AnimationData>
+-add a Field to the fields of the data class <AnimationData>. Give it a short_name if it should be saved to fileInfo.
+ __slots__, __init__, __str__ and the json/xml readers and writers are built from the fields. Data saved before the 
+ field existed gets the field default when it is read
 
 in ui module <fbx_exporter_ui.py>
 -if needed add to function that is called on tree being updated <tre_animations_changed>
@@ -94,12 +145,15 @@ in ui module <fbx_exporter_ui.py>
 -add to function that creates new data based on user request <add_animation>
 
 in data module <fbx_exporter_data.py>
--add to function that creates xml data <create_actor_xml>
--add to function that populates data class <populate_actors_classes>
 -add to function that is called to change/update data <change_start_end_frame> 
 -if needed add to other functions that apply to data changes <set_maya_to_data_range>
+
+The data classes use __slots__, setting an attribute that is not a declared field raises an AttributeError
 """
 
+import collections.abc
+import copy
+
 
 class ExportUtilities(object):
     """
@@ -182,122 +236,325 @@ class Identifiers:
     root_str = 'root'
     scene_layer_identifier = '_fbx_scene_layer_'
 
+    # layers are stored as a manifest under the keys above and one chunk per child under
+    # chunk_identifier + <layer key without exporter_identifier> + chunk_separator + <child name>. the separator (and %)
+    # in the names is quoted, see fbx_exporter_serialize.get_chunk_key
+    exporter_identifier = '_fbx_export_'
+    chunk_identifier = '_fbx_export_chunk_'
+    chunk_separator = '|'
+
+    # prefixes of the fileInfo keys owned by the exporter. FBXExporterData keeps an index of keys for each of these
+    fileInfo_prefixes = (model_layer_identifier, rig_layer_identifier, actor_identifier)
+
+    # Maya optionVar of UserOptionsData.save_to_disk
+    save_to_disk_option = 'fbxExporterSaveToDisk'
+
 
-class AnimationData:
+class Field(object):
     """
-    collection of data for animation export
-    used to hold data for reading and writing to fileInfo
+    declaration of a single attribute of a data container. the containers below list their fields in a fields tuple,
+    __slots__, __init__ and __str__ are built from it and fbx_exporter_serialize builds the json and xml readers and
+    writers from it
+
+    kinds:
+        text - str or None
+        flag - bool, 'True'/'False' in xml
+        items - list of str, joined with ', ' in xml
+        children - list of containers, child_type is the name of the container class
+
+    fields without a short_name are runtime only and are not written to fileInfo
     """
-    def __init__(self):
-        self.actor_name = None
-        self.anim_name = None
-        self.start_frame = None
-        self.end_frame = None
-        self.path = None
-        self.override_path = None
-        self.rig_name = None
-        self.framerate = None
-        self.muted_layers = None
-        self.export_version = None
+    text = 'text'
+    flag = 'flag'
+    items = 'items'
+    children = 'children'
 
-    def __str__(self):
-        return (
-            'actor_name :: {0}\n anim_name :: {1}\n start_frame :: {2}\n end_frame :: {3}\n path :: {4}\n '
-            'override_path :: {5}\n rig_name ::  {6}\n framerate :: {7}\n muted_layers :: {8}\n'.format(
-                self.actor_name,self.anim_name, self.start_frame, self.end_frame, self.path, self.override_path,
-                self.rig_name, self.framerate, self.muted_layers))
+    __slots__ = ('name', 'short_name', 'kind', 'default', 'xml_name', 'child_type')
+
+    def __init__(self, name, short_name=None, kind=text, default=None, xml_name=None, child_type=None):
+        self.name = name
+        self.short_name = short_name
+        self.kind = kind
+        self.default = default
+        self.xml_name = xml_name or name
+        self.child_type = child_type
+
+    @property
+    def stored(self):
+        return self.short_name is not None
+
+    def new_default(self):
+        """
+        :return: default value for a new container. list fields get their own list
+        """
+        if self.kind in (Field.items, Field.children):
+            return list(self.default or ())
+
+        return self.default
+
+    def __repr__(self):
+        return 'Field({0!r}, {1!r}, {2!r})'.format(self.name, self.short_name, self.kind)
 
 
-class ActorLayerData(object):
+# container class name mapped to the class, filled in by DataContainerType
+schema_registry = {}
+
+
+class DataContainerType(type):
     """
-    collection of data for acyot export
-    used to hold data for reading and writing to fileInfo
+    builds __slots__ from the declared fields and adds the class to schema_registry
     """
-    def __init__(self):
-        # the name needs to be the group name that is referenced from the rig file
-        self.name = None
-        self.export_items = []
-        self.path = None
-        self.animations = []
-        self.export_version = None
-        self.uuid = None
-        self.root = None
-
-    def __str__(self):
-        return 'name :: {0}\n path :: {1}\n animations :: {2}\n uuid :: {3}'.format(self.name, self.path,
-                                                                                         self.animations, self.uuid)
+    def __new__(mcs, name, bases, namespace):
+        fields = namespace.get('fields', ())
+        namespace.setdefault('__slots__', tuple(field.name for field in fields))
+        cls = super(DataContainerType, mcs).__new__(mcs, name, bases, namespace)
+        if fields:
+            schema_registry[name] = cls
+        return cls
 
 
-class RigLayerData(object):
+class DataContainer(object, metaclass=DataContainerType):
     """
-    collection of data for rig export
-    used to hold data for reading and writing to fileInfo
+    base for the containers that are read from and written to fileInfo
+
+    xml_tag and xml_attrib describe the element the container is written to in the legacy xml format
     """
+    fields = ()
+    xml_tag = None
+    xml_attrib = {}
+    # field that names the container in the ui, chunks of a layer are named after it
+    key_field = 'name'
+
     def __init__(self):
-        self.name = None
-        self.model_name = None
-        self.root = None
-        self.animation_path = None
-        self.rig_path = None
-        self.export_version = None
-        self.models = []
-        self.export_items = []
-        self.uuid = None
+        for field in self.fields:
+            setattr(self, field.name, field.new_default())
 
     def __str__(self):
-        return 'name :: {0}\n rig path :: {1}\n anim_path :: {2}\n models :: {3}\n export_items :: {4}'.\
-            format(self.name, self.rig_path, self.animation_path, self.models, self.export_items)
+        return '\n '.join('{0} :: {1}'.format(field.name, getattr(self, field.name)) for field in self.fields)
+
+    def copy(self):
+        """
+        copies the container so it can be changed without changing the cached one, list fields (export items...) are
+        copied as well. the children of a layer are shared
 
+        :return: copy
+        :rtype: DataContainer()
+        """
+        other = type(self).__new__(type(self))
+        for field in self.fields:
+            value = getattr(self, field.name)
+            setattr(other, field.name, list(value) if isinstance(value, list) else value)
 
-class RigModelData(object):
+        return other
+
+
+class LazyChildren(collections.abc.MutableSequence):
     """
-    collection of data for rig export
-    used to hold data for reading and writing to fileInfo
+    children (models or animations) of a chunked layer that are read from fileInfo the first time they are used.
+    layers are read with their header only so the ui can show them without reading every model in the scene.
+    chunk_names are the names listed in the layer manifest, they give the child count without loading
+
+    anything that uses it like a list (iterating, len, indexing, append, copy, + ...) loads it first. it wraps a list
+    rather than subclassing one, a list subclass would let C level code (list + lazy, copy.copy) read the empty list
+    underneath without loading it
     """
-    def __init__(self):
-        self.name = None
-        self.path = None
-        self.export_version = None
-        self.export_items = []
-        self.uuid = None
-        self.influences = None
+    __slots__ = ('loader', 'chunk_names', 'source_key', 'source_version', 'loaded', 'children')
 
-    def __str__(self):
-        return 'name :: {0}\n path :: {1}\n anim_path :: {2}\n export items :: {3}\n influences :: {4}'.format(
-            self.name, self.path,
-            self.path,
-            self.export_items,
-            self.influences
-        )
+    def __init__(self, loader, chunk_names, source_key=None, source_version=None):
+        self.loader = loader
+        self.chunk_names = list(chunk_names)
+        self.source_key = source_key
+        # format version of the manifest the chunk names were read from, it decides their chunk keys
+        self.source_version = source_version
+        self.loaded = False
+        self.children = []
+
+    def load(self):
+        """
+        reads the children if they have not been read yet
+
+        :return: loaded children
+        :rtype: list
+        """
+        if not self.loaded:
+            self.loaded = True
+            self.children.extend(self.loader())
+            self.loader = None
+
+        return self.children
+
+    def __repr__(self):
+        if not self.loaded:
+            return '<{0} not loaded children>'.format(len(self.chunk_names))
+
+        return repr(self.children)
+
+    def __len__(self):
+        return len(self.load())
+
+    def __getitem__(self, index):
+        return self.load()[index]
+
+    def __setitem__(self, index, value):
+        self.load()[index] = value
+
+    def __delitem__(self, index):
+        del self.load()[index]
+
+    def insert(self, index, value):
+        self.load().insert(index, value)
+
+    def __iter__(self):
+        return iter(self.load())
 
+    def __eq__(self, other):
+        if isinstance(other, LazyChildren):
+            other = other.load()
+        return self.load() == other
 
-class LayerData(object):
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __add__(self, other):
+        return self.load() + list(other)
+
+    def __radd__(self, other):
+        return list(other) + self.load()
+
+    def __iadd__(self, other):
+        self.load().extend(other)
+        return self
+
+    def sort(self, *args, **kwargs):
+        self.load().sort(*args, **kwargs)
+
+    def copy(self):
+        """
+        :return: loaded children as a plain list
+        :rtype: list
+        """
+        return list(self.load())
+
+    def __copy__(self):
+        return self.copy()
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(self.load(), memo)
+
+
+# export options shared by layers and models. the override fields are named differently on each
+export_option_fields = (
+    Field('fbx_export_smoothing_groups', 'sg', Field.flag, True),
+    Field('fbx_export_hard_edges', 'he', Field.flag, False),
+    Field('fbx_export_tangents', 'tg', Field.flag, True),
+    Field('fbx_export_smooth_mesh', 'sm', Field.flag, False),
+    Field('fbx_export_animation_only', 'ao', Field.flag, False),
+    Field('fbx_export_instances', 'in', Field.flag, False),
+    Field('fbx_export_zero', 'zr', Field.flag, False),
+    Field('fbx_export_triangulate', 'tr', Field.flag, False),
+)
+
+
+class AnimationData(DataContainer):
+    """
+    collection of data for animation export
+    used to hold data for reading and writing to fileInfo
+
+    actor_name is the name of the actor the animation belongs to, it is set when the actor is read
+    """
+    xml_tag = 'animation'
+    xml_attrib = {'node_type': 'animation'}
+    key_field = 'anim_name'
+    fields = (
+        Field('actor_name'),
+        Field('anim_name', 'n', xml_name='animation_name'),
+        Field('start_frame', 's', xml_name='start'),
+        Field('end_frame', 'e', xml_name='end'),
+        Field('path', 'p'),
+        Field('override_path', 'op'),
+        Field('rig_name'),
+        Field('framerate'),
+        Field('muted_layers', 'mu', xml_name='muted'),
+        Field('export_version'),
+    )
+
+
+class ActorLayerData(DataContainer):
+    """
+    collection of data for acyot export
+    used to hold data for reading and writing to fileInfo
+
+    the name needs to be the group name that is referenced from the rig file
+    """
+    xml_tag = Identifiers.model_layer_str
+    xml_attrib = {'node_type': 'actor'}
+    fields = (
+        Field('name', 'n'),
+        Field('export_items', 'e', Field.items),
+        Field('path', 'p', xml_name='anim_path'),
+        Field('animations', 'a', Field.children, xml_name=Identifiers.animations_str, child_type='AnimationData'),
+        Field('export_version'),
+        Field('uuid'),
+        Field('root', 'r'),
+    )
+
+
+class RigLayerData(DataContainer):
+    """
+    collection of data for rig export
+    used to hold data for reading and writing to fileInfo
+    """
+    xml_tag = Identifiers.rigs_str
+    xml_attrib = {'node_type': Identifiers.rigs_str}
+    fields = (
+        Field('name', 'n'),
+        Field('model_name', 'mn'),
+        Field('root', 'r'),
+        Field('animation_path', 'ap'),
+        Field('rig_path', 'rp'),
+        Field('export_version'),
+        Field('models', 'm', Field.children, xml_name=Identifiers.models_str, child_type='RigModelData'),
+        Field('export_items', 'e', Field.items),
+        Field('uuid', 'u'),
+    )
+
+
+class RigModelData(DataContainer):
+    """
+    collection of data for rig export
+    used to hold data for reading and writing to fileInfo
+    """
+    xml_tag = Identifiers.model_str
+    xml_attrib = {'node_type': Identifiers.model_str}
+    fields = (
+        Field('name', 'n'),
+        Field('path', 'p'),
+        Field('export_version'),
+        Field('export_items', 'e', Field.items),
+        Field('uuid', 'u'),
+        Field('influences', 'i'),
+    )
+
+
+class LayerData(DataContainer):
     """
     collection of data for layers export. includes a list of ModelData contained in the layer
     used to hold data for reading and writing to fileInfo
     """
-    def __init__(self):
-        self.name = None
-        self.path = None
-        self.type = None
-        self.models = []
-        self.color = None
+    xml_tag = Identifiers.model_layer_str
+    fields = (
+        Field('name', 'n'),
+        Field('path', 'p'),
+        Field('type'),
+        Field('models', 'm', Field.children, xml_name=Identifiers.models_str, child_type='ModelData'),
+        Field('color'),
 
         # export options
-        self.fbx_export_override_path = False
-        self.fbx_export_override_options = False
-        self.fbx_export_smoothing_groups = True
-        self.fbx_export_hard_edges = False
-        self.fbx_export_tangents = True
-        self.fbx_export_smooth_mesh = False
-        self.fbx_export_animation_only = False
-        self.fbx_export_instances = False
-        self.fbx_export_zero = False
-        self.fbx_export_triangulate = False
-
-    def __str__(self):
-        return 'name :: {0}\n path :: {1}\n type :: {2}\n models :: {3}\n use override path :: {4}\n use override options :: {5}'.format(
-            self.name, self.path, self.type, self.models, self.fbx_export_override_path, self.fbx_export_override_options)
+        Field('fbx_export_override_path', 'op', Field.flag, False),
+        Field('fbx_export_override_options', 'oo', Field.flag, False),
+    ) + export_option_fields
 
 
 class UserOptionsData(object):
@@ -305,51 +562,29 @@ class UserOptionsData(object):
         self.save_to_disk = False
         self.auto_select_in_scene = False
         self.active_tab = True
+        # read layer headers when the tool opens and their models/animations when they are expanded or used
+        self.lazy_load = True
 
     def __str__(self):
-        return 'save_to_disk :: {0}\n auto_select_in_scene :: {1}\n active_tab :: {2}\n'.format(
-            self.save_to_disk, self.auto_select_in_scene, self.active_tab)
+        return 'save_to_disk :: {0}\n auto_select_in_scene :: {1}\n active_tab :: {2}\n lazy_load :: {3}\n'.format(
+            self.save_to_disk, self.auto_select_in_scene, self.active_tab, self.lazy_load)
 
 
-class ModelData(object):
+class ModelData(DataContainer):
     """
     collection of data for model export
     used to hold data for reading and writing to fileInfo
     """
-    def __init__(self):
-        self.name = None
-        self.export_items = []
-        self.path = None
-        self.export_version = None
-        self.uuid = None
-        self.color = None
+    xml_tag = Identifiers.model_str
+    fields = (
+        Field('name', 'n'),
+        Field('export_items', 'e', Field.items),
+        Field('path', 'p'),
+        Field('export_version'),
+        Field('uuid', 'u'),
+        Field('color'),
 
         # export options
-        self.fbx_export_override_layer_path = False
-        self.fbx_export_override_layer_options = False
-        self.fbx_export_smoothing_groups = True
-        self.fbx_export_hard_edges = False
-        self.fbx_export_tangents = True
-        self.fbx_export_smooth_mesh = False
-        self.fbx_export_animation_only = False
-        self.fbx_export_instances = False
-        self.fbx_export_triangulate = False
-        self.fbx_export_zero = False
-
-    def __str__(self):
-        return 'name :: {0}\n path :: {1}\n uuid :: {2}\n fbx_export_smoothing_groups :: {3}\n fbx_export_hard_edges '\
-               ':: {4}\n fbx_export_tangents :: {5}\n fbx_export_smooth_mesh :: {6}\n fbx_export_animation_only :: {7}'\
-               '\n fbx_export_instances :: {8}\n fbx_export_triangulate :: {9}\n fbx_export_zero :: {10}\n ' \
-               'export items :: {11}\n override path :: {12}\n override options :: {13}'.format(
-                self.name, self.path, self.uuid, self.fbx_export_smoothing_groups, self.fbx_export_hard_edges,
-                self.fbx_export_tangents, self.fbx_export_smooth_mesh, self.fbx_export_animation_only,
-                self.fbx_export_instances, self.fbx_export_triangulate, self.fbx_export_zero, self.export_items,
-                self.fbx_export_override_layer_path, self.fbx_export_override_layer_options)
-
-
-
-
-
-
-
-
+        Field('fbx_export_override_layer_path', 'op', Field.flag, False),
+        Field('fbx_export_override_layer_options', 'oo', Field.flag, False),
+    ) + export_option_fields
@@ -0,0 +1,257 @@
+"""
+compaction of the exporter fileInfo data. finds data that is no longer used and works out the fileInfo changes that
+remove it. the pass itself does not need Maya, FBXExporterData.compact feeds it the fileInfo values of the open scene and
+applies the changes in one transaction
+
+garbage:
+    orphaned keys - chunks no layer manifest lists (left by renames and removes) and exporter keys with no value
+    duplicate layers - layers of the same type with the same models/animations and settings under different keys,
+        e.g. the old key of a rename that was never removed. the last one in fileInfo order is kept, empty layers are
+        never duplicates
+    stale models - models whose uuid and name (and export items) are all missing from the scene
+
+keys that can not be read are reported but never pruned
+
+in batch mode, Maya standalone opens each scene, compacts it and saves it:
+    mayapy fbx_exporter_compact.py [--dry-run] scene.ma [scene.mb ...]
+"""
+
+import argparse
+
+from scr.tools.fbxexporters import Identifiers
+from scr.tools.fbxexporters import fbx_exporter_serialize
+
+
+class CompactionReport(object):
+    """
+    what a compaction pass found and the fileInfo changes that prune it
+    """
+    def __init__(self):
+        # [key]
+        self.orphaned_keys = []
+        # [(key, key of the layer that is kept)]
+        self.duplicate_layers = []
+        # [(layer key, model name)]
+        self.stale_models = []
+        # [(key, error)] keys that could not be read, left as they are
+        self.errors = []
+        # {key: new value}, None removes the key
+        self.changes = {}
+        # {key: value before the changes}, None if the key did not exist. used to restore the data
+        self.previous = {}
+
+    def __len__(self):
+        return len(self.orphaned_keys) + len(self.duplicate_layers) + len(self.stale_models)
+
+    def __str__(self):
+        lines = ['{0} orphaned key(s), {1} duplicate layer(s), {2} stale model(s), {3} fileInfo change(s)'.format(
+            len(self.orphaned_keys), len(self.duplicate_layers), len(self.stale_models), len(self.changes))]
+        lines.extend('orphaned key :: {0}'.format(key) for key in self.orphaned_keys)
+        lines.extend('duplicate layer :: {0} (same as {1})'.format(key, kept) for key, kept in self.duplicate_layers)
+        lines.extend('stale model :: {0} in {1}'.format(name, key) for key, name in self.stale_models)
+        lines.extend('could not read :: {0} ({1})'.format(key, error) for key, error in self.errors)
+        return '\n'.join(lines)
+
+    def set_change(self, key, value, values):
+        if values.get(key) != value:
+            self.changes[key] = value
+            self.previous[key] = values.get(key)
+
+
+def get_layer_prefix(key):
+    for prefix in Identifiers.fileInfo_prefixes:
+        if key.startswith(prefix):
+            return prefix
+
+    return None
+
+
+def get_layer_signature(key, value, values):
+    """
+    content of a layer without its name, two layers with the same signature hold the same data
+
+    :return: json string or None if the layer is empty
+    :rtype: str
+    """
+    obj = fbx_exporter_serialize.decode(value, key, values.get)
+    cls = type(obj)
+    data = fbx_exporter_serialize.compile_json_writer(cls, children=False)(obj)
+    data.pop('n', None)
+
+    child_writer = fbx_exporter_serialize.compile_json_writer(
+        fbx_exporter_serialize.get_child_type(fbx_exporter_serialize.get_children_field(cls)))
+    data['c'] = [child_writer(child) for child in getattr(obj, fbx_exporter_serialize.get_children_field(cls).name)]
+    if not data['c']:
+        return None
+    for child in data['c']:
+        # an animation keeps the name of its actor, which is taken from the key
+        child.pop('actor_name', None)
+
+    return fbx_exporter_serialize.to_json(data)
+
+
+def find_duplicate_layers(layer_keys, values, report):
+    """
+    :return: keys of the layers that are kept
+    :rtype: [str]
+    """
+    signatures = {}
+    for key in layer_keys:
+        try:
+            signature = get_layer_signature(key, values[key], values)
+        except Exception as e:
+            report.errors.append((key, '{0}: {1}'.format(type(e).__name__, e)))
+            signature = None
+
+        # empty and unreadable layers are only grouped with themselves
+        signature = (get_layer_prefix(key), signature) if signature is not None else (key,)
+
+        signatures.setdefault(signature, []).append(key)
+
+    kept = []
+    for signature, keys in signatures.items():
+        kept.append(keys[-1])
+        if len(signature) > 1:
+            report.duplicate_layers.extend((key, keys[-1]) for key in keys[:-1])
+
+    return [key for key in layer_keys if key in kept]
+
+
+def get_listed_chunk_keys(key, value):
+    if fbx_exporter_serialize.get_format_version(value) < fbx_exporter_serialize.chunked_format_version:
+        return []
+
+    return fbx_exporter_serialize.get_chunk_keys(value, key)
+
+
+def is_stale(model, found_uuids, found_names):
+    if model.uuid and model.uuid in found_uuids:
+        return False
+    if model.name in found_names:
+        return False
+
+    return not any(name in found_names for name in model.export_items)
+
+
+def find_garbage(values, resolve=None):
+    """
+    finds the exporter data that can be pruned
+
+    :param values: every exporter fileInfo value of a scene {key: value}, layers and chunks
+    :type values: dict
+    :param resolve: function(uuids, names) that returns the (uuids, names) that exist in the scene. if None models are
+        not checked
+    :type resolve: function
+    :return: report with the changes that prune the garbage
+    :rtype: CompactionReport()
+    """
+    report = CompactionReport()
+
+    layer_keys = []
+    for key, value in values.items():
+        if get_layer_prefix(key) is None and not key.startswith(Identifiers.chunk_identifier):
+            continue
+        if not value:
+            report.orphaned_keys.append(key)
+        elif not key.startswith(Identifiers.chunk_identifier):
+            layer_keys.append(key)
+
+    kept = find_duplicate_layers(layer_keys, values, report)
+    error_keys = set(key for key, error in report.errors)
+    for key, kept_key in report.duplicate_layers:
+        report.set_change(key, None, values)
+
+    # models of the kept layers, all uuids and names are resolved in one go
+    layers = {}
+    if resolve is not None:
+        uuids = set()
+        names = set()
+        for key in kept:
+            if key in error_keys:
+                continue
+            obj = fbx_exporter_serialize.decode(values[key], key, values.get)
+            children = getattr(obj, fbx_exporter_serialize.get_children_field(type(obj)).name)
+            if children and hasattr(children[0], 'uuid'):
+                layers[key] = obj
+                for child in children:
+                    uuids.add(child.uuid)
+                    names.add(child.name)
+                    names.update(child.export_items)
+
+        for found in (uuids, names):
+            found.discard(None)
+            found.discard('')
+        found_uuids, found_names = resolve(sorted(uuids), sorted(names))
+        found_uuids = set(found_uuids)
+        found_names = set(found_names)
+
+        for key, obj in layers.items():
+            children = getattr(obj, fbx_exporter_serialize.get_children_field(type(obj)).name)
+            stale = [child for child in children if is_stale(child, found_uuids, found_names)]
+            if not stale:
+                continue
+
+            report.stale_models.extend((key, child.name) for child in stale)
+            stale_ids = set(id(child) for child in stale)
+            setattr(obj, fbx_exporter_serialize.get_children_field(type(obj)).name,
+                    [child for child in children if id(child) not in stale_ids])
+
+            manifest, chunks = fbx_exporter_serialize.encode_chunked(obj, key)
+            report.set_change(key, manifest, values)
+            for chunk_key, chunk_value in chunks:
+                report.set_change(chunk_key, chunk_value, values)
+
+    # chunks listed by a layer before and after the changes above. chunks that drop out with a duplicate layer or a
+    # stale model are removed with it, chunks no layer ever listed are orphans
+    listed = set()
+    referenced = set()
+    for key in layer_keys:
+        if key in error_keys:
+            # can not tell which chunks an unreadable layer uses (or the version of their keys), keep all of them
+            chunk_prefixes = tuple(fbx_exporter_serialize.get_chunk_key(key, '', version) for version in
+                                   range(fbx_exporter_serialize.chunked_format_version,
+                                         fbx_exporter_serialize.format_version + 1))
+            referenced.update(chunk_key for chunk_key in values if chunk_key.startswith(chunk_prefixes))
+            continue
+
+        listed.update(get_listed_chunk_keys(key, values[key]))
+        if key in kept:
+            referenced.update(get_listed_chunk_keys(key, report.changes.get(key, values[key])))
+
+    for key, value in values.items():
+        if key.startswith(Identifiers.chunk_identifier) and value and key not in referenced:
+            if key not in listed:
+                report.orphaned_keys.append(key)
+            report.set_change(key, None, values)
+
+    for key in report.orphaned_keys:
+        report.set_change(key, None, values)
+
+    return report
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='prune unused fbx exporter data from Maya scenes')
+    parser.add_argument('scenes', nargs='+')
+    parser.add_argument('--dry-run', action='store_true', help='only report, scenes are not changed')
+    args = parser.parse_args(args)
+
+    import maya.standalone
+    maya.standalone.initialize()
+
+    import pymel.core as pm
+    from scr.tools.fbxexporters import fbx_exporter_data
+
+    for scene in args.scenes:
+        pm.openFile(scene, force=True)
+        fbx_exporter_data.ExporterData.invalidate_cache()
+        report = fbx_exporter_data.ExporterData.compact(prune=not args.dry_run)
+        print('{0} :: {1}'.format(scene, report))
+        if report.changes and not args.dry_run:
+            pm.saveFile(force=True)
+
+    maya.standalone.uninitialize()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,28 +1,467 @@
 import os
-import glob
+from contextlib import contextmanager
 import pymel.core as pm
-from xml.etree import ElementTree as ET
-from xml.dom import minidom
-from distutils.util import strtobool
+import maya.cmds as cmds
 import logging
 import tempfile
 from pathlib import Path
 
-from scr.tools.fbxexporters import AnimationData
+import scr
+
 from scr.tools.fbxexporters import ActorLayerData
 from scr.tools.fbxexporters import RigLayerData
-from scr.tools.fbxexporters import RigModelData
-from scr.tools.fbxexporters import ModelData
 from scr.tools.fbxexporters import LayerData
 from scr.tools.fbxexporters import UserOptionsData
 from scr.tools.fbxexporters import Identifiers
 from scr.tools.fbxexporters import Debug
+from scr.tools.fbxexporters import fbx_exporter_serialize
+from scr.tools.fbxexporters import fbx_exporter_compact
+from scr.tools.fbxexporters import fbx_exporter_index
+from scr.tools.fbxexporters import fbx_exporter_scene
+from scr.tools.fbxexporters import fbx_exporter_sidecar
+
+
+class FileInfoKeyIndex(object):
+    """
+    index of the exporter keys in fileInfo grouped by prefix (Identifiers.fileInfo_prefixes)
+    gives O(1) existence checks and O(k) listing of the keys for a prefix instead of scanning all of fileInfo
+    """
+    def __init__(self, prefixes):
+        self.prefixes = prefixes
+        # {prefix: {key: None}}. dicts are used as ordered sets so listing keeps fileInfo order
+        self.keys = dict((prefix, {}) for prefix in prefixes)
+
+    def get_prefix(self, key):
+        """
+        gets the exporter prefix a key starts with
+
+        :param key: fileInfo key
+        :type key: str
+        :return: prefix or None if the key is not an exporter key
+        :rtype: str
+        """
+        for prefix in self.prefixes:
+            if key.startswith(prefix):
+                return prefix
+
+        return None
+
+    def add(self, key):
+        """
+        adds a key to the index if it starts with one of the exporter prefixes
+        """
+        prefix = self.get_prefix(key)
+        if prefix is not None:
+            self.keys[prefix][key] = None
+
+    def remove(self, key):
+        """
+        removes a key from the index
+        """
+        prefix = self.get_prefix(key)
+        if prefix is not None:
+            self.keys[prefix].pop(key, None)
+
+    def has_key(self, key):
+        """
+        checks if an exporter key exists
+        """
+        prefix = self.get_prefix(key)
+        if prefix is None:
+            return False
+
+        return key in self.keys[prefix]
+
+    def list_keys(self, prefix):
+        """
+        gets all keys for a prefix in the order they were added
+        """
+        return list(self.keys[prefix])
 
 
 class FBXExporterData(object):
 
     def __init__(self):
-        pass
+        # parsed containers keyed by fileInfo key. each entry is [container, value]. the cache is emptied whenever the
+        # scene changes underneath us. value is the last serialized string written for the key (None if it was read)
+        # and lets unchanged writes be skipped
+        self.cache = {}
+
+        # built from one scan of fileInfo on first use, then kept in sync by set_fileInfo_value and remove_key
+        self.key_index = None
+
+        # name/uuid/export item lookups over the cached layers. layers are indexed on first lookup and re-indexed when
+        # they are written, invalidating a cache entry drops its layer from the index
+        self.data_index = fbx_exporter_index.ExporterDataIndex()
+        self.logger = logging.getLogger(scr.logger_name)
+
+        # read layer headers only, models and animations are read when they are first used. set from UserOptionsData
+        self.lazy_load = False
+
+        # unit of work. while a transaction is open writes and removes are collected here and flushed once on commit
+        self.transaction_depth = 0
+        self.pending_values = {}
+        self.pending_removes = set()
+
+    def invalidate_cache(self, key=None):
+        """
+        marks cached container data as stale so it is re-read from fileInfo on the next request. called from the
+        scene callbacks (file open/new) and whenever fileInfo may have been edited outside of this module
+
+        :param key: fileInfo key to invalidate. if None the whole cache is invalidated
+        :type key: str
+        """
+        if Debug.debug: print(('calling :: {0}'.format('invalidate_cache')))
+
+        if key is None:
+            self.cache = {}
+            self.key_index = None
+            self.data_index.clear()
+        else:
+            self.cache.pop(key, None)
+            self.data_index.remove_layer(key)
+
+    def get_cached_data(self, key):
+        """
+        gets the parsed container for a fileInfo key if it is cached
+
+        :param key: key from fileInfo dict
+        :type key: str
+        :return: cached container or None if it needs to be read from fileInfo
+        :rtype: LayerData(), RigLayerData(), ActorLayerData() or None
+        """
+        entry = self.cache.get(key)
+        if entry is not None:
+            return entry[0]
+
+        return None
+
+    def set_cached_data(self, key, data, value=None):
+        """
+        stores a parsed container for a fileInfo key
+
+        :param key: key from fileInfo dict
+        :type key: str
+        :param data: container that was read from or written to fileInfo
+        :type data: LayerData(), RigLayerData() or ActorLayerData()
+        :param value: serialized string that was written for the container
+        :type value: str
+        """
+        self.cache[key] = [data, value]
+
+    def get_key_index(self):
+        """
+        gets the index of exporter keys, building it from fileInfo if it has been invalidated
+
+        :return: key index
+        :rtype: FileInfoKeyIndex()
+        """
+        if self.key_index is None:
+            self.key_index = FileInfoKeyIndex(Identifiers.fileInfo_prefixes)
+            for key in pm.fileInfo.keys():
+                self.key_index.add(key)
+
+        return self.key_index
+
+    def has_fileInfo_key(self, key):
+        """
+        checks if a key exists in fileInfo. exporter keys are answered from the key index
+
+        :param key: fileInfo key
+        :type key: str
+        :return: found
+        :rtype: bool
+        """
+        key_index = self.get_key_index()
+        if key_index.get_prefix(key) is not None:
+            return key_index.has_key(key)
+
+        return key in pm.fileInfo
+
+    def set_fileInfo_value(self, key, value, data=None):
+        """
+        writes a value to fileInfo and keeps the key index and container cache in sync
+
+        :param key: fileInfo key
+        :type key: str
+        :param value: serialized data
+        :type value: str
+        :param data: container the value was serialized from. cached so the next read does not re-parse it. None for
+            chunks, only their value is cached
+        :type data: LayerData(), RigLayerData() or ActorLayerData()
+        """
+        entry = self.cache.get(key)
+        if entry is not None and entry[1] == value:
+            # fileInfo already holds this exact value
+            return
+
+        with self.transaction():
+            self.pending_values[key] = value
+            self.pending_removes.discard(key)
+
+        self.get_key_index().add(key)
+        self.set_cached_data(key, data, value)
+
+    def get_current_value(self, key):
+        """
+        gets the value a key has or will have once the open transaction is flushed
+
+        :param key: fileInfo key
+        :type key: str
+        :return: unescaped value or None
+        :rtype: str
+        """
+        if key in self.pending_values:
+            return self.pending_values[key]
+        if key in self.pending_removes:
+            return None
+
+        entry = self.cache.get(key)
+        if entry is not None and entry[1] is not None:
+            return entry[1]
+
+        return self.get_fileInfo_value(key)
+
+    def read_chunk_value(self, key):
+        """
+        reads a layer chunk from fileInfo. the value is cached so writing the layer back can skip unchanged chunks
+
+        :param key: fileInfo key of the chunk
+        :type key: str
+        :return: unescaped value or None
+        :rtype: str
+        """
+        value = self.get_current_value(key)
+        if value is not None:
+            self.set_cached_data(key, None, value)
+
+        return value
+
+    def set_layer_data(self, key, data):
+        """
+        writes a layer to fileInfo as a manifest and one chunk per model/animation. only chunks whose value changed are
+        written and chunks of children that are no longer in the layer are removed. children that were never loaded
+        (lazy_load) are left as they are
+
+        :param key: fileInfo key of the layer
+        :type key: str
+        :param data: layer data
+        :type data: LayerData(), RigLayerData() or ActorLayerData()
+        """
+        manifest, chunks = fbx_exporter_serialize.encode_chunked(data, key)
+        stale = set(fbx_exporter_serialize.get_chunk_keys(self.get_current_value(key), key))
+        stale.difference_update(fbx_exporter_serialize.get_chunk_keys(manifest, key))
+
+        with self.transaction():
+            for chunk_key, chunk_value in chunks:
+                self.set_fileInfo_value(chunk_key, chunk_value)
+
+            for chunk_key in stale:
+                self.remove_fileInfo_value(chunk_key)
+
+            self.set_fileInfo_value(key, manifest, data)
+
+        # names, uuids and export items may have changed. layers that were never looked up stay unindexed
+        if self.data_index.has_layer(key):
+            self.data_index.add_layer(key, data)
+
+    def get_layer_data(self, key):
+        """
+        gets the data for one layer without building all layers of its type
+
+        :param key: fileInfo key of the layer
+        :type key: str
+        :return: layer data or None if the layer does not exist
+        :rtype: LayerData(), RigLayerData(), ActorLayerData() or None
+        """
+        data = self.get_cached_data(key)
+        if data is not None:
+            return data
+
+        if not self.has_fileInfo_key(key):
+            return None
+
+        prefix = self.get_key_index().get_prefix(key)
+        if prefix == Identifiers.actor_identifier:
+            return self.populate_actors_classes(key)
+        elif prefix == Identifiers.rig_layer_identifier:
+            return self.populate_rig_class(key)
+        elif prefix == Identifiers.model_layer_identifier:
+            return self.populate_models_classes_from_fileInfo(key)
+
+        return None
+
+    def index_layer(self, key):
+        """
+        makes sure a layer is in the data index. reads the layer and its children if they are not loaded yet
+
+        :param key: fileInfo key of the layer
+        :type key: str
+        :return: layer data or None if the layer does not exist
+        :rtype: LayerData(), RigLayerData(), ActorLayerData() or None
+        """
+        if self.data_index.has_layer(key):
+            return self.data_index.get_layer(key)
+
+        data = self.get_layer_data(key)
+        if data is not None:
+            self.data_index.add_layer(key, data)
+
+        return data
+
+    def get_layer_child(self, key, name):
+        """
+        gets a model or animation of a layer by name
+
+        :param key: fileInfo key of the layer
+        :type key: str
+        :param name: name of the model or animation
+        :type name: str
+        :return: (layer, child). either is None if it was not found
+        :rtype: tuple
+        """
+        layer = self.index_layer(key)
+        if layer is None:
+            return None, None
+
+        return layer, self.data_index.get_child(key, name)
+
+    def get_item_data(self, item, prefix):
+        """
+        gets the layer and model/animation data for a child tree item. the parent item holds the layer name
+
+        :param item: model, rig model or animation tree item
+        :type item: QTreeWidgetItem
+        :param prefix: fileInfo prefix of the layer type
+        :type prefix: str defined in Identifiers class
+        :return: (layer, child). either is None if it was not found
+        :rtype: tuple
+        """
+        return self.get_layer_child(prefix + item.parent().text(0), item.text(0))
+
+    def index_layers(self, prefixes):
+        """
+        indexes every layer of the given types, needed before a lookup that spans layers
+        """
+        for prefix in prefixes:
+            for key in self.get_valid_keys_from_fileInfo(prefix):
+                self.index_layer(key)
+
+    def get_layers(self, prefixes=Identifiers.fileInfo_prefixes):
+        """
+        gets every layer of the given types
+
+        :param prefixes: layer types
+        :type prefixes: tuple
+        :return: {prefix: [layer data]} in fileInfo order
+        :rtype: dict
+        """
+        layers = {}
+        for prefix in prefixes:
+            layers[prefix] = [layer for layer in (self.get_layer_data(key)
+                                                  for key in self.get_valid_keys_from_fileInfo(prefix))
+                              if layer is not None]
+
+        return layers
+
+    def find_models_by_uuid(self, uuid, prefixes=(Identifiers.model_layer_identifier,
+                                                  Identifiers.rig_layer_identifier)):
+        """
+        gets the models with a maya uuid
+
+        :param uuid: maya uuid
+        :type uuid: str
+        :param prefixes: layer types to search
+        :type prefixes: tuple
+        :return: [(layer key, model)]
+        :rtype: list
+        """
+        self.index_layers(prefixes)
+        return [(key, model) for key, model in self.data_index.find_uuid(uuid) if key.startswith(prefixes)]
+
+    def find_models_by_export_item(self, export_item, prefixes=(Identifiers.model_layer_identifier,
+                                                                Identifiers.rig_layer_identifier)):
+        """
+        gets the models that export a scene node
+
+        :param export_item: name of a node in the scene
+        :type export_item: str
+        :param prefixes: layer types to search
+        :type prefixes: tuple
+        :return: [(layer key, model)]
+        :rtype: list
+        """
+        self.index_layers(prefixes)
+        return [(key, model) for key, model in self.data_index.find_export_item(export_item)
+                if key.startswith(prefixes)]
+
+    @contextmanager
+    def transaction(self, name='FBX Exporter edit'):
+        """
+        unit of work for a user action. every fileInfo write and remove made inside the block is collected and
+        flushed once when the outermost transaction closes, the scene is marked modified once and all Maya changes
+        made in the block end up in one undo step. transactions can be nested, only the outermost one flushes.
+
+        if the block raises, pending changes are dropped and the cache is invalidated so the data is re-read from
+        fileInfo, which still holds the state from before the transaction
+
+            with ExporterData.transaction('Edit multiple entries'):
+                for item in items:
+                    ExporterData.change_start_end_frame(item, '10', 1)
+
+        :param name: name of the undo chunk
+        :type name: str
+        """
+        if self.transaction_depth == 0:
+            pm.undoInfo(openChunk=True, chunkName=name)
+        self.transaction_depth += 1
+
+        try:
+            yield
+        except Exception:
+            self.transaction_depth -= 1
+            if self.transaction_depth == 0:
+                self.rollback()
+                pm.undoInfo(closeChunk=True)
+            raise
+
+        self.transaction_depth -= 1
+        if self.transaction_depth == 0:
+            try:
+                self.flush()
+            finally:
+                pm.undoInfo(closeChunk=True)
+
+    def flush(self):
+        """
+        writes the changes collected by the transaction to fileInfo and marks the scene modified
+        """
+        if Debug.debug: print(('calling :: {0}'.format('flush')))
+
+        pending_values = self.pending_values
+        pending_removes = self.pending_removes
+        self.pending_values = {}
+        self.pending_removes = set()
+
+        for key in pending_removes:
+            if key in pm.fileInfo:
+                cmds.fileInfo(rm=key)
+
+        for key, value in pending_values.items():
+            pm.fileInfo[key] = value
+
+        if pending_values or pending_removes:
+            self.trigger_save()
+
+    def rollback(self):
+        """
+        drops the changes collected by the transaction
+        """
+        if Debug.debug: print(('calling :: {0}'.format('rollback')))
+
+        self.pending_values = {}
+        self.pending_removes = set()
+        self.invalidate_cache()
 
     def check_exists_layer(self, layer_name):
         """
@@ -35,12 +474,7 @@ class FBXExporterData(object):
         """
         if Debug.debug: print(('calling  :: {0}'.format('check_exists_layer')))
 
-        found = False
-        model_layers_fileInfo = self.get_valid_keys_from_fileInfo(layer_name)
-        if len(model_layers_fileInfo) > 0:
-            found = True
-
-        return found
+        return self.has_fileInfo_key(layer_name)
 
     def export_animation(self, animation):
         """
@@ -72,18 +506,10 @@ class FBXExporterData(object):
         """
         if Debug.debug : print(('calling :: {0}'.format('remove_model')))
 
-        layer_member = None
-        model_member = None
-        layers = self.build_class_from_data(Identifiers.rig_layer_identifier)
-        for layer in range(len(layers)):
-            if item.parent().text(0) == layers[layer].name:
-                layer_member = layer
-                for mod in range(len(layers[layer].models)):
-                    if item.text(0) == layers[layer].models[mod].name:
-                        model_member = mod
-
-        layers[layer_member].models.pop(model_member)
-        self.write_rig_data_to_fileinfo(layers)
+        layer, model = self.get_item_data(item, Identifiers.rig_layer_identifier)
+        if model is not None:
+            layer.models.remove(model)
+            self.write_rig_data_to_fileinfo([layer])
 
     def remove_model(self, item):
         """
@@ -94,18 +520,10 @@ class FBXExporterData(object):
         """
         if Debug.debug : print(('calling :: {0}'.format('remove_model')))
 
-        layer_member = None
-        model_member = None
-        layers = self.build_class_from_data(Identifiers.model_layer_identifier)
-        for layer in range(len(layers)):
-            if item.parent().text(0) == layers[layer].name:
-                layer_member = layer
-                for mod in range(len(layers[layer].models)):
-                    if item.text(0) == layers[layer].models[mod].name:
-                        model_member = mod
-
-        layers[layer_member].models.pop(model_member)
-        self.write_model_layer_data_to_fileinfo(layers)
+        layer, model = self.get_item_data(item, Identifiers.model_layer_identifier)
+        if model is not None:
+            layer.models.remove(model)
+            self.write_model_layer_data_to_fileinfo([layer])
 
     def remove_animation(self, item):
         """
@@ -117,18 +535,10 @@ class FBXExporterData(object):
         """
         if Debug.debug : print(('calling :: {0}'.format('remove_animation')))
 
-        char_member = None
-        anim_member = None
-        chars = self.build_class_from_data(Identifiers.actor_identifier)
-        for char in range(len(chars)):
-            if item.parent().text(0) == chars[char].name:
-                char_member = char
-                for anim in range(len(chars[char].animations)):
-                    if item.text(0) == chars[char].animations[anim].anim_name:
-                        anim_member = anim
-
-        chars[char_member].animations.pop(anim_member)
-        self.write_anim_data_to_fileinfo(chars)
+        char, anim = self.get_item_data(item, Identifiers.actor_identifier)
+        if anim is not None:
+            char.animations.remove(anim)
+            self.write_anim_data_to_fileinfo([char])
 
     def remove_key(self, key_name):
         """
@@ -139,9 +549,34 @@ class FBXExporterData(object):
         """
         if Debug.debug: print(('calling :: {0}'.format('remove_character')))
 
-        if key_name in pm.fileInfo:
-            import maya.cmds as cmds
-            cmds.fileInfo(rm=key_name)
+        chunk_keys = []
+        if self.get_key_index().get_prefix(key_name) is not None:
+            # a renamed layer is removed before it is written under its new key, read children that were not loaded yet
+            # so they are not lost with the chunks
+            data = self.get_cached_data(key_name)
+            if data is not None:
+                fbx_exporter_serialize.load_children(data)
+
+            chunk_keys = fbx_exporter_serialize.get_chunk_keys(self.get_current_value(key_name), key_name)
+
+        with self.transaction():
+            self.remove_fileInfo_value(key_name)
+            for chunk_key in chunk_keys:
+                self.remove_fileInfo_value(chunk_key)
+
+    def remove_fileInfo_value(self, key):
+        """
+        removes a single key from fileInfo and keeps the key index and container cache in sync
+
+        :param key: fileInfo key
+        :type key: str
+        """
+        self.invalidate_cache(key)
+        self.get_key_index().remove(key)
+
+        with self.transaction():
+            self.pending_values.pop(key, None)
+            self.pending_removes.add(key)
 
     def object_in_data(self, name, find_attr_name):
         """
@@ -154,184 +589,84 @@ class FBXExporterData(object):
         :rtype:
         """
         if Debug.debug : print(('calling :: {0}'.format('object_in_data')))
-        out = False
-
-        if (find_attr_name + name) in list(pm.fileInfo.keys()):
-            out = True
-
-        return out
+        return self.has_fileInfo_key(find_attr_name + name)
 
     def trigger_save(self):
         """
-        creates artificial event so maya file can be saved
+        marks the scene as modified so maya file can be saved. fileInfo edits do not do this on their own
         """
         if Debug.debug : print(('calling :: {0}'.format('trigger_save')))
 
-        delete_me = pm.polyCube()
-        pm.delete(delete_me)
+        cmds.file(modified=True)
 
     def create_rig_layer_xml(self, rig):
         """
-        WIP
-        :param rig:
-        :type rig:
-        :return:
-        :rtype:
-        """
-        if Debug.debug: print(('calling :: {0}'.format('format_rig_string')))
-
-        root = ET.Element("root")
-        rig_attr = {'node_type': Identifiers.rigs_str}
-        models_attr = {'node_type': Identifiers.models_str}
-        model_attr = {'node_type': Identifiers.model_str}
-
-        doc = ET.SubElement(root, Identifiers.rigs_str, attrib=rig_attr)
-        meshes = ET.SubElement(doc, Identifiers.models_str, attrib=models_attr)
-        ET.SubElement(doc, 'name').text = rig.name
-        ET.SubElement(doc, 'model_name').text = rig.model_name
-        ET.SubElement(doc, 'root').text = rig.root
-        ET.SubElement(doc, 'rig_path').text = rig.rig_path
-        ET.SubElement(doc, 'animation_path').text = rig.animation_path
-        ET.SubElement(doc, 'uuid').text = rig.uuid
-
-        s = ', '
-        ET.SubElement(doc, 'export_items').text = s.join(rig.export_items)
+        creates rig layer data in the legacy xml format. fileInfo is written as json (see fbx_exporter_serialize),
+        xml is kept for export_xml
 
-        if rig.models:
-            for model in rig.models:
-                rig_model = ET.SubElement(meshes, Identifiers.model_str, attrib=model_attr)
-                ET.SubElement(rig_model, "name").text = model.name
-                ET.SubElement(rig_model, "uuid").text = model.uuid
-                ET.SubElement(rig_model, "path").text = model.path
-                ET.SubElement(rig_model, "influences").text = str(model.influences)
-
-                s = ', '
-                ET.SubElement(rig_model, 'export_items').text = s.join(model.export_items)
+        :param rig: rig layer data
+        :type rig: RigLayerData()
+        :return: prettyXML formated string
+        :rtype: str
+        """
+        if Debug.debug: print(('calling :: {0}'.format('create_rig_layer_xml')))
 
-        return minidom.parseString(ET.tostring(root)).toprettyxml(indent="   ")
+        return fbx_exporter_serialize.to_xml(rig, pretty=True)
 
     def create_actor_layer_xml(self, char):
         """
-        WIP
-        :param char:
-        :type char:
-        :return:
-        :rtype:
+        creates actor layer data in the legacy xml format
+
+        :param char: actor layer data
+        :type char: ActorLayerData()
+        :return: prettyXML formated string
+        :rtype: str
         """
         if Debug.debug : print(('calling :: {0}'.format('create_actor_xml')))
 
-        root = ET.Element("root")
-        actor_attr = {'node_type': 'actor'}
-        anim_attr = {'node_type': 'animation'}
-        anims_attr = {'node_type': 'animations'}
-
-        doc = ET.SubElement(root, Identifiers.model_layer_str, attrib=actor_attr)
-        animations = ET.SubElement(doc, Identifiers.animations_str, attrib=anims_attr)
-        ET.SubElement(doc, 'name').text = char.name
-        ET.SubElement(doc, 'anim_path').text = char.path
-        ET.SubElement(doc, 'root').text = char.root
-
-        s = ', '
-        ET.SubElement(doc, 'export_items').text = s.join(char.export_items)
-
-        for anim in char.animations:
-            animation = ET.SubElement(animations, 'animation', attrib=anim_attr)
-            ET.SubElement(animation, "animation_name").text = anim.anim_name
-            ET.SubElement(animation, "path").text = anim.path
-            ET.SubElement(animation, "override_path").text = anim.override_path
-            ET.SubElement(animation, "start").text = anim.start_frame
-            ET.SubElement(animation, "end").text = anim.end_frame
-            ET.SubElement(animation, "muted").text = anim.muted_layers
-
-        return minidom.parseString(ET.tostring(root)).toprettyxml(indent="   ")
+        return fbx_exporter_serialize.to_xml(char, pretty=True)
 
     def create_model_layer_xml(self, model_layer):
         """
-        creates model layer xml data based on data in arg model_layer
+        creates model layer data in the legacy xml format
 
         :param model_layer: model layer data from fileinfo
         :type model_layer: LayerData()
-        :return: string
-        :rtype: prettyXML formated string
+        :return: xml
+        :rtype: str
         """
         if Debug.debug : print(('calling :: {0}'.format('create_model_layer_xml')))
 
-        root = ET.Element("root")
-        doc = ET.SubElement(root, Identifiers.model_layer_str)
-        models = ET.SubElement(doc, Identifiers.models_str)
-
-        ET.SubElement(doc, 'name').text = model_layer.name
-        ET.SubElement(doc, 'path').text = model_layer.path
-        ET.SubElement(doc, 'fbx_export_override_path').text = str(model_layer.fbx_export_override_path)
-        ET.SubElement(doc, 'fbx_export_override_options').text = str(model_layer.fbx_export_override_options)
-        ET.SubElement(doc, "fbx_export_smoothing_groups").text = str(model_layer.fbx_export_smoothing_groups)
-        ET.SubElement(doc, "fbx_export_hard_edges").text = str(model_layer.fbx_export_hard_edges)
-        ET.SubElement(doc, "fbx_export_tangents").text = str(model_layer.fbx_export_tangents)
-        ET.SubElement(doc, "fbx_export_smooth_mesh").text = str(model_layer.fbx_export_smooth_mesh)
-        ET.SubElement(doc, "fbx_export_animation_only").text = str(model_layer.fbx_export_animation_only)
-        ET.SubElement(doc, "fbx_export_instances").text = str(model_layer.fbx_export_instances)
-        ET.SubElement(doc, "fbx_export_zero").text = str(model_layer.fbx_export_zero)
-        ET.SubElement(doc, "fbx_export_triangulate").text = str(model_layer.fbx_export_triangulate)
-
-        for mod in model_layer.models:
-            model = ET.SubElement(models, Identifiers.model_str)
-            ET.SubElement(model, "name").text = mod.name
-            ET.SubElement(model, "uuid").text = mod.uuid
-            ET.SubElement(model, "path").text = mod.path
-
-            s = ', '
-            ET.SubElement(model, "export_items").text = s.join(mod.export_items)
-
-            #export options
-            ET.SubElement(model, "fbx_export_override_layer_options").text = str(mod.fbx_export_override_layer_options)
-            ET.SubElement(model, "fbx_export_override_layer_path").text = str(mod.fbx_export_override_layer_path)
-            ET.SubElement(model, "fbx_export_smoothing_groups").text = str(mod.fbx_export_smoothing_groups)
-            ET.SubElement(model, "fbx_export_hard_edges").text = str(mod.fbx_export_hard_edges)
-            ET.SubElement(model, "fbx_export_tangents").text = str(mod.fbx_export_tangents)
-            ET.SubElement(model, "fbx_export_smooth_mesh").text = str(mod.fbx_export_smooth_mesh)
-            ET.SubElement(model, "fbx_export_animation_only").text = str(mod.fbx_export_animation_only)
-            ET.SubElement(model, "fbx_export_instances").text = str(mod.fbx_export_instances)
-            ET.SubElement(model, "fbx_export_zero").text = str(mod.fbx_export_zero)
-            ET.SubElement(model, "fbx_export_triangulate").text = str(mod.fbx_export_triangulate)
-
-        # return minidom.parseString(ET.tostring(root)).toprettyxml(indent="   ")
-        return ET.tostring(root)
+        return fbx_exporter_serialize.to_xml(model_layer)
 
     def write_model_layer_data_to_fileinfo(self, model_layers):
         """
-        write xml data to fileinfo
+        write model layer data to fileinfo
 
         :param model_layers: changed layer data from fileinfo
         :type model_layers: [LayerData()]
         """
         if Debug.debug : print(('calling :: {0}'.format('write_model_layer_data_to_fileinfo')))
 
-        for model_layer in model_layers:
-
-            models_string = self.create_model_layer_xml(model_layer)
-            fileInfo_key = Identifiers.model_layer_identifier + model_layer.name
-            pm.fileInfo[fileInfo_key] = models_string
-
-            self.trigger_save()
-
-    def read_fileInfo_xml_from_disk(self):
-
-        open_directory = self.get_xml_directory()
+        with self.transaction():
+            for model_layer in model_layers:
+                fileInfo_key = Identifiers.model_layer_identifier + model_layer.name
+                self.set_layer_data(fileInfo_key, model_layer)
 
-        layers = []
+    def read_fileInfo_from_disk(self):
+        """
+        reads the exporter data of the open scene from its sidecar manifest (see fbx_exporter_sidecar)
 
-        files = glob.glob(open_directory[0] + '*' + '.xml')
-        for file_path in files:
-            if open_directory[1] + '.' in file_path:
-                layer_name = file_path.split('.')[1]
-                opened_file = open(file_path)
-                lines = opened_file.read()
-                opened_file.close()
+        :return: {prefix: [layer data]} or None if the scene has no sidecar
+        :rtype: dict
+        """
+        if Debug.debug: print(('calling :: {0}'.format('read_fileInfo_from_disk')))
 
-                layers.append(self.populate_models_classes_from_string(lines, Identifiers.model_layer_identifier + layer_name))
+        scene_path = pm.sceneName()
+        if not scene_path:
+            return None
 
-                # print('\nread_fileInfo_xml_from_disk\n layer :: {0}'.format(layer))
-        return layers
+        return fbx_exporter_sidecar.read_exporter_data(scene_path)
 
     def get_xml_directory(self, append_save_path):
 
@@ -359,20 +694,21 @@ class FBXExporterData(object):
         export xml data from fileInfo
         '''
 
-        file_name = Path(pm.sceneName()).stem + '.xml'
-        key = self.get_valid_keys_from_fileInfo('_fbx_export_')
-        print('key :: {}'.format(key))
-        if key:
-            rig_value = pm.fileInfo[key]
-            rig_value = rig_value.encode().decode('unicode-escape')
+        scene_name = Path(pm.sceneName()).stem
+        for prefix in Identifiers.fileInfo_prefixes:
+            for key in self.get_valid_keys_from_fileInfo(prefix):
+                value = self.get_fileInfo_value(key)
+                if value is None:
+                    continue
+                data = fbx_exporter_serialize.decode(value, key, self.read_chunk_value)
+                value = fbx_exporter_serialize.to_xml(data, pretty=True)
 
-            xml_path = os.path.join(tempfile.gettempdir(), file_name)
-            with open(xml_path, 'w') as f:
-                f.write(rig_value)
+                xml_path = os.path.join(tempfile.gettempdir(), scene_name + key + '.xml')
+                with open(xml_path, 'w') as f:
+                    f.write(value)
 
-            out = ('XML file exported to {}'.format(xml_path))
-            self.logger.info(out)
-            self.ui.lab_log.setText(out)
+                out = ('XML file exported to {}'.format(xml_path))
+                self.logger.info(out)
 
     def import_xml(self):
 
@@ -403,6 +739,9 @@ class FBXExporterData(object):
         # prefs[Identifiers.options_str] = export_options
         # sg_prefUtils.writePrefs(prefs, [Identifiers.options_str])
 
+        # user options are per user, not per scene. kept in a Maya optionVar
+        pm.optionVar[Identifiers.save_to_disk_option] = int(users_options.save_to_disk)
+
         self.trigger_save()
 
     def write_anim_data_to_fileinfo(self, chars):
@@ -415,12 +754,10 @@ class FBXExporterData(object):
         """
         if Debug.debug : print(('calling :: {0}'.format('write_anim_data_to_fileinfo')))
 
-        for char in chars:
-            anim_string = self.create_actor_layer_xml(char)
-            fileInfo_key = Identifiers.actor_identifier + char.name
-            pm.fileInfo[fileInfo_key] = anim_string
-
-            self.trigger_save()
+        with self.transaction():
+            for char in chars:
+                fileInfo_key = Identifiers.actor_identifier + char.name
+                self.set_layer_data(fileInfo_key, char)
 
     def write_rig_data_to_fileinfo(self, rigs):
         """
@@ -434,112 +771,102 @@ class FBXExporterData(object):
         """
         if Debug.debug : print(('calling :: {0}'.format('write_rig_data_to_fileinfo')))
 
-        for rig in rigs:
-            rig_string = self.create_rig_layer_xml(rig)
-            fileInfo_key = Identifiers.rig_layer_identifier + rig.name
-            pm.fileInfo[fileInfo_key] = rig_string
+        with self.transaction():
+            for rig in rigs:
+                fileInfo_key = Identifiers.rig_layer_identifier + rig.name
+                self.set_layer_data(fileInfo_key, rig)
 
-            self.trigger_save()
+    def get_sidecar_values(self):
+        """
+        collects the exporter fileInfo values, layer manifests and their chunks. values that were read or written since
+        the scene was opened come from the cache, only the rest are read from fileInfo
 
-    def write_rig_fileinfo_to_disk(self, rigs):
-        '''
-        placeholder for turn ten test
+        :return: {key: value}
+        :rtype: dict
+        """
+        if Debug.debug: print(('calling :: {0}'.format('get_sidecar_values')))
 
-        :param rigs:
-        :type rigs:
-        :return:
-        :rtype:
-        '''
-        out = ''
+        values = {}
+        for prefix in Identifiers.fileInfo_prefixes:
+            for key in self.get_valid_keys_from_fileInfo(prefix):
+                value = self.get_current_value(key)
+                if value is None:
+                    continue
 
-        print('here')
+                values[key] = value
+                for chunk_key in fbx_exporter_serialize.get_chunk_keys(value, key):
+                    chunk_value = self.get_current_value(chunk_key)
+                    if chunk_value is not None:
+                        values[chunk_key] = chunk_value
 
-        for rig in rigs:
-            print('rig :: {}'.format(rig))
-            fileInfo_key = Identifiers.rig_layer_identifier + rig.name
-            out = pm.fileInfo[fileInfo_key]
+        return values
 
-        return out
+    def write_fileInfo_to_disk(self):
+        """
+        writes the exporter data of the open scene to its sidecar manifest. the values are collected here, the file is
+        written on the sidecar thread and skipped if nothing changed since the last save
+        """
+        if Debug.debug: print(('calling :: {0}'.format('write_fileInfo_to_disk')))
 
+        scene_path = pm.sceneName()
+        if not scene_path:
+            return
 
-    def populate_actors_classes(self, key):
+        fbx_exporter_sidecar.Writer.submit(str(scene_path), self.get_sidecar_values())
+
+    def get_fileInfo_value(self, key):
         """
-        WIP
-        :param key:
-        :type key:
-        :return:
-        :rtype:
+        gets a fileInfo value ready to be parsed
+
+        :param key: key from fileInfo dict
+        :type key: str
+        :return: unescaped value or None if the key does not exist or is empty
+        :rtype: str
         """
-        if Debug.debug : print(('calling :: {0}'.format('populate_actors_classes')))
+        if key not in pm.fileInfo:
+            return None
 
-        char_data = ActorLayerData()
-
-        if pm.fileInfo[key] != '':
-            anim_value = pm.fileInfo[key]
-            anim_value = anim_value.encode().decode('unicode-escape')
-            root = ET.fromstring(anim_value)
-            actor = root.find(Identifiers.model_layer_str)
-            char_data.name = key.replace(Identifiers.actor_identifier, '')
-            char_data.path = actor.find('anim_path').text
-            char_data.root = actor.find('root').text
-            export_items = actor.find('export_items').text
-            char_data.export_items.append(export_items)
-
-            anims = actor.findall('./animations/animation')
-            for anim in anims:
-                anim_data = AnimationData()
-                char_data.animations.append(anim_data)
-                anim_data.name = actor.find('name').text
-                anim_data.anim_name = anim.find('animation_name').text
-                anim_data.path = actor.find('anim_path').text
-                anim_data.override_path = anim.find('override_path').text
-                anim_data.start_frame = anim.find('start').text
-                anim_data.end_frame = anim.find('end').text
-                anim_data.path = anim.find('path').text
-                anim_data.muted_layers = anim.find('muted').text
-
-        return char_data
+        value = fbx_exporter_serialize.unescape_fileInfo_value(pm.fileInfo[key])
+        if not value:
+            return None
 
-    def populate_rig_class(self, key):
+        return value
+
+    def populate_actors_classes(self, key):
         """
-        gets data from fileInfo based on key and populates layer data
+        gets data from fileInfo based on key and populates actor data
 
         :param key: key from fileInfo dict
         :type key: str
-        :return: class that contain users option data
-        :rtype: UserOptionsData()
+        :return: class that contain actor (and animation) data
+        :rtype: ActorLayerData()
         """
-        if Debug.debug : print(('calling :: {0}'.format('populate_users_options_classes')))
+        if Debug.debug : print(('calling :: {0}'.format('populate_actors_classes')))
 
-        rig = RigLayerData()
-        if key in pm.fileInfo:
-            rig_value = pm.fileInfo[key]
-            rig_value = rig_value.encode().decode('unicode-escape')
+        value = self.get_fileInfo_value(key)
+        if value is None:
+            char_data = ActorLayerData()
+            char_data.name = key[len(Identifiers.actor_identifier):]
+            return char_data
 
-            root = ET.fromstring(rig_value)
-            rig_data = root.find(Identifiers.rigs_str)
-            rig.name = rig_data.find('name').text
-            rig.model_name = rig_data.find('model_name').text
-            rig.root = rig_data.find('root').text
-            rig.rig_path = rig_data.find('rig_path').text
-            rig.animation_path = rig_data.find('animation_path').text
+        return self.decode_fileInfo_value(key, value)
 
-            export_items = rig_data.find('export_items').text
-            rig.export_items = export_items.split(', ')
+    def populate_rig_class(self, key):
+        """
+        gets data from fileInfo based on key and populates rig data
 
-            models = rig_data.findall(Identifiers.model_xml_path)
-            for model in models:
-                model_data = RigModelData()
-                rig.models.append(model_data)
-                model_data.name = model.find('name').text
-                model_data.path = model.find('path').text
-                model_data.uuid = model.find('uuid').text
-                model_data.influences = model.find('influences').text
+        :param key: key from fileInfo dict
+        :type key: str
+        :return: class that contain rig (and model) data
+        :rtype: RigLayerData()
+        """
+        if Debug.debug : print(('calling :: {0}'.format('populate_rig_class')))
 
-                export_items = model.find('export_items').text
-                model_data.export_items = export_items.split(', ')
+        value = self.get_fileInfo_value(key)
+        if value is None:
+            return RigLayerData()
 
-        return rig
+        return self.decode_fileInfo_value(key, value)
 
     def populate_users_options_class(self):
 
@@ -548,8 +875,9 @@ class FBXExporterData(object):
         users_options_data = UserOptionsData()
 
         users_options_data.auto_select_in_scene = False
-        users_options_data.save_to_disk = False
+        users_options_data.save_to_disk = bool(pm.optionVar.get(Identifiers.save_to_disk_option, False))
         users_options_data.active_tab = True
+        users_options_data.lazy_load = True
 
         return users_options_data
 
@@ -557,57 +885,12 @@ class FBXExporterData(object):
         """
         called by
 
-        :param layer_value: xml format string
+        :param layer_value: json or xml format string
         :param key: (str) name of item as it would be represented in fileInfo
         :return: populated model class used to populate ui
         """
 
-        layer_data = LayerData()
-
-        root = ET.fromstring(layer_value)
-        layer = root.find(Identifiers.model_layer_str)
-        layer_data.name = key.replace(Identifiers.model_layer_identifier, '')
-        layer_data.path = layer.find('path').text
-
-        layer_data.fbx_export_override_path = strtobool(layer.find('fbx_export_override_path').text)
-        layer_data.fbx_export_override_options = strtobool(layer.find('fbx_export_override_options').text)
-        layer_data.fbx_export_smoothing_groups = strtobool(layer.find('fbx_export_smoothing_groups').text)
-        layer_data.fbx_export_hard_edges = strtobool(layer.find('fbx_export_hard_edges').text)
-        layer_data.fbx_export_tangents = strtobool(layer.find('fbx_export_tangents').text)
-        layer_data.fbx_export_smooth_mesh = strtobool(layer.find('fbx_export_smooth_mesh').text)
-        layer_data.fbx_export_animation_only = strtobool(layer.find('fbx_export_animation_only').text)
-        layer_data.fbx_export_instances = strtobool(layer.find('fbx_export_instances').text)
-        layer_data.fbx_export_zero = strtobool(layer.find('fbx_export_zero').text)
-        layer_data.fbx_export_triangulate = strtobool(layer.find('fbx_export_triangulate').text)
-        models = layer.findall(Identifiers.model_xml_path)
-        for model in models:
-            model_data = ModelData()
-            layer_data.models.append(model_data)
-            model_data.name = model.find('name').text
-            model_data.path = model.find('path').text
-            model_data.uuid = model.find('uuid').text
-
-            export_items = model.find('export_items').text
-            # there is a possibility that there are no export item but that the users wants to keep the item listed
-            # in the ui to use later
-            if export_items:
-                model_data.export_items = export_items.split(', ')
-
-            # export options
-            model_data.fbx_export_override_layer_options = strtobool(
-                model.find('fbx_export_override_layer_options').text)
-            model_data.fbx_export_override_layer_path = strtobool(
-                model.find('fbx_export_override_layer_path').text)
-            model_data.fbx_export_smoothing_groups = strtobool(model.find('fbx_export_smoothing_groups').text)
-            model_data.fbx_export_hard_edges = strtobool(model.find('fbx_export_hard_edges').text)
-            model_data.fbx_export_tangents = strtobool(model.find('fbx_export_tangents').text)
-            model_data.fbx_export_smooth_mesh = strtobool(model.find('fbx_export_smooth_mesh').text)
-            model_data.fbx_export_animation_only = strtobool(model.find('fbx_export_animation_only').text)
-            model_data.fbx_export_instances = strtobool(model.find('fbx_export_instances').text)
-            model_data.fbx_export_zero = strtobool(model.find('fbx_export_zero').text)
-            model_data.fbx_export_triangulate = strtobool(model.find('fbx_export_triangulate').text)
-
-        return layer_data
+        return fbx_exporter_serialize.decode(layer_value, key, self.read_chunk_value)
 
     def populate_models_classes_from_string(self, xml_string, key):
         pass
@@ -628,12 +911,130 @@ class FBXExporterData(object):
         """
         if Debug.debug : print(('calling :: {0}'.format('populate_model_classes')))
 
-        if key in pm.fileInfo:
-            layer_value = pm.fileInfo[key]
-            layer_value = layer_value.encode().decode('unicode-escape')
-            layer_data = self.populate_models_classes(layer_value, key)
+        layer_value = self.get_fileInfo_value(key)
+        if layer_value is not None:
+            layer_data = self.decode_fileInfo_value(key, layer_value)
             return layer_data
 
+    def decode_fileInfo_value(self, key, value):
+        """
+        populates layer data from a value read from fileInfo and caches it along with the value so writing it back
+        unchanged is skipped
+
+        :param key: key from fileInfo dict
+        :type key: str
+        :param value: unescaped fileInfo value
+        :type value: str
+        :return: layer data
+        :rtype: LayerData(), RigLayerData() or ActorLayerData()
+        """
+        data = fbx_exporter_serialize.decode(value, key, self.read_chunk_value, self.lazy_load)
+        self.set_cached_data(key, data, value)
+        return data
+
+    def migrate_legacy_fileInfo(self):
+        """
+        one-shot migration of exporter data stored in an older format (legacy xml or unchunked json) to the current
+        format
+
+        :return: number of keys that were migrated
+        :rtype: int
+        """
+        if Debug.debug: print(('calling :: {0}'.format('migrate_legacy_fileInfo')))
+
+        migrated = 0
+        with self.transaction('Migrate FBX Exporter data'):
+            for prefix in Identifiers.fileInfo_prefixes:
+                for key in self.get_valid_keys_from_fileInfo(prefix):
+                    value = self.get_fileInfo_value(key)
+                    # chunked layers of an older version are read as they are, their chunks are rewritten with
+                    # the current keys the next time the layer changes
+                    if value is not None and fbx_exporter_serialize.get_format_version(value) < \
+                            fbx_exporter_serialize.chunked_format_version:
+                        data = self.decode_fileInfo_value(key, value)
+                        self.set_layer_data(key, data)
+                        migrated += 1
+
+        if migrated:
+            self.logger.info('Migrated {0} FBX Exporter fileInfo entries to format version {1}'.format(
+                migrated, fbx_exporter_serialize.format_version))
+
+        return migrated
+
+    def get_exporter_values(self):
+        """
+        reads every exporter fileInfo value, layers and chunks, including chunks no layer lists any more
+
+        :return: {key: value}, empty values are kept as ''
+        :rtype: dict
+        """
+        if Debug.debug: print(('calling :: {0}'.format('get_exporter_values')))
+
+        values = {}
+        # keys written by an open transaction are not in fileInfo yet
+        for key in list(pm.fileInfo.keys()) + list(self.pending_values):
+            if key.startswith(Identifiers.exporter_identifier) and key not in self.pending_removes:
+                values[key] = self.get_current_value(key) or ''
+
+        return values
+
+    def compact(self, prune=True):
+        """
+        finds orphaned keys, duplicate layers and models that are no longer in the scene (see fbx_exporter_compact)
+        and prunes them in one transaction so it is a single undo step
+
+        :param prune: False only reports, fileInfo is not changed
+        :type prune: bool
+        :return: what was found and the changes made
+        :rtype: fbx_exporter_compact.CompactionReport()
+        """
+        if Debug.debug: print(('calling :: {0}'.format('compact')))
+
+        def resolve(uuids, names):
+            return fbx_exporter_scene.Resolver.get_paths(uuids), fbx_exporter_scene.Resolver.exists(names)[0]
+
+        with self.transaction('Compact FBX Exporter data'):
+            if prune:
+                # older formats are migrated first so pruning only writes chunked layers
+                self.migrate_legacy_fileInfo()
+            report = fbx_exporter_compact.find_garbage(self.get_exporter_values(), resolve)
+            if prune:
+                self.apply_values(report.changes)
+
+        if prune and report.changes:
+            self.logger.info('Compacted FBX Exporter data :: {0}'.format(report))
+
+        return report
+
+    def apply_values(self, values):
+        """
+        writes raw fileInfo values, None removes the key. the layers they belong to are re-read on next use
+
+        :param values: {key: value}
+        :type values: dict
+        """
+        if Debug.debug: print(('calling :: {0}'.format('apply_values')))
+
+        with self.transaction():
+            for key, value in values.items():
+                if value is None:
+                    self.remove_fileInfo_value(key)
+                else:
+                    self.set_fileInfo_value(key, value)
+                    self.invalidate_cache(key)
+
+    def restore_compaction(self, report):
+        """
+        puts back the fileInfo values a compaction changed or removed
+
+        :param report: report returned by compact
+        :type report: fbx_exporter_compact.CompactionReport()
+        """
+        if Debug.debug: print(('calling :: {0}'.format('restore_compaction')))
+
+        with self.transaction('Restore FBX Exporter data'):
+            self.apply_values(report.previous)
+
     def get_valid_keys_from_fileInfo(self, fileInfo_identifier):
         """
         gets a list of valid keys from fileInfo based on a pre-fix to identify the type of data
@@ -645,9 +1046,13 @@ class FBXExporterData(object):
         """
         if Debug.debug : print(('calling :: {0}'.format('get_valid_keys')))
 
+        if fileInfo_identifier in Identifiers.fileInfo_prefixes:
+            return self.get_key_index().list_keys(fileInfo_identifier)
+
+        # not one of the indexed exporter prefixes, fall back to a scan of fileInfo
         fileInfo_keys = []
-        for key in list(pm.fileInfo.keys()):
-            if fileInfo_identifier in key:
+        for key in pm.fileInfo.keys():
+            if key.startswith(fileInfo_identifier):
                 fileInfo_keys.append(key)
 
         return fileInfo_keys
@@ -663,7 +1068,9 @@ class FBXExporterData(object):
 
         chars = []
         for key in fileInfo_keys:
-            char_data = self.populate_actors_classes(key)
+            char_data = self.get_cached_data(key)
+            if char_data is None:
+                char_data = self.populate_actors_classes(key)
             chars.append(char_data)
 
         return chars
@@ -681,7 +1088,9 @@ class FBXExporterData(object):
 
         models = []
         for key in fileInfo_keys:
-            model_data = self.populate_models_classes_from_fileInfo(key)
+            model_data = self.get_cached_data(key)
+            if model_data is None:
+                model_data = self.populate_models_classes_from_fileInfo(key)
             models.append(model_data)
 
         return models
@@ -699,7 +1108,9 @@ class FBXExporterData(object):
 
         rigs = []
         for key in fileInfo_keys:
-            rig_data = self.populate_rig_class(key)
+            rig_data = self.get_cached_data(key)
+            if rig_data is None:
+                rig_data = self.populate_rig_class(key)
             rigs.append(rig_data)
 
         return rigs
@@ -741,18 +1152,14 @@ class FBXExporterData(object):
         """
         if Debug.debug : print(('calling :: {0}'.format('change_start_frame')))
 
-        chars = self.build_class_from_data(Identifiers.actor_identifier)
+        char, anim = self.get_item_data(item, Identifiers.actor_identifier)
+        if anim is not None:
+            if type == 1:
+                anim.start_frame = new_frame
+            elif type == 2:
+                anim.end_frame = new_frame
 
-        for char in chars:
-            if item.parent().text(0) == char.name:
-                for anim in char.animations:
-                    if item.text(0) == anim.anim_name:
-                        if type == 1:
-                            anim.start_frame = new_frame
-                        elif type == 2:
-                            anim.end_frame = new_frame
-
-        self.write_anim_data_to_fileinfo(chars)
+            self.write_anim_data_to_fileinfo([char])
 
     def change_animation_name(self, item, new_name, old_anim_name):
         """
@@ -769,14 +1176,13 @@ class FBXExporterData(object):
         """
         if Debug.debug: print(('calling :: {0}'.format('change_animation_name')))
 
-        chars = self.build_class_from_data(Identifiers.actor_identifier)
-        for char in chars:
-            if item.parent().text(0) == char.name:
-                for anim in char.animations:
-                    if old_anim_name == anim.anim_name:
-                        anim.anim_name = new_name
+        char_key = Identifiers.actor_identifier + item.parent().text(0)
+        char = self.index_layer(char_key)
+        if char is not None:
+            for anim in self.data_index.get_children(char_key, old_anim_name):
+                anim.anim_name = new_name
 
-        self.write_anim_data_to_fileinfo(chars)
+            self.write_anim_data_to_fileinfo([char])
 
     def change_rig_name(self, item, old_name):
         """
@@ -792,21 +1198,24 @@ class FBXExporterData(object):
         print('\nchange_rig_layer_name\n item.whatsThis :: {0}\n old_name :: {1}'.format(item.whatsThis(0), old_name))
 
         if item.whatsThis(0) == Identifiers.rigs_str:
-            rigs = self.build_class_from_data(Identifiers.rig_layer_identifier)
-            for rig in rigs:
-                for model in rig.models:
-                    if old_name == model.name:
-                        model.name = item.text(0)
+            rig_key = Identifiers.rig_layer_identifier + item.parent().text(0)
+            rig = self.index_layer(rig_key)
+            if rig is not None:
+                for model in self.data_index.get_children(rig_key, old_name):
+                    model.name = item.text(0)
 
-        elif item.whatsThis(0) == Identifiers.rig_layer_identifier:
-            rigs = self.build_class_from_data(Identifiers.rig_layer_identifier)
-            for rig in rigs:
-                if old_name == rig.name:
-                    rig.name = item.text(0)
+                self.write_rig_data_to_fileinfo([rig])
 
-            self.remove_key(Identifiers.rig_layer_identifier + old_name)
+        elif item.whatsThis(0) == Identifiers.rig_layer_identifier:
+            rig = self.get_layer_data(Identifiers.rig_layer_identifier + old_name)
+            if rig is None:
+                return
 
-        self.write_rig_data_to_fileinfo(rigs)
+            # removed and written under the new key in one flush and one undo step
+            with self.transaction():
+                rig.name = item.text(0)
+                self.remove_key(Identifiers.rig_layer_identifier + old_name)
+                self.write_rig_data_to_fileinfo([rig])
 
     # def change_rig_layer_name(self, item, old_name):
     #     """
@@ -845,15 +1254,12 @@ class FBXExporterData(object):
         '''
         if Debug.debug: print(('calling :: {0}'.format('change_export_item_name')))
 
-        layers = self.build_class_from_data(indentifier)
-        for layer in layers:
-            for model in layer.models:
-                if old_name in model.export_items:
-                    index = model.export_items.index(old_name)
-                    model.export_items.pop(index)
-                    model.export_items.append(new_name)
-                    self.write_model_layer_data_to_fileinfo(layers)
-                    return True
+        for key, model in self.find_models_by_export_item(old_name, (indentifier,)):
+            index = model.export_items.index(old_name)
+            model.export_items.pop(index)
+            model.export_items.append(new_name)
+            self.write_model_layer_data_to_fileinfo([self.data_index.get_layer(key)])
+            return True
 
         return False
 
@@ -877,22 +1283,23 @@ class FBXExporterData(object):
                                  defaultButton='OK')
                 return
             else:
-                layers = self.build_class_from_data(Identifiers.model_layer_identifier)
-                for layer in layers:
-                    if old_name == layer.name:
-                        layer.name = item.text(0)
+                layer = self.get_layer_data(Identifiers.model_layer_identifier + old_name)
+                if layer is None:
+                    return
 
-                        self.remove_key(Identifiers.model_layer_identifier + old_name)
+                with self.transaction():
+                    layer.name = item.text(0)
+                    self.remove_key(Identifiers.model_layer_identifier + old_name)
+                    self.write_model_layer_data_to_fileinfo([layer])
 
         elif item.whatsThis(0) == Identifiers.models_str:
-            layers = self.build_class_from_data(Identifiers.model_layer_identifier)
-            for layer in layers:
-                if item.parent().text(0) == layer.name:
-                    for model in layer.models:
-                        if model.name == old_name:
-                            model.name = item.text(0)
+            layer_key = Identifiers.model_layer_identifier + item.parent().text(0)
+            layer = self.index_layer(layer_key)
+            if layer is not None:
+                for model in self.data_index.get_children(layer_key, old_name):
+                    model.name = item.text(0)
 
-        self.write_model_layer_data_to_fileinfo(layers)
+                self.write_model_layer_data_to_fileinfo([layer])
 
     def change_layer_path(self, item, new_path):
         """
@@ -905,12 +1312,10 @@ class FBXExporterData(object):
         """
         if Debug.debug: print(('calling :: {0}'.format('change_layer_path')))
 
-        layers = self.build_class_from_data(Identifiers.model_layer_identifier)
-        for layer in layers:
-            if item.text(0) == layer.name:
-                layer.path = new_path
-
-        self.write_model_layer_data_to_fileinfo(layers)
+        layer = self.get_layer_data(Identifiers.model_layer_identifier + item.text(0))
+        if layer is not None:
+            layer.path = new_path
+            self.write_model_layer_data_to_fileinfo([layer])
 
     def change_model_path(self, item, new_path):
         """
@@ -923,14 +1328,13 @@ class FBXExporterData(object):
         """
         if Debug.debug: print(('calling :: {0}'.format('change_layer_name')))
 
-        layers = self.build_class_from_data(Identifiers.model_layer_identifier)
-        for layer in layers:
-            if item.parent().text(0) == layer.name:
-                for model in layer.models:
-                    if model.name == item.text(0):
-                        model.path = new_path
+        layer_key = Identifiers.model_layer_identifier + item.parent().text(0)
+        layer = self.index_layer(layer_key)
+        if layer is not None:
+            for model in self.data_index.get_children(layer_key, item.text(0)):
+                model.path = new_path
 
-        self.write_model_layer_data_to_fileinfo(layers)
+            self.write_model_layer_data_to_fileinfo([layer])
 
     def change_override_path(self, item, path, column):
         """
@@ -947,16 +1351,12 @@ class FBXExporterData(object):
 
         if Debug.debug : print(('calling :: {0}'.format('change_override_path')))
 
-        chars = self.build_class_from_data(Identifiers.actor_identifier)
-        for char in chars:
-            if item.parent().text(0) == char.name:
-                for anim in char.animations:
-                    if item.text(0) == anim.anim_name:
-                        if column == 4:
-                            anim.override_path = path
-        # need to remove from fileInfo as the name of a top level object is the
-        self.remove_key(Identifiers.actor_identifier + item.text(0))
-        self.write_anim_data_to_fileinfo(chars)
+        char, anim = self.get_item_data(item, Identifiers.actor_identifier)
+        if anim is not None:
+            if column == 4:
+                anim.override_path = path
+
+            self.write_anim_data_to_fileinfo([char])
 
     def change_rig_influences(self, item, influences):
         '''
@@ -971,14 +1371,13 @@ class FBXExporterData(object):
         '''
         if Debug.debug: print(('calling :: {0}'.format('change_rig_layer_path')))
 
-        rig_layers = self.build_class_from_data(Identifiers.rig_layer_identifier)
-        for rig in rig_layers:
-            if item.parent().text(0) == rig.name:
-                for model in rig.models:
-                    if model.name == item.text(0):
-                        model.influences = influences
+        rig_key = Identifiers.rig_layer_identifier + item.parent().text(0)
+        rig = self.index_layer(rig_key)
+        if rig is not None:
+            for model in self.data_index.get_children(rig_key, item.text(0)):
+                model.influences = influences
 
-        self.write_rig_data_to_fileinfo(rig_layers)
+            self.write_rig_data_to_fileinfo([rig])
 
     def change_rig_layer_path(self, item, new_path, asset_type):
         """
@@ -993,15 +1392,14 @@ class FBXExporterData(object):
         """
         if Debug.debug: print(('calling :: {0}'.format('change_rig_layer_path')))
 
-        rig_layers = self.build_class_from_data(Identifiers.rig_layer_identifier)
-        for rig in rig_layers:
-            if item.text(0) == rig.name:
-                if asset_type == 'rig_path':
-                    rig.rig_path = new_path
-                elif asset_type == 'anim_path':
-                    rig.animation_path = new_path
+        rig = self.get_layer_data(Identifiers.rig_layer_identifier + item.text(0))
+        if rig is not None:
+            if asset_type == 'rig_path':
+                rig.rig_path = new_path
+            elif asset_type == 'anim_path':
+                rig.animation_path = new_path
 
-        self.write_rig_data_to_fileinfo(rig_layers)
+            self.write_rig_data_to_fileinfo([rig])
 
     def set_maya_to_data_range(self, item):
         """
@@ -1014,13 +1412,10 @@ class FBXExporterData(object):
         """
         if Debug.debug : print(('calling :: {0}'.format('set_maya_to_data_range')))
 
-        chars = self.build_class_from_data(Identifiers.actor_identifier)
-        for char in chars:
-            if item.parent().text(0) == char.name:
-                for anim in char.animations:
-                    if item.text(0) == anim.anim_name:
-                        pm.playbackOptions(animationStartTime=anim.start_frame, minTime=anim.start_frame,
-                                           animationEndTime=anim.end_frame, maxTime=anim.end_frame)
+        char, anim = self.get_item_data(item, Identifiers.actor_identifier)
+        if anim is not None:
+            pm.playbackOptions(animationStartTime=anim.start_frame, minTime=anim.start_frame,
+                               animationEndTime=anim.end_frame, maxTime=anim.end_frame)
 
     def get_selected_animlayers(self):
         """
@@ -1,9 +1,17 @@
 import logging
+import os
+from contextlib import contextmanager
 import pymel.core as pm
 
 import scr
 from scr.tools.fbxexporters import Debug
 from scr.tools.fbxexporters import GlobalExportOptions
+from scr.tools.fbxexporters import fbx_exporter_fbxhash
+from scr.tools.fbxexporters import fbx_exporter_options
+from scr.tools.fbxexporters import fbx_exporter_publish
+from scr.tools.fbxexporters import fbx_exporter_scene
+from scr.tools.fbxexporters import fbx_exporter_telemetry
+from scr.tools.fbxexporters import fbx_exporter_vcs
 
 
 class FBXExport(object):
@@ -15,29 +23,70 @@ class FBXExport(object):
         self.zero_matrix = pm.datatypes.Matrix([[1.0, 0.0, 0.0, 0.0], [0.0, 1.0, 0.0, 0.0], [0.0, 0.0, 1.0, 0.0],
                                                 [0.0, 0.0, 0.0, 1.0]])
 
-    def export_global_options(self):
+        # FBX options last sent to the plugin, kept between the exports of an option_batch
+        self.option_state = fbx_exporter_options.FBXOptionState()
+        self.batch_depth = 0
+
+        # fbx paths whose last export had the same content as the published file, which was left untouched
+        self.kept_outputs = set()
+
+        # stage timings of the job that is exporting
+        self.Recorder = fbx_exporter_telemetry.Recorder
+        # moves the exports from local storage into the project on background threads
+        self.Publisher = fbx_exporter_publish.Publisher
+        # checks out and adds the exported files when P4 is configured
+        self.VersionControl = fbx_exporter_vcs.VersionControl
+
+    @contextmanager
+    def option_batch(self):
         """
-        sets up the default export options that will remain consistent across all exports
+        exports made inside the block share the FBX option state, only the options that change between them are sent
+        to the plugin. outside of a batch every export starts from FBXResetExport
+
+            with Exporter.option_batch():
+                for model in models:
+                    Exporter.export_model_setup(model, path, options)
         """
-        if Debug.debug: print(('calling :: {0} '.format('export_global_options')))
+        if self.batch_depth == 0:
+            # options may have been changed from the FBX export dialog or another tool since the last batch
+            self.option_state.invalidate()
+        self.batch_depth += 1
 
-        # Global
-        pm.mel.FBXExportScaleFactor(self.global_export_options.fbx_export_scale_factor)
+        try:
+            yield
+        finally:
+            self.batch_depth -= 1
+            if self.batch_depth == 0:
+                self.option_state.invalidate()
 
+    def apply_options(self, options):
         """
-        HACK
-        removing FBXExportConvertUnitString as it is causing issues with scale in unity where the rig is brought in at 
-        .01 scale fro x,y,z . Removing it fixes the rig export to unity i need to test how it impacts other exports as 
-        well as rig exports to unreal
-        """
-        pm.mel.FBXExportConvertUnitString(v=self.global_export_options.fbx_export_convert_unit_string)
+        sends the FBX options that differ from the current plugin state in a single mel evaluation
+
+        :param options: {FBX option command: value} in the order they are sent
+        :type options: dict
         """
-        above...remove for rig
+        if Debug.debug: print(('calling :: {0} '.format('apply_options')))
+
+        if self.batch_depth == 0:
+            self.option_state.invalidate()
+
+        with self.Recorder.stage(fbx_exporter_telemetry.options_stage):
+            script = self.option_state.get_script(options)
+            if script:
+                try:
+                    pm.mel.eval(script)
+                except Exception:
+                    self.option_state.invalidate()
+                    raise
+
+    def get_global_options(self):
         """
+        the default export options that will remain consistent across all exports
 
-        pm.mel.FBXExportInputConnections(v=self.global_export_options.fbx_export_input_connections)
-        pm.mel.FBXExportInAscii(v=self.global_export_options.fbx_export_in_ascii)
-        pm.mel.FBXExportEmbeddedTextures(v=self.global_export_options.fbx_export_embedded_textures)
+        :rtype: dict
+        """
+        return fbx_exporter_options.get_global_options(self.global_export_options)
 
     def export_rig_setup(self, models, model_name, root_name, export_dir):
         '''
@@ -56,11 +105,9 @@ class FBXExport(object):
         '''
         if Debug.debug: print(('calling :: {0} '.format('export_rig_setup')))
 
-        pm.mel.FBXResetExport()
-
         # removing until rig scale issue is resolved
-        # self.export_global_options()
-        self.export_rig_options()
+        # options = self.get_global_options()
+        self.apply_options(self.get_rig_options())
         success = self.export_rig(models, model_name, root_name, export_dir)
         return success
 
@@ -76,72 +123,50 @@ class FBXExport(object):
         @type start: str
         @param end: end frame
         @type end: str
-        @return:
-        @rtype:
+        @return: success
+        @rtype: bool
         '''
         if Debug.debug: print(('calling :: {0} '.format('export_rig_setup')))
 
-        pm.playbackOptions(animationStartTime=start, animationEndTime=end)
-        pm.playbackOptions(min=start, max=end)
+        with self.Recorder.stage(fbx_exporter_telemetry.scene_stage):
+            pm.playbackOptions(animationStartTime=start, animationEndTime=end)
+            pm.playbackOptions(min=start, max=end)
 
-        pm.mel.FBXResetExport()
-        self.export_global_options()
-        self.export_animation_options()
-        self.export_animation(name, path)
+        options = self.get_global_options()
+        options.update(self.get_animation_options())
+        self.apply_options(options)
+        return self.export_animation(name, path)
 
     @staticmethod
-    def export_animation_options():
+    def get_animation_options():
         '''
         fbx options for animation export
 
-        @return:
-        @rtype:
+        @return: {FBX option command: value}
+        @rtype: dict
         '''
-        if Debug.debug: print(('calling :: {0} '.format('export_rig_options')))
-
-        # this is from the original exporter. i am not sure how to include it if it is needed
-        # pm.Mel.eval("FBXProperty Export|IncludeGrp|Animation -v true;")
+        return fbx_exporter_options.get_animation_options()
 
-        pm.mel.FBXExportBakeComplexAnimation(v=True)
-        pm.mel.FBXExportReferencedAssetsContent(v=True)
-
-    def export_rig_options(self):
+    def get_rig_options(self):
         '''
         fbx options for rig export
 
-        @return:
-        @rtype:
+        @return: {FBX option command: value}
+        @rtype: dict
         '''
-        if Debug.debug: print(('calling :: {0} '.format('export_rig_options')))
-
-        """
-        copying from def export_global_options until i figure out the FBXExportConvertUnitString and how it relates to 
-        the scale of .01 being imported on the rig
-        """
-        pm.mel.FBXExportInputConnections(v=self.global_export_options.fbx_export_input_connections)
-        pm.mel.FBXExportInAscii(v=self.global_export_options.fbx_export_in_ascii)
-        pm.mel.FBXExportEmbeddedTextures(v=self.global_export_options.fbx_export_embedded_textures)
-
-        pm.mel.FBXExportSkins(v=True)
-        pm.mel.FBXExportAnimationOnly(v=False)
+        return fbx_exporter_options.get_rig_options(self.global_export_options)
 
     @staticmethod
-    def export_model_options(options):
+    def get_model_options(options):
         """
         fbx options for model export
 
         :param options: class with export options
         :type options: either ModelData() or LayerData()
+        :return: {FBX option command: value}
+        :rtype: dict
         """
-        if Debug.debug: print(('calling :: {0} '.format('export_model_options')))
-
-        pm.mel.FBXExportSmoothingGroups(v=options.fbx_export_smoothing_groups)
-        pm.mel.FBXExportHardEdges(v=options.fbx_export_hard_edges)
-        pm.mel.FBXExportTangents(v=options.fbx_export_tangents)
-        pm.mel.FBXExportSmoothMesh(v=options.fbx_export_smooth_mesh)
-        pm.mel.FBXExportAnimationOnly(v=options.fbx_export_animation_only)
-        pm.mel.FBXExportInstances(v=options.fbx_export_instances)
-        pm.mel.FBXExportTriangulate(v=options.fbx_export_triangulate)
+        return fbx_exporter_options.get_model_options(options)
 
     def export_model_setup(self, model, export_path, options):
         """
@@ -156,38 +181,51 @@ class FBXExport(object):
         """
         if Debug.debug: print(('calling :: {0} '.format('export_model_setup')))
 
-        pm.mel.FBXResetExport()
-        self.export_global_options()
-        self.export_model_options(options)
-        # added = self.do_p4(export_path)
-        self.pre_export_model(model, export_path, options)
+        fbx_options = self.get_global_options()
+        fbx_options.update(self.get_model_options(options))
+        self.apply_options(fbx_options)
+        p4_batch = self.do_p4(export_path)
+        success = False
+        try:
+            success = self.pre_export_model(model, export_path, options)
+            # a new fbx is added once it is published. p4 runs on Maya's main thread
+            self.Publisher.wait_for(export_path)
+        finally:
+            # closed even if the export failed, the fbx is reverted if it did not change
+            p4_batch.close([export_path] if success else [])
+
+    def export_model_job(self, job):
+        """
+        exports a model job from fbx_exporter_planner, the path and options were resolved when the job was planned
 
-        # # removing we need to figure out a way to determine if the user has P4 or SVN
-        # if not added:
-        #     pipelineTools.sg_p4Utils.add(export_path)
+        :param job: model job
+        :type job: fbx_exporter_planner.ExportJob()
+        :return: success
+        :rtype: bool
+        """
+        if Debug.debug: print(('calling :: {0} '.format('export_model_job')))
+
+        self.apply_options(job.options)
+        return self.pre_export_model(job.data, job.path, job.option_data)
 
     def test_models_exist(self, model):
         '''
-        tests if model in ModelData exists
+        tests if model in ModelData exists. export items are checked in one batch and an item that was renamed is
+        found again by the model uuid
 
         :param model: model(s) to export...export items
         :type model: ModelData()
-        @return:
-        @rtype:
+        @return: model with the export items found in the scene. a copy if they differ, the model passed in may be the
+            cached container of its layer and is never changed
+        @rtype: ModelData()
         '''
 
-        missing = []
+        with self.Recorder.stage(fbx_exporter_telemetry.resolve_stage):
+            export_items, missing = fbx_exporter_scene.Resolver.resolve_export_items(model)
 
-        for item in range(len(model.export_items)):
-            if pm.objExists(model.export_items[item]):
-                pass
-                # print(('found :: {0}'.format(model.export_items[item])))
-            else:
-                # print(('missing :: {0}'.format(model.export_items[item])))
-                missing.append(model.export_items[item])
-
-        for miss in missing:
-            model.export_items.remove(miss)
+        if export_items != model.export_items:
+            model = model.copy()
+            model.export_items = export_items
 
         return model
 
@@ -200,25 +238,102 @@ class FBXExport(object):
         :type model: ModelData()
         :param export_path: path to export fbx to
         :type export_path: str
+        :return: success
+        :rtype: bool
         """
         if Debug.debug : print(('calling :: {0} '.format('pre_export_model')))
 
         model = self.test_models_exist(model)
 
         if model.fbx_export_zero or options.fbx_export_zero:
-            model_matrixs = {}
-            for item in model.export_items:
-                export_item = pm.ls(item)[0]
-                model_matrixs[item] = export_item.getMatrix()
-                export_item.setMatrix(self.zero_matrix)
+            with self.Recorder.stage(fbx_exporter_telemetry.scene_stage):
+                # one ls for all items, the nodes are kept to put them back after the export
+                export_nodes = pm.ls(model.export_items)
+                model_matrixs = []
+                for export_item in export_nodes:
+                    model_matrixs.append(export_item.getMatrix())
+                    export_item.setMatrix(self.zero_matrix)
+
+            success = self.export_model(model, export_path)
+
+            with self.Recorder.stage(fbx_exporter_telemetry.post_stage):
+                for export_item, matrix in zip(export_nodes, model_matrixs):
+                    export_item.setMatrix(matrix)
+        else:
+            success = self.export_model(model, export_path)
 
-            self.export_model(model, export_path)
+        return success
 
-            for item in model.export_items:
-                export_item = pm.ls(item)[0]
-                export_item.setMatrix(model_matrixs[item])
-        else:
-            self.export_model(model, export_path)
+    @staticmethod
+    def get_output_key(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def is_kept(self, path):
+        """
+        :return: whether the last export to path matched the published fbx, see write_fbx. only known once the
+            publish is done, see wait_for_publishes
+        :rtype: bool
+        """
+        return path is not None and self.get_output_key(path) in self.kept_outputs
+
+    def write_fbx(self, export_path):
+        """
+        exports the selection. the fbx is written to local storage and returns as soon as it is written, it is published
+        to export_path on a background thread (see fbx_exporter_publish). the published file is only replaced when its
+        content changed (see fbx_exporter_fbxhash), so an unchanged export does not touch it
+
+        :param export_path: path to export fbx to
+        :type export_path: str
+        :return: success of the FBX write, the publish can still fail (wait_for_publishes)
+        :rtype: bool
+        """
+        if Debug.debug: print(('calling :: {0} '.format('write_fbx')))
+
+        # the local file of an output is reused, its last publish has to be done
+        self.Publisher.wait_for(export_path)
+
+        self.Recorder.count(items=len(pm.ls(selection=True)))
+        with self.Recorder.stage(fbx_exporter_telemetry.write_stage):
+            local_path = fbx_exporter_fbxhash.get_local_staging_path(export_path)
+            pm.mel.FBXExport(s=True, f=local_path.replace('\\', '/'))
+        if not os.path.isfile(local_path):
+            self.logger.error('FBXExport did not write {0}'.format(local_path))
+            return False
+
+        self.Recorder.count(path=local_path)
+        self.Publisher.submit(local_path, export_path, self.Recorder.current)
+        return True
+
+    def get_publish(self, path):
+        """
+        :return: future of the publish of the last export to path, None if there is none pending
+        :rtype: concurrent.futures.Future()
+        """
+        return self.Publisher.get(path) if path is not None else None
+
+    def wait_for_publishes(self):
+        """
+        blocks until every export is published and records which published files were kept (is_kept)
+
+        :return: {output key: error} of the publishes that failed, see get_output_key
+        :rtype: dict
+        """
+        if Debug.debug: print(('calling :: {0} '.format('wait_for_publishes')))
+
+        errors = {}
+        for key, future in self.Publisher.wait().items():
+            try:
+                kept = future.result()
+            except Exception as e:
+                errors[key] = 'publish failed :: {0}: {1}'.format(type(e).__name__, e)
+                kept = False
+
+            if kept:
+                self.kept_outputs.add(key)
+            else:
+                self.kept_outputs.discard(key)
+
+        return errors
 
     @staticmethod
     def remove_pipe(name):
@@ -258,9 +373,9 @@ class FBXExport(object):
             mess = ('\nExporting {0} to {1}'.format(name, export_path))
             self.logger.info(mess)
 
-            pm.mel.FBXExport(s=True, f=export_path)
+            success = self.write_fbx(export_path)
             pm.select(clear=True)
-            return True
+            return success
 
     def export_rig(self, models, model_name, root_name, export_dir):
         '''
@@ -279,27 +394,39 @@ class FBXExport(object):
         '''
 
         try:
-            pm.select(clear=True)
-            export_models = []
-            for model in models:
-                export_models.append(self.remove_pipe(model))
+            with self.Recorder.stage(fbx_exporter_telemetry.select_stage):
+                pm.select(clear=True)
+                export_models = []
+                for model in models:
+                    export_models.append(self.remove_pipe(model))
 
-            pm.select(export_models, root_name)
+                pm.select(export_models, root_name)
 
             model_name = self.remove_pipe(model_name)
-            export_path = export_dir + '\\' + model_name + '.fbx'
+            export_path = self.get_rig_export_path(model_name, export_dir)
 
             if pm.ls(selection=True):
                 mess = ('\nExporting {0} to {1}'.format(model_name, export_path))
                 self.logger.info(mess)
 
-                pm.mel.FBXExport(s=True, f=export_path)
+                success = self.write_fbx(export_path)
                 pm.select(clear=True)
 
-                return True
+                return success
         except:
             return False
 
+    def get_rig_export_path(self, model_name, export_dir):
+        """
+        :param model_name: rig model name
+        :type model_name: str
+        :param export_dir: location for export
+        :type export_dir: str
+        :return: path the rig model is exported to
+        :rtype: str
+        """
+        return export_dir + '\\' + self.remove_pipe(model_name) + '.fbx'
+
     def export_model(self, model, export_path):
         """
         call to export. throws an error if model geo does not exist
@@ -308,56 +435,52 @@ class FBXExport(object):
         :type model: ModelData()
         :param export_path: path to export fbx to
         :type export_path: str
+        :return: success
+        :rtype: bool
         """
         if Debug.debug: print(('calling :: {0} '.format('export_model')))
 
-        pm.select(clear=True)
-        pm.select(model.export_items)
+        with self.Recorder.stage(fbx_exporter_telemetry.select_stage):
+            pm.select(clear=True)
+            pm.select(model.export_items)
 
         if pm.ls(selection=True):
             mess = ('\nExporting {0} to {1}'.format(', '.join(model.export_items), export_path))
             self.logger.info(mess)
 
-            pm.mel.FBXExport(s=True, f=export_path)
+            success = self.write_fbx(export_path)
             pm.select(clear=True)
+            return success
         else:
             if model.export_items:
                 out = ('Model(s) not found for export :: {0}'.format(', '.join(model.export_items)))
             else:
                 out = 'No Models found in export items for export.'
 
-            pm.confirmDialog(title='No model found', message=out, button=['OK'])
+            if self.batch_depth:
+                # no dialog in the middle of a batch, the result is reported when it is done
+                self.logger.error(out)
+            else:
+                pm.confirmDialog(title='No model found', message=out, button=['OK'])
+            return False
 
     """
     \/\/\/\/\/\/\/\/    P4    \/\/\/\/\/\/\/\/
     """
 
-    @staticmethod
-    def do_p4(path):
+    def do_p4(self, path):
         """
+        opens a single fbx for edit before it is exported, a batch of exports opens all of its outputs at once (see
+        fbx_exporter_vcs). does nothing when P4 is not configured
 
         :param path: export path for fbx
         :type path: str
-        :return: has fbx already been added to p4
-        :rtype: bool
+        :return: batch to close with the path once the fbx is published, it adds a new fbx
+        :rtype: fbx_exporter_vcs.VersionControlBatch()
         """
         if Debug.debug : print(('calling :: {0} '.format('do_p4')))
 
-        pass
-
-        # path = os.path.realpath(path).replace('@', '%40').replace('\\', '/')
-        # p4_path_reveal = pipelineTools.sg_p4Utils.p4_depot_local_path_reveal(path)
-        # added = False
-        # if p4_path_reveal:
-        #     p4_path = p4_path_reveal["depotFile"]
-        #     added = pipelineTools.sg_p4Utils.isP4(p4_path)
-        #
-        #     if added:
-        #         if not pipelineTools.sg_p4Utils.isLatest(p4_path)[0]:
-        #             pipelineTools.sg_p4Utils.syncFile(p4_path)
-        #         pipelineTools.sg_p4Utils.checkOut(p4_path)
-        #
-        # return added
+        return self.VersionControl.open_batch([path], fbx_exporter_vcs.get_description(pm.sceneName()))
 
 
 Exporter = FBXExport()
@@ -0,0 +1,298 @@
+"""
+compares exported fbx files by content. an ASCII fbx holds fields that change on every export even when the scene did
+not: the creation time stamp, the creator string, the file id, the file name and dates in the scene info and the object
+ids (the FBX SDK hands out new ids every export). the normalizer streams the file line by line, leaves those fields out
+and numbers the object ids in the order they first appear, so two exports of the same content normalize the same
+
+a new export is written to a staging file next to the output and only moved over the published fbx when it differs.
+an identical export is dropped and the published file is left untouched, no checkout, no submit and no reimport
+
+exports from Maya are written to local temp storage first (get_local_staging_path) and published from there with
+publish_local, on a background thread (see fbx_exporter_publish). the fbx is copied into a staging file next to the
+output and moved into place, a crash never leaves a half written fbx in the project
+
+binary fbx files are compared byte for byte, their header always differs so they are always published
+
+this module does not need Maya
+"""
+
+import hashlib
+import itertools
+import os
+import re
+import shutil
+import tempfile
+
+
+staging_prefix = '.fbx_export_staging_'
+local_staging_folder = os.path.join(tempfile.gettempdir(), 'fbx_export_staging')
+# local staging folders made by this process, removed once nothing is being published (remove_local_staging_folders)
+local_staging_folders = set()
+binary_magic = b'Kaydara FBX Binary'
+
+# FBXHeaderExtension fields and blocks that change every export
+volatile_keys = ('CreationTime', 'Creator', 'FileId')
+volatile_blocks = ('CreationTimeStamp',)
+# Properties70 entries of the scene info that hold the file path or a date
+volatile_properties = ('DateTime_GMT', 'FileName', 'DocumentUrl', 'SrcDocumentUrl')
+
+key_pattern = re.compile(r'^\s*(\w+):')
+property_pattern = re.compile(r'^\s*P: "([^"]*)"')
+# Model: 2094129248, "Model::crate", "Mesh" {
+object_pattern = re.compile(r'^(\s*\w+: )(-?\d+)(, ".*)$')
+# C: "OO",2094129248,2094133568  or  C: "OP",1,2, "Lcl Translation"
+connection_pattern = re.compile(r'^(\s*C: "\w+",)(-?\d+),(-?\d+)(.*)$')
+# pose node reference
+node_pattern = re.compile(r'^(\s*Node: )(-?\d+)(.*)$')
+
+
+def is_binary_fbx(path):
+    with open(path, 'rb') as fbx_file:
+        return fbx_file.read(len(binary_magic)) == binary_magic
+
+
+def is_volatile(line):
+    """
+    :return: whether a line holds a field that changes every export
+    :rtype: bool
+    """
+    if line.lstrip().startswith(';'):
+        # comments, the header comment has the creation time
+        return True
+
+    match = property_pattern.match(line)
+    if match:
+        return any(name in match.group(1) for name in volatile_properties)
+
+    match = key_pattern.match(line)
+    return match is not None and match.group(1) in volatile_keys
+
+
+def iter_normalized_lines(lines):
+    """
+    normalizes the lines of an ASCII fbx
+
+    :param lines: lines of the file
+    :type lines: iterable of str
+    :return: normalized lines, volatile lines are left out
+    :rtype: generator
+    """
+    ids = {'0': '0'}
+
+    def get_id(value):
+        if value not in ids:
+            ids[value] = str(len(ids))
+        return ids[value]
+
+    skip_depth = 0
+    for line in lines:
+        line = line.rstrip('\r\n')
+
+        if skip_depth:
+            skip_depth += line.count('{') - line.count('}')
+            continue
+
+        match = key_pattern.match(line)
+        if match and match.group(1) in volatile_blocks:
+            skip_depth = line.count('{') - line.count('}')
+            continue
+
+        if not line.strip() or is_volatile(line):
+            continue
+
+        match = connection_pattern.match(line)
+        if match:
+            yield '{0}{1},{2}{3}'.format(match.group(1), get_id(match.group(2)), get_id(match.group(3)),
+                                         match.group(4))
+            continue
+
+        match = object_pattern.match(line) or node_pattern.match(line)
+        if match:
+            yield '{0}{1}{2}'.format(match.group(1), get_id(match.group(2)), match.group(3))
+            continue
+
+        yield line
+
+
+def iter_fbx(path, chunk_size=1 << 16):
+    """
+    :return: normalized lines of an ASCII fbx or chunks of a binary one
+    :rtype: generator
+    """
+    if is_binary_fbx(path):
+        with open(path, 'rb') as fbx_file:
+            for chunk in iter(lambda: fbx_file.read(chunk_size), b''):
+                yield chunk
+        return
+
+    # latin-1 maps every byte, the content is compared not interpreted
+    with open(path, 'r', encoding='latin-1', newline='') as fbx_file:
+        for line in iter_normalized_lines(fbx_file):
+            yield line
+
+
+def get_normalized_hash(path):
+    """
+    :param path: fbx file
+    :type path: str
+    :return: sha1 hex digest of the normalized content
+    :rtype: str
+    """
+    hasher = hashlib.sha1()
+    for part in iter_fbx(path):
+        hasher.update(part if isinstance(part, bytes) else part.encode('latin-1') + b'\n')
+
+    return hasher.hexdigest()
+
+
+def is_same_content(path, other_path):
+    """
+    compares two fbx files after normalizing them, stops at the first difference
+
+    :rtype: bool
+    """
+    if not os.path.isfile(path) or not os.path.isfile(other_path):
+        return False
+    if is_binary_fbx(path) != is_binary_fbx(other_path):
+        return False
+
+    sentinel = object()
+    for part, other_part in itertools.zip_longest(iter_fbx(path), iter_fbx(other_path), fillvalue=sentinel):
+        if part != other_part:
+            return False
+
+    return True
+
+
+def get_staging_path(export_path):
+    """
+    :return: new empty file next to the output a new export is written to before it is published. every call gets its
+        own file, publishes to the same folder from other threads or workers never share or remove each other's files
+    :rtype: str
+    """
+    folder, name = os.path.split(export_path)
+    handle, staged_path = tempfile.mkstemp(prefix='{0}{1}.'.format(staging_prefix, name), dir=folder or None)
+    os.close(handle)
+
+    return staged_path
+
+
+def publish(staged_path, export_path):
+    """
+    moves a staged export over the published fbx unless their content is the same, the staged file is removed either
+    way
+
+    :param staged_path: new export, see get_staging_path
+    :type staged_path: str
+    :param export_path: published fbx
+    :type export_path: str
+    :return: True if the published fbx was kept because it has the same content
+    :rtype: bool
+    """
+    try:
+        if is_same_content(staged_path, export_path):
+            return True
+
+        os.replace(staged_path, export_path)
+        return False
+    finally:
+        remove_staged(staged_path)
+
+
+def remove_staged(staged_path):
+    """
+    removes a staged file. the folder it is in is left, other exports to the same folder may be using it
+    """
+    if os.path.exists(staged_path):
+        os.remove(staged_path)
+
+
+def get_local_staging_path(export_path):
+    """
+    :return: path on local storage an export is written to before it is published with publish_local. outputs with the
+        same file name in different folders get different paths
+    :rtype: str
+    """
+    folder, name = os.path.split(os.path.abspath(export_path))
+    folder_key = hashlib.sha1(os.path.normcase(folder).encode('utf-8')).hexdigest()[:12]
+    process_staging = '{0}_{1}'.format(local_staging_folder, os.getpid())
+    staging = os.path.join(process_staging, folder_key)
+    if not os.path.isdir(staging):
+        os.makedirs(staging)
+    local_staging_folders.update((process_staging, staging))
+
+    return os.path.join(staging, name)
+
+
+def remove_local_staging_folders():
+    """
+    removes the empty local staging folders of this process. only call it when nothing is being exported or published,
+    an export may be about to write into a folder (see fbx_exporter_publish.PublishQueue.wait)
+    """
+    # deepest first so a process folder is empty by the time it is reached
+    for folder in sorted(local_staging_folders, key=len, reverse=True):
+        try:
+            os.rmdir(folder)
+        except OSError:
+            if os.path.isdir(folder):
+                continue
+        local_staging_folders.discard(folder)
+
+
+def publish_local(local_path, export_path):
+    """
+    publishes an export staged on local storage. the content is compared first so an unchanged export is never copied
+    to the output folder, a changed one is copied next to the output and moved over the published fbx. the local file is
+    removed either way
+
+    :param local_path: new export, see get_local_staging_path
+    :type local_path: str
+    :param export_path: published fbx
+    :type export_path: str
+    :return: True if the published fbx was kept because it has the same content
+    :rtype: bool
+    """
+    try:
+        if is_same_content(local_path, export_path):
+            return True
+
+        staged_path = get_staging_path(export_path)
+        try:
+            shutil.copyfile(local_path, staged_path)
+            os.replace(staged_path, export_path)
+        finally:
+            remove_staged(staged_path)
+        return False
+    finally:
+        remove_staged(local_path)
+
+
+def publish_copy(source_path, export_path, link=False):
+    """
+    publishes a copy of an exported fbx to another output, see publish
+
+    :param source_path: published fbx
+    :type source_path: str
+    :param export_path: output that gets the same fbx
+    :type export_path: str
+    :param link: hard link instead of copying
+    :type link: bool
+    :return: True if the output was kept because it has the same content
+    :rtype: bool
+    """
+    if os.path.normcase(os.path.abspath(source_path)) == os.path.normcase(os.path.abspath(export_path)):
+        return True
+
+    staged_path = get_staging_path(export_path)
+    try:
+        if link:
+            # a link needs a path that does not exist yet
+            os.remove(staged_path)
+            os.link(source_path, staged_path)
+        else:
+            shutil.copyfile(source_path, staged_path)
+    except (IOError, OSError):
+        remove_staged(staged_path)
+        raise
+
+    return publish(staged_path, export_path)
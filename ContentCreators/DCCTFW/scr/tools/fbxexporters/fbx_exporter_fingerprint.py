@@ -0,0 +1,195 @@
+"""
+incremental export. every export target gets a fingerprint of what went into it: the scene content (mesh topology,
+points and skin weights, transforms, animation curves over the frame range, see ExportStaging.get_content_hash), the
+resolved FBX options and the exporter version. the fingerprint is stored with the size and modification time of the
+fbx in a manifest in the output folder. a job whose fingerprint and fbx are unchanged since its last export is skipped
+
+    Assets/Props/crate.fbx
+    Assets/Props/.fbx_export_fingerprints.json
+    {"v": 1, "outputs": {"crate.fbx": {"f": "<sha1>", "s": [size, mtime ns]}}}
+
+this module does not need Maya, the content hash is passed in
+
+    incremental = IncrementalExport(Stager.get_content_hash, force=False)
+    results, cancelled = run_plan(plan, incremental.wrap(run_job))
+    incremental.update(results)
+"""
+
+import hashlib
+import json
+import logging
+import os
+
+import scr
+from scr.tools.fbxexporters import fbx_exporter_sidecar
+from scr.tools.fbxexporters import fbx_exporter_telemetry
+
+
+# bump when a change to the exporter changes the fbx it writes for the same scene, every target exports again
+exporter_version = 1
+manifest_version = 1
+manifest_name = '.fbx_export_fingerprints.json'
+
+
+def get_fingerprint(job, content_hash):
+    """
+    :param job: job to fingerprint
+    :type job: fbx_exporter_planner.ExportJob()
+    :param content_hash: hash of the scene content the job exports
+    :type content_hash: str
+    :return: sha1 hex digest
+    :rtype: str
+    """
+    data = [exporter_version, job.kind, job.staging, [[command, value] for command, value in job.options.items()],
+            content_hash]
+
+    return hashlib.sha1(json.dumps(data, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+
+def get_file_state(path):
+    """
+    :return: [size, modification time in ns] or None if the file does not exist
+    :rtype: list
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class FingerprintManifest(object):
+    """
+    fingerprints of the fbx files in one folder
+    """
+    def __init__(self, folder):
+        self.path = os.path.join(folder, manifest_name)
+        # {file name: {'f': fingerprint, 's': file state}}
+        self.outputs = {}
+        self.dirty = False
+
+    def load(self):
+        """
+        reads the manifest, a missing or unreadable manifest is empty
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as manifest_file:
+                data = json.load(manifest_file)
+        except (IOError, OSError, ValueError):
+            return self
+
+        if data.get('v') == manifest_version:
+            self.outputs = data.get('outputs', {})
+
+        return self
+
+    def is_current(self, path, fingerprint):
+        """
+        :return: whether the fbx at path was exported from fingerprint and has not changed since
+        :rtype: bool
+        """
+        entry = self.outputs.get(os.path.basename(path))
+        if entry is None or entry.get('f') != fingerprint:
+            return False
+
+        return entry.get('s') == get_file_state(path)
+
+    def record(self, path, fingerprint):
+        state = get_file_state(path)
+        if state is None:
+            self.forget(path)
+            return
+
+        self.outputs[os.path.basename(path)] = {'f': fingerprint, 's': state}
+        self.dirty = True
+
+    def forget(self, path):
+        if self.outputs.pop(os.path.basename(path), None) is not None:
+            self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+
+        fbx_exporter_sidecar.write_atomic(self.path, json.dumps({'v': manifest_version, 'outputs': self.outputs},
+                                                                separators=(',', ':'), sort_keys=True))
+        self.dirty = False
+
+
+class IncrementalExport(object):
+    """
+    skips the jobs of an export whose fingerprint and fbx are unchanged
+    """
+    def __init__(self, get_content_hash, force=False):
+        self.logger = logging.getLogger(scr.logger_name)
+        # function(job) that hashes the scene content of a job
+        self.get_content_hash = get_content_hash
+        # export everything, fingerprints are still recorded
+        self.force = force
+        # {folder: FingerprintManifest()}
+        self.manifests = {}
+
+    def get_manifest(self, path):
+        folder = os.path.dirname(os.path.abspath(path))
+        if folder not in self.manifests:
+            self.manifests[folder] = FingerprintManifest(folder).load()
+
+        return self.manifests[folder]
+
+    def is_current(self, job):
+        """
+        fingerprints a job (job.fingerprint) and checks it against the manifest. a job that can not be fingerprinted is
+        never current
+
+        :rtype: bool
+        """
+        with fbx_exporter_telemetry.Recorder.stage(fbx_exporter_telemetry.fingerprint_stage):
+            try:
+                job.fingerprint = get_fingerprint(job, self.get_content_hash(job))
+            except Exception as e:
+                self.logger.warning('Could not fingerprint {0} :: {1}: {2}'.format(job.name, type(e).__name__, e))
+                job.fingerprint = None
+                return False
+
+            return not self.force and self.get_manifest(job.path).is_current(job.path, job.fingerprint)
+
+    def wrap(self, run_job):
+        """
+        :param run_job: function(job) that exports one job and returns success
+        :type run_job: function
+        :return: function(job) that skips current jobs (job.skipped) and runs the others
+        :rtype: function
+        """
+        def run_incremental(job):
+            if self.is_current(job):
+                job.skipped = True
+                return True
+
+            return run_job(job)
+
+        return run_incremental
+
+    def update(self, results):
+        """
+        records the fingerprints of the exported jobs and forgets the ones that failed, then saves the manifests
+
+        :param results: results of the export
+        :type results: [fbx_exporter_planner.ExportResult()]
+        """
+        for result in results:
+            job = result.job
+            if job.skipped or job.path is None:
+                continue
+
+            manifest = self.get_manifest(job.path)
+            if result.success and job.fingerprint is not None:
+                manifest.record(job.path, job.fingerprint)
+            else:
+                manifest.forget(job.path)
+
+        for manifest in self.manifests.values():
+            try:
+                manifest.save()
+            except (IOError, OSError) as e:
+                self.logger.warning('Could not write {0} :: {1}'.format(manifest.path, e))
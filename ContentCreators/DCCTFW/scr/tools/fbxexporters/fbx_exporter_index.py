@@ -0,0 +1,163 @@
+"""
+lookup tables over the loaded exporter layers. this module does not need Maya
+
+layers are indexed by their fileInfo key. for each indexed layer the children (models/animations) are indexed by name
+and uuid, and their export items are mapped back to the models that own them. everything recorded for a layer is
+kept with it so the layer can be re-indexed or dropped on its own when it is written, renamed or removed.
+
+layers are only indexed when asked for, so a layer whose children were not loaded yet (lazy_load) is not read until
+one of its children is looked up.
+"""
+
+from scr.tools.fbxexporters import fbx_exporter_serialize
+
+
+class IndexedLayer(object):
+    """
+    what was recorded for one layer when it was indexed
+    """
+    def __init__(self, layer):
+        self.layer = layer
+        # {child name: [child]}. duplicate names are allowed in the data so every child with the name is kept
+        self.names = {}
+        # [(uuid, child)] and [(export item, child)] as they were when indexed, used to drop them again
+        self.uuids = []
+        self.export_items = []
+
+
+class ExporterDataIndex(object):
+    """
+    name, uuid and export item index over layer data (LayerData(), RigLayerData(), ActorLayerData())
+    """
+    def __init__(self):
+        self.layers = {}
+        # {uuid: {layer key: [child]}}
+        self.uuids = {}
+        # {export item: {layer key: [child]}}
+        self.export_items = {}
+
+    def clear(self):
+        """
+        drops everything from the index
+        """
+        self.layers = {}
+        self.uuids = {}
+        self.export_items = {}
+
+    def has_layer(self, key):
+        """
+        checks if a layer is indexed
+
+        :param key: fileInfo key of the layer
+        :type key: str
+        """
+        return key in self.layers
+
+    def add_layer(self, key, layer):
+        """
+        indexes a layer and its children. a layer that is already indexed under the key is replaced
+
+        :param key: fileInfo key of the layer
+        :type key: str
+        :param layer: layer data
+        :type layer: LayerData(), RigLayerData() or ActorLayerData()
+        """
+        self.remove_layer(key)
+
+        entry = IndexedLayer(layer)
+        for child in getattr(layer, fbx_exporter_serialize.get_children_field(type(layer)).name):
+            entry.names.setdefault(getattr(child, child.key_field), []).append(child)
+
+            uuid = getattr(child, 'uuid', None)
+            if uuid:
+                entry.uuids.append((uuid, child))
+                self.uuids.setdefault(uuid, {}).setdefault(key, []).append(child)
+
+            for export_item in getattr(child, 'export_items', ()):
+                entry.export_items.append((export_item, child))
+                self.export_items.setdefault(export_item, {}).setdefault(key, []).append(child)
+
+        self.layers[key] = entry
+
+    def remove_layer(self, key):
+        """
+        drops a layer and everything recorded for its children
+
+        :param key: fileInfo key of the layer
+        :type key: str
+        """
+        entry = self.layers.pop(key, None)
+        if entry is None:
+            return
+
+        for table, values in ((self.uuids, entry.uuids), (self.export_items, entry.export_items)):
+            for value, child in values:
+                owners = table.get(value)
+                if owners is not None and owners.pop(key, None) is not None and not owners:
+                    del table[value]
+
+    def get_layer(self, key):
+        """
+        gets an indexed layer
+
+        :param key: fileInfo key of the layer
+        :type key: str
+        :return: layer data or None if the layer is not indexed
+        """
+        entry = self.layers.get(key)
+        if entry is not None:
+            return entry.layer
+
+        return None
+
+    def get_children(self, key, name):
+        """
+        gets all children of an indexed layer with a name
+
+        :param key: fileInfo key of the layer
+        :type key: str
+        :param name: name of the model or animation
+        :type name: str
+        :return: [ModelData(), RigModelData() or AnimationData()]
+        :rtype: list
+        """
+        entry = self.layers.get(key)
+        if entry is None:
+            return []
+
+        return list(entry.names.get(name, ()))
+
+    def get_child(self, key, name):
+        """
+        gets the first child of an indexed layer with a name
+
+        :return: ModelData(), RigModelData(), AnimationData() or None
+        """
+        children = self.get_children(key, name)
+        if children:
+            return children[0]
+
+        return None
+
+    def find_uuid(self, uuid):
+        """
+        gets the children with a uuid from all indexed layers
+
+        :param uuid: maya uuid
+        :type uuid: str
+        :return: [(layer key, child)]
+        :rtype: list
+        """
+        return [(key, child) for key, children in self.uuids.get(uuid, {}).items() for child in children]
+
+    def find_export_item(self, export_item):
+        """
+        gets the children that export an item from all indexed layers
+
+        :param export_item: name of a node in the scene
+        :type export_item: str
+        :return: [(layer key, child)]
+        :rtype: list
+        """
+        return [(key, child) for key, children in self.export_items.get(export_item, {}).items()
+                for child in children]
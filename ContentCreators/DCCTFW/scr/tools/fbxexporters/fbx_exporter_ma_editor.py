@@ -0,0 +1,306 @@
+"""
+edits exporter data straight in Maya ASCII (.ma) files. this module does not need Maya
+
+the file is streamed line by line with fbx_exporter_mafile.iter_header_groups. only the fileInfo statements of
+exporter keys that an edit actually changes are rewritten, every other line is copied byte for byte and the rest of
+the file after the header is copied in one go. the result is written to a temporary file next to the scene and moved
+over it, so a scene is never left half written. scenes nothing changed in are not touched.
+
+edits:
+    PathRemap('Assets/Props', 'Assets/Env/Props') - moves layer, model, rig and animation paths under a folder
+    SetOption('fbx_export_triangulate', True) - sets a field on every layer/model that has it
+
+    edit_scenes(paths, [PathRemap(old, new)], workers=8)
+
+from the command line:
+    python fbx_exporter_ma_editor.py [--remap old new ...] [--set field=value ...] [--dry-run] [--workers n] paths...
+"""
+
+import argparse
+import concurrent.futures
+import os
+import shutil
+import tempfile
+
+from scr.tools.fbxexporters import Field
+from scr.tools.fbxexporters import Identifiers
+from scr.tools.fbxexporters import fbx_exporter_mafile
+from scr.tools.fbxexporters import fbx_exporter_serialize
+
+
+# fields that hold export folders
+path_fields = ('path', 'rig_path', 'animation_path', 'override_path')
+
+
+def normalize_path(path):
+    return path.replace('\\', '/').rstrip('/').lower()
+
+
+class PathRemap(object):
+    """
+    replaces a folder at the start of export paths. matched without case and with either separator, the rest of the
+    path is kept as it was
+    """
+    def __init__(self, old_prefix, new_prefix):
+        self.old_prefix = old_prefix
+        self.new_prefix = new_prefix
+        self.old_key = normalize_path(old_prefix)
+
+    def remap(self, path):
+        """
+        :return: remapped path or None if the path is not under old_prefix
+        :rtype: str
+        """
+        if not path:
+            return None
+
+        key = normalize_path(path)
+        if key == self.old_key:
+            return self.new_prefix
+        if key.startswith(self.old_key + '/'):
+            return self.new_prefix.rstrip('/\\') + path[len(self.old_key):]
+
+        return None
+
+    def apply(self, obj):
+        """
+        :param obj: layer, model or animation data
+        :type obj: DataContainer()
+        :return: True if a field changed
+        :rtype: bool
+        """
+        changed = False
+        for field in obj.fields:
+            if field.name in path_fields:
+                path = self.remap(getattr(obj, field.name))
+                if path is not None and path != getattr(obj, field.name):
+                    setattr(obj, field.name, path)
+                    changed = True
+
+        return changed
+
+
+class SetOption(object):
+    """
+    sets a field on every container that has it, e.g. the fbx_export_* options of layers and models
+    """
+    def __init__(self, field_name, value):
+        self.field_name = field_name
+        self.value = value
+
+    def apply(self, obj):
+        for field in obj.fields:
+            if field.name == self.field_name and field.stored:
+                value = self.value
+                if field.kind == Field.flag:
+                    value = fbx_exporter_serialize.strtobool(value)
+                elif field.kind == Field.items and isinstance(value, str):
+                    value = [item.strip() for item in value.split(',') if item.strip()]
+
+                if getattr(obj, field.name) != value:
+                    setattr(obj, field.name, value)
+                    return True
+
+        return False
+
+
+def apply_edits(obj, edits):
+    changed = False
+    for edit in edits:
+        if edit.apply(obj):
+            changed = True
+
+    return changed
+
+
+def edit_value(key, value, edits):
+    """
+    applies edits to one exporter fileInfo value
+
+    :param key: fileInfo key
+    :type key: str
+    :param value: unescaped fileInfo value
+    :type value: str
+    :param edits: edits to apply
+    :type edits: [PathRemap() or SetOption()]
+    :return: new value or None if nothing changed
+    :rtype: str
+    """
+    if not value:
+        return None
+
+    if key.startswith(Identifiers.chunk_identifier):
+        obj = fbx_exporter_serialize.decode_chunk(value, key)
+        if apply_edits(obj, edits):
+            return fbx_exporter_serialize.encode_chunk(obj)
+        return None
+
+    version = fbx_exporter_serialize.get_format_version(value)
+    if version >= fbx_exporter_serialize.chunked_format_version:
+        # manifest, the children live in their own chunk statements and are left unread
+        obj = fbx_exporter_serialize.decode(value, key, {}.get, lazy=True)
+        if apply_edits(obj, edits):
+            return fbx_exporter_serialize.encode_chunked(obj, key)[0]
+        return None
+
+    # older formats keep the children inline. they are written back as inline json, Maya migrates them on open
+    obj = fbx_exporter_serialize.decode(value, key)
+    changed = apply_edits(obj, edits)
+    for child in getattr(obj, fbx_exporter_serialize.get_children_field(type(obj)).name):
+        if apply_edits(child, edits):
+            changed = True
+
+    if changed:
+        return fbx_exporter_serialize.encode(obj)
+    return None
+
+
+def mel_string(value):
+    return '"{0}"'.format(value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n').replace('\t', '\\t'))
+
+
+def is_exporter_key(key):
+    return key.startswith(Identifiers.chunk_identifier) or key.startswith(Identifiers.fileInfo_prefixes)
+
+
+def edit_scene(path, edits, dry_run=False):
+    """
+    applies edits to the exporter data of a .ma file
+
+    :param path: path of a .ma file
+    :type path: str
+    :param edits: edits to apply
+    :type edits: [PathRemap() or SetOption()]
+    :param dry_run: only count the changes, the file is not written
+    :type dry_run: bool
+    :return: (path, number of fileInfo values changed, error). error is the message if the scene could not be edited
+    :rtype: tuple
+    """
+    changed = 0
+    temp_path = None
+    try:
+        with open(path, 'rb') as ma_file:
+            temp_file = None
+            if not dry_run:
+                temp_file = tempfile.NamedTemporaryFile(dir=os.path.dirname(os.path.abspath(path)), prefix='.',
+                                                        suffix='.ma.tmp', delete=False)
+                temp_path = temp_file.name
+
+            with temp_file or open(os.devnull, 'wb') as out_file:
+                for statements, raw, encoding in fbx_exporter_mafile.iter_header_groups(ma_file):
+                    if statements is None:
+                        out_file.writelines(raw)
+                        break
+
+                    new_line = None
+                    if len(statements) == 1:
+                        command, args = statements[0]
+                        if command == 'fileInfo' and len(args) == 2:
+                            key = fbx_exporter_serialize.unescape_fileInfo_value(args[0])
+                            if is_exporter_key(key):
+                                value = edit_value(key, fbx_exporter_serialize.unescape_fileInfo_value(args[1]), edits)
+                                if value is not None:
+                                    new_line = 'fileInfo {0} {1};'.format(mel_string(key), mel_string(value))
+                                    changed += 1
+
+                    if new_line is None:
+                        out_file.writelines(raw)
+                    else:
+                        # keep the line endings of the file
+                        ending = b'\r\n' if raw[-1].endswith(b'\r\n') else b'\n'
+                        out_file.write(new_line.encode(encoding) + ending)
+
+                if not dry_run and changed:
+                    shutil.copyfileobj(ma_file, out_file, 1024 * 1024)
+                    out_file.flush()
+                    os.fsync(out_file.fileno())
+
+        if temp_path is not None:
+            if changed:
+                shutil.copymode(path, temp_path)
+                os.replace(temp_path, path)
+            else:
+                os.remove(temp_path)
+            temp_path = None
+
+    except Exception as e:
+        if temp_path is not None and os.path.exists(temp_path):
+            os.remove(temp_path)
+        return path, 0, '{0}: {1}'.format(type(e).__name__, e)
+
+    return path, changed, None
+
+
+def find_scenes(paths):
+    """
+    expands folders to the .ma files under them
+    """
+    scenes = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs[:] = [d for d in dirs if not d.startswith('.')]
+                scenes.extend(os.path.join(root, name) for name in files if name.lower().endswith('.ma'))
+        else:
+            scenes.append(path)
+
+    return scenes
+
+
+def edit_scenes(paths, edits, workers=None, dry_run=False):
+    """
+    applies edits to many .ma files in a process pool
+
+    :param paths: .ma files or folders to search for them
+    :type paths: [str]
+    :param edits: edits to apply
+    :type edits: [PathRemap() or SetOption()]
+    :param workers: number of processes. None uses one per cpu, 1 edits the scenes in this process
+    :type workers: int
+    :param dry_run: only count the changes, no file is written
+    :type dry_run: bool
+    :return: [(path, number of fileInfo values changed, error)]
+    :rtype: list
+    """
+    scenes = find_scenes(paths)
+    if workers == 1 or len(scenes) < 2:
+        return [edit_scene(scene, edits, dry_run) for scene in scenes]
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(edit_scene, scenes, [edits] * len(scenes), [dry_run] * len(scenes)))
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='edit fbx exporter settings in .ma files without Maya')
+    parser.add_argument('paths', nargs='+', help='.ma files or folders')
+    parser.add_argument('--remap', nargs=2, action='append', default=[], metavar=('OLD', 'NEW'),
+                        help='replace the export folder OLD with NEW')
+    parser.add_argument('--set', action='append', default=[], metavar='FIELD=VALUE',
+                        help='set a field, e.g. fbx_export_triangulate=True')
+    parser.add_argument('--dry-run', action='store_true')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args(args)
+
+    edits = [PathRemap(old, new) for old, new in args.remap]
+    for option in args.set:
+        field_name, sep, value = option.partition('=')
+        if not sep:
+            parser.error('--set needs FIELD=VALUE, got {0}'.format(option))
+        edits.append(SetOption(field_name, value))
+
+    if not edits:
+        parser.error('nothing to do, add --remap or --set')
+
+    results = edit_scenes(args.paths, edits, args.workers, args.dry_run)
+    for path, changed, error in results:
+        if error:
+            print('could not edit {0} :: {1}'.format(path, error))
+        elif changed:
+            print('{0} :: {1} value(s) {2}'.format(path, changed, 'to change' if args.dry_run else 'changed'))
+
+    print('{0} of {1} scene(s) {2}'.format(len([r for r in results if r[1]]), len(results),
+                                           'to change' if args.dry_run else 'changed'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+"""
+reads exporter data straight from Maya ASCII (.ma) files. this module does not need Maya
+
+fileInfo statements are written in the header of a .ma file, after the file/requires/currentUnit statements and before
+the first createNode. the file is streamed line by line and reading stops at the first statement that can not be part
+of the header, so only the top of the file is read no matter how big the scene is.
+
+values are decoded with fbx_exporter_serialize into the same containers FBXExporterData builds in Maya.
+
+run from the command line to print the exporter data of one or more files:
+    python fbx_exporter_mafile.py scene.ma [scene.ma ...]
+"""
+
+import codecs
+import re
+import sys
+
+from scr.tools.fbxexporters import Identifiers
+from scr.tools.fbxexporters import fbx_exporter_serialize
+
+
+# statements that are written before fileInfo or between fileInfo statements
+header_commands = ('file', 'requires', 'currentUnit', 'fileInfo')
+
+# string literal, statement end, string concatenation or any other word. maya splits long strings over lines with +
+token_re = re.compile(r'"((?:[^"\\]|\\.)*)"|(;)|(\+)|([^\s";+]+)')
+
+codeset_str = '//Codeset:'
+
+
+def get_encoding(codeset):
+    """
+    :param codeset: value of the //Codeset: header line, UTF-8 or a windows code page number
+    :type codeset: str
+    :return: python codec name, utf-8 if the codeset is not known
+    :rtype: str
+    """
+    codeset = codeset.strip()
+    if codeset.isdigit():
+        codeset = 'cp' + codeset
+
+    try:
+        return codecs.lookup(codeset).name
+    except LookupError:
+        return 'utf-8'
+
+
+def iter_header_groups(lines):
+    """
+    reads the mel statements at the top of a .ma file a group of lines at a time. a group ends at the first line where
+    no statement is left open, maya writes one statement per group. used by fbx_exporter_ma_editor to rewrite single
+    statements and copy everything else as it is
+
+    :param lines: lines of the file as bytes
+    :type lines: iterable
+    :return: (statements, raw lines, encoding). statements is a list of (command, args), args are the words and string
+        literals after the command, string literals are left escaped and joined if they were split with +. the last
+        group has statements None and holds the lines that were read past the header
+    :rtype: generator
+    """
+    encoding = 'utf-8'
+    statements = []
+    raw = []
+    words = []
+    concat = False
+
+    for raw_line in lines:
+        raw.append(raw_line)
+        line = raw_line.decode(encoding, 'replace')
+        if not words and line.startswith('//'):
+            if line.startswith(codeset_str):
+                encoding = get_encoding(line[len(codeset_str):])
+            yield statements, raw, encoding
+            statements, raw = [], []
+            continue
+
+        for match in token_re.finditer(line):
+            string, end, plus, word = match.groups()
+            if end:
+                if words:
+                    if words[0] not in header_commands:
+                        yield None, raw, encoding
+                        return
+
+                    statements.append((words[0], words[1:]))
+
+                words = []
+            elif plus:
+                concat = True
+                continue
+            elif string is not None:
+                if concat and words:
+                    words[-1] += string
+                else:
+                    words.append(string)
+            else:
+                words.append(word)
+
+            concat = False
+
+        # a statement that is not part of the header can be left as soon as its command is read
+        if words and words[0] not in header_commands:
+            yield None, raw, encoding
+            return
+
+        if not words:
+            yield statements, raw, encoding
+            statements, raw = [], []
+
+    yield None, raw, encoding
+
+
+def iter_header_statements(lines):
+    """
+    yields the mel statements at the top of a .ma file until the first one that is not a header statement
+
+    :param lines: lines of the file as bytes
+    :type lines: iterable
+    :return: (command, args). args are the words and string literals after the command, string literals are left
+        escaped and joined if they were split with +
+    :rtype: generator
+    """
+    for statements, raw, encoding in iter_header_groups(lines):
+        if statements is None:
+            return
+
+        for statement in statements:
+            yield statement
+
+
+def iter_fileInfo(path, prefix=''):
+    """
+    reads the fileInfo values of a .ma file
+
+    :param path: path of a .ma file
+    :type path: str
+    :param prefix: only keys starting with prefix are returned
+    :type prefix: str
+    :return: (key, value) with the value unescaped the same way FBXExporterData.get_fileInfo_value does
+    :rtype: generator
+    """
+    with open(path, 'rb') as ma_file:
+        for command, args in iter_header_statements(ma_file):
+            if command == 'fileInfo' and len(args) == 2:
+                key = fbx_exporter_serialize.unescape_fileInfo_value(args[0])
+                if key.startswith(prefix):
+                    yield key, fbx_exporter_serialize.unescape_fileInfo_value(args[1])
+
+
+def read_fileInfo(path, prefix=Identifiers.exporter_identifier):
+    """
+    reads the exporter fileInfo values of a .ma file, layers and their chunks
+
+    :param path: path of a .ma file
+    :type path: str
+    :return: {key: value} in file order
+    :rtype: dict
+    """
+    return dict(iter_fileInfo(path, prefix))
+
+
+def decode_fileInfo(values):
+    """
+    decodes exporter fileInfo values into layer data
+
+    :param values: {key: value} as returned by read_fileInfo
+    :type values: dict
+    :return: {prefix: [layer data]} for each of Identifiers.fileInfo_prefixes, layers in file order
+    :rtype: dict
+    """
+    layers = dict((prefix, []) for prefix in Identifiers.fileInfo_prefixes)
+
+    for key, value in values.items():
+        for prefix in Identifiers.fileInfo_prefixes:
+            if key.startswith(prefix):
+                if value:
+                    layers[prefix].append(fbx_exporter_serialize.decode(value, key, values.get))
+                break
+
+    return layers
+
+
+def read_exporter_data(path):
+    """
+    reads the exporter data of a .ma file without Maya
+
+    :param path: path of a .ma file
+    :type path: str
+    :return: {prefix: [layer data]}. LayerData() under Identifiers.model_layer_identifier, RigLayerData() under
+        Identifiers.rig_layer_identifier and ActorLayerData() under Identifiers.actor_identifier
+    :rtype: dict
+    """
+    return decode_fileInfo(read_fileInfo(path))
+
+
+def print_exporter_data(path):
+    print(path)
+    for prefix, layers in read_exporter_data(path).items():
+        for layer in layers:
+            children = getattr(layer, fbx_exporter_serialize.get_children_field(type(layer)).name)
+            print('\t{0}{1} :: {2} item(s)'.format(prefix, layer.name, len(children)))
+            for child in children:
+                print('\t\t{0}'.format(getattr(child, child.key_field)))
+
+
+if __name__ == '__main__':
+    for arg in sys.argv[1:]:
+        print_exporter_data(arg)
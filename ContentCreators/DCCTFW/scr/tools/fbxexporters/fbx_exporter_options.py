@@ -0,0 +1,174 @@
+"""
+keeps track of the option state of the FBX plugin so an export only sends the options that differ from the last one.
+this module does not need Maya, FBXExport evaluates the mel it builds
+
+an option set is a dict of FBX option command: value, in the order the commands are sent
+
+    {'FBXExportInAscii': True, 'FBXExportSkins': True, 'FBXExportScaleFactor': 1}
+
+while the state is unknown (first export of a batch, after an error) FBXResetExport is sent followed by every option.
+after that only changed options are sent. an option set that leaves out an option the last one sent needs a reset too,
+the option has to go back to the FBX default like it would after FBXResetExport
+"""
+
+reset_command = 'FBXResetExport'
+
+# options that take their value as an argument instead of -v
+positional_commands = ('FBXExportScaleFactor',)
+
+
+def get_mel_value(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, str):
+        return '"{0}"'.format(value.replace('\\', '\\\\').replace('"', '\\"'))
+
+    return str(value)
+
+
+def get_mel_command(command, value):
+    """
+    :return: mel statement that sets one FBX option, e.g. FBXExportInAscii -v true;
+    :rtype: str
+    """
+    if command in positional_commands:
+        return '{0} {1};'.format(command, get_mel_value(value))
+
+    return '{0} -v {1};'.format(command, get_mel_value(value))
+
+
+"""
+\/\/\/\/\/\/\/\/    option sets    \/\/\/\/\/\/\/\/
+"""
+
+
+def get_global_options(global_export_options):
+    """
+    the default export options that will remain consistent across all exports
+
+    :param global_export_options: global options
+    :type global_export_options: GlobalExportOptions()
+    :return: {FBX option command: value}
+    :rtype: dict
+    """
+    options = {}
+    # Global
+    options['FBXExportScaleFactor'] = global_export_options.fbx_export_scale_factor
+
+    """
+    HACK
+    removing FBXExportConvertUnitString as it is causing issues with scale in unity where the rig is brought in at .01
+    scale fro x,y,z . Removing it fixes the rig export to unity i need to test how it impacts other exports as well as
+    rig exports to unreal
+    """
+    options['FBXExportConvertUnitString'] = global_export_options.fbx_export_convert_unit_string
+    """
+    above...remove for rig
+    """
+
+    options['FBXExportInputConnections'] = global_export_options.fbx_export_input_connections
+    options['FBXExportInAscii'] = global_export_options.fbx_export_in_ascii
+    options['FBXExportEmbeddedTextures'] = global_export_options.fbx_export_embedded_textures
+
+    return options
+
+
+def get_animation_options():
+    """
+    fbx options for animation export
+
+    :return: {FBX option command: value}
+    :rtype: dict
+    """
+    # this is from the original exporter. i am not sure how to include it if it is needed
+    # pm.Mel.eval("FBXProperty Export|IncludeGrp|Animation -v true;")
+
+    return {'FBXExportBakeComplexAnimation': True,
+            'FBXExportReferencedAssetsContent': True}
+
+
+def get_rig_options(global_export_options):
+    """
+    fbx options for rig export
+
+    :param global_export_options: global options
+    :type global_export_options: GlobalExportOptions()
+    :return: {FBX option command: value}
+    :rtype: dict
+    """
+    # copying from get_global_options until i figure out the FBXExportConvertUnitString and how it relates to the
+    # scale of .01 being imported on the rig
+    return {'FBXExportInputConnections': global_export_options.fbx_export_input_connections,
+            'FBXExportInAscii': global_export_options.fbx_export_in_ascii,
+            'FBXExportEmbeddedTextures': global_export_options.fbx_export_embedded_textures,
+            'FBXExportSkins': True,
+            'FBXExportAnimationOnly': False}
+
+
+def get_model_options(options):
+    """
+    fbx options for model export
+
+    :param options: class with export options
+    :type options: either ModelData() or LayerData()
+    :return: {FBX option command: value}
+    :rtype: dict
+    """
+    return {'FBXExportSmoothingGroups': options.fbx_export_smoothing_groups,
+            'FBXExportHardEdges': options.fbx_export_hard_edges,
+            'FBXExportTangents': options.fbx_export_tangents,
+            'FBXExportSmoothMesh': options.fbx_export_smooth_mesh,
+            'FBXExportAnimationOnly': options.fbx_export_animation_only,
+            'FBXExportInstances': options.fbx_export_instances,
+            'FBXExportTriangulate': options.fbx_export_triangulate}
+
+
+"""
+\/\/\/\/\/\/\/\/    option state    \/\/\/\/\/\/\/\/
+"""
+
+
+class FBXOptionState(object):
+    """
+    the FBX options that were last sent to the plugin
+    """
+    def __init__(self):
+        # {command: value} or None when the plugin state is unknown
+        self.known = None
+
+    def invalidate(self):
+        """
+        forgets the plugin state, the next option set starts with a reset
+        """
+        self.known = None
+
+    def get_changes(self, options):
+        """
+        :param options: option set for the next export {command: value}
+        :type options: dict
+        :return: (reset needed, [(command, value)] to send)
+        :rtype: bool, list
+        """
+        if self.known is None or any(command not in options for command in self.known):
+            return True, list(options.items())
+
+        return False, [(command, value) for command, value in options.items()
+                       if command not in self.known or self.known[command] != value]
+
+    def get_script(self, options):
+        """
+        builds the mel that takes the plugin from its current state to an option set and records the new state. the
+        caller must evaluate it or call invalidate if it could not
+
+        :param options: option set for the next export {command: value}
+        :type options: dict
+        :return: mel statements in one string, empty if the plugin already has these options
+        :rtype: str
+        """
+        reset, changes = self.get_changes(options)
+
+        statements = [reset_command + ';'] if reset else []
+        statements.extend(get_mel_command(command, value) for command, value in changes)
+
+        self.known = dict(options)
+        return ' '.join(statements)
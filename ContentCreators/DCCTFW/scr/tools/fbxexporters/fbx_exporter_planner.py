@@ -0,0 +1,363 @@
+"""
+plans exports. a request like "export these layers/rigs/actors" is turned into a list of ExportJob, each with its fbx
+path and FBX option set resolved once up front. jobs are grouped by staging (what has to be done to the scene before
+the export) and by option profile so jobs that share options run one after the other and FBXExport only sends the
+options that change (see fbx_exporter_options). this module does not need Maya, the UI runs the plan
+
+jobs that would write the same fbx to different paths (the same export items in two model layers) are exported once.
+the other jobs get the fbx of that job (job.source) copied or hard linked once it is exported, see fan_out_duplicates
+
+    plan = plan_exports({Identifiers.model_layer_identifier: [layer]}, project_path, GlobalExportOptions())
+    results, cancelled = run_plan(plan, run_job, progress)
+"""
+
+import collections
+import os
+import time
+
+from scr.tools.fbxexporters import Identifiers
+from scr.tools.fbxexporters import fbx_exporter_fbxhash
+from scr.tools.fbxexporters import fbx_exporter_options
+from scr.tools.fbxexporters import fbx_exporter_project_index
+from scr.tools.fbxexporters import fbx_exporter_telemetry
+
+
+# kinds of jobs, the same names the project index uses for its outputs
+model_kind = fbx_exporter_project_index.model_kind
+rig_kind = fbx_exporter_project_index.rig_kind
+animation_kind = fbx_exporter_project_index.animation_kind
+
+# staging, what has to happen to the scene before the export. jobs run in this order, rigs last as their staging deletes
+# most of the scene before it is rolled back
+stage_none = ''
+stage_zero = 'zero'
+stage_animation = 'animation'
+stage_rig = 'rig'
+staging_order = (stage_none, stage_zero, stage_animation, stage_rig)
+
+ExportResult = collections.namedtuple('ExportResult', 'job success error')
+
+
+class ExportJob(object):
+    """
+    one fbx to export
+    """
+    def __init__(self, kind, layer_key, layer, data, path, options, staging=stage_none, option_data=None):
+        self.kind = kind
+        # fileInfo key and data of the layer/rig/actor the job comes from
+        self.layer_key = layer_key
+        self.layer = layer
+        # model or animation
+        self.data = data
+        # fbx file to write
+        self.path = path
+        # {FBX option command: value}
+        self.options = options
+        self.staging = staging
+        # container the fbx_export_* options were taken from (model or layer), models only
+        self.option_data = option_data
+        # why the job can not run, None if it can
+        self.error = None
+        # fingerprint of the job inputs and whether the export was skipped because it matched, see
+        # fbx_exporter_fingerprint
+        self.fingerprint = None
+        self.skipped = False
+        # the export had the same content as the published fbx, which was kept (see fbx_exporter_fbxhash)
+        self.kept = False
+        # job with the same inputs whose fbx is copied to this job's path instead of exporting it again
+        self.source = None
+        # stage timings of the export, see fbx_exporter_telemetry
+        self.telemetry = None
+        # mismatches between the exported fbx and the scene, None if it was not validated (fbx_exporter_validate)
+        self.issues = None
+
+    @property
+    def name(self):
+        return getattr(self.data, self.data.key_field)
+
+    @property
+    def profile(self):
+        """
+        hashable option set, jobs with the same profile export with the same FBX options
+        """
+        return tuple(sorted(self.options.items()))
+
+    def __repr__(self):
+        return 'ExportJob({0}, {1}, {2})'.format(self.kind, self.name, self.path)
+
+
+class ExportPlan(object):
+    """
+    jobs of an export request in the order they run
+    """
+    def __init__(self, jobs=()):
+        self.jobs = list(jobs)
+        # seconds it took to resolve the jobs
+        self.plan_time = 0.0
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def find_duplicates(self):
+        """
+        points every job that has the same inputs as an earlier job to that job (job.source)
+        """
+        sources = {}
+        for job in self.jobs:
+            job.source = None
+            if job.error is not None:
+                continue
+
+            key = get_input_key(job)
+            if key is not None:
+                source = sources.setdefault(key, job)
+                if source is not job:
+                    job.source = source
+
+    def get_duplicates(self):
+        """
+        :return: jobs that get the fbx of another job
+        :rtype: [ExportJob()]
+        """
+        return [job for job in self.jobs if job.error is None and job.source is not None]
+
+    def get_groups(self):
+        """
+        groups the jobs that export by staging and option profile. the order of jobs within a group and of the
+        groups for a staging is the order they were planned in. jobs that can not run and duplicates are left out
+
+        :return: [(staging, profile, [ExportJob()])]
+        :rtype: list
+        """
+        groups = collections.OrderedDict()
+        for job in self.jobs:
+            if job.error is None and job.source is None:
+                groups.setdefault((job.staging, job.profile), []).append(job)
+
+        return sorted(((staging, profile, jobs) for (staging, profile), jobs in groups.items()),
+                      key=lambda group: staging_order.index(group[0]))
+
+    def get_errors(self):
+        """
+        :return: jobs that can not run
+        :rtype: [ExportJob()]
+        """
+        return [job for job in self.jobs if job.error is not None]
+
+
+def get_input_key(job):
+    """
+    everything that goes into the fbx of a job apart from its path, jobs with the same key write the same fbx. a model
+    and a rig model of the same mesh never match, the rig is staged and exported with skins
+
+    :return: hashable key or None if the job has nothing to export
+    :rtype: tuple
+    """
+    if job.kind == animation_kind:
+        animation = job.data
+        return (job.kind, job.layer.root, animation.start_frame, animation.end_frame, animation.muted_layers,
+                job.staging, job.profile)
+
+    if not job.data.export_items:
+        # fails on its own, with its own message
+        return None
+
+    items = tuple(job.data.export_items)
+    if job.kind == rig_kind:
+        return job.kind, items, job.layer.root, job.staging, job.profile
+
+    return job.kind, items, job.staging, job.profile
+
+
+def get_export_file(project_path, folder, name, check_folders):
+    """
+    :return: (fbx path, error)
+    :rtype: tuple
+    """
+    path = fbx_exporter_project_index.get_export_file(project_path, folder, name)
+    if path is None:
+        return None, 'no export path set'
+    if check_folders and not os.path.isdir(os.path.dirname(path)):
+        return path, 'export folder not found {0}'.format(os.path.dirname(path))
+
+    return path, None
+
+
+def get_option_data(layer, model):
+    """
+    :return: the container a model takes its fbx_export_* options from
+    :rtype: ModelData() or LayerData()
+    """
+    return model if model.fbx_export_override_layer_options else layer
+
+
+def plan_models(key, layer, project_path, global_export_options, check_folders=True):
+    jobs = []
+    for model in layer.models:
+        folder = model.path if model.fbx_export_override_layer_path else layer.path
+        option_data = get_option_data(layer, model)
+
+        options = fbx_exporter_options.get_global_options(global_export_options)
+        options.update(fbx_exporter_options.get_model_options(option_data))
+        staging = stage_zero if model.fbx_export_zero or option_data.fbx_export_zero else stage_none
+
+        path, error = get_export_file(project_path, folder, model.name, check_folders)
+        job = ExportJob(model_kind, key, layer, model, path, options, staging, option_data)
+        job.error = error
+        jobs.append(job)
+
+    return jobs
+
+
+def plan_rig(key, rig, project_path, global_export_options, check_folders=True):
+    jobs = []
+    for model in rig.models:
+        path, error = get_export_file(project_path, rig.rig_path, model.name, check_folders)
+        job = ExportJob(rig_kind, key, rig, model, path, fbx_exporter_options.get_rig_options(global_export_options),
+                        stage_rig)
+        job.error = error
+        jobs.append(job)
+
+    return jobs
+
+
+def plan_actor(key, actor, project_path, global_export_options, check_folders=True):
+    jobs = []
+    for anim in actor.animations:
+        folder = anim.override_path if anim.override_path is not None else anim.path
+        options = fbx_exporter_options.get_global_options(global_export_options)
+        options.update(fbx_exporter_options.get_animation_options())
+
+        path, error = get_export_file(project_path, folder, anim.anim_name, check_folders)
+        job = ExportJob(animation_kind, key, actor, anim, path, options, stage_animation)
+        job.error = error
+        jobs.append(job)
+
+    return jobs
+
+
+planners = {Identifiers.model_layer_identifier: plan_models,
+            Identifiers.rig_layer_identifier: plan_rig,
+            Identifiers.actor_identifier: plan_actor}
+
+
+def plan_exports(layers, project_path, global_export_options, check_folders=True):
+    """
+    plans the export of every model, rig model and animation of some layers
+
+    :param layers: {prefix: [layer data]}, prefixes from Identifiers.fileInfo_prefixes
+    :type layers: dict
+    :param project_path: project root relative export paths are resolved against
+    :type project_path: str
+    :param global_export_options: global options
+    :type global_export_options: GlobalExportOptions()
+    :param check_folders: jobs whose export folder does not exist get an error
+    :type check_folders: bool
+    :return: plan
+    :rtype: ExportPlan()
+    """
+    start = time.perf_counter()
+    jobs = []
+    for prefix in Identifiers.fileInfo_prefixes:
+        for layer in layers.get(prefix, ()):
+            jobs.extend(planners[prefix](prefix + layer.name, layer, project_path, global_export_options,
+                                         check_folders))
+
+    plan = ExportPlan(jobs)
+    plan.find_duplicates()
+    plan.plan_time = time.perf_counter() - start
+    return plan
+
+
+def fan_out_duplicates(plan, results, cancelled=False, link=False):
+    """
+    gives the duplicates of a plan the fbx of their source job. the copy only replaces a published fbx when it differs
+    (see fbx_exporter_fbxhash.publish)
+
+    :param plan: plan that ran
+    :type plan: ExportPlan()
+    :param results: results of the jobs that exported
+    :type results: [ExportResult()]
+    :param cancelled: the plan was cancelled, duplicates of jobs that did not run are left out
+    :type cancelled: bool
+    :param link: hard link the fbx instead of copying it. only for outputs that are not under version control, a
+        checkout or sync of one link changes all of them
+    :type link: bool
+    :return: results of the duplicates
+    :rtype: [ExportResult()]
+    """
+    exported = set(id(result.job) for result in results if result.success)
+    ran = set(id(result.job) for result in results)
+
+    duplicate_results = []
+    for job in plan.get_duplicates():
+        if id(job.source) not in exported:
+            if id(job.source) in ran or not cancelled:
+                duplicate_results.append(ExportResult(job, False, 'export of {0} failed'.format(job.source.path)))
+            continue
+
+        Recorder = fbx_exporter_telemetry.Recorder
+        try:
+            with Recorder.job(job.kind, job.name, job.path) as record:
+                job.telemetry = record
+                with Recorder.stage(fbx_exporter_telemetry.publish_stage):
+                    job.kept = fbx_exporter_fbxhash.publish_copy(job.source.path, job.path, link)
+                Recorder.count(path=job.path)
+        except (IOError, OSError) as e:
+            duplicate_results.append(ExportResult(job, False, '{0}: {1}'.format(type(e).__name__, e)))
+            continue
+
+        job.fingerprint = job.source.fingerprint
+        duplicate_results.append(ExportResult(job, True, None))
+
+    return duplicate_results
+
+
+def run_plan(plan, run_job, progress=None, link=False, finish=None):
+    """
+    runs the jobs of a plan group by group. a job that raises is recorded as failed and the plan carries on. duplicates
+    get the fbx of their source job at the end
+
+    :param plan: plan
+    :type plan: ExportPlan()
+    :param run_job: function(job) that exports one job and returns success
+    :type run_job: function
+    :param progress: function(done, total, job) called before each job, returning False cancels the rest of the plan
+    :type progress: function
+    :param link: hard link duplicates instead of copying them, see fan_out_duplicates
+    :type link: bool
+    :param finish: function(results) called once the jobs ran and before the duplicates get their fbx, returns the
+        results. waits for work the jobs left running (publishes) and fails the jobs it failed for
+    :type finish: function
+    :return: ([ExportResult()], cancelled). jobs that could not run are in the results as failed
+    :rtype: tuple
+    """
+    results = [ExportResult(job, False, job.error) for job in plan.get_errors()]
+    total = len(plan) - len(results) - len(plan.get_duplicates())
+    done = 0
+    cancelled = False
+
+    for staging, profile, jobs in plan.get_groups():
+        for job in jobs:
+            if progress is not None and progress(done, total, job) is False:
+                cancelled = True
+                break
+
+            try:
+                success = bool(run_job(job))
+                error = None if success else 'export failed'
+            except Exception as e:
+                success = False
+                error = '{0}: {1}'.format(type(e).__name__, e)
+
+            results.append(ExportResult(job, success, error))
+            done += 1
+
+        if cancelled:
+            break
+
+    if finish is not None:
+        results = finish(results)
+
+    results.extend(fan_out_duplicates(plan, results, cancelled, link))
+    return results, cancelled
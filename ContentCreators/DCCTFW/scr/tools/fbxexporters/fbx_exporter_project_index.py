@@ -0,0 +1,379 @@
+"""
+project wide index of what every scene exports. this module does not need Maya
+
+the project tree is walked for .ma files, each new or changed scene is read with fbx_exporter_mafile in a process pool
+and the fbx files it exports (models, rigs, animations) are stored in a local SQLite database together with the layer
+they come from, the root joint and the uuid. a scene is only read again when its mtime or size changed.
+
+    index = ProjectIndex(db_path)
+    index.update(project_path)
+    index.find_by_output_path('Assets/Props/crate.fbx')
+
+from the command line:
+    python fbx_exporter_project_index.py scan [--project path] [--db path] [--workers n]
+    python fbx_exporter_project_index.py query (--path p | --folder p | --layer n | --root n | --uuid u) [--db path]
+
+multiprocessing needs a plain python interpreter, run scans from the command line or mayapy instead of the Maya ui.
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import ntpath
+import os
+import posixpath
+import sqlite3
+import tempfile
+import time
+
+from scr.tools.fbxexporters import Identifiers
+from scr.tools.fbxexporters import fbx_exporter_mafile
+
+
+default_db_path = os.path.join(tempfile.gettempdir(), 'fbx_export_index.sqlite')
+scene_extensions = ('.ma',)
+
+# kinds of outputs
+model_kind = 'model'
+rig_kind = 'rig'
+rig_animations_kind = 'rig_animations'
+animation_kind = 'animation'
+
+# one fbx (or for rig_animations the animation folder of a rig) exported by a scene
+ExportOutput = collections.namedtuple('ExportOutput', 'scene kind layer item path root uuid')
+
+schema = """
+CREATE TABLE IF NOT EXISTS scenes (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS outputs (
+    scene_id INTEGER NOT NULL REFERENCES scenes(id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    layer TEXT,
+    item TEXT,
+    path TEXT,
+    path_key TEXT,
+    folder_key TEXT,
+    root TEXT,
+    uuid TEXT
+);
+CREATE INDEX IF NOT EXISTS outputs_scene ON outputs(scene_id);
+CREATE INDEX IF NOT EXISTS outputs_path ON outputs(path_key);
+CREATE INDEX IF NOT EXISTS outputs_folder ON outputs(folder_key);
+CREATE INDEX IF NOT EXISTS outputs_layer ON outputs(layer);
+CREATE INDEX IF NOT EXISTS outputs_root ON outputs(root);
+CREATE INDEX IF NOT EXISTS outputs_uuid ON outputs(uuid);
+"""
+
+
+def is_absolute(path):
+    """
+    paths in the data are written on windows, check for both windows and posix absolute paths
+    """
+    return ntpath.isabs(path) or posixpath.isabs(path)
+
+
+def resolve_path(project_path, path):
+    """
+    resolves an export path from the data the same way the exporter does, relative paths are under the project
+
+    :param project_path: project root
+    :type project_path: str
+    :param path: path from layer data
+    :type path: str
+    :return: normalized path with / separators or None if there is no path
+    :rtype: str
+    """
+    if not path:
+        return None
+
+    path = path.replace('\\', '/')
+    if project_path and not is_absolute(path):
+        path = project_path.replace('\\', '/').rstrip('/') + '/' + path
+
+    return posixpath.normpath(path)
+
+
+def get_path_key(path):
+    """
+    key used to look up paths. paths are compared without case, the project lives on windows
+    """
+    if path is None:
+        return None
+
+    return path.replace('\\', '/').rstrip('/').lower()
+
+
+def get_folder_key(kind, path):
+    """
+    key of the folder an output is written to. rig_animations outputs are the folder itself
+    """
+    if path is None:
+        return None
+
+    if kind == rig_animations_kind:
+        return get_path_key(path)
+
+    return get_path_key(posixpath.dirname(path))
+
+
+def get_export_file(project_path, folder, name):
+    folder = resolve_path(project_path, folder)
+    if folder is None or not name:
+        return None
+
+    return folder + '/' + name.split('|')[-1] + '.fbx'
+
+
+def get_export_outputs(layers, project_path):
+    """
+    lists the fbx files a scene exports
+
+    :param layers: {prefix: [layer data]} as returned by fbx_exporter_mafile.read_exporter_data
+    :type layers: dict
+    :param project_path: project root relative export paths are resolved against
+    :type project_path: str
+    :return: [(kind, layer, item, path, root, uuid)]
+    :rtype: list
+    """
+    outputs = []
+
+    for layer in layers.get(Identifiers.model_layer_identifier, ()):
+        for model in layer.models:
+            folder = model.path if model.fbx_export_override_layer_path else layer.path
+            outputs.append((model_kind, layer.name, model.name, get_export_file(project_path, folder, model.name),
+                            None, model.uuid))
+
+    for rig in layers.get(Identifiers.rig_layer_identifier, ()):
+        outputs.append((rig_animations_kind, rig.name, None, resolve_path(project_path, rig.animation_path), rig.root,
+                        rig.uuid))
+        for model in rig.models:
+            outputs.append((rig_kind, rig.name, model.name, get_export_file(project_path, rig.rig_path, model.name),
+                            rig.root, model.uuid))
+
+    for char in layers.get(Identifiers.actor_identifier, ()):
+        for anim in char.animations:
+            folder = anim.override_path if anim.override_path is not None else anim.path
+            outputs.append((animation_kind, char.name, anim.anim_name,
+                            get_export_file(project_path, folder, anim.anim_name), char.root, None))
+
+    return outputs
+
+
+def scan_scene(path, project_path):
+    """
+    reads the export outputs of one scene. runs in the worker processes so it only returns plain data
+
+    :return: (path, outputs, error). error is the message if the scene could not be read
+    :rtype: tuple
+    """
+    try:
+        return path, get_export_outputs(fbx_exporter_mafile.read_exporter_data(path), project_path), None
+    except Exception as e:
+        return path, [], '{0}: {1}'.format(type(e).__name__, e)
+
+
+def find_scenes(project_path):
+    """
+    walks the project for scenes
+
+    :return: {path: (mtime, size)}
+    :rtype: dict
+    """
+    scenes = {}
+    for root, dirs, files in os.walk(project_path):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        for name in files:
+            if name.lower().endswith(scene_extensions):
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                scenes[path] = (stat.st_mtime, stat.st_size)
+
+    return scenes
+
+
+class ProjectIndex(object):
+
+    def __init__(self, db_path=default_db_path):
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        self.connection.executescript(schema)
+
+    def close(self):
+        self.connection.close()
+
+    def get_indexed_scenes(self, project_path):
+        """
+        :return: {path: (id, mtime, size)} of the indexed scenes under project_path
+        :rtype: dict
+        """
+        prefix = os.path.join(os.path.abspath(project_path), '')
+        rows = self.connection.execute('SELECT id, path, mtime, size FROM scenes WHERE substr(path, 1, ?) = ?',
+                                       (len(prefix), prefix))
+        return dict((path, (scene_id, mtime, size)) for scene_id, path, mtime, size in rows)
+
+    def update(self, project_path, workers=None, progress=None):
+        """
+        brings the index up to date with the scenes under project_path. only new and changed scenes are read, scenes
+        that are gone are dropped
+
+        :param project_path: project root
+        :type project_path: str
+        :param workers: number of processes. None uses one per cpu, 1 reads the scenes in this process
+        :type workers: int
+        :param progress: called with (done, total) after each scene is read
+        :type progress: function
+        :return: (read, removed, unchanged) scene counts
+        :rtype: tuple
+        """
+        project_path = os.path.abspath(project_path)
+        scenes = find_scenes(project_path)
+        indexed = self.get_indexed_scenes(project_path)
+
+        removed = [indexed[path][0] for path in indexed if path not in scenes]
+        changed = [path for path, stat in scenes.items() if path not in indexed or indexed[path][1:] != stat]
+
+        with self.connection:
+            self.connection.executemany('DELETE FROM scenes WHERE id = ?', [(scene_id,) for scene_id in removed])
+
+        if workers == 1 or len(changed) < 2:
+            results = (scan_scene(path, project_path) for path in changed)
+            self.store_results(results, scenes, len(changed), progress)
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(scan_scene, path, project_path) for path in changed]
+                results = (future.result() for future in concurrent.futures.as_completed(futures))
+                self.store_results(results, scenes, len(changed), progress)
+
+        return len(changed), len(removed), len(scenes) - len(changed)
+
+    def store_results(self, results, scenes, total, progress=None, batch_size=200):
+        """
+        writes scan results to the database, committing every batch_size scenes so an interrupted scan keeps what
+        it has read
+        """
+        cursor = self.connection.cursor()
+        done = 0
+        for path, outputs, error in results:
+            mtime, size = scenes[path]
+            cursor.execute('DELETE FROM scenes WHERE path = ?', (path,))
+            cursor.execute('INSERT INTO scenes (path, mtime, size, error) VALUES (?, ?, ?, ?)',
+                           (path, mtime, size, error))
+            scene_id = cursor.lastrowid
+            cursor.executemany(
+                'INSERT INTO outputs (scene_id, kind, layer, item, path, path_key, folder_key, root, uuid) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [(scene_id, kind, layer, item, output_path, get_path_key(output_path),
+                  get_folder_key(kind, output_path), root, uuid)
+                 for kind, layer, item, output_path, root, uuid in outputs])
+
+            done += 1
+            if done % batch_size == 0:
+                self.connection.commit()
+            if progress is not None:
+                progress(done, total)
+
+        self.connection.commit()
+
+    def query(self, where, args):
+        rows = self.connection.execute(
+            'SELECT scenes.path, kind, layer, item, outputs.path, root, uuid FROM outputs '
+            'JOIN scenes ON scenes.id = outputs.scene_id WHERE ' + where + ' ORDER BY scenes.path', args)
+        return [ExportOutput(*row) for row in rows]
+
+    def find_by_output_path(self, path, project_path=None):
+        """
+        gets the scenes that export an fbx. relative paths are resolved against project_path
+
+        :rtype: [ExportOutput()]
+        """
+        return self.query('path_key = ?', (get_path_key(resolve_path(project_path, path)),))
+
+    def find_by_output_folder(self, folder, project_path=None):
+        """
+        gets everything exported into a folder, including the rigs whose animation folder it is
+
+        :rtype: [ExportOutput()]
+        """
+        return self.query('folder_key = ?', (get_path_key(resolve_path(project_path, folder)),))
+
+    def find_by_layer(self, name):
+        """
+        :rtype: [ExportOutput()]
+        """
+        return self.query('layer = ?', (name,))
+
+    def find_by_root(self, root):
+        """
+        :rtype: [ExportOutput()]
+        """
+        return self.query('root = ?', (root,))
+
+    def find_by_uuid(self, uuid):
+        """
+        :rtype: [ExportOutput()]
+        """
+        return self.query('uuid = ?', (uuid,))
+
+    def get_errors(self):
+        """
+        :return: [(scene path, error)] for scenes that could not be read
+        :rtype: list
+        """
+        return list(self.connection.execute('SELECT path, error FROM scenes WHERE error IS NOT NULL ORDER BY path'))
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='index of the fbx files exported by the scenes of a project')
+    parser.add_argument('--db', default=default_db_path)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    scan = commands.add_parser('scan')
+    scan.add_argument('--project', default=os.environ.get('GameProjectPath'))
+    scan.add_argument('--workers', type=int, default=None)
+
+    query = commands.add_parser('query')
+    query.add_argument('--project', default=os.environ.get('GameProjectPath'))
+    for name in ('path', 'folder', 'layer', 'root', 'uuid'):
+        query.add_argument('--' + name)
+
+    args = parser.parse_args(args)
+    index = ProjectIndex(args.db)
+
+    if args.command == 'scan':
+        start = time.time()
+        read, removed, unchanged = index.update(args.project, args.workers)
+        print('{0} read, {1} removed, {2} unchanged in {3:.2f}s'.format(read, removed, unchanged, time.time() - start))
+        for path, error in index.get_errors():
+            print('could not read {0} :: {1}'.format(path, error))
+    else:
+        if args.path:
+            results = index.find_by_output_path(args.path, args.project)
+        elif args.folder:
+            results = index.find_by_output_folder(args.folder, args.project)
+        elif args.layer:
+            results = index.find_by_layer(args.layer)
+        elif args.root:
+            results = index.find_by_root(args.root)
+        elif args.uuid:
+            results = index.find_by_uuid(args.uuid)
+        else:
+            parser.error('query needs one of --path, --folder, --layer, --root or --uuid')
+
+        for result in results:
+            print('{0} :: {1} {2} {3} -> {4}'.format(result.scene, result.kind, result.layer, result.item or '',
+                                                    result.path))
+
+    index.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+publishes exported fbx files to the project on background I/O threads. FBXExport writes to local temp storage, Maya
+goes on with the next export (or back to the artist) while the fbx is compared with the published file and moved into
+place (fbx_exporter_fbxhash.publish_local)
+
+    future = Publisher.submit(local_path, export_path)
+    ...
+    Publisher.wait()
+    kept = future.result()
+
+the project is usually a network backed workspace, a few publishes at a time keep it busy without flooding it. an
+output is exported again only once its last publish is done (wait_for), its local file is reused. this module does not
+need Maya
+"""
+
+import concurrent.futures
+import logging
+import os
+import threading
+import time
+
+import scr
+from scr.tools.fbxexporters import fbx_exporter_fbxhash
+from scr.tools.fbxexporters import fbx_exporter_telemetry
+
+
+# publishes that run at the same time
+publish_workers = 2
+
+
+class PublishQueue(object):
+    """
+    bounded pool of publish threads
+    """
+    def __init__(self, workers=publish_workers):
+        self.logger = logging.getLogger(scr.logger_name)
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.executor = None
+        # {output key: Future()} of the last publish of each output
+        self.pending = {}
+
+    @staticmethod
+    def get_output_key(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def submit(self, local_path, export_path, record=None):
+        """
+        queues a publish
+
+        :param local_path: new export on local storage, see fbx_exporter_fbxhash.get_local_staging_path
+        :type local_path: str
+        :param export_path: published fbx
+        :type export_path: str
+        :param record: telemetry of the job the fbx was exported for, the publish time is added to it
+        :type record: fbx_exporter_telemetry.JobRecord()
+        :return: future, its result is True if the published fbx was kept because it has the same content
+        :rtype: concurrent.futures.Future()
+        """
+        with self.lock:
+            if self.executor is None:
+                self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers,
+                                                                      thread_name_prefix='fbx_exporter_publish')
+            future = self.executor.submit(self.publish, local_path, export_path, record)
+            self.pending[self.get_output_key(export_path)] = future
+
+        return future
+
+    def publish(self, local_path, export_path, record=None):
+        start = time.perf_counter()
+        try:
+            kept = fbx_exporter_fbxhash.publish_local(local_path, export_path)
+        except Exception as e:
+            self.logger.error('Could not publish {0} :: {1}: {2}'.format(export_path, type(e).__name__, e))
+            raise
+        finally:
+            if record is not None:
+                record.add(fbx_exporter_telemetry.publish_stage, time.perf_counter() - start)
+
+        if kept:
+            self.logger.info('{0} is unchanged, the published file was kept'.format(export_path))
+        return kept
+
+    def get(self, export_path):
+        """
+        :return: future of the last publish of an output, None if it was never published
+        :rtype: concurrent.futures.Future()
+        """
+        with self.lock:
+            return self.pending.get(self.get_output_key(export_path))
+
+    def wait_for(self, export_path):
+        """
+        blocks until the last publish of an output is done
+        """
+        future = self.get(export_path)
+        if future is not None:
+            concurrent.futures.wait([future])
+
+    def wait(self):
+        """
+        blocks until every queued publish is done. the local staging folders are removed once nothing is left to
+        publish, publishes only remove their own files
+
+        :return: {output key: Future()} of the publishes that were waited for
+        :rtype: dict
+        """
+        with self.lock:
+            pending = dict(self.pending)
+            self.pending.clear()
+
+        concurrent.futures.wait(list(pending.values()))
+
+        with self.lock:
+            if not self.pending:
+                fbx_exporter_fbxhash.remove_local_staging_folders()
+
+        return pending
+
+
+Publisher = PublishQueue()
@@ -0,0 +1,330 @@
+"""
+batched scene queries for the exporter. the export items of a layer are added to one API selection list instead of a
+pm.objExists or cmds.ls call (and a selection list) per item, the found ones are read back from that list.
+
+the uuid stored on ModelData and RigModelData is the uuid of its first export item (see add_multiple_models and
+add_rig_model), resolve_export_items uses it to find that item again after it was renamed in the scene.
+
+the hash_* functions feed scene content into a hashlib object for the export fingerprints (fbx_exporter_fingerprint).
+they use the python API 2.0, which hands back whole point and weight arrays instead of one value per call.
+"""
+
+import array
+
+import maya.OpenMaya as OpenMaya
+import maya.api.OpenMaya as om2
+import maya.api.OpenMayaAnim as om2Anim
+import maya.cmds as cmds
+
+from scr.tools.fbxexporters import Debug
+
+
+class SceneResolver(object):
+
+    @staticmethod
+    def get_selection(name):
+        """
+        gets the nodes matching a name or uuid
+
+        :param name: node name, partial dag path or OpenMaya.MUuid()
+        :type name: str or OpenMaya.MUuid()
+        :return: selection list or None if nothing matched
+        :rtype: OpenMaya.MSelectionList()
+        """
+        selection = OpenMaya.MSelectionList()
+        try:
+            selection.add(name)
+        except RuntimeError:
+            return None
+
+        if selection.length():
+            return selection
+
+        return None
+
+    @staticmethod
+    def get_node_name(selection, index=0):
+        """
+        gets the shortest unique name of a node in a selection list, the dag path for dag nodes
+
+        :param selection: selection list
+        :type selection: OpenMaya.MSelectionList()
+        :param index: index of the node in the list
+        :type index: int
+        :rtype: str
+        """
+        node = OpenMaya.MObject()
+        selection.getDependNode(index, node)
+        if node.hasFn(OpenMaya.MFn.kDagNode):
+            dag_path = OpenMaya.MDagPath()
+            selection.getDagPath(index, dag_path)
+            return dag_path.partialPathName()
+
+        return OpenMaya.MFnDependencyNode(node).name()
+
+    @staticmethod
+    def get_node_uuid(selection, index=0):
+        """
+        gets the uuid of a node in a selection list
+
+        :param selection: selection list
+        :type selection: OpenMaya.MSelectionList()
+        :param index: index of the node in the list
+        :type index: int
+        :rtype: str
+        """
+        node = OpenMaya.MObject()
+        selection.getDependNode(index, node)
+        return OpenMaya.MFnDependencyNode(node).uuid().asString()
+
+    def get_selections(self, names):
+        """
+        adds every name to one selection list. a name that matches a node another name already added does not grow the
+        list, it gets a selection list of its own
+
+        :param names: node names, partial dag paths or OpenMaya.MUuid()
+        :type names: [str] or [OpenMaya.MUuid()]
+        :return: {name: (selection list, index of its first node)}. names that are not in the scene are left out
+        :rtype: dict
+        """
+        selection = OpenMaya.MSelectionList()
+        selections = {}
+        for name in names:
+            key = name.asString() if isinstance(name, OpenMaya.MUuid) else name
+            if key in selections:
+                continue
+
+            length = selection.length()
+            try:
+                selection.add(name)
+            except RuntimeError:
+                continue
+
+            if selection.length() > length:
+                selections[key] = (selection, length)
+            else:
+                own = self.get_selection(name)
+                if own is not None:
+                    selections[key] = (own, 0)
+
+        return selections
+
+    def exists(self, names):
+        """
+        checks which nodes exist in the scene, the names are resolved into one selection list
+
+        :param names: node names
+        :type names: [str]
+        :return: (found, missing) names in the order they were given
+        :rtype: ([str], [str])
+        """
+        if Debug.debug: print(('calling :: {0}'.format('exists')))
+
+        selections = self.get_selections(names)
+        found = []
+        missing = []
+        for name in names:
+            if name in selections:
+                found.append(name)
+            else:
+                missing.append(name)
+
+        return found, missing
+
+    def get_uuids(self, names):
+        """
+        gets the uuids of nodes in the scene, the names are resolved into one selection list
+
+        :param names: node names
+        :type names: [str]
+        :return: {name: uuid}. names that are not in the scene are left out
+        :rtype: dict
+        """
+        if Debug.debug: print(('calling :: {0}'.format('get_uuids')))
+
+        uuids = {}
+        for name, (selection, index) in self.get_selections(names).items():
+            uuids[name] = self.get_node_uuid(selection, index)
+
+        return uuids
+
+    def get_paths(self, uuids):
+        """
+        gets the current names of nodes from their uuids, the uuids are resolved into one selection list
+
+        :param uuids: uuids
+        :type uuids: [str]
+        :return: {uuid: shortest unique dag path}. uuids that are not in the scene are left out
+        :rtype: dict
+        """
+        if Debug.debug: print(('calling :: {0}'.format('get_paths')))
+
+        muuids = []
+        for uuid in uuids:
+            if uuid:
+                muuid = OpenMaya.MUuid(uuid)
+                if muuid.valid():
+                    muuids.append(muuid)
+
+        paths = {}
+        for uuid, (selection, index) in self.get_selections(muuids).items():
+            paths[uuid] = self.get_node_name(selection, index)
+
+        return paths
+
+    def resolve_export_items(self, model):
+        """
+        checks that the export items of a model are in the scene. if the first export item was renamed it is found by
+        the model uuid and exported under its new name. the model is not changed, it may be the cached container of
+        its layer
+
+        :param model: model with export items
+        :type model: ModelData() or RigModelData()
+        :return: (export items found in the scene, export items that could not be found)
+        :rtype: ([str], [str])
+        """
+        if Debug.debug: print(('calling :: {0}'.format('resolve_export_items')))
+
+        found, missing = self.exists(model.export_items)
+        if missing and model.export_items[0] in missing and getattr(model, 'uuid', None):
+            path = self.get_paths([model.uuid]).get(model.uuid)
+            if path is not None and path not in found:
+                found.insert(0, path)
+                missing.pop(0)
+
+        return found, missing
+
+    """
+    \/\/\/\/\/\/\/\/    content hashes    \/\/\/\/\/\/\/\/
+    """
+
+    @staticmethod
+    def get_skin_weights(path, vertex_count):
+        """
+        gets the skin weights of a mesh
+
+        :param path: mesh shape
+        :type path: om2.MDagPath()
+        :param vertex_count: number of verts of the mesh
+        :type vertex_count: int
+        :return: [(influence names, weights)] for each skin cluster of the mesh
+        :rtype: list
+        """
+        history = cmds.listHistory(path.fullPathName(), pruneDagObjects=True) or []
+        skins = []
+        for skin_cluster in cmds.ls(history, type='skinCluster'):
+            selection = om2.MSelectionList()
+            selection.add(skin_cluster)
+            skin_fn = om2Anim.MFnSkinCluster(selection.getDependNode(0))
+
+            component_fn = om2.MFnSingleIndexedComponent()
+            components = component_fn.create(om2.MFn.kMeshVertComponent)
+            component_fn.setCompleteData(vertex_count)
+
+            weights, influence_count = skin_fn.getWeights(path, components)
+            influences = [influence.partialPathName() for influence in skin_fn.influenceObjects()]
+            skins.append((influences, weights))
+
+        return skins
+
+    def hash_mesh(self, hasher, path):
+        """
+        hashes the topology, object space points, normals, uvs and skin weights of a mesh
+
+        :param hasher: hashlib object
+        :type hasher: hashlib.sha1()
+        :param path: mesh shape
+        :type path: om2.MDagPath()
+        """
+        mesh = om2.MFnMesh(path)
+        if mesh.isIntermediateObject:
+            return
+
+        counts, vertices = mesh.getVertices()
+        hasher.update(array.array('i', counts).tobytes())
+        hasher.update(array.array('i', vertices).tobytes())
+
+        points = mesh.getFloatPoints(om2.MSpace.kObject)
+        hasher.update(array.array('f', [value for point in points for value in (point.x, point.y, point.z)]).tobytes())
+
+        normals = mesh.getNormals(om2.MSpace.kObject)
+        hasher.update(array.array('f', [value for normal in normals for value in (normal.x, normal.y, normal.z)])
+                      .tobytes())
+
+        for uv_set in mesh.getUVSetNames():
+            hasher.update(uv_set.encode('utf-8'))
+            us, vs = mesh.getUVs(uv_set)
+            hasher.update(array.array('f', us).tobytes())
+            hasher.update(array.array('f', vs).tobytes())
+
+        for influences, weights in self.get_skin_weights(path, mesh.numVertices):
+            hasher.update('|'.join(influences).encode('utf-8'))
+            hasher.update(array.array('d', weights).tobytes())
+
+    def hash_hierarchy(self, hasher, names, top_transforms=True):
+        """
+        hashes the meshes and transforms of nodes and everything below them. missing nodes are hashed by name
+
+        :param hasher: hashlib object
+        :type hasher: hashlib.sha1()
+        :param names: top nodes
+        :type names: [str]
+        :param top_transforms: include the world matrix of the top nodes, off when they are zeroed for the export
+        :type top_transforms: bool
+        """
+        if Debug.debug: print(('calling :: {0}'.format('hash_hierarchy')))
+
+        for name in names:
+            hasher.update(name.encode('utf-8'))
+            selection = om2.MSelectionList()
+            try:
+                selection.add(name)
+                top = selection.getDagPath(0)
+            except (RuntimeError, TypeError):
+                hasher.update(b'<missing>')
+                continue
+
+            if top_transforms:
+                hasher.update(array.array('d', top.inclusiveMatrix()).tobytes())
+
+            iterator = om2.MItDag()
+            iterator.reset(top, om2.MItDag.kDepthFirst)
+            while not iterator.isDone():
+                path = iterator.getPath()
+                hasher.update(path.partialPathName().encode('utf-8'))
+                if path.node().hasFn(om2.MFn.kMesh):
+                    self.hash_mesh(hasher, path)
+                elif iterator.depth() > 0 and path.node().hasFn(om2.MFn.kTransform):
+                    hasher.update(array.array('d', om2.MFnDagNode(path).transformationMatrix()).tobytes())
+                iterator.next()
+
+    @staticmethod
+    def hash_animation(hasher, nodes, start, end):
+        """
+        hashes the anim curves of nodes between start and end: the keys, tangents and the values at start and end
+
+        :param hasher: hashlib object
+        :type hasher: hashlib.sha1()
+        :param nodes: animated nodes
+        :type nodes: [str]
+        :param start: first frame
+        :type start: float
+        :param end: last frame
+        :type end: float
+        """
+        if Debug.debug: print(('calling :: {0}'.format('hash_animation')))
+
+        curves = sorted(set(cmds.keyframe(nodes, query=True, name=True) or []))
+        for curve in curves:
+            hasher.update(curve.encode('utf-8'))
+            hasher.update('|'.join(cmds.listConnections(curve + '.output', plugs=True) or []).encode('utf-8'))
+
+            values = cmds.keyframe(curve, query=True, time=(start, end), timeChange=True, valueChange=True) or []
+            values += cmds.keyTangent(curve, query=True, time=(start, end), inAngle=True, outAngle=True,
+                                      inWeight=True, outWeight=True) or []
+            for frame in (start, end):
+                values += cmds.keyframe(curve, query=True, eval=True, time=(frame,)) or []
+            hasher.update(array.array('d', values).tobytes())
+
+
+Resolver = SceneResolver()
@@ -0,0 +1,658 @@
+"""
+serialization of exporter data for fileInfo
+
+Exporter data is stored as compact, canonical json with short field names and a schema version ("v"). Lists are real
+json lists so names containing ', ' survive a round trip. Values that match the container defaults are left out.
+
+Version 2 stores each layer as a manifest plus one chunk per model/animation (see encode_chunked). Version 3 quotes the
+chunk separator in the layer and child names of the chunk keys so two layers can not share a chunk key (see
+get_chunk_key), version 2 manifests are still read with their unquoted keys. Version 1 kept the children inline in the
+layer value, that is still read and encode still writes it for use outside of fileInfo.
+
+The original format was ElementTree xml. decode reads both so old scenes keep working,
+FBXExporterData.migrate_legacy_fileInfo rewrites them in the current format.
+
+The readers and writers are not written by hand, they are compiled once per container class from the Field
+declarations in __init__.py (see compile_json_writer, compile_json_reader, compile_xml_writer and compile_xml_reader).
+
+This module does not use pymel/maya so it can be used outside of Maya (batch tools, benchmarks, tests).
+"""
+
+import functools
+import json
+from xml.etree import ElementTree as ET
+from xml.dom import minidom
+
+from scr.tools.fbxexporters import ActorLayerData
+from scr.tools.fbxexporters import RigLayerData
+from scr.tools.fbxexporters import LayerData
+from scr.tools.fbxexporters import Field
+from scr.tools.fbxexporters import Identifiers
+from scr.tools.fbxexporters import LazyChildren
+from scr.tools.fbxexporters import schema_registry
+
+
+format_version = 3
+# first version that stores a layer as a manifest plus chunks
+chunked_format_version = 2
+# first version whose chunk keys quote the chunk separator, see get_chunk_key
+quoted_chunk_keys_version = 3
+xml_list_separator = ', '
+
+
+def unescape_fileInfo_value(value):
+    """
+    fileInfo returns values with their backslashes and quotes escaped. undo that before parsing
+
+    :param value: value as returned by pm.fileInfo[key]
+    :type value: str
+    :return: unescaped value
+    :rtype: str
+    """
+    if isinstance(value, bytes):
+        value = value.decode()
+
+    if '\\' in value:
+        value = value.encode().decode('unicode-escape')
+
+    return value
+
+
+def is_legacy_value(value):
+    """
+    checks if an (unescaped) fileInfo value is in the legacy xml format
+
+    :param value: fileInfo value
+    :type value: str
+    :rtype: bool
+    """
+    return value.lstrip()[:1] == '<'
+
+
+def to_json(data):
+    """
+    canonical compact json. the same data always gives the same string so unchanged writes can be skipped
+    """
+    return json.dumps(data, separators=(',', ':'), sort_keys=True, ensure_ascii=True)
+
+
+def strtobool(value):
+    """
+    same as distutils.util.strtobool but also accepts bools and None (None is False)
+    """
+    if value is None:
+        return False
+    if isinstance(value, (bool, int)):
+        return bool(value)
+
+    value = value.lower()
+    if value in ('y', 'yes', 't', 'true', 'on', '1'):
+        return True
+    elif value in ('n', 'no', 'f', 'false', 'off', '0'):
+        return False
+    raise ValueError('invalid truth value {0}'.format(value))
+
+
+def split_xml_list(text):
+    """
+    legacy xml stored lists joined with ', '
+
+    :param text: joined list
+    :type text: str
+    :rtype: [str]
+    """
+    if not text:
+        return []
+
+    return text.split(xml_list_separator)
+
+
+def get_child_type(field):
+    return schema_registry[field.child_type]
+
+
+"""
+\/\/\/\/\/\/\/\/    json    \/\/\/\/\/\/\/\/
+"""
+
+# container class mapped to its compiled json writer/reader
+json_writers = {}
+json_readers = {}
+
+
+def compile_function(name, lines, namespace):
+    """
+    compiles generated source. used so reading and writing a container is a flat list of attribute lookups instead
+    of a loop over its fields
+
+    :param name: name of the generated function
+    :type name: str
+    :param lines: source lines of the function
+    :type lines: [str]
+    :param namespace: globals for the function
+    :type namespace: dict
+    :rtype: function
+    """
+    exec(compile('\n'.join(lines), '<{0}>'.format(name), 'exec'), namespace)
+    return namespace[name]
+
+
+def compile_json_writer(cls, children=True):
+    """
+    builds a function that turns a container into a json ready dict. values equal to the field default are left out
+
+    :param cls: container class
+    :type cls: DataContainer subclass
+    :param children: include the children fields. chunked layers write their children separately
+    :type children: bool
+    :return: writer
+    :rtype: function
+    """
+    if (cls, children) in json_writers:
+        return json_writers[(cls, children)]
+
+    name = 'write_{0}'.format(cls.__name__)
+    namespace = {'str': str}
+    lines = ['def {0}(obj):'.format(name), '    data = {}']
+    for field in cls.fields:
+        if not field.stored:
+            continue
+
+        if field.kind == Field.children and not children:
+            continue
+
+        lines.append('    value = obj.{0}'.format(field.name))
+        if field.kind == Field.flag:
+            lines.append('    if bool(value) != {0!r}: data[{1!r}] = bool(value)'.format(
+                bool(field.default), field.short_name))
+        elif field.kind == Field.items:
+            lines.append('    if value: data[{0!r}] = list(value)'.format(field.short_name))
+        elif field.kind == Field.children:
+            writer = 'write_{0}'.format(field.child_type)
+            namespace[writer] = compile_json_writer(get_child_type(field))
+            lines.append('    if value: data[{0!r}] = [{1}(child) for child in value]'.format(
+                field.short_name, writer))
+        else:
+            lines.append('    if value is not None: data[{0!r}] = value if value.__class__ is str else str(value)'.format(
+                field.short_name))
+    lines.append('    return data')
+
+    json_writers[(cls, children)] = compile_function(name, lines, namespace)
+    return json_writers[(cls, children)]
+
+
+def compile_json_reader(cls):
+    """
+    builds a function that populates a new container from a json dict. fields missing from the data (older data or
+    newly added fields) get their default
+
+    :param cls: container class
+    :type cls: DataContainer subclass
+    :return: reader
+    :rtype: function
+    """
+    if cls in json_readers:
+        return json_readers[cls]
+
+    name = 'read_{0}'.format(cls.__name__)
+    namespace = {'cls': cls}
+    lines = ['def {0}(data):'.format(name), '    obj = cls.__new__(cls)', '    get = data.get']
+    for field in cls.fields:
+        if field.kind == Field.children:
+            reader = 'read_{0}'.format(field.child_type)
+            namespace[reader] = compile_json_reader(get_child_type(field))
+            lines.append('    obj.{0} = [{1}(child) for child in get({2!r}, ())]'.format(
+                field.name, reader, field.short_name))
+        elif field.kind == Field.items:
+            if field.stored:
+                lines.append('    obj.{0} = list(get({1!r}, ()))'.format(field.name, field.short_name))
+            else:
+                lines.append('    obj.{0} = []'.format(field.name))
+        elif field.stored:
+            lines.append('    obj.{0} = get({1!r}, {2!r})'.format(field.name, field.short_name, field.default))
+        else:
+            lines.append('    obj.{0} = {1!r}'.format(field.name, field.default))
+    lines.append('    return obj')
+
+    json_readers[cls] = compile_function(name, lines, namespace)
+    return json_readers[cls]
+
+
+def encode(obj):
+    """
+    creates versioned json data for a layer container
+
+    :param obj: layer data
+    :type obj: LayerData(), RigLayerData() or ActorLayerData()
+    :return: json string
+    :rtype: str
+    """
+    data = compile_json_writer(type(obj))(obj)
+    data['v'] = format_version
+    return to_json(data)
+
+
+def json_to_container(cls, value, get_value=None, key=None, lazy=False):
+    data = json.loads(value)
+    chunk_names = data.pop(chunks_str, None)
+    version = data.get('v', format_version)
+    obj = compile_json_reader(cls)(data)
+
+    if chunk_names is not None:
+        # chunked layer, the children are stored under their own keys
+        if get_value is None:
+            raise ValueError('{0} is chunked, a get_value function is needed to read it'.format(key))
+
+        field = get_children_field(cls)
+        loader = functools.partial(read_chunks, get_child_type(field), key, chunk_names, get_value, version)
+        setattr(obj, field.name, LazyChildren(loader, chunk_names, key, version) if lazy else loader())
+
+    return obj
+
+
+def read_chunks(cls, key, chunk_names, get_value, version=format_version):
+    """
+    reads the children of a chunked layer
+
+    :param cls: child container class
+    :type cls: DataContainer subclass
+    :param key: fileInfo key of the layer
+    :type key: str
+    :param chunk_names: chunk names from the layer manifest
+    :type chunk_names: [str]
+    :param get_value: function that returns the (unescaped) fileInfo value for a key
+    :type get_value: function
+    :param version: format version of the manifest
+    :type version: int
+    :return: children, missing chunks are skipped
+    :rtype: [DataContainer()]
+    """
+    reader = compile_json_reader(cls)
+    children = []
+    for chunk_name in chunk_names:
+        chunk = get_value(get_chunk_key(key, chunk_name, version))
+        if chunk is not None:
+            children.append(reader(json.loads(chunk)))
+
+    return children
+
+
+def is_loaded(children):
+    """
+    :param children: models or animations of a layer
+    :type children: list or LazyChildren()
+    :return: False if the children have not been read from fileInfo yet
+    :rtype: bool
+    """
+    return not isinstance(children, LazyChildren) or children.loaded
+
+
+def load_children(obj):
+    """
+    reads the children of a layer if they have not been read yet
+
+    :param obj: layer data
+    :type obj: LayerData(), RigLayerData() or ActorLayerData()
+    """
+    children = getattr(obj, get_children_field(type(obj)).name)
+    if not is_loaded(children):
+        children.load()
+
+
+def get_child_count(children):
+    """
+    gets the number of children without loading them
+    """
+    if isinstance(children, LazyChildren) and not children.loaded:
+        return len(children.chunk_names)
+
+    return len(children)
+
+
+def get_format_version(value):
+    """
+    :param value: fileInfo value
+    :type value: str
+    :return: format version of a fileInfo value. legacy xml is version 0
+    :rtype: int
+    """
+    if is_legacy_value(value):
+        return 0
+
+    return json.loads(value).get('v', 1)
+
+
+"""
+\/\/\/\/\/\/\/\/    chunks    \/\/\/\/\/\/\/\/
+"""
+
+# a layer is written as a manifest under the layer key and one chunk per child (model or animation) under its own
+# key. the manifest lists the chunk names in order. writing a layer only rewrites the chunks that changed so the cost
+# of an edit does not grow with the size of the layer
+chunks_str = 'c'
+
+
+def get_children_field(cls):
+    """
+    :param cls: layer container class
+    :type cls: DataContainer subclass
+    :return: the children field of a layer container (models or animations)
+    :rtype: Field()
+    """
+    for field in cls.fields:
+        if field.kind == Field.children:
+            return field
+
+    raise ValueError('{0} has no children field'.format(cls.__name__))
+
+
+def quote_chunk_key_part(part):
+    """
+    quotes % and the chunk separator in a layer or chunk name so the separator in a chunk key only ever separates them
+
+    :rtype: str
+    """
+    quoted_separator = '%{0:02X}'.format(ord(Identifiers.chunk_separator))
+    return part.replace('%', '%25').replace(Identifiers.chunk_separator, quoted_separator)
+
+
+def get_chunk_key(key, chunk_name, version=format_version):
+    """
+    fileInfo key for a chunk of a layer
+
+        _fbx_export_model_layer_props + crate -> _fbx_export_chunk_model_layer_props|crate
+        _fbx_export_model_layer_a|b + c -> _fbx_export_chunk_model_layer_a%7Cb|c
+
+    :param key: fileInfo key of the layer
+    :type key: str
+    :param chunk_name: name of the chunk as listed in the manifest
+    :type chunk_name: str
+    :param version: format version of the manifest, version 2 keys are not quoted
+    :type version: int
+    :rtype: str
+    """
+    layer_name = key[len(Identifiers.exporter_identifier):]
+    if version >= quoted_chunk_keys_version:
+        layer_name = quote_chunk_key_part(layer_name)
+        chunk_name = quote_chunk_key_part(chunk_name)
+
+    return Identifiers.chunk_identifier + layer_name + Identifiers.chunk_separator + chunk_name
+
+
+def get_chunk_keys(value, key):
+    """
+    gets the keys of the chunks listed in a layer manifest
+
+    :param value: fileInfo value of the layer
+    :type value: str
+    :param key: fileInfo key of the layer
+    :type key: str
+    :return: chunk keys, empty if the layer is not chunked
+    :rtype: [str]
+    """
+    if not value or is_legacy_value(value):
+        return []
+
+    data = json.loads(value)
+    version = data.get('v', format_version)
+    return [get_chunk_key(key, chunk_name, version) for chunk_name in data.get(chunks_str, ())]
+
+
+def get_chunk_type(chunk_key):
+    """
+    :param chunk_key: fileInfo key of a chunk
+    :type chunk_key: str
+    :return: container class of the child stored in the chunk (ModelData, RigModelData or AnimationData)
+    :rtype: DataContainer subclass
+    """
+    layer_key = Identifiers.exporter_identifier + chunk_key[len(Identifiers.chunk_identifier):]
+    for prefix, cls in containers.items():
+        if layer_key.startswith(prefix):
+            return get_child_type(get_children_field(cls))
+
+    raise KeyError('{0} is not an exporter chunk key'.format(chunk_key))
+
+
+def decode_chunk(value, chunk_key):
+    """
+    populates a single model/animation from a chunk value
+
+    :rtype: ModelData(), RigModelData() or AnimationData()
+    """
+    return compile_json_reader(get_chunk_type(chunk_key))(json.loads(value))
+
+
+def encode_chunk(obj):
+    """
+    creates the chunk value for a single model/animation, the same value encode_chunked writes for it
+
+    :rtype: str
+    """
+    return to_json(compile_json_writer(type(obj))(obj))
+
+
+def encode_chunked(obj, key):
+    """
+    creates the manifest and chunks for a layer container. chunks are named after the child (model name or animation
+    name), children with the same name get a #n suffix so every child has its own chunk
+
+    :param obj: layer data
+    :type obj: LayerData(), RigLayerData() or ActorLayerData()
+    :param key: fileInfo key of the layer
+    :type key: str
+    :return: manifest json string and a list of (chunk key, chunk json string)
+    :rtype: str, [(str, str)]
+    """
+    cls = type(obj)
+    field = get_children_field(cls)
+    child_writer = compile_json_writer(get_child_type(field))
+
+    data = compile_json_writer(cls, children=False)(obj)
+    data['v'] = format_version
+
+    children = getattr(obj, field.name)
+    if isinstance(children, LazyChildren) and not children.loaded and children.source_key == key:
+        # the children were never read so they can not have changed, their chunks stay as they are. the manifest keeps
+        # the version its chunk keys were made with
+        data['v'] = children.source_version
+        data[chunks_str] = children.chunk_names
+        return to_json(data), []
+
+    chunk_names = []
+    chunks = []
+    used = set()
+    for child in children:
+        chunk_name = base_name = str(getattr(child, child.key_field))
+        count = 1
+        while chunk_name in used:
+            count += 1
+            chunk_name = '{0}#{1}'.format(base_name, count)
+        used.add(chunk_name)
+
+        chunk_names.append(chunk_name)
+        chunks.append((get_chunk_key(key, chunk_name), to_json(child_writer(child))))
+
+    data[chunks_str] = chunk_names
+
+    return to_json(data), chunks
+
+
+"""
+\/\/\/\/\/\/\/\/    legacy xml    \/\/\/\/\/\/\/\/
+"""
+
+xml_writers = {}
+xml_readers = {}
+
+
+def compile_xml_writer(cls):
+    """
+    builds a function that adds a container to a parent element in the legacy xml format
+
+    :param cls: container class
+    :type cls: DataContainer subclass
+    :return: writer
+    :rtype: function
+    """
+    if cls in xml_writers:
+        return xml_writers[cls]
+
+    plan = []
+    for field in cls.fields:
+        if field.stored:
+            child_writer = None
+            if field.kind == Field.children:
+                child_writer = compile_xml_writer(get_child_type(field))
+            plan.append((field.name, field.xml_name, field.kind, child_writer))
+    plan = tuple(plan)
+
+    def write(parent, obj):
+        element = ET.SubElement(parent, cls.xml_tag, attrib=dict(cls.xml_attrib))
+        for name, xml_name, kind, child_writer in plan:
+            value = getattr(obj, name)
+            if kind == Field.children:
+                child_attrib = {'node_type': xml_name} if child_writer.attrib else {}
+                children = ET.SubElement(element, xml_name, attrib=child_attrib)
+                for child in value:
+                    child_writer(children, child)
+            elif kind == Field.items:
+                ET.SubElement(element, xml_name).text = xml_list_separator.join(value)
+            elif kind == Field.flag:
+                ET.SubElement(element, xml_name).text = str(bool(value))
+            else:
+                ET.SubElement(element, xml_name).text = None if value is None else str(value)
+
+        return element
+
+    write.attrib = cls.xml_attrib
+    xml_writers[cls] = write
+    return write
+
+
+def compile_xml_reader(cls):
+    """
+    builds a function that populates a new container from a legacy xml element. elements missing from the xml keep
+    the field default
+
+    :param cls: container class
+    :type cls: DataContainer subclass
+    :return: reader
+    :rtype: function
+    """
+    if cls in xml_readers:
+        return xml_readers[cls]
+
+    plan = []
+    for field in cls.fields:
+        if field.stored:
+            child_reader = None
+            xml_path = field.xml_name
+            if field.kind == Field.children:
+                child_type = get_child_type(field)
+                child_reader = compile_xml_reader(child_type)
+                xml_path = './{0}/{1}'.format(field.xml_name, child_type.xml_tag)
+            plan.append((field.name, xml_path, field.kind, child_reader))
+    plan = tuple(plan)
+
+    def read(element):
+        obj = cls()
+        for name, xml_path, kind, child_reader in plan:
+            if kind == Field.children:
+                setattr(obj, name, [child_reader(child) for child in element.findall(xml_path)])
+                continue
+
+            text = element.findtext(xml_path)
+            if text is None:
+                continue
+            if kind == Field.flag:
+                setattr(obj, name, strtobool(text))
+            elif kind == Field.items:
+                # there is a possibility that there are no export item but that the users wants to keep the item
+                # listed in the ui to use later
+                setattr(obj, name, split_xml_list(text))
+            else:
+                setattr(obj, name, text)
+
+        return obj
+
+    xml_readers[cls] = read
+    return read
+
+
+def to_xml(obj, pretty=False):
+    """
+    creates legacy xml data for a layer container
+
+    :param obj: layer data
+    :type obj: LayerData(), RigLayerData() or ActorLayerData()
+    :param pretty: indent the xml
+    :type pretty: bool
+    :return: xml
+    :rtype: str
+    """
+    root = ET.Element('root')
+    compile_xml_writer(type(obj))(root, obj)
+    if pretty:
+        return minidom.parseString(ET.tostring(root)).toprettyxml(indent="   ")
+
+    return ET.tostring(root, encoding='unicode')
+
+
+def xml_to_container(cls, value):
+    element = ET.fromstring(value).find(cls.xml_tag)
+    return compile_xml_reader(cls)(element)
+
+
+"""
+\/\/\/\/\/\/\/\/    readers    \/\/\/\/\/\/\/\/
+"""
+
+# fileInfo prefix mapped to the container class stored under it
+containers = {
+    Identifiers.model_layer_identifier: LayerData,
+    Identifiers.rig_layer_identifier: RigLayerData,
+    Identifiers.actor_identifier: ActorLayerData,
+}
+
+
+def decode(value, key, get_value=None, lazy=False):
+    """
+    populates layer data from an (unescaped) fileInfo value in either format. the name is taken from the key
+
+    :param value: fileInfo value
+    :type value: str
+    :param key: fileInfo key
+    :type key: str
+    :param get_value: function that returns the (unescaped) fileInfo value for a key, used to read chunks
+    :type get_value: function
+    :param lazy: only read the layer header, the children of a chunked layer are read when they are first used
+    :type lazy: bool
+    :rtype: LayerData(), RigLayerData() or ActorLayerData()
+    """
+    for prefix, cls in containers.items():
+        if key.startswith(prefix):
+            break
+    else:
+        raise KeyError('{0} is not an exporter fileInfo key'.format(key))
+
+    if is_legacy_value(value):
+        obj = xml_to_container(cls, value)
+    else:
+        obj = json_to_container(cls, value, get_value, key, lazy)
+
+    obj.name = key[len(prefix):]
+    if cls is ActorLayerData:
+        if is_loaded(obj.animations):
+            set_actor_name(obj.animations, obj.name)
+        else:
+            loader = obj.animations.loader
+            obj.animations.loader = lambda: set_actor_name(loader(), obj.name)
+
+    return obj
+
+
+def set_actor_name(animations, actor_name):
+    for anim in animations:
+        anim.actor_name = actor_name
+
+    return animations
@@ -0,0 +1,225 @@
+"""
+sidecar manifest of the exporter data, written next to the scene when it is saved (UserOptionsData.save_to_disk). this
+module does not need Maya
+
+the sidecar holds the same exporter fileInfo values as the scene (layer manifests and their chunks, see
+fbx_exporter_serialize) as compact json so pipeline tools can read export intent from .mb scenes too, without parsing
+the scene or starting Maya
+
+    hero.ma -> hero.ma.fbx_export.json
+    {"v": 1, "scene": "hero.ma", "values": {"_fbx_export_rig_hero": "...", "_fbx_export_chunk_rig_hero|body": "..."}}
+
+in Maya the values are collected on the main thread (FBXExporterData.get_sidecar_values) and handed to Writer. the
+file is written on a background thread, only when a value changed since the last write, to a temporary file that is
+moved over the old sidecar
+
+reading:
+    read_exporter_data('hero.ma') -> {prefix: [layer data]}, same as fbx_exporter_mafile.read_exporter_data
+"""
+
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+
+import scr
+from scr.tools.fbxexporters import fbx_exporter_mafile
+
+
+sidecar_version = 1
+sidecar_suffix = '.fbx_export.json'
+
+
+def get_sidecar_path(scene_path):
+    """
+    :param scene_path: path of the Maya scene or of its sidecar
+    :type scene_path: str
+    :return: path of the sidecar manifest for a scene
+    :rtype: str
+    """
+    if scene_path.endswith(sidecar_suffix):
+        return scene_path
+
+    return scene_path + sidecar_suffix
+
+
+def encode_sidecar(scene_path, values):
+    """
+    :param scene_path: path of the Maya scene
+    :type scene_path: str
+    :param values: exporter fileInfo values {key: value}
+    :type values: dict
+    :return: compact json
+    :rtype: str
+    """
+    return json.dumps({'v': sidecar_version, 'scene': os.path.basename(scene_path), 'values': values},
+                      separators=(',', ':'), sort_keys=True)
+
+
+def read_sidecar(path):
+    """
+    reads the exporter fileInfo values from a sidecar
+
+    :param path: path of the Maya scene or of its sidecar
+    :type path: str
+    :return: {key: value} or None if there is no sidecar
+    :rtype: dict
+    """
+    sidecar_path = get_sidecar_path(path)
+    if not os.path.isfile(sidecar_path):
+        return None
+
+    with open(sidecar_path, 'r', encoding='utf-8') as sidecar_file:
+        data = json.load(sidecar_file)
+
+    if data.get('v', 0) > sidecar_version:
+        raise ValueError('{0} was written by a newer exporter (version {1})'.format(sidecar_path, data.get('v')))
+
+    return data.get('values', {})
+
+
+def read_exporter_data(path):
+    """
+    reads the exporter data of a scene from its sidecar
+
+    :param path: path of the Maya scene or of its sidecar
+    :type path: str
+    :return: {prefix: [layer data]} or None if there is no sidecar
+    :rtype: dict
+    """
+    values = read_sidecar(path)
+    if values is None:
+        return None
+
+    return fbx_exporter_mafile.decode_fileInfo(values)
+
+
+def write_atomic(path, text):
+    """
+    writes a text file. the text is written to a temporary file next to it and moved over the old file so readers never
+    see a half written file
+
+    :param path: file to write
+    :type path: str
+    :param text: content
+    :type text: str
+    """
+    temp_file = tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=os.path.dirname(os.path.abspath(path)),
+                                            prefix='.', suffix='.tmp', delete=False)
+    try:
+        with temp_file:
+            temp_file.write(text)
+        os.replace(temp_file.name, path)
+    except Exception:
+        if os.path.exists(temp_file.name):
+            os.remove(temp_file.name)
+        raise
+
+
+def write_sidecar(scene_path, values):
+    """
+    writes a sidecar, see write_atomic
+
+    :param scene_path: path of the Maya scene
+    :type scene_path: str
+    :param values: exporter fileInfo values {key: value}
+    :type values: dict
+    :return: path of the sidecar
+    :rtype: str
+    """
+    sidecar_path = get_sidecar_path(scene_path)
+    write_atomic(sidecar_path, encode_sidecar(scene_path, values))
+
+    return sidecar_path
+
+
+class SidecarWriter(object):
+    """
+    writes sidecars on a background thread so saving the scene does not wait on the disk. requests for the same scene
+    that queue up while a write is running are merged, only the latest values are written
+    """
+    def __init__(self):
+        self.logger = logging.getLogger(scr.logger_name)
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        # {scene path: values} waiting to be written, the queue only holds the scene paths
+        self.pending = {}
+        # {scene path: values} last written (or read) for each scene, used to skip writes that change nothing
+        self.written = {}
+        self.thread = None
+
+    def submit(self, scene_path, values):
+        """
+        queues a sidecar write
+
+        :param scene_path: path of the Maya scene
+        :type scene_path: str
+        :param values: exporter fileInfo values {key: value}. must not be edited after it is passed in
+        :type values: dict
+        """
+        with self.lock:
+            queued = scene_path in self.pending
+            self.pending[scene_path] = values
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='fbx_exporter_sidecar')
+                self.thread.daemon = True
+                self.thread.start()
+
+        if not queued:
+            self.queue.put(scene_path)
+
+    def wait(self):
+        """
+        blocks until every queued sidecar is written
+        """
+        self.queue.join()
+
+    def run(self):
+        while True:
+            scene_path = self.queue.get()
+            try:
+                with self.lock:
+                    values = self.pending.pop(scene_path)
+                self.write(scene_path, values)
+            except Exception as e:
+                self.logger.warning('Could not write FBX Exporter sidecar for {0} :: {1}'.format(scene_path, e))
+            finally:
+                self.queue.task_done()
+
+    def get_changed_keys(self, scene_path, values):
+        """
+        :return: keys that were added, changed or removed since the sidecar was last written
+        :rtype: [str]
+        """
+        old_values = self.written.get(scene_path)
+        if old_values is None:
+            # first save of this scene in the session, compare with the sidecar already on disk
+            try:
+                old_values = read_sidecar(scene_path) or {}
+            except ValueError:
+                old_values = {}
+
+        changed = [key for key, value in values.items() if old_values.get(key) != value]
+        changed.extend(key for key in old_values if key not in values)
+        return changed
+
+    def write(self, scene_path, values):
+        """
+        writes the sidecar for a scene if any value changed
+
+        :return: number of keys that changed, 0 if the write was skipped
+        :rtype: int
+        """
+        changed = self.get_changed_keys(scene_path, values)
+        if changed or (values and not os.path.isfile(get_sidecar_path(scene_path))):
+            write_sidecar(scene_path, values)
+            self.logger.info('FBX Exporter sidecar written {0} ({1} value(s) changed)'.format(
+                get_sidecar_path(scene_path), len(changed)))
+
+        self.written[scene_path] = values
+        return len(changed)
+
+
+Writer = SidecarWriter()
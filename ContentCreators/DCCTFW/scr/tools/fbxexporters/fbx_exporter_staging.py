@@ -0,0 +1,558 @@
+"""
+gets the scene ready for animation and rig exports. this used to live in the UI, it is here so the exports can run
+without it (see fbx_exporter_workers)
+
+export_rig flattens the rig and deletes everything else from the scene inside an undo chunk and rolls the chunk back
+once the fbx is written (rollback_scene), the scene file is not saved or reopened. if the scene does not come back as
+it was, restored is False and the caller reopens it (a worker reopens its scene, the UI asks the artist to)
+
+get_content_hash hashes what a job exports from the scene before it is staged, see fbx_exporter_fingerprint.
+get_expectation reads what the fbx of a job should hold, see fbx_exporter_validate
+"""
+
+import hashlib
+import logging
+from contextlib import contextmanager
+import maya.OpenMaya as OpenMaya
+import maya.OpenMayaAnim as OpenMayaAnim
+import pymel.core as pm
+
+import scr
+from scr.tools.fbxexporters import Debug
+from scr.tools.fbxexporters import fbx_exporter_export
+from scr.tools.fbxexporters import fbx_exporter_planner
+from scr.tools.fbxexporters import fbx_exporter_scene
+from scr.tools.fbxexporters import fbx_exporter_telemetry
+from scr.tools.fbxexporters import fbx_exporter_validate
+
+
+class ExportStaging(object):
+
+    def __init__(self):
+        self.logger = logging.getLogger(scr.logger_name)
+        self.Exporter = fbx_exporter_export.Exporter
+        self.Resolver = fbx_exporter_scene.Resolver
+        self.Recorder = fbx_exporter_telemetry.Recorder
+        self.Validator = fbx_exporter_validate.Validator
+        # False when the last rollback_scene did not bring the scene back as it was
+        self.restored = True
+
+    """
+    \/\/\/\/\/\/\/\/    animation    \/\/\/\/\/\/\/\/
+    """
+
+    def get_top_level_parent(self, root):
+        '''
+        gets top level parent of root joint
+
+        @param root: rig root
+        @type root: joint
+        @return: rig group parent
+        @rtype: group transform
+        '''
+        if Debug.debug: print(('calling :: {0}'.format('get_root_parent')))
+
+        parents = pm.listRelatives(root, allParents=True)
+        if parents:
+            parent = parents[0]
+            return self.get_top_level_parent(parent)
+        else:
+            return root
+
+    @staticmethod
+    def get_animlayers():
+        """
+        get all anim layers beside the Base layer
+
+        @return: list of animation layers
+        @rtype: list
+        """
+
+        if Debug.debug: print(('calling :: {0}'.format('get_animlayers')))
+
+        if pm.animLayer(query=True, root=True):
+            return pm.animLayer(pm.animLayer(q=True, root=True), q=True, children=True)
+        else:
+            return None
+
+    def get_muted_layers(self):
+        """
+        gets all the muted anim layers
+
+        @return: list of muted layers
+        @rtype: list of str
+        """
+
+        muted = []
+
+        anim_layers = self.get_animlayers()
+
+        if anim_layers:
+            for anim_layer in anim_layers:
+                if pm.animLayer(anim_layer, query=True, mute=True):
+                    muted.append(anim_layer.name())
+
+            return muted
+        else:
+            return None
+
+    @staticmethod
+    def set_muted_layer(muted_layers):
+        """
+        get list of layers and mutes those layers
+
+        @param muted_layers: list of muted layers
+        @type muted_layers: list of str
+        @return:
+        @rtype:
+        """
+
+        kids = pm.animLayer(pm.animLayer(q=True, root=True), q=True, children=True)
+        if kids:
+            for kid in kids:
+                if kid.name() in muted_layers:
+                    pm.animLayer(kid.name(), edit=True, mute=True)
+                else:
+                    pm.animLayer(kid.name(), edit=True, mute=False)
+
+    def export_animation(self, animation, layer, export_dir):
+        """
+        sets up and exports a single animation. the scene is put back the way it was after the export
+
+        @param animation: data for animation to be exported
+        @type animation: AnimationData()
+        @param layer: rig layer
+        @type layer: ActorLayerData()
+        @param export_dir: folder to export to
+        @type export_dir: str
+        @return: success
+        @rtype: bool
+        """
+        if Debug.debug: print(('calling :: {0}'.format('export_animation')))
+
+        with self.Recorder.stage(fbx_exporter_telemetry.scene_stage):
+            # set time range for specific animation
+            min = pm.playbackOptions(min=True, q=True)
+            max = pm.playbackOptions(max=True, q=True)
+            start = pm.playbackOptions(animationStartTime=True, q=True)
+            end = pm.playbackOptions(animationEndTime=True, q=True)
+
+            root = None
+
+            # get joint name from root as root has namespace
+            find_joint = layer.root.split(':')[-1]
+            parent = self.get_top_level_parent(layer.root)
+            # copy hierarchy to flatten
+            copy = pm.duplicate(parent, rr=True, inputConnections=True)
+            # get joints
+            shapes = pm.listRelatives(copy, allDescendents=True, type='joint')
+            # get root joint
+            for shape in shapes:
+                if shape.name() == find_joint:
+                    root = shape
+                    break
+
+            # get the layers that are muted before making any changes for anim export
+            muted_layers = self.get_muted_layers()
+
+            if muted_layers:
+                # turn off layers that have been added to data as being muted
+                if animation.muted_layers:
+                    mutes = animation.muted_layers.split(', ')
+                    for mute in mutes:
+                        pm.animLayer(mute, mute=True, edit=True)
+
+            if root:
+                pm.parent(root, world=True)
+                pm.delete(copy)
+
+        success = False
+        if root:
+            success = self.Exporter.export_animation_setup(animation.anim_name, export_dir,
+                                                           animation.start_frame, animation.end_frame)
+
+        with self.Recorder.stage(fbx_exporter_telemetry.post_stage):
+            if root:
+                pm.delete(root)
+
+                pm.playbackOptions(animationStartTime=start, animationEndTime=end)
+                pm.playbackOptions(min=min, max=max)
+            else:
+                print('Rig root was not found')
+
+            if muted_layers:
+                self.set_muted_layer(muted_layers)
+
+        return bool(success)
+
+    """
+    \/\/\/\/\/\/\/\/    rig    \/\/\/\/\/\/\/\/
+    """
+
+    @staticmethod
+    def flatten_rig(node):
+        '''
+        set rig parent to world so the fbx is export flat instead of under a group or other node
+
+        @param node: root node of rig
+        @type node: joint
+        @return:
+        @rtype:
+        '''
+        if pm.objExists(node):
+            pm.parent(node, world=True)
+            return True
+        else:
+            print('{0} model not found to export'.format(node))
+            return False
+
+    def clean_scene(self, used_models):
+        '''
+        clean scene to get it ready for export to fbx. gets rid of stuff that is not to be exported
+
+        @param used_models: models to be exports
+        @type used_models: str
+        @return:
+        @rtype:
+        '''
+
+        if Debug.debug: print(('calling :: {0}'.format('clean_scene')))
+
+        scene_transforms = pm.ls(assemblies=True)
+        scene_parents = []
+        for scene_transform in scene_transforms:
+            parent = self.get_top_level_parent(scene_transform)
+            scene_parents.append(parent)
+
+        models = []
+        for used_model in used_models:
+            models.append(self.Exporter.remove_pipe(used_model))
+
+        parents = []
+        for scene_parent in scene_parents:
+            if not type(scene_parent.getShape()) == pm.nodetypes.Camera:
+                parents.append(self.Exporter.remove_pipe(scene_parent.name()))
+
+        # remove any non joint nodes
+        delete1 = []
+        for parent in parents:
+            parent_node = pm.ls(parent)[0]
+            if type(parent_node) == pm.nodetypes.Joint:
+                kid_nodes = pm.listRelatives(parent_node, allDescendents=True)
+                for kid in kid_nodes:
+                    if type(kid) != pm.nodetypes.Joint:
+                        delete1.append(kid)
+
+        delete2 = list(set(models).symmetric_difference(set(parents)))
+        pm.delete(delete1, delete2)
+
+    @staticmethod
+    def get_node_count():
+        return len(pm.cmds.ls(long=True) or [])
+
+    @contextmanager
+    def rollback_scene(self, name):
+        """
+        every change made to the scene inside the block is undone as one step when it closes, the scene is staged in
+        memory instead of in a saved copy. undo is turned on for the block if it was off and the modified flag is put
+        back. nothing is undone if the block did not record anything. restored is set False if the scene does not have
+        the nodes it had before the block
+
+        :param name: name of the undo chunk
+        :type name: str
+        """
+        undo_state = pm.undoInfo(query=True, state=True)
+        modified = pm.cmds.file(query=True, modified=True)
+        node_count = self.get_node_count()
+        if not undo_state:
+            pm.undoInfo(state=True)
+
+        pm.undoInfo(openChunk=True, chunkName=name)
+        try:
+            yield
+        finally:
+            pm.undoInfo(closeChunk=True)
+            with self.Recorder.stage(fbx_exporter_telemetry.post_stage):
+                # a block that changed nothing queues no chunk, undoing would revert the artist's last edit
+                if pm.undoInfo(query=True, undoName=True) == name:
+                    pm.undo()
+                if not undo_state:
+                    pm.undoInfo(state=False)
+                if not modified:
+                    pm.cmds.file(modified=False)
+
+                self.restored = self.get_node_count() == node_count
+                if not self.restored:
+                    self.logger.error('The scene was not restored after {0}, reopen it without saving'.format(name))
+
+    def export_rig(self, layer, model, export_dir):
+        """
+        flattens the rig, deletes everything that is not exported and exports the model. the changes are rolled back
+        afterwards, see rollback_scene
+
+        :param layer: rig layer
+        :type layer: RigLayerData()
+        :param model: rig model to export
+        :type model: RigModelData()
+        :param export_dir: folder to export to
+        :type export_dir: str
+        :return: success
+        :rtype: bool
+        """
+        if Debug.debug: print(('calling :: {0}'.format('export_rig')))
+
+        with self.rollback_scene('FBX Exporter rig export {0}'.format(model.name)):
+            with self.Recorder.stage(fbx_exporter_telemetry.scene_stage):
+                success = False
+                for export_item in model.export_items:
+                    success = self.flatten_rig(export_item)
+                if success:
+                    success = self.flatten_rig(layer.root)
+                    if success:
+                        used_models = list(model.export_items)
+                        used_models.append(layer.root)
+
+                        self.clean_scene(used_models)
+
+            if success:
+                success = self.Exporter.export_rig_setup(model.export_items, model.name, layer.root, export_dir)
+
+        return bool(success)
+
+    """
+    \/\/\/\/\/\/\/\/    influences    \/\/\/\/\/\/\/\/
+    """
+
+    def get_over_weighted(self, model):
+        '''
+        finds the verts of a rig model with more influences than the model allows
+
+        @param model: rig model to test
+        @type model: RigModelData()
+        @return: (mesh, max influences, over weighted vertex ids). mesh is None if the model or its skin cluster was
+        not found
+        @rtype: tuple
+        '''
+
+        mesh = None
+        max_influences = None
+
+        if model is not None and pm.objExists(model.name):
+            mesh = pm.ls(model.name)[0]
+            max_influences = int(model.influences)
+
+        if mesh and max_influences:
+            skin_cluster = self.get_skincluster(mesh)
+
+            if skin_cluster:
+                skinFn = self.get_MFnSkinCluster(skin_cluster)
+
+                # get the MDagPath for all influence
+                infDags = OpenMaya.MDagPathArray()
+                skinFn.influenceObjects(infDags)
+
+                # create a dictionary whose key is the MPlug indice id and
+                # whose value is the influence list id
+                infIds = {}
+                infs = []
+                for x in range(infDags.length()):
+                    infPath = infDags[x].fullPathName()
+                    infId = int(skinFn.indexForInfluenceObject(infDags[x]))
+                    infIds[infId] = x
+                    infs.append(infPath)
+
+                weights = self.get_weights_dict(skinFn, infIds)
+
+                over_weighted = []
+                for x in weights.keys():
+                    if len(weights[x]) > max_influences:
+                        over_weighted.append(x)
+
+                return mesh, max_influences, over_weighted
+
+        return None, max_influences, []
+
+    @staticmethod
+    def get_skincluster(mesh):
+        '''
+        get the skin cluster for mesh arg
+
+        @param mesh: mesh to get skin cluster for
+        @type mesh: transform
+        @return: skin cluster
+        @rtype: skinCluster node
+        '''
+        for node in pm.listHistory(mesh):
+            if type(node) == pm.nodetypes.SkinCluster:
+                return node
+
+    @staticmethod
+    def get_MFnSkinCluster(skincluster):
+        '''
+        gets the MFnSkinCluster class from a given skin cluster
+
+        @param skincluster: skin cluster
+        @type skincluster: skinCluster
+        @return:
+        @rtype:
+        '''
+
+        # get the MFnSkinCluster for skinCluster
+        selList = OpenMaya.MSelectionList()
+        selList.add(skincluster.name())
+        clusterNode = OpenMaya.MObject()
+        selList.getDependNode(0, clusterNode)
+        skinFn = OpenMayaAnim.MFnSkinCluster(clusterNode)
+        return skinFn
+
+    @staticmethod
+    def get_weights_dict(skinFn, infIds):
+        '''
+        creates a dictionary with a vert id key and value of a dict whose key is the influence id and value is the
+        weight for that influence
+
+        @param skinFn: skin cluster
+        @type skinFn: MFnSkinCluster
+        @param infIds: dictionary whose key is the MPlug indice id and whose value is the influence list id
+        @type infIds: dict
+        @return: the weights are stored in dictionary, the key is the vert Id, the value is another dictionary whose
+        key is the influence id and value is the weight for that influence
+        @rtype: dict
+        '''
+
+        wlPlug = skinFn.findPlug('weightList')
+        wPlug = skinFn.findPlug('weights')
+        wlAttr = wlPlug.attribute()
+        wAttr = wPlug.attribute()
+        wInfIds = OpenMaya.MIntArray()
+
+        weights = {}
+        for vId in range(wlPlug.numElements()):
+            vert_weights = {}
+            # tell the weights attribute which vertex id it represents
+            wPlug.selectAncestorLogicalIndex(vId, wlAttr)
+            # get the indice of all non-zero weights for this vert
+            wPlug.getExistingArrayAttributeIndices(wInfIds)
+            # create a copy of the current wPlug
+            infPlug = OpenMaya.MPlug(wPlug)
+            for infId in wInfIds:
+                # tell the infPlug it represents the current influence id
+                infPlug.selectAncestorLogicalIndex(infId, wAttr)
+                # add this influence and its weight to this verts weights
+                try:
+                    vert_weights[infIds[infId]] = infPlug.asDouble()
+                except KeyError:
+                    # assumes a removed influence
+                    pass
+            weights[vId] = vert_weights
+
+        return weights
+
+    """
+    \/\/\/\/\/\/\/\/    fingerprint    \/\/\/\/\/\/\/\/
+    """
+
+    def get_content_hash(self, job):
+        """
+        hashes the scene content a job exports. models and rigs hash their export items (and the rig root) with
+        everything below them, the top transforms are left out when the model is zeroed. animations hash the curves of
+        the rig over the frame range
+
+        :param job: job from the plan
+        :type job: fbx_exporter_planner.ExportJob()
+        :return: sha1 hex digest
+        :rtype: str
+        """
+        if Debug.debug: print(('calling :: {0}'.format('get_content_hash')))
+
+        hasher = hashlib.sha1()
+        if job.kind == fbx_exporter_planner.animation_kind:
+            animation = job.data
+            for value in (job.layer.root, animation.start_frame, animation.end_frame, animation.muted_layers,
+                          pm.currentUnit(query=True, time=True)):
+                hasher.update(str(value).encode('utf-8'))
+
+            parent = self.get_top_level_parent(job.layer.root)
+            nodes = [parent.name()] + [node.name() for node in pm.listRelatives(parent, allDescendents=True)]
+            self.Resolver.hash_animation(hasher, nodes, float(animation.start_frame), float(animation.end_frame))
+        else:
+            items = list(job.data.export_items)
+            if job.kind == fbx_exporter_planner.rig_kind:
+                items.append(job.layer.root)
+            self.Resolver.hash_hierarchy(hasher, items, top_transforms=job.staging != fbx_exporter_planner.stage_zero)
+
+        return hasher.hexdigest()
+
+    """
+    \/\/\/\/\/\/\/\/    validation    \/\/\/\/\/\/\/\/
+    """
+
+    @staticmethod
+    def get_mesh_counts(nodes, count_polygons=True):
+        '''
+        vertex and polygon counts of the meshes under nodes
+
+        @param nodes: export items
+        @type nodes: [str]
+        @param count_polygons: False leaves the polygon counts out, a triangulated export changes them
+        @type count_polygons: bool
+        @return: {transform name: (vertices, polygons)}
+        @rtype: dict
+        '''
+        meshes = {}
+        for shape in pm.listRelatives(nodes, allDescendents=True, type='mesh', fullPath=True) or []:
+            if shape.intermediateObject.get():
+                continue
+            polygons = shape.numFaces() if count_polygons else None
+            meshes[shape.getParent().nodeName()] = (shape.numVertices(), polygons)
+
+        return meshes
+
+    def get_expectation(self, job):
+        '''
+        what the fbx of a job should hold, see fbx_exporter_validate. the scene has to be the way it was before the
+        job was staged
+
+        @param job: job from the plan
+        @type job: fbx_exporter_planner.ExportJob()
+        @return: expectation
+        @rtype: fbx_exporter_validate.ExportExpectation()
+        '''
+        if Debug.debug: print(('calling :: {0}'.format('get_expectation')))
+
+        if job.kind == fbx_exporter_planner.animation_kind:
+            # the exported joints are a renamed copy of the rig, only the take is checked
+            animation = job.data
+            return fbx_exporter_validate.ExportExpectation(frame_range=(animation.start_frame, animation.end_frame),
+                                                           has_joints=True)
+
+        items = [item for item in job.data.export_items if pm.objExists(item)]
+        count_polygons = not job.options.get('FBXExportTriangulate')
+        meshes = self.get_mesh_counts(items, count_polygons) if items else {}
+
+        if job.kind == fbx_exporter_planner.rig_kind:
+            joints = pm.ls(job.layer.root) + (pm.listRelatives(job.layer.root, allDescendents=True, type='joint')
+                                              or [])
+            skinned = bool(job.options.get('FBXExportSkins')) and any(self.get_skincluster(item) for item in items)
+            return fbx_exporter_validate.ExportExpectation(meshes, [joint.nodeName() for joint in joints], skinned)
+
+        return fbx_exporter_validate.ExportExpectation(meshes)
+
+    def validate(self, job):
+        '''
+        queues the fbx of an exported job for validation, the issues are set on the job (job.issues) once
+        Validator.wait() returns
+
+        @param job: exported job
+        @type job: fbx_exporter_planner.ExportJob()
+        '''
+        try:
+            expectation = self.get_expectation(job)
+        except Exception as e:
+            job.issues = ['could not read what the fbx should hold :: {0}: {1}'.format(type(e).__name__, e)]
+            return
+
+        self.Validator.submit(job, expectation, self.Exporter.get_publish(job.path))
+
+
+Stager = ExportStaging()
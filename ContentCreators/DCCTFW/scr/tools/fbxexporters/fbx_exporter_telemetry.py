@@ -0,0 +1,328 @@
+"""
+export telemetry. every export job is timed by stage and the size of the fbx and the number of exported items are
+recorded, so a slow export can be put down to option setup, selection, scene staging, the FBXExport call or the
+publish to the share
+
+    with Recorder.job(job.kind, job.name, job.path) as record:
+        with Recorder.stage(select_stage):
+            pm.select(items)
+
+stage timers outside of a job do nothing, the export functions are timed without knowing who called them. a stage
+inside another stage pauses it, so each second is counted once. time that is in no stage is reported as other
+
+each batch is appended to telemetry_path as json lines, one line per job then one line with the batch summary, so
+runs can be compared over time (see read_batches)
+    {"type": "job", "run", "kind", "name", "path", "stages": {stage: seconds}, "total", "bytes", "items",
+     "success", "error", "skipped", "kept", "deduplicated"}
+    {"type": "batch", "run", "time", "host", "scene", "mode", "version", "jobs", "exported", "failed", "skipped",
+     "deduplicated", "wall_time", "plan_time", "job_time", "stages", "bytes", "items", "jobs_per_minute",
+     "bytes_per_second", "slowest"}
+
+this module does not need Maya
+"""
+
+import collections
+import json
+import os
+import socket
+import tempfile
+import time
+from contextlib import contextmanager
+
+import scr
+
+
+telemetry_version = 1
+telemetry_path = os.path.join(tempfile.gettempdir(), scr.logger_name + '_fbx_export_telemetry.jsonl')
+
+# stages of an export job, in the order they happen
+resolve_stage = 'resolve'
+fingerprint_stage = 'fingerprint'
+scene_stage = 'stage'
+options_stage = 'options'
+select_stage = 'select'
+write_stage = 'write'
+post_stage = 'post'
+publish_stage = 'publish'
+stages = (resolve_stage, fingerprint_stage, scene_stage, options_stage, select_stage, write_stage, post_stage,
+          publish_stage)
+other_stage = 'other'
+
+
+class JobRecord(object):
+    """
+    timings of one export job
+    """
+    def __init__(self, kind=None, name=None, path=None):
+        self.kind = kind
+        self.name = name
+        self.path = path
+        # {stage: seconds}
+        self.stages = collections.OrderedDict()
+        self.total = 0.0
+        # size of the published fbx
+        self.bytes = 0
+        # number of items selected for the export
+        self.items = 0
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def get_other(self):
+        """
+        :return: seconds of the job that are in no stage
+        :rtype: float
+        """
+        return max(self.total - sum(self.stages.values()), 0.0)
+
+    def to_dict(self):
+        return {'kind': self.kind, 'name': self.name, 'path': self.path, 'stages': dict(self.stages),
+                'total': self.total, 'bytes': self.bytes, 'items': self.items}
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        :return: record or None if there is no data, a worker that died does not send one
+        :rtype: JobRecord()
+        """
+        if not data:
+            return None
+
+        record = cls(data.get('kind'), data.get('name'), data.get('path'))
+        for stage in stages + (other_stage,):
+            if stage in data.get('stages', {}):
+                record.stages[stage] = float(data['stages'][stage])
+        record.total = float(data.get('total', 0.0))
+        record.bytes = int(data.get('bytes', 0))
+        record.items = int(data.get('items', 0))
+        return record
+
+
+class ExportTelemetry(object):
+    """
+    records the job that is exporting in this process
+    """
+    def __init__(self):
+        self.current = None
+        # [[stage, start]] of the stages that are open
+        self.active = []
+
+    @contextmanager
+    def job(self, kind, name, path):
+        """
+        times a job, a job inside a job is part of the outer one
+
+        :return: record of the job
+        :rtype: JobRecord()
+        """
+        if self.current is not None:
+            yield self.current
+            return
+
+        record = JobRecord(kind, name, path)
+        self.current = record
+        self.active = []
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.total = time.perf_counter() - start
+            self.current = None
+            self.active = []
+
+    @contextmanager
+    def stage(self, name):
+        """
+        adds the time of the block to a stage of the current job
+        """
+        record = self.current
+        if record is None:
+            yield
+            return
+
+        now = time.perf_counter()
+        if self.active:
+            outer = self.active[-1]
+            record.add(outer[0], now - outer[1])
+        self.active.append([name, now])
+
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            if self.active:
+                stage, start = self.active.pop()
+                record.add(stage, now - start)
+                if self.active:
+                    self.active[-1][1] = now
+
+    def count(self, items=0, path=None):
+        """
+        adds exported items and the size of the fbx at path to the current job
+        """
+        record = self.current
+        if record is None:
+            return
+
+        record.items += items
+        if path is not None and os.path.isfile(path):
+            record.bytes = os.path.getsize(path)
+
+    def wrap(self, run_job):
+        """
+        :param run_job: function(job) that exports one job and returns success
+        :type run_job: function
+        :return: function(job) that runs run_job and sets job.telemetry
+        :rtype: function
+        """
+        def run_recorded_job(job):
+            with self.job(job.kind, job.name, job.path) as record:
+                job.telemetry = record
+                return run_job(job)
+
+        return run_recorded_job
+
+
+Recorder = ExportTelemetry()
+
+
+def get_run_id():
+    return '{0}-{1}'.format(time.strftime('%Y%m%d-%H%M%S'), os.getpid())
+
+
+def get_job_rows(results, run=None):
+    """
+    :param results: results of a batch
+    :type results: [fbx_exporter_planner.ExportResult()]
+    :return: one row per job. jobs that could not run have no stages
+    :rtype: [dict]
+    """
+    rows = []
+    for result in results:
+        job = result.job
+        record = job.telemetry or JobRecord(job.kind, job.name, job.path)
+        row = record.to_dict()
+        if record.total:
+            row['stages'][other_stage] = record.get_other()
+        row.update({'type': 'job', 'run': run, 'success': result.success, 'error': result.error,
+                    'skipped': job.skipped, 'kept': job.kept, 'deduplicated': job.source is not None})
+        rows.append(row)
+
+    return rows
+
+
+def summarize(rows, wall_time, plan_time=0.0, slowest=5):
+    """
+    aggregates the job rows of a batch
+
+    :param rows: see get_job_rows
+    :type rows: [dict]
+    :param wall_time: seconds the batch took
+    :type wall_time: float
+    :param plan_time: seconds it took to plan the batch
+    :type plan_time: float
+    :param slowest: number of slowest jobs to keep
+    :type slowest: int
+    :return: batch summary
+    :rtype: dict
+    """
+    totals = collections.OrderedDict((stage, 0.0) for stage in stages + (other_stage,))
+    for row in rows:
+        for stage, seconds in row['stages'].items():
+            totals[stage] = totals.get(stage, 0.0) + seconds
+
+    exported = [row for row in rows if row['success'] and not row['skipped'] and not row['deduplicated']]
+    slowest_rows = sorted(rows, key=lambda row: row['total'], reverse=True)[:slowest]
+    output_bytes = sum(row['bytes'] for row in exported)
+
+    return {'type': 'batch', 'jobs': len(rows), 'exported': len(exported),
+            'failed': len([row for row in rows if not row['success']]),
+            'skipped': len([row for row in rows if row['skipped']]),
+            'deduplicated': len([row for row in rows if row['deduplicated'] and row['success']]),
+            'wall_time': wall_time, 'plan_time': plan_time, 'job_time': sum(row['total'] for row in rows),
+            'stages': dict((stage, seconds) for stage, seconds in totals.items() if seconds),
+            'bytes': output_bytes, 'items': sum(row['items'] for row in exported),
+            'jobs_per_minute': len(exported) * 60.0 / wall_time if wall_time else 0.0,
+            'bytes_per_second': output_bytes / wall_time if wall_time else 0.0,
+            'slowest': [[row['kind'], row['name'], row['total']] for row in slowest_rows if row['total']]}
+
+
+def format_summary(summary):
+    """
+    :return: lines of a readable batch summary
+    :rtype: [str]
+    """
+    lines = ['{0} jobs in {1:.2f}s (planned in {2:.2f}s) :: {3} exported, {4} unchanged, {5} deduplicated, '
+             '{6} failed'.format(summary['jobs'], summary['wall_time'], summary['plan_time'], summary['exported'],
+                                 summary['skipped'], summary['deduplicated'], summary['failed'])]
+
+    job_time = summary['job_time']
+    if job_time:
+        parts = ['{0} {1:.2f}s ({2:.0%})'.format(stage, seconds, seconds / job_time)
+                 for stage, seconds in sorted(summary['stages'].items(), key=lambda item: item[1], reverse=True)]
+        lines.append('time per stage :: ' + ', '.join(parts))
+
+    lines.append('throughput :: {0:.1f} jobs/min, {1:.2f} MB/s, {2} MB, {3} items'.format(
+        summary['jobs_per_minute'], summary['bytes_per_second'] / (1 << 20), summary['bytes'] // (1 << 20),
+        summary['items']))
+
+    if summary['slowest']:
+        lines.append('slowest :: ' + ', '.join('{0} {1} {2:.2f}s'.format(kind, name, seconds)
+                                              for kind, name, seconds in summary['slowest']))
+
+    return lines
+
+
+def write_batch(results, wall_time, plan_time=0.0, scene=None, mode=None, path=None):
+    """
+    appends the job rows and the summary of a batch to the telemetry file. a file that can not be written does not
+    fail the export, the summary is still returned
+
+    :param results: results of the batch
+    :type results: [fbx_exporter_planner.ExportResult()]
+    :param scene: scene the batch exported from
+    :type scene: str
+    :param mode: how the batch ran, local or pool
+    :type mode: str
+    :param path: telemetry file, telemetry_path if None
+    :type path: str
+    :return: batch summary, see summarize
+    :rtype: dict
+    """
+    run = get_run_id()
+    rows = get_job_rows(results, run)
+    summary = summarize(rows, wall_time, plan_time)
+    summary.update({'run': run, 'time': time.time(), 'host': socket.gethostname(), 'scene': scene, 'mode': mode,
+                    'version': telemetry_version})
+
+    lines = [json.dumps(row, sort_keys=True) for row in rows + [summary]]
+    try:
+        with open(path or telemetry_path, 'a') as telemetry_file:
+            telemetry_file.write('\n'.join(lines) + '\n')
+    except (IOError, OSError):
+        pass
+
+    return summary
+
+
+def read_batches(path=None):
+    """
+    :param path: telemetry file, telemetry_path if None
+    :type path: str
+    :return: batch summaries in the order they ran, lines that can not be read are left out
+    :rtype: [dict]
+    """
+    batches = []
+    if not os.path.isfile(path or telemetry_path):
+        return batches
+
+    with open(path or telemetry_path) as telemetry_file:
+        for line in telemetry_file:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(row, dict) and row.get('type') == 'batch':
+                batches.append(row)
+
+    return batches
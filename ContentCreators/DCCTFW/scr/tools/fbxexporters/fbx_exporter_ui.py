@@ -1,10 +1,9 @@
 import os
 import maya.OpenMaya as OpenMaya
 import pymel.core as pm
-import maya.OpenMayaAnim as OpenMayaAnim
 import random
 import logging
-import tempfile
+import time
 from pathlib import Path
 
 from PySide6 import QtWidgets, QtGui, QtUiTools, QtCore
@@ -15,7 +14,16 @@ from shiboken6 import wrapInstance
 
 import scr
 from scr.tools.fbxexporters import fbx_exporter_export
+from scr.tools.fbxexporters import fbx_exporter_fingerprint
 from scr.tools.fbxexporters import fbx_exporter_data
+from scr.tools.fbxexporters import fbx_exporter_planner
+from scr.tools.fbxexporters import fbx_exporter_serialize
+from scr.tools.fbxexporters import fbx_exporter_scene
+from scr.tools.fbxexporters import fbx_exporter_staging
+from scr.tools.fbxexporters import fbx_exporter_telemetry
+from scr.tools.fbxexporters import fbx_exporter_validate
+from scr.tools.fbxexporters import fbx_exporter_vcs
+from scr.tools.fbxexporters import fbx_exporter_workers
 from scr.tools.fbxexporters import fbx_exporter_ui
 from scr.tools.fbxexporters import Identifiers
 from scr.tools.fbxexporters import Debug
@@ -46,6 +54,10 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
         self.ExportData = fbx_exporter_data.ExporterData
         self.FbxExporter = scr.framework.ToolHelpers()
         self.Exporter = fbx_exporter_export.Exporter
+        self.Stager = fbx_exporter_staging.Stager
+        self.Recorder = fbx_exporter_telemetry.Recorder
+        self.Validator = fbx_exporter_validate.Validator
+        self.VersionControl = fbx_exporter_vcs.VersionControl
         self.ExportOptions = ExportOptions
         self.framework_paths = scr.framework_paths['project_path']
         self.Browsers = dialogs.Browsers()
@@ -69,9 +81,11 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
 
         # model vars
         self.model_layers = []
-        self.user_options = UserOptionsData()
+        self.user_options = self.ExportData.populate_users_options_class()
         self.old_layer = None
         self.model_column_double_clicked = None
+        # last compaction, kept so it can be restored
+        self.compaction_report = None
 
         # ui events
         # main menu buttons
@@ -86,6 +100,13 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
         self.ui.act_project_trunk.triggered.connect(self.set_project_trunk)
         self.ui.act_export_xml.triggered.connect(self.ExportData.export_xml)
         self.ui.act_import_xml.triggered.connect(self.ExportData.import_xml)
+        self.ui.act_enable_save_to_disk.setChecked(self.user_options.save_to_disk)
+        self.ui.act_enable_save_to_disk.toggled.connect(self.update_user_options)
+        self.ui.act_compact_data.triggered.connect(self.compact_data)
+        self.ui.act_export_all.triggered.connect(self.export_all)
+        self.ui.act_export_all_background.triggered.connect(self.export_all_in_background)
+        self.ui.act_restore_compacted_data.triggered.connect(self.restore_compacted_data)
+        self.ui.act_restore_compacted_data.setEnabled(False)
 
         # anim buttons
         # self.ui.btn_add_actor.clicked.connect(self.btn_add_actor_clicked)
@@ -103,6 +124,11 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
         self.ui.tre_animations.itemChanged.connect(self.tre_animations_changed)
         self.ui.tre_animations.itemPressed.connect(self.tre_animations_pressed)
 
+        # children of lazy loaded layers are added on expand
+        self.ui.tre_rigs.itemExpanded.connect(self.tre_item_expanded)
+        self.ui.tre_animations.itemExpanded.connect(self.tre_item_expanded)
+        self.ui.tre_models.itemExpanded.connect(self.tre_item_expanded)
+
         # model tree
         self.ui.tre_models.itemDoubleClicked.connect(self.tre_models_double_clicked)
         self.ui.tre_models.itemChanged.connect(self.tre_models_changed)
@@ -139,6 +165,11 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
 
         self.remove_callbacks()
         self.add_callbacks()
+        # fileInfo can be edited from the script editor while the tool is closed so start from a clean read
+        self.ExportData.invalidate_cache()
+        self.ExportData.lazy_load = self.user_options.lazy_load
+        # scenes saved before the json format still hold xml, convert them once on open
+        self.ExportData.migrate_legacy_fileInfo()
         self.populate_trees_ui()
         self.ui.show()
         self.ui.lab_log.setText('Welcome to the FBX Exporter')
@@ -189,7 +220,9 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
         """
         callback for Maya file opened
         """
-        pass
+        self.ExportData.invalidate_cache()
+        # a reopened scene is whole again after a rig export that was not rolled back
+        self.Stager.restored = True
 
         # closing current ui and populating new ui based on new file opening
         try:
@@ -204,6 +237,9 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
         """
         callback for new Maya file
         """
+        self.ExportData.invalidate_cache()
+        self.Stager.restored = True
+
         try:
             if self.ui.isVisible():
                 self.ui.close()
@@ -213,11 +249,10 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
 
     def file_saved(self, *args):
         """
-        callback for saved Maya file
+        callback for saved Maya file. writes the sidecar manifest of the exporter data if the option is on
         """
-        pass
-        # if self.user_options.save_to_disk:
-        #     self.write_fileInfo_to_disk()
+        if self.user_options.save_to_disk:
+            self.ExportData.write_fileInfo_to_disk()
 
     def add_callbacks(self):
         """
@@ -262,8 +297,9 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
         if Debug.debug: print(('calling :: {0}'.format('remove_model_click')))
 
         items = self.get_selected_items_from_active_tab()
-        for item in items:
-            self.remove_model(item)
+        with self.ExportData.transaction('Remove Model'):
+            for item in items:
+                self.remove_model(item)
 
         self.populate_model_tree_ui()
 
@@ -294,15 +330,13 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
 
         self.ui.tre_models.blockSignals(True)
 
-        for layer in self.model_layers:
-            if item.parent():
-                if layer.name == item.parent().text(0):
-                    for model in layer.models:
-                        if model.name == item.text(0):
-                            temp_list = temp_list + model.export_items
-                            model.export_items = set(temp_list)
+        if item.parent():
+            layer, model = self.ExportData.get_item_data(item, Identifiers.model_layer_identifier)
+            if model is not None:
+                # existing items first so the item the model uuid belongs to stays first
+                model.export_items = list(dict.fromkeys(model.export_items + temp_list))
 
-                            self.ExportData.write_model_layer_data_to_fileinfo(self.model_layers)
+                self.ExportData.write_model_layer_data_to_fileinfo([layer])
 
         self.ui.tre_models.blockSignals(False)
         self.populate_model_tree_ui()
@@ -320,15 +354,13 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
 
         self.ui.tre_models.blockSignals(True)
 
-        for layer in self.model_layers:
-            if layer.name == item.parent().text(0):
-                for model in layer.models:
-                    if model.name == item.text(0):
-                        for sel in selected:
-                            if sel.name() in model.export_items:
-                                model.export_items.remove(sel.name())
+        layer, model = self.ExportData.get_item_data(item, Identifiers.model_layer_identifier)
+        if model is not None:
+            for sel in selected:
+                if sel.name() in model.export_items:
+                    model.export_items.remove(sel.name())
 
-                        self.ExportData.write_model_layer_data_to_fileinfo(self.model_layers)
+            self.ExportData.write_model_layer_data_to_fileinfo([layer])
 
         self.ui.tre_models.blockSignals(False)
         self.populate_model_tree_ui()
@@ -342,12 +374,10 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
         """
         if Debug.debug: print(('calling :: {0}'.format('print_export_items')))
 
-        for layer in self.model_layers:
-            if layer.name == item.parent().text(0):
-                for model in layer.models:
-                    if model.name == item.text(0):
-                        for export_item in model.export_items:
-                            print(('\t{0}'.format(export_item)))
+        layer, model = self.ExportData.get_item_data(item, Identifiers.model_layer_identifier)
+        if model is not None:
+            for export_item in model.export_items:
+                print(('\t{0}'.format(export_item)))
 
     def remove_model_layer_click(self, item):
         """
@@ -372,8 +402,9 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
         if Debug.debug: print(('calling :: {0}'.format('remove_model_layer')))
 
         items = self.get_selected_items_from_active_tab()
-        for item in items:
-            fbx_exporter_data.ExporterData.remove_key(Identifiers.model_layer_identifier + item.text(0))
+        with self.ExportData.transaction('Remove Layer'):
+            for item in items:
+                fbx_exporter_data.ExporterData.remove_key(Identifiers.model_layer_identifier + item.text(0))
 
         self.populate_model_tree_ui()
 
@@ -394,27 +425,22 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
         items = self.get_selected_items_from_active_tab()
         for item in items:
             if item.whatsThis(0) == Identifiers.rig_layer_identifier:
-                for layer in self.rig_layers:
-                    if layer.name == item.text(0):
-                        select_set.add(layer.root)
+                layer = self.ExportData.get_layer_data(Identifiers.rig_layer_identifier + item.text(0))
+                if layer is not None:
+                    select_set.add(layer.root)
             elif item.whatsThis(0) == Identifiers.rigs_str:
-                for layer in self.rig_layers:
-                    for model in layer.models:
-                        if model.name == item.text(0):
-                            for export_item in model.export_items:
-                                select_set.add(export_item)
+                layer, model = self.ExportData.get_item_data(item, Identifiers.rig_layer_identifier)
+                if model is not None:
+                    select_set.update(model.export_items)
             if item.whatsThis(0) == Identifiers.model_layer_str:
-                for layer in self.model_layers:
-                    if layer.name == item.text(0):
-                        for model in layer.models:
-                            for export_item in model.export_items:
-                                select_set.add(export_item)
-            elif item.whatsThis(0) == Identifiers.models_str:
-                for layer in self.model_layers:
+                layer = self.ExportData.get_layer_data(Identifiers.model_layer_identifier + item.text(0))
+                if layer is not None:
                     for model in layer.models:
-                        if model.name == item.text(0):
-                            for export_item in model.export_items:
-                                select_set.add(export_item)
+                        select_set.update(model.export_items)
+            elif item.whatsThis(0) == Identifiers.models_str:
+                layer, model = self.ExportData.get_item_data(item, Identifiers.model_layer_identifier)
+                if model is not None:
+                    select_set.update(model.export_items)
 
         select_list = list(select_set)
 
@@ -611,11 +637,12 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
                         add_models.append(tran.name())
 
         if add_models:
+            uuids = fbx_exporter_scene.Resolver.get_uuids(add_models[:1])
             for rig in self.rig_layers:
                 if rig.name == layer_name:
                     model_data = RigModelData()
                     model_data.name = add_models[0]
-                    model_data.uuid = self.FbxExporter.get_uuid(add_models[0])
+                    model_data.uuid = uuids.get(add_models[0])
                     model_data.path = rig.rig_path
                     model_data.export_items = add_models
                     model_data.influences = '0'
@@ -739,6 +766,44 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
         TrunkUI = fbx_exporter_ui.ProjectTrunkUI()
         TrunkUI.run()
 
+    def compact_data(self):
+        '''
+        reports orphaned keys, duplicate layers and models that are no longer in the scene and prunes them if the user
+        agrees
+        '''
+        if Debug.debug: print(('calling :: {0}'.format('compact_data')))
+
+        report = self.ExportData.compact(prune=False)
+        if not report.changes:
+            self.ui.lab_log.setText('Nothing to compact')
+            return
+
+        self.logger.info('{0}'.format(report))
+        out = '{0}\n\nSee the script editor for the full list. Prune them?'.format(str(report).split('\n')[0])
+        confirm = pm.confirmDialog(title='Compact export data', message=out, button=['Prune', 'Cancel'],
+                                   defaultButton='Prune', cancelButton='Cancel')
+        if confirm != 'Prune':
+            return
+
+        self.compaction_report = self.ExportData.compact()
+        self.ui.act_restore_compacted_data.setEnabled(True)
+        self.populate_trees_ui()
+        self.ui.lab_log.setText('Compacted export data, {0} fileInfo change(s)'.format(
+            len(self.compaction_report.changes)))
+
+    def restore_compacted_data(self):
+        '''
+        puts back the data removed by the last compaction
+        '''
+        if Debug.debug: print(('calling :: {0}'.format('restore_compacted_data')))
+
+        if self.compaction_report is not None:
+            self.ExportData.restore_compaction(self.compaction_report)
+            self.compaction_report = None
+            self.ui.act_restore_compacted_data.setEnabled(False)
+            self.populate_trees_ui()
+            self.ui.lab_log.setText('Restored compacted export data')
+
     def set_debug(self):
         """
         turns on the option to print out functions as they are called
@@ -788,17 +853,12 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
 
         items = self.ui.tre_animations.selectedItems()
 
-        for item in items:
-            if item.whatsThis(0) == Identifiers.model_layer_str:
-                for layer in self.actors_layers:
-                    for animation in layer.animations:
-                        self.export_animation(animation, layer)
+        plan = self.plan_exports({Identifiers.actor_identifier: self.actors_layers})
+        if not [item for item in items if item.whatsThis(0) == Identifiers.model_layer_str]:
+            names = [item.text(0) for item in items if item.whatsThis(0) == Identifiers.animations_str]
+            plan = fbx_exporter_planner.ExportPlan([job for job in plan.jobs if job.name in names])
 
-            elif item.whatsThis(0) == Identifiers.animations_str:
-                for layer in self.actors_layers:
-                    for animation in layer.animations:
-                        if animation.anim_name == item.text(0):
-                            self.export_animation(animation, layer)
+        self.run_export_plan(plan)
 
     def btn_select_selected_clicked(self):
         """
@@ -812,9 +872,7 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
         if self.actors_layers:
             self.Save.query_save_scene_on_export()
 
-        for actor in self.actors_layers:
-            for animation in actor.animations:
-                self.export_animation(animation, actor)
+        self.run_export_plan(self.plan_exports({Identifiers.actor_identifier: self.actors_layers}))
 
     # hack need to marry the next 2 with combine dialog
     # 1
@@ -847,12 +905,9 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
     def update_user_options(self):
         if Debug.debug: print(('calling :: {0}'.format('update_user_options')))
 
-        user_options = UserOptionsData()
+        self.user_options.save_to_disk = self.ui.act_enable_save_to_disk.isChecked()
 
-        user_options.auto_select_in_scene = self.ui.act_auto_select_in_scene.isChecked()
-        user_options.save_to_disk = self.ui.act_enable_save_to_disk.isChecked()
-
-        self.ExportData.write_user_option_data_to_prefs(user_options)
+        self.ExportData.write_user_option_data_to_prefs(self.user_options)
 
     def export_options(self, item):
         """
@@ -879,7 +934,10 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
                     model_options = ModelExportUI(update_layer, Identifiers.model_layer_str)
                     if model_options.ui.exec_():
                         self.ExportData.write_model_layer_data_to_fileinfo(self.model_layers)
-                        self.populate_model_tree_ui()
+                    else:
+                        # the option ui edits the cached layer in place, drop it so the cancelled edit is discarded
+                        self.ExportData.invalidate_cache(Identifiers.model_layer_identifier + layer.name)
+                    self.populate_model_tree_ui()
 
         elif item.whatsThis(0) == Identifiers.models_str:
             print('model_str')
@@ -890,7 +948,9 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
                             model_options = ModelExportUI(model, Identifiers.models_str)
                             if model_options.ui.exec_():
                                 self.ExportData.write_model_layer_data_to_fileinfo(self.model_layers)
-                                self.populate_model_tree_ui()
+                            else:
+                                self.ExportData.invalidate_cache(Identifiers.model_layer_identifier + layer.name)
+                            self.populate_model_tree_ui()
 
         # self.ui.tre_models.blockSignals(False)
 
@@ -904,13 +964,9 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
         if Debug.debug: print(('calling :: {0}'.format('export_model_layer')))
 
         if scr.framework_paths['project_path']:
-            root = self.ui.tre_models.invisibleRootItem()
-
-            for tree_child in range(root.childCount()):
-                layer_item = self.ui.tre_models.topLevelItem(tree_child)
-                if layer_item.text(0) == item.text(0):
-                    for model_item in range(layer_item.childCount()):
-                        self.export_model(layer_item.child(model_item))
+            layer = self.ExportData.get_layer_data(Identifiers.model_layer_identifier + item.text(0))
+            if layer is not None:
+                self.run_export_plan(self.plan_exports({Identifiers.model_layer_identifier: [layer]}))
         else:
             out = ('No project Path found.')
             self.logger.critical(out)
@@ -1011,23 +1067,21 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
         """
 
         if scr.framework_paths['project_path']:
-            for layer in self.model_layers:
-                if item.parent().text(0) == layer.name:
-                    for model in layer.models:
-                        if item.text(0) == model.name:
-                            if model.fbx_export_override_layer_path:
-                                export_dir = self.get_export_dir(layer.path, model, Identifiers.models_str)
-                            else:
-                                export_dir = self.get_export_dir(layer.path, '', Identifiers.model_layer_str)
+            layer, model = self.ExportData.get_item_data(item, Identifiers.model_layer_identifier)
+            if model is not None:
+                if model.fbx_export_override_layer_path:
+                    export_dir = self.get_export_dir(layer.path, model, Identifiers.models_str)
+                else:
+                    export_dir = self.get_export_dir(layer.path, '', Identifiers.model_layer_str)
 
-                            if export_dir:
-                                export_path = export_dir + '\\' + model.name + '.fbx'
-                                if model.fbx_export_override_layer_options:
-                                    options = self.set_export_options(model, Identifiers.models_str)
-                                else:
-                                    options = self.set_export_options(layer, Identifiers.model_layer_str)
+                if export_dir:
+                    export_path = export_dir + '\\' + model.name + '.fbx'
+                    if model.fbx_export_override_layer_options:
+                        options = self.set_export_options(model, Identifiers.models_str)
+                    else:
+                        options = self.set_export_options(layer, Identifiers.model_layer_str)
 
-                                self.Exporter.export_model_setup(model, export_path, options)
+                    self.Exporter.export_model_setup(model, export_path, options)
         else:
             out = ('No project Path found.')
             self.logger.critical(out)
@@ -1075,6 +1129,7 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
                             valid_models.append(add_model)
 
                     if valid_models:
+                        uuids = fbx_exporter_scene.Resolver.get_uuids(valid_models)
                         for model in valid_models:
                             model_data = ModelData()
 
@@ -1084,7 +1139,7 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
                                 model_data.name = model
 
                             model_data.export_items.append(model)
-                            model_data.uuid = self.FbxExporter.get_uuid(model)
+                            model_data.uuid = uuids.get(model)
                             layer.models.append(model_data)
                     else:
                         out = ('{0} already added to Layer'.format(not_valid_models))
@@ -1107,7 +1162,7 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
         import random
 
         model_layer_data = LayerData()
-        model_layer_data.fbx_export_override_layer_path = False
+        model_layer_data.fbx_export_override_path = False
         model_layer_data.fbx_export_override_options = False
         path = self.Browsers.get_existing_directory('Model Layer export path', scr.framework_paths['project_path'])
         use_path = self.FbxExporter.get_relative_path(path)
@@ -1126,8 +1181,9 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
             print('model_layer_data.name :: {}'.format(model_layer_data.name))
 
             self.model_layers.append(model_layer_data)
-            self.add_multiple_models(name, None, None, mess=False)
-            self.ExportData.write_model_layer_data_to_fileinfo(self.model_layers)
+            with self.ExportData.transaction('Add Layer'):
+                self.add_multiple_models(name, None, None, mess=False)
+                self.ExportData.write_model_layer_data_to_fileinfo(self.model_layers)
             self.populate_model_tree_ui()
 
     # >>>>>>>>>>>>>>>>>>>>>>>>  trees  <<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<#
@@ -1174,22 +1230,37 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
             character_item.setText(0, character.name)
             character_item.setWhatsThis(0, Identifiers.model_layer_str)
 
-            for animation in character.animations:
-                animation_item = QtWidgets.QTreeWidgetItem()
-                animation_item.setFlags(animation_item.flags() | Qt.ItemIsEditable)
-                animation_item.setSizeHint(0, QSize(-1, 20))
-                animation_item.setWhatsThis(0, Identifiers.animations_str)
-                animation_item.setText(0, animation.anim_name)
-                animation_item.setText(1, animation.start_frame)
-                animation_item.setText(2, animation.end_frame)
-                animation_item.setText(3, animation.path)
-                animation_item.setText(4, animation.override_path)
-                animation_item.setText(5, animation.muted_layers)
-                character_item.addChild(animation_item)
+            if fbx_exporter_serialize.is_loaded(character.animations):
+                self.add_animation_items(character_item, character)
+            else:
+                # animations are added when the item is expanded (tre_item_expanded)
+                character_item.setChildIndicatorPolicy(QtWidgets.QTreeWidgetItem.ShowIndicator)
 
             self.ui.tre_animations.addTopLevelItem(character_item)
             self.set_expand_items(expanded_items)
 
+    def add_animation_items(self, character_item, character):
+        '''
+        adds the animations of an actor to its tree item
+
+        @param character_item: actor tree item
+        @type character_item: QTreeWidgetItem
+        @param character: actor data
+        @type character: ActorLayerData()
+        '''
+        for animation in character.animations:
+            animation_item = QtWidgets.QTreeWidgetItem()
+            animation_item.setFlags(animation_item.flags() | Qt.ItemIsEditable)
+            animation_item.setSizeHint(0, QSize(-1, 20))
+            animation_item.setWhatsThis(0, Identifiers.animations_str)
+            animation_item.setText(0, animation.anim_name)
+            animation_item.setText(1, animation.start_frame)
+            animation_item.setText(2, animation.end_frame)
+            animation_item.setText(3, animation.path)
+            animation_item.setText(4, animation.override_path)
+            animation_item.setText(5, animation.muted_layers)
+            character_item.addChild(animation_item)
+
     def create_animation_tree_menu(self):
         '''
         creates right click option for the anim tree
@@ -1362,35 +1433,51 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
             rig_item.setText(2, rig.animation_path)
             rig_item.setWhatsThis(0, Identifiers.rig_layer_identifier)
 
-            for model in rig.models:
-                model_item = QtWidgets.QTreeWidgetItem()
-                model_item.setFlags(model_item.flags() | Qt.ItemIsEditable)
-                model_item.setWhatsThis(0, Identifiers.rigs_str)
-                model_item.setText(0, model.name)
-
-                # adding drop down for skin influences
-                combo_box = QtWidgets.QComboBox()
-                combo_box.setFixedWidth(60)
-                combo_box.addItem('')
-                combo_box.addItem('1')
-                combo_box.addItem('2')
-                combo_box.addItem('3')
-
-                if eval(model.influences):
-                    combo_box.setCurrentIndex(int(model.influences))
-                else:
-                    combo_box.setCurrentIndex(0)
-
-                combo_box.currentIndexChanged.connect(self.cmb_current_index_changed)
-
-                rig_item.addChild(model_item)
-                self.ui.tre_rigs.setItemWidget(model_item, 3, combo_box)
-
+            # the influence combo boxes can only be set once the item is in the tree
             self.ui.tre_rigs.addTopLevelItem(rig_item)
+            if fbx_exporter_serialize.is_loaded(rig.models):
+                self.add_rig_model_items(rig_item, rig)
+            else:
+                # models are added when the item is expanded (tre_item_expanded)
+                rig_item.setChildIndicatorPolicy(QtWidgets.QTreeWidgetItem.ShowIndicator)
+
             self.FbxExporter.set_expand_items(self.ui.tre_rigs, expanded_items)
             self.ui.tre_rigs.setColumnWidth(0, 160)
             self.ui.tre_rigs.setColumnWidth(3, 62)
 
+    def add_rig_model_items(self, rig_item, rig):
+        '''
+        adds the models of a rig to its tree item
+
+        @param rig_item: rig tree item, needs to be in the tree already
+        @type rig_item: QTreeWidgetItem
+        @param rig: rig data
+        @type rig: RigLayerData()
+        '''
+        for model in rig.models:
+            model_item = QtWidgets.QTreeWidgetItem()
+            model_item.setFlags(model_item.flags() | Qt.ItemIsEditable)
+            model_item.setWhatsThis(0, Identifiers.rigs_str)
+            model_item.setText(0, model.name)
+
+            # adding drop down for skin influences
+            combo_box = QtWidgets.QComboBox()
+            combo_box.setFixedWidth(60)
+            combo_box.addItem('')
+            combo_box.addItem('1')
+            combo_box.addItem('2')
+            combo_box.addItem('3')
+
+            if eval(model.influences):
+                combo_box.setCurrentIndex(int(model.influences))
+            else:
+                combo_box.setCurrentIndex(0)
+
+            combo_box.currentIndexChanged.connect(self.cmb_current_index_changed)
+
+            rig_item.addChild(model_item)
+            self.ui.tre_rigs.setItemWidget(model_item, 3, combo_box)
+
     def create_rig_menu(self, item):
         '''
         creates context menu for rig layer item
@@ -1621,31 +1708,72 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
             #     layer_item.setCheckState(1, Qt.Unchecked)
             #     layer_item.setText(1, 'False')
 
-            # color = 0
-            for model in layer.models:
-                model_item = QtWidgets.QTreeWidgetItem()
-                model_item.setFlags(model_item.flags() | Qt.ItemIsEditable)
-                model_item.setSizeHint(0, QSize(-1, 20))
-                model_item.setWhatsThis(0, Identifiers.models_str)
-                model_item.setText(0, model.name)
-                model_item.setText(1, model.path)
-                layer_item.addChild(model_item)
-
-                # if color:
-                #     for i in range(model_item.columnCount()):
-                #         # removing alternating colors. After
-                #         # model_item.setBackground(i, QtGui.QBrush(self.dark_grey))
-                #         model_item.setBackground(i, QtGui.QBrush(self.grey))
-                # else:
-                #     for i in range(model_item.columnCount()):
-                #         model_item.setBackground(i, QtGui.QBrush(self.grey))
-
-                # color = not color
+            if fbx_exporter_serialize.is_loaded(layer.models):
+                self.add_model_items(layer_item, layer)
+            else:
+                # models are added when the item is expanded (tre_item_expanded)
+                layer_item.setChildIndicatorPolicy(QtWidgets.QTreeWidgetItem.ShowIndicator)
 
             self.ui.tre_models.addTopLevelItem(layer_item)
             self.FbxExporter.set_expand_items(self.ui.tre_models, expanded_items)
             self.ui.tre_models.setColumnWidth(0, 180)
 
+    def add_model_items(self, layer_item, layer):
+        """
+        adds the models of a layer to its tree item
+
+        :param layer_item: layer tree item
+        :type layer_item: QTreeWidgetItem
+        :param layer: layer data
+        :type layer: LayerData()
+        """
+        # color = 0
+        for model in layer.models:
+            model_item = QtWidgets.QTreeWidgetItem()
+            model_item.setFlags(model_item.flags() | Qt.ItemIsEditable)
+            model_item.setSizeHint(0, QSize(-1, 20))
+            model_item.setWhatsThis(0, Identifiers.models_str)
+            model_item.setText(0, model.name)
+            model_item.setText(1, model.path)
+            layer_item.addChild(model_item)
+
+            # if color:
+            #     for i in range(model_item.columnCount()):
+            #         # removing alternating colors. After
+            #         # model_item.setBackground(i, QtGui.QBrush(self.dark_grey))
+            #         model_item.setBackground(i, QtGui.QBrush(self.grey))
+            # else:
+            #     for i in range(model_item.columnCount()):
+            #         model_item.setBackground(i, QtGui.QBrush(self.grey))
+
+            # color = not color
+
+    def tre_item_expanded(self, item):
+        """
+        event triggered by a tree item being expanded. with lazy_load the models/animations of a layer are read and
+        added to the tree the first time its item is expanded
+
+        :param item: expanded tree item
+        :type item: QTreeWidgetItem
+        """
+        if item.parent() is not None or item.childCount():
+            return
+
+        if Debug.debug: print(('calling :: {0}'.format('tre_item_expanded')))
+
+        tree = item.treeWidget()
+        if tree is self.ui.tre_models:
+            layers, add_items = self.model_layers, self.add_model_items
+        elif tree is self.ui.tre_rigs:
+            layers, add_items = self.rig_layers, self.add_rig_model_items
+        else:
+            layers, add_items = self.actors_layers, self.add_animation_items
+
+        for layer in layers:
+            if layer.name == item.text(0):
+                add_items(item, layer)
+                break
+
     def tre_models_double_clicked(self, item, column):
         """
         event triggered by tree model item itemDoubleClicked (model or layer)
@@ -1940,168 +2068,293 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
         '''
         if Debug.debug: print(('calling :: {0}'.format('export_rig')))
 
-        out = 'During the rig export process this file will be saved do you wish to continue?'
-        confirm = pm.confirmDialog(title='Rig export check', message=out, button=['Yes', 'No'], defaultButton='Yes',
-                                   cancelButton='No')
-
-        if self.framework_paths and confirm == 'Yes':
-            root = self.ui.tre_rigs.invisibleRootItem()
-
-            for tree_child in range(root.childCount()):
-                layer_item = self.ui.tre_rigs.topLevelItem(tree_child)
-
-                if layer_item.text(0) == item.text(0):
-                    for model_item in range(layer_item.childCount()):
-                        pm.refresh(suspend=True)
-                        self.export_rig(layer_item.child(model_item))
-                        pm.refresh(suspend=False)
+        if self.framework_paths:
+            rig = self.ExportData.get_layer_data(Identifiers.rig_layer_identifier + item.text(0))
+            if rig is not None:
+                self.run_export_plan(self.plan_exports({Identifiers.rig_layer_identifier: [rig]}))
         else:
             out = 'Please select a Project Trunk and try again'
             pm.confirmDialog(title='No Project Trunk', message=out, button=['OK'])
 
     def export_all_rigs(self):
 
-        root = self.ui.tre_rigs.invisibleRootItem()
-        for child in range(root.childCount()):
-            self.export_rig_layer(root.child(child))
+        if self.framework_paths:
+            self.run_export_plan(self.plan_exports(self.ExportData.get_layers((Identifiers.rig_layer_identifier,))))
 
-    def export_rig(self, item):
-        """
-        Exports individual rig by selecting the model and root nodes
-        Export saves a temporary version of the rig file and flattens the model and root for the FBX
-        After export the original file is opened and the temporary file is deleted
+    def export_all(self):
+        '''
+        exports every model, animation and rig in the scene in one plan
+        '''
+        if Debug.debug: print(('calling :: {0}'.format('export_all')))
 
-        :param item: the ui element of the rig to be exported
-        :type item: QTreeWidgetItem
-        :return:
-        :rtype:
-        """
-        if Debug.debug: print(('calling :: {0}'.format('export_rig')))
+        self.run_export_plan(self.plan_exports(self.ExportData.get_layers()))
 
-        if self.framework_paths:
-            for layer in self.rig_layers:
-                if item.parent().text(0) == layer.name:
-                    export_dir = self.get_export_directory(layer.rig_path)
-                    for model in layer.models:
-                        if item.text(0) == model.name:
-                            over_weighted = self.test_influences(item, from_export=True)
-                            if not over_weighted:
-                                temp_save_name = self.get_rig_temp_path()
-                                original_save_path = pm.sceneName()
-                                if os.access(pm.sceneName(), os.W_OK):
-                                    pm.saveFile()
-                                    pm.saveAs(temp_save_name)
-                                    for export_item in model.export_items:
-                                        success = self.flatten_rig(export_item)
-                                    if success:
-                                        success = self.flatten_rig(layer.root)
-                                        if success:
-                                            used_models = model.export_items
-                                            used_models.append(layer.root)
-
-                                            self.clean_scene(used_models)
-                                            success = self.Exporter.export_rig_setup(model.export_items, model.name, layer.root,
-                                                                           export_dir)
-
-                                            if success:
-                                                pm.saveFile()
-                                                pm.openFile(original_save_path)
-                                                os.remove(temp_save_name)
-
-                                                out = ('{} rig exported'.format(item.text(0)))
-                                                self.logger.info(out)
-                                                self.ui.lab_log.setText(out)
-                                            else:
-                                                out = ('{} rig export failed!'.format(item.text(0)))
-                                                self.logger.error(out)
-                                                self.ui.lab_log.setText(out)
-                                else:
-                                    out = ('Maya file is read-only, please checkout this Maya file')
-                                    self.logger.error(out)
-                                    self.ui.lab_log.setText(out)
+    def export_all_in_background(self):
+        '''
+        exports every model, animation and rig of the saved scene in headless Maya workers, see fbx_exporter_workers.
+        the open scene is not staged, saved or reopened
+        '''
+        if Debug.debug: print(('calling :: {0}'.format('export_all_in_background')))
 
-                            else:
-                                out = ('Export failed! There are over the max number of influences on {0}'.
-                                       format(model.name))
-                                self.logger.error(out)
-                                self.ui.lab_log.setText(out)
-        else:
-            out = 'Please select a Project Trunk and try again'
-            pm.confirmDialog(title='No Project Trunk', message=out, button=['OK'])
+        if not pm.sceneName() or pm.cmds.file(query=True, modified=True):
+            out = 'The workers export the saved scene, save the scene now?'
+            confirm = pm.confirmDialog(title='Save scene', message=out, button=['Yes', 'No'], defaultButton='Yes',
+                                       cancelButton='No')
+            if confirm != 'Yes' or not pm.sceneName():
+                return
+            pm.saveFile()
 
-    @staticmethod
-    def flatten_rig(node):
+        self.run_export_plan(self.plan_exports(self.ExportData.get_layers()), fbx_exporter_workers.Pool)
+
+    def plan_exports(self, layers):
         '''
-        set rig parent to world so the fbx is export flat instead of under a group or other node
+        resolves the fbx paths and options of everything in layers, see fbx_exporter_planner
 
-        @param node: root node of rig
-        @type node: joint
-        @return:
-        @rtype:
+        @param layers: {prefix: [layer data]}
+        @type layers: dict
+        @return: plan
+        @rtype: fbx_exporter_planner.ExportPlan()
         '''
-        if pm.objExists(node):
-            pm.parent(node, world=True)
-            return True
-        else:
-            print('{0} model not found to export'.format(node))
-            return False
+        if Debug.debug: print(('calling :: {0}'.format('plan_exports')))
+
+        return fbx_exporter_planner.plan_exports(layers, scr.framework_paths['project_path'],
+                                                 self.Exporter.global_export_options)
 
-    def clean_scene(self, used_models):
+    def run_export_job(self, job):
         '''
-        clean scene to get it ready for export to fbx. gets rid of stuff that is not to be exported
+        exports one planned job
 
-        @param used_models: models to be exports
-        @type used_models: str
-        @return:
-        @rtype:
+        @param job: job from the plan
+        @type job: fbx_exporter_planner.ExportJob()
+        @return: success
+        @rtype: bool
+        '''
+        success = False
+        if job.kind == fbx_exporter_planner.model_kind:
+            success = self.Exporter.export_model_job(job)
+        elif job.kind == fbx_exporter_planner.rig_kind:
+            success = self.export_rig_model(job.layer, job.data, os.path.dirname(job.path))
+        elif job.kind == fbx_exporter_planner.animation_kind:
+            success = self.export_animation(job.data, job.layer, os.path.dirname(job.path))
+
+        if success and self.Stager.restored:
+            # published and read back on background threads while the next job exports
+            self.Stager.validate(job)
+        return success
+
+    def finish_export_jobs(self, results):
         '''
+        waits for the exports of a plan to be published. jobs whose publish failed are failed, the others get job.kept
 
-        if Debug.debug: print(('calling :: {0}'.format('clean_scene')))
+        @param results: results of the jobs that ran
+        @type results: [fbx_exporter_planner.ExportResult()]
+        @return: results
+        @rtype: [fbx_exporter_planner.ExportResult()]
+        '''
+        if Debug.debug: print(('calling :: {0}'.format('finish_export_jobs')))
 
-        scene_transforms = pm.ls(assemblies=True)
-        scene_parents = []
-        for scene_transform in scene_transforms:
-            parent = self.get_top_level_parent(scene_transform)
-            scene_parents.append(parent)
+        errors = self.Exporter.wait_for_publishes()
 
-        models = []
-        for used_model in used_models:
-            models.append(self.Exporter.remove_pipe(used_model))
+        finished = []
+        for result in results:
+            job = result.job
+            if result.success and not job.skipped and job.path is not None:
+                key = self.Exporter.get_output_key(job.path)
+                if key in errors:
+                    result = fbx_exporter_planner.ExportResult(job, False, errors[key])
+                job.kept = result.success and self.Exporter.is_kept(job.path)
+            finished.append(result)
 
-        parents = []
-        for scene_parent in scene_parents:
-            if not type(scene_parent.getShape()) == pm.nodetypes.Camera:
-                parents.append(self.Exporter.remove_pipe(scene_parent.name()))
-
-        # remove any non joint nodes
-        delete1 = []
-        for parent in parents:
-            parent_node = pm.ls(parent)[0]
-            if type(parent_node) == pm.nodetypes.Joint:
-                kid_nodes = pm.listRelatives(parent_node, allDescendents=True)
-                for kid in kid_nodes:
-                    if type(kid) != pm.nodetypes.Joint:
-                        delete1.append(kid)
-
-        delete2 = list(set(models).symmetric_difference(set(parents)))
-        pm.delete(delete1, delete2)
+        return finished
 
-    @staticmethod
-    def get_rig_temp_path():
+    def run_export_plan(self, plan, pool=None):
         '''
-        locaton to save temp file which has been prepared for export
+        runs an export plan with one progress window. the export can be cancelled from the progress window or with esc
 
-        @return:
-        @rtype:
+        @param plan: plan
+        @type plan: fbx_exporter_planner.ExportPlan()
+        @param pool: worker pool to run the plan in, None runs it in this session
+        @type pool: fbx_exporter_workers.WorkerPool()
+        @return: results
+        @rtype: [fbx_exporter_planner.ExportResult()]
         '''
+        if Debug.debug: print(('calling :: {0}'.format('run_export_plan')))
 
-        prefix = Identifiers.rigs_str + '_' + str(random.randint(100, 999)) + '_'
-        path_list = os.path.split(pm.sceneName())
-        if path_list[0]:
-            temp_save_name = prefix + path_list[1]
-            return tempfile.gettempdir() + '\\' + temp_save_name
+        if not plan.jobs:
+            self.ui.lab_log.setText('Nothing to export')
+            return []
+
+        def progress(done, total, job):
+            if pm.progressWindow(query=True, isCancelled=True):
+                return False
+            status = '{0} {1}/{2} :: {3}'.format(job.kind, done + 1, total, job.name) if job else 'starting workers'
+            pm.progressWindow(edit=True, progress=done, status=status)
+
+        # targets whose fingerprint and fbx did not change since their last export are skipped unless forced
+        force = self.ui.act_force_export.isChecked()
+        incremental = fbx_exporter_fingerprint.IncrementalExport(self.Stager.get_content_hash, force)
+
+        # the outputs are checked out in one round trip before the export, new ones are added after it
+        p4_batch = self.VersionControl.open_batch([job.path for job in plan.jobs if job.error is None],
+                                                  fbx_exporter_vcs.get_description(pm.sceneName()))
+
+        results = []
+        try:
+            pm.progressWindow(title='FBX Export', progress=0, maxValue=max(len(plan.jobs), 1), status='',
+                              isInterruptable=True)
+            start = time.perf_counter()
+            try:
+                if pool is not None:
+                    results, cancelled = pool.run(plan, pm.sceneName(), progress, force)
+                else:
+                    # no viewport redraws while the scene is staged for each export
+                    pm.refresh(suspend=True)
+                    try:
+                        with self.Exporter.option_batch():
+                            export_job = self.Recorder.wrap(incremental.wrap(self.run_export_job))
+
+                            def run_job(job):
+                                # a rig export that was not rolled back left a partly deleted scene, nothing more is
+                                # fingerprinted, exported or validated from it
+                                if not self.Stager.restored:
+                                    raise RuntimeError('the scene was not restored after a rig export')
+                                return export_job(job)
+
+                            results, cancelled = fbx_exporter_planner.run_plan(plan, run_job, progress,
+                                                                               finish=self.finish_export_jobs)
+                    finally:
+                        pm.refresh(suspend=False)
+            finally:
+                pm.progressWindow(endProgress=True)
+            self.Validator.wait()
+            wall_time = time.perf_counter() - start
+
+            incremental.update(results)
+        finally:
+            # closed even if the run raised, the checked out outputs that did not change are reverted
+            p4_batch.close([result.job.path for result in results if result.success and not result.job.skipped])
+
+        # stage timings of every job and the batch go to the telemetry file, the summary to the script editor
+        summary = fbx_exporter_telemetry.write_batch(results, wall_time, plan.plan_time, pm.sceneName(),
+                                                     'local' if pool is None else 'pool')
+        for line in fbx_exporter_telemetry.format_summary(summary):
+            self.logger.info(line)
+
+        failed = [result for result in results if not result.success]
+        for result in failed:
+            self.logger.error('Export failed {0} {1} :: {2}'.format(result.job.kind, result.job.name, result.error))
+
+        # targets with the same inputs as another target get a copy of its fbx
+        duplicates = [result for result in results if result.success and result.job.source is not None]
+        for result in duplicates:
+            self.logger.info('Deduplicated {0} {1} :: {2} copied from {3}'.format(
+                result.job.kind, result.job.name, result.job.path, result.job.source.path))
+
+        # fbx files that do not hold what the scene has, the export itself did not fail
+        invalid = [result for result in results if result.job.issues]
+        for result in invalid:
+            for issue in result.job.issues:
+                self.logger.warning('Validation {0} {1} :: {2}'.format(result.job.kind, result.job.name, issue))
+
+        skipped = [result for result in results if result.job.skipped]
+        out = '{0} of {1} exported'.format(len(results) - len(failed) - len(skipped) - len(duplicates),
+                                           len(plan.jobs))
+        if skipped:
+            out += ', {0} unchanged'.format(len(skipped))
+        if duplicates:
+            out += ', {0} deduplicated'.format(len(duplicates))
+        kept = [result for result in results if result.success and result.job.kept]
+        if kept:
+            out += ', {0} identical to the published file'.format(len(kept))
+        if failed:
+            out += ', {0} failed (see script editor)'.format(len(failed))
+        if invalid:
+            out += ', {0} failed validation (see script editor)'.format(len(invalid))
+        if cancelled:
+            out += ', cancelled'
+        self.logger.info(out)
+        self.ui.lab_log.setText(out)
+
+        if pool is None and not self.Stager.restored:
+            out = 'The scene was not restored after a rig export, the jobs after it failed. Reopen it without saving'
+            pm.confirmDialog(title='FBX Export', message=out, button=['OK'])
+
+        return results
+
+    def export_rig(self, item):
+        """
+        Exports individual rig by selecting the model and root nodes
+        Export flattens the model and root for the FBX and rolls the changes back afterwards, the file is not saved
+
+        :param item: the ui element of the rig to be exported
+        :type item: QTreeWidgetItem
+        :return:
+        :rtype:
+        """
+        if Debug.debug: print(('calling :: {0}'.format('export_rig')))
+
+        if self.framework_paths:
+            layer, model = self.ExportData.get_item_data(item, Identifiers.rig_layer_identifier)
+            export_dir = self.get_export_directory(layer.rig_path) if model is not None else None
+            if export_dir is not None:
+                export_path = self.Exporter.get_rig_export_path(model.name, export_dir)
+                p4_batch = self.Exporter.do_p4(export_path)
+                success = False
+                try:
+                    success = self.export_rig_model(layer, model, export_dir)
+                    # a new fbx is added once it is published. p4 runs on Maya's main thread
+                    self.Exporter.Publisher.wait_for(export_path)
+                finally:
+                    # closed even if the export failed, the fbx is reverted if it did not change
+                    p4_batch.close([export_path] if success else [])
         else:
-            print('Please save rig file to create a scene path')
+            out = 'Please select a Project Trunk and try again'
+            pm.confirmDialog(title='No Project Trunk', message=out, button=['OK'])
+
+    def export_rig_model(self, layer, model, export_dir=None):
+        """
+        exports one model of a rig layer, see export_rig
+
+        :param layer: rig layer
+        :type layer: RigLayerData()
+        :param model: rig model to export
+        :type model: RigModelData()
+        :param export_dir: folder to export to, resolved from the rig path if None
+        :type export_dir: str
+        :return: success
+        :rtype: bool
+        """
+        if Debug.debug: print(('calling :: {0}'.format('export_rig_model')))
+
+        success = False
+        if export_dir is None:
+            export_dir = self.get_export_directory(layer.rig_path)
+        over_weighted = self.test_model_influences(model, from_export=True)
+        if not over_weighted:
+            # staged and rolled back in memory, the scene file is not saved or reopened
+            success = self.Stager.export_rig(layer, model, export_dir)
+
+            if not self.Stager.restored and not self.Exporter.batch_depth:
+                # the Stager logs it in the middle of a batch
+                out = 'The scene was not restored after the {0} rig export, reopen it without saving'.format(
+                    model.name)
+                pm.confirmDialog(title='Rig export', message=out, button=['OK'])
+            if success:
+                out = ('{} rig exported'.format(model.name))
+                self.logger.info(out)
+                self.ui.lab_log.setText(out)
+            else:
+                out = ('{} rig export failed!'.format(model.name))
+                self.logger.error(out)
+                self.ui.lab_log.setText(out)
+
+        else:
+            out = ('Export failed! There are over the max number of influences on {0}'.
+                   format(model.name))
+            self.logger.error(out)
+            self.ui.lab_log.setText(out)
+
+        return bool(success)
 
     """
     \/\/\/\/\/\/\/\/    get influences    \/\/\/\/\/\/\/\/
@@ -2120,128 +2373,35 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
         @rtype:
         '''
 
-        mesh = None
-        max_influences = None
-
-        for layer in self.rig_layers:
-            for model in layer.models:
-                if model.name == item.text(0):
-                    if pm.objExists(model.name):
-                        mesh = pm.ls(model.name)[0]
-                        max_influences = int(model.influences)
-
-        if mesh and max_influences:
-            skin_cluster = self.get_skincluster(mesh)
-
-            if skin_cluster:
-                skinFn = self.get_MFnSkinCluster(skin_cluster)
-
-                # get the MDagPath for all influence
-                infDags = OpenMaya.MDagPathArray()
-                skinFn.influenceObjects(infDags)
-
-                # create a dictionary whose key is the MPlug indice id and
-                # whose value is the influence list id
-                infIds = {}
-                infs = []
-                for x in range(infDags.length()):
-                    infPath = infDags[x].fullPathName()
-                    infId = int(skinFn.indexForInfluenceObject(infDags[x]))
-                    infIds[infId] = x
-                    infs.append(infPath)
-
-                weights = self.get_weights_dict(skinFn, infIds)
-
-                over_weighted = []
-                for x in weights.keys():
-                    if len(weights[x]) > max_influences:
-                        over_weighted.append(x)
-
-                if over_weighted:
-                    if not from_export:
-                        out = ('{0} has {1} verts which have more than ({2}) influences. This rig will not export'.
-                               format(mesh, len(over_weighted), max_influences))
-                        self.logger.error(out)
-                        self.ui.lab_log.setText(out)
-
-                        [pm.select(mesh.vtx[x], add=True) for x in over_weighted]
-                        pm.selectMode(component=True)
-                        return []
-                    else:
-                        return over_weighted
+        layer, model = self.ExportData.get_item_data(item, Identifiers.rig_layer_identifier)
+        return self.test_model_influences(model, from_export)
 
-    def get_skincluster(self, mesh):
+    def test_model_influences(self, model, from_export=False):
         '''
-        get the skin cluster for mesh arg
+        see test_influences
 
-        @param mesh: mesh to get skin cluster for
-        @type mesh: transform
-        @return: skin cluster
-        @rtype: skinCluster node
-        '''
-        for node in pm.listHistory(mesh):
-            if type(node) == pm.nodetypes.SkinCluster:
-                return node
-
-    def get_MFnSkinCluster(self, skincluster):
+        @param model: rig model to test
+        @type model: RigModelData()
+        @param from_export: whether the function is being called for export or just a test
+        @type from_export: bool
+        @return: over weighted vertex ids when called for export
+        @rtype: list
         '''
-        gets the MFnSkinCluster class from a given skin cluster
 
-        @param skincluster: skin cluster
-        @type skincluster: skinCluster
-        @return:
-        @rtype:
-        '''
+        mesh, max_influences, over_weighted = self.Stager.get_over_weighted(model)
 
-        # get the MFnSkinCluster for skinCluster
-        selList = OpenMaya.MSelectionList()
-        selList.add(skincluster.name())
-        clusterNode = OpenMaya.MObject()
-        selList.getDependNode(0, clusterNode)
-        skinFn = OpenMayaAnim.MFnSkinCluster(clusterNode)
-        return skinFn
-
-    def get_weights_dict(self, skinFn, infIds):
-        '''
-        creates a dictionary with a vert id key and value of a dict whose key is the influence id and value is the
-        weight for that influence
-
-        @param skinFn: skin cluster
-        @type skinFn: MFnSkinCluster
-        @param infIds: dictionary whose key is the MPlug indice id and whose value is the influence list id
-        @type infIds: dict
-        @return: the weights are stored in dictionary, the key is the vert Id, the value is another dictionary whose
-        key is the influence id and value is the weight for that influence
-        @rtype: dict
-        '''
-
-        wlPlug = skinFn.findPlug('weightList')
-        wPlug = skinFn.findPlug('weights')
-        wlAttr = wlPlug.attribute()
-        wAttr = wPlug.attribute()
-        wInfIds = OpenMaya.MIntArray()
-
-        weights = {}
-        for vId in range(wlPlug.numElements()):
-            vert_weights = {}
-            # tell the weights attribute which vertex id it represents
-            wPlug.selectAncestorLogicalIndex(vId, wlAttr)
-            # get the indice of all non-zero weights for this vert
-            wPlug.getExistingArrayAttributeIndices(wInfIds)
-            # create a copy of the current wPlug
-            infPlug = OpenMaya.MPlug(wPlug)
-            for infId in wInfIds:
-                # tell the infPlug it represents the current influence id
-                infPlug.selectAncestorLogicalIndex(infId, wAttr)
-                # add this influence and its weight to this verts weights
-                try:
-                    vert_weights[infIds[infId]] = infPlug.asDouble()
-                except KeyError:
-                    # assumes a removed influence
-                    pass
-            weights[vId] = vert_weights
+        if over_weighted:
+            if not from_export:
+                out = ('{0} has {1} verts which have more than ({2}) influences. This rig will not export'.
+                       format(mesh, len(over_weighted), max_influences))
+                self.logger.error(out)
+                self.ui.lab_log.setText(out)
 
-        return weights
+                [pm.select(mesh.vtx[x], add=True) for x in over_weighted]
+                pm.selectMode(component=True)
+                return []
+            else:
+                return over_weighted
 
     # >>>>>>>>>>>>>>>>>>>>>>>>  generic ui functions <<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<#
     def remove_actors(self, items):
@@ -2255,8 +2415,9 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
         '''
         if Debug.debug: print(('calling :: {0}'.format('remove_actors')))
 
-        for item in items:
-            fbx_exporter_data.ExporterData.remove_key(Identifiers.actor_identifier + item.text(0))
+        with self.ExportData.transaction('Remove Actor'):
+            for item in items:
+                fbx_exporter_data.ExporterData.remove_key(Identifiers.actor_identifier + item.text(0))
 
         self.populate_anim_tree_ui()
 
@@ -2272,10 +2433,11 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
         SelectUI = fbx_exporter_ui.SelectSomething(Identifiers.rig_layer_identifier)
         results = SelectUI.result
         to_add = pm.ls(results)
-        for add in to_add:
-            self.initialize_character_data(add)
-            self.ExportData.write_anim_data_to_fileinfo(self.actors_layers)
-            self.populate_anim_tree_ui()
+        with self.ExportData.transaction('Add Actor'):
+            for add in to_add:
+                self.initialize_character_data(add)
+                self.ExportData.write_anim_data_to_fileinfo(self.actors_layers)
+        self.populate_anim_tree_ui()
 
     def remove_animations(self, items):
         '''
@@ -2288,8 +2450,9 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
         '''
         if Debug.debug: print(('calling :: {0}'.format('remove_animation')))
 
-        for item in items:
-            fbx_exporter_data.ExporterData.remove_animation(item)
+        with self.ExportData.transaction('Remove Animation'):
+            for item in items:
+                fbx_exporter_data.ExporterData.remove_animation(item)
 
         self.populate_anim_tree_ui()
 
@@ -2314,7 +2477,7 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
                     if item.text(0) == actor.name:
                         animation_data = AnimationData()
                         actor.animations.append(animation_data)
-                        animation_data.name = actor.name
+                        animation_data.actor_name = actor.name
                         animation_data.anim_name = file_name
                         animation_data.start_frame = str(int(pm.playbackOptions(q=True, minTime=True)))
                         animation_data.end_frame = str(int(pm.playbackOptions(q=True, maxTime=True)))
@@ -2325,61 +2488,7 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
             self.ExportData.write_anim_data_to_fileinfo(self.actors_layers)
             self.populate_anim_tree_ui()
 
-    def get_animlayers(self):
-        """
-        get all anim layers beside the Base layer
-
-        @return: list of animation layers
-        @rtype: list
-        """
-
-        if Debug.debug: print(('calling :: {0}'.format('get_animlayers')))
-
-        if pm.animLayer(query=True, root=True):
-            return pm.animLayer(pm.animLayer(q=True, root=True), q=True, children=True)
-        else:
-            return None
-
-    def get_muted_layers(self):
-        """
-        gets all the muted anim layers
-
-        @return: list of muted layers
-        @rtype: list of str
-        """
-
-        muted = []
-
-        anim_layers = self.get_animlayers()
-
-        if anim_layers:
-            for anim_layer in anim_layers:
-                if pm.animLayer(anim_layer, query=True, mute=True):
-                    muted.append(anim_layer.name())
-
-            return muted
-        else:
-            return None
-
-    def set_muted_layer(self, muted_layers):
-        """
-        get list of layers and mutes those layers
-
-        @param muted_layers: list of muted layers
-        @type muted_layers: list of str
-        @return:
-        @rtype:
-        """
-
-        kids = pm.animLayer(pm.animLayer(q=True, root=True), q=True, children=True)
-        if kids:
-            for kid in kids:
-                if kid.name() in muted_layers:
-                    pm.animLayer(kid.name(), edit=True, mute=True)
-                else:
-                    pm.animLayer(kid.name(), edit=True, mute=False)
-
-    def export_animation(self, animation, layer):
+    def export_animation(self, animation, layer, export_dir=None):
         """
         sets up and exports a single animation
 
@@ -2387,62 +2496,22 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
         @type animation: AnimationData()
         @param layer: rig layer
         @type layer: ActorLayerData()
-        @return:
-        @rtype:
+        @param export_dir: folder to export to, resolved from the animation paths if None
+        @type export_dir: str
+        @return: success
+        @rtype: bool
         """
         if Debug.debug: print(('calling :: {0}'.format('export_animation')))
 
-        # set time range for specific animation
-        min = pm.playbackOptions(min=True, q=True)
-        max = pm.playbackOptions(max=True, q=True)
-        start = pm.playbackOptions(animationStartTime=True, q=True)
-        end = pm.playbackOptions(animationEndTime=True, q=True)
-
-        root = None
-
-        # get joint name from root as root has namespace
-        find_joint = layer.root.split(':')[-1]
-        parent = self.get_top_level_parent(layer.root)
-        # copy hierarchy to flatten
-        copy = pm.duplicate(parent, rr=True, inputConnections=True)
-        # get joints
-        shapes = pm.listRelatives(copy, allDescendents=True, type='joint')
-        # get root joint
-        for shape in shapes:
-            if shape.name() == find_joint:
-                root = shape
-                break
-
         # get export path...there might be an override path
-        if animation.override_path is None:
+        if export_dir is not None:
+            pass
+        elif animation.override_path is None:
             export_dir = self.get_export_directory(animation.path)
         else:
             export_dir = self.get_export_directory(animation.override_path)
 
-        # get the layers that are muted before making any changes for anim export
-        muted_layers = self.get_muted_layers()
-
-        if muted_layers:
-            # turn off layers that have been added to data as being muted
-            if animation.muted_layers:
-                mutes = animation.muted_layers.split(', ')
-                for mute in mutes:
-                    pm.animLayer(mute, mute=True, edit=True)
-
-        if root:
-            pm.parent(root, world=True)
-            pm.delete(copy)
-            self.Exporter.export_animation_setup(animation.anim_name, export_dir,
-                                                 animation.start_frame, animation.end_frame)
-            pm.delete(root)
-
-            pm.playbackOptions(animationStartTime=start, animationEndTime=end)
-            pm.playbackOptions(min=min, max=max)
-        else:
-            print('Rig root was not found')
-
-        if muted_layers:
-            self.set_muted_layer(muted_layers)
+        return self.Stager.export_animation(animation, layer, export_dir)
 
     def edit_multiple_entries(self):
         '''
@@ -2491,8 +2560,10 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
         # populate selected items fields with data from above
         if None not in (column, new_val, func):
             selected = self.get_selected_items_from_active_tab()
-            for select in selected:
-                func(select, new_val, column)
+            # one fileInfo flush and one undo step for the whole multi edit
+            with self.ExportData.transaction('Edit multiple entries'):
+                for select in selected:
+                    func(select, new_val, column)
 
             self.populate_anim_tree_ui()
 
@@ -2564,8 +2635,9 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
         if Debug.debug: print(('calling :: {0}'.format('remove_rig')))
 
         items = self.get_selected_items_from_active_tab()
-        for item in items:
-            fbx_exporter_data.ExporterData.remove_rig_model(item)
+        with self.ExportData.transaction('Remove Rig Model'):
+            for item in items:
+                fbx_exporter_data.ExporterData.remove_rig_model(item)
         self.populate_rig_tree_ui()
 
     def remove_rig(self, item):
@@ -2603,24 +2675,6 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
         if not rig.hasAttr(Identifiers.root_str):
             rig.addAttr(Identifiers.root_str, dataType='string')
 
-    def get_top_level_parent(self, root):
-        '''
-        gets top level parent of root joint
-
-        @param root: rig root
-        @type root: joint
-        @return: rig group parent
-        @rtype: group transform
-        '''
-        if Debug.debug: print(('calling :: {0}'.format('get_root_parent')))
-
-        parents = pm.listRelatives(root, allParents=True)
-        if parents:
-            parent = parents[0]
-            return self.get_top_level_parent(parent)
-        else:
-            return root
-
     def add_multiple_rig_model(self, layer_name):
         '''
         event for adding multiple models as seperate models in the rig layer
@@ -2644,6 +2698,7 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
                         add_models.append(tran.name())
 
         if add_models:
+            uuids = fbx_exporter_scene.Resolver.get_uuids(add_models)
             for rig in self.rig_layers:
                 if rig.name == layer_name:
                     for model in add_models:
@@ -2652,7 +2707,7 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
                         # rig.models = list(set1.union(set2))
                         model_data = RigModelData()
                         model_data.name = model
-                        model_data.uuid = self.FbxExporter.get_uuid(model)
+                        model_data.uuid = uuids.get(model)
                         model_data.path = rig.rig_path
                         model_data.influences = 0
                         model_data.export_items.append(model)
@@ -2805,8 +2860,8 @@ class FbxCharacterExporterUI(QtWidgets.QMainWindow):
         elif item.whatsThis(0) == Identifiers.model_layer_str:
             for layer in self.actors_layers:
                 for animation in layer.animations:
-                    if animation.name == item.text(0):
-                        print('animation.name :: {}'.format(animation.name))
+                    if animation.actor_name == item.text(0):
+                        print('animation.actor_name :: {}'.format(animation.actor_name))
 
     def update_anim_path_attr(self, model, path):
         '''
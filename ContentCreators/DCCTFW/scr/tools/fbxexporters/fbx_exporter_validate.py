@@ -0,0 +1,364 @@
+"""
+checks an exported ASCII fbx against what its job should have written: the mesh and joint names, the vertex and
+polygon counts of each mesh, a skin deformer for rigs and the frame range of the take for animations
+
+the fbx is streamed a line at a time, array values are counted as they go by and never kept, so a large export is
+read in constant memory. no Autodesk SDK is needed, this module does not need Maya
+
+    expectation = Stager.get_expectation(job)      # main thread, reads the scene
+    Validator.submit(job, expectation)             # background thread reads the fbx and sets job.issues
+    Validator.wait()
+
+binary fbx files are not validated
+"""
+
+import logging
+import queue
+import re
+import threading
+
+import scr
+from scr.tools.fbxexporters import fbx_exporter_fbxhash
+
+
+# FBX time is in ticks of 1/46186158000 of a second
+ticks_per_second = 46186158000
+# GlobalSettings TimeMode enum to frames per second, 14 is custom (CustomFrameRate)
+time_modes = {0: 24.0, 1: 120.0, 2: 100.0, 3: 60.0, 4: 50.0, 5: 48.0, 6: 30.0, 7: 30.0, 8: 29.97, 9: 29.97, 10: 25.0,
+              11: 24.0, 12: 1000.0, 13: 23.976, 15: 96.0, 16: 72.0, 17: 59.94, 18: 119.88}
+custom_time_mode = 14
+# a take may start or stop up to half a frame off the scene range
+frame_tolerance = 0.5
+# mismatched names listed in one issue, the rest are counted
+max_names = 5
+
+# Model: 2094133568, "Model::crate", "Mesh" {
+object_pattern = re.compile(r'^\s*(\w+): (-?\d+), "\w*::([^"]*)", "([^"]*)"')
+# Vertices: *24 {
+array_pattern = re.compile(r'^\s*(\w+): \*(\d+)')
+# P: "LocalStop", "KTime", "Time", "",46186158000
+property_pattern = re.compile(r'^\s*P: "([^"]*)",.*,([^,]*)$')
+# C: "OO",2094129248,2094133568
+connection_pattern = re.compile(r'^\s*C: "OO",(-?\d+),(-?\d+)')
+# Take: "Take 001" {
+take_pattern = re.compile(r'^\s*Take: "([^"]*)"')
+# LocalTime: 0,46186158000
+local_time_pattern = re.compile(r'^\s*LocalTime: (-?\d+),(-?\d+)')
+
+
+def get_short_name(name):
+    """
+    :return: name without its path and namespace
+    :rtype: str
+    """
+    return name.split('|')[-1].split(':')[-1]
+
+
+class FbxContents(object):
+    """
+    what an ASCII fbx holds, as far as the validator checks it
+    """
+    def __init__(self):
+        # {model name: model type}, Mesh, LimbNode, Null...
+        self.models = {}
+        # {geometry id: [vertices, polygons]}
+        self.geometry = {}
+        # {geometry id: model name}
+        self.geometry_models = {}
+        # {deformer type: count}, Skin, Cluster, BlendShape...
+        self.deformers = {}
+        # {take name: [start ticks, stop ticks]}
+        self.takes = {}
+        self.frame_rate = None
+
+    def get_meshes(self):
+        """
+        :return: {model short name: (vertices, polygons)}
+        :rtype: dict
+        """
+        meshes = {}
+        for geometry_id, counts in self.geometry.items():
+            name = self.geometry_models.get(geometry_id)
+            if name is not None:
+                meshes[get_short_name(name)] = tuple(counts)
+
+        return meshes
+
+    def get_names(self, model_type):
+        return set(get_short_name(name) for name, kind in self.models.items() if kind == model_type)
+
+    def get_frame_ranges(self):
+        """
+        :return: {take name: (start frame, end frame)}
+        :rtype: dict
+        """
+        frame_rate = self.frame_rate or time_modes[0]
+        return dict((name, (start * frame_rate / ticks_per_second, stop * frame_rate / ticks_per_second))
+                    for name, (start, stop) in self.takes.items())
+
+
+def read_fbx(lines):
+    """
+    reads the parts of an ASCII fbx the validator checks
+
+    :param lines: lines of the file
+    :type lines: iterable of str
+    :rtype: FbxContents()
+    """
+    contents = FbxContents()
+    custom_rate = None
+    time_mode = None
+    # {model id: name}, the connections hold ids
+    model_names = {}
+
+    depth = 0
+    section = None
+    # object or take the current block belongs to
+    current = None
+    current_type = None
+    # array being counted, its depth and the polygon count so far
+    array = None
+    array_depth = 0
+    polygons = 0
+
+    for line in lines:
+        stripped = line.strip()
+        if not stripped or stripped.startswith(';'):
+            continue
+
+        if array is not None:
+            if array == 'PolygonVertexIndex':
+                # the last index of each polygon is stored as -(index + 1)
+                polygons += stripped.count('-')
+            depth += line.count('{') - line.count('}')
+            if depth <= array_depth:
+                if array == 'PolygonVertexIndex':
+                    contents.geometry[current][1] = polygons
+                array = None
+            continue
+
+        if depth == 0:
+            section = stripped.split(':', 1)[0]
+            current, current_type = (None, None)
+
+        elif section == 'Objects' and depth == 1:
+            match = object_pattern.match(line)
+            current, current_type = (None, None)
+            if match:
+                kind, object_id, name, subtype = match.groups()
+                current_type = kind
+                if kind == 'Model':
+                    contents.models[name] = subtype
+                    model_names[object_id] = name
+                elif kind == 'Geometry' and subtype == 'Mesh':
+                    current = object_id
+                    contents.geometry[object_id] = [0, 0]
+                elif kind == 'Deformer':
+                    contents.deformers[subtype] = contents.deformers.get(subtype, 0) + 1
+                elif kind == 'AnimationStack':
+                    current = name
+                    contents.takes[name] = [0, 0]
+
+        elif section == 'Objects' and current is not None:
+            match = array_pattern.match(line)
+            if current_type == 'Geometry' and match and match.group(1) in ('Vertices', 'PolygonVertexIndex'):
+                if match.group(1) == 'Vertices':
+                    contents.geometry[current][0] = int(match.group(2)) // 3
+                array = match.group(1)
+                array_depth = depth
+                polygons = 0
+            elif current_type == 'AnimationStack':
+                match = property_pattern.match(line)
+                if match and match.group(1) in ('LocalStart', 'LocalStop'):
+                    contents.takes[current][match.group(1) == 'LocalStop'] = int(match.group(2))
+
+        elif section == 'GlobalSettings':
+            match = property_pattern.match(line)
+            if match and match.group(1) == 'TimeMode':
+                time_mode = int(match.group(2))
+            elif match and match.group(1) == 'CustomFrameRate':
+                custom_rate = float(match.group(2))
+
+        elif section == 'Connections':
+            match = connection_pattern.match(line)
+            if match and match.group(1) in contents.geometry:
+                contents.geometry_models[match.group(1)] = match.group(2)
+
+        elif section == 'Takes':
+            match = take_pattern.match(line)
+            if match:
+                current = match.group(1)
+            match = local_time_pattern.match(line)
+            if match and current is not None and current not in contents.takes:
+                contents.takes[current] = [int(match.group(1)), int(match.group(2))]
+
+        depth += line.count('{') - line.count('}')
+        if array is not None:
+            # a one line array
+            if depth <= array_depth:
+                array = None
+
+    contents.geometry_models = dict((geometry_id, model_names[model_id])
+                                    for geometry_id, model_id in contents.geometry_models.items()
+                                    if model_id in model_names)
+    if time_mode == custom_time_mode:
+        contents.frame_rate = custom_rate
+    elif time_mode is not None:
+        contents.frame_rate = time_modes.get(time_mode)
+
+    return contents
+
+
+class ExportExpectation(object):
+    """
+    what the fbx of a job should hold, taken from the scene when the job is exported
+    """
+    def __init__(self, meshes=None, joints=None, skinned=False, frame_range=None, has_joints=False):
+        # {mesh name: (vertices, polygons)}, polygons is None when the count is not checked (triangulated export)
+        self.meshes = meshes or {}
+        # joint names that have to be in the fbx
+        self.joints = joints or []
+        # the fbx needs a skin deformer
+        self.skinned = skinned
+        # (start frame, end frame) of the take
+        self.frame_range = frame_range
+        # the fbx needs at least one joint, when the joint names are not known
+        self.has_joints = has_joints
+
+
+def get_missing_issue(kind, names):
+    names = sorted(names)
+    out = '{0} {1}s missing'.format(len(names), kind) if len(names) > 1 else '{0} missing'.format(kind)
+    shown = ', '.join(names[:max_names])
+    if len(names) > max_names:
+        shown += ' and {0} more'.format(len(names) - max_names)
+
+    return '{0} :: {1}'.format(out, shown)
+
+
+def check_contents(contents, expectation):
+    """
+    :param contents: what the fbx holds
+    :type contents: FbxContents()
+    :param expectation: what it should hold
+    :type expectation: ExportExpectation()
+    :return: mismatches, empty if the fbx holds what was expected
+    :rtype: [str]
+    """
+    issues = []
+
+    meshes = contents.get_meshes()
+    missing = []
+    for name, (vertices, polygons) in sorted(expectation.meshes.items()):
+        short_name = get_short_name(name)
+        if short_name not in meshes:
+            missing.append(short_name)
+            continue
+
+        found_vertices, found_polygons = meshes[short_name]
+        if found_vertices != vertices:
+            issues.append('mesh {0} has {1} vertices, expected {2}'.format(short_name, found_vertices, vertices))
+        if polygons is not None and found_polygons != polygons:
+            issues.append('mesh {0} has {1} polygons, expected {2}'.format(short_name, found_polygons, polygons))
+    if missing:
+        issues.insert(0, get_missing_issue('mesh', missing))
+
+    joints = contents.get_names('LimbNode')
+    missing = set(get_short_name(name) for name in expectation.joints) - joints
+    if missing:
+        issues.append(get_missing_issue('joint', missing))
+    elif expectation.has_joints and not joints:
+        issues.append('no joints')
+
+    if expectation.skinned and not contents.deformers.get('Skin'):
+        issues.append('no skin deformer')
+
+    if expectation.frame_range is not None:
+        frame_ranges = contents.get_frame_ranges()
+        start, end = [float(frame) for frame in expectation.frame_range]
+        if not frame_ranges:
+            issues.append('no animation take')
+        elif not any(abs(take_start - start) <= frame_tolerance and abs(take_end - end) <= frame_tolerance
+                     for take_start, take_end in frame_ranges.values()):
+            issues.append('take covers frames {0}, expected {1:g}-{2:g}'.format(
+                ', '.join('{0:g}-{1:g}'.format(round(take_start, 2), round(take_end, 2))
+                          for take_start, take_end in frame_ranges.values()), start, end))
+
+    return issues
+
+
+def validate_fbx(path, expectation):
+    """
+    streams an exported fbx and checks it
+
+    :param path: exported fbx
+    :type path: str
+    :param expectation: what it should hold
+    :type expectation: ExportExpectation()
+    :return: mismatches, empty if the fbx holds what was expected or is binary
+    :rtype: [str]
+    """
+    if fbx_exporter_fbxhash.is_binary_fbx(path):
+        return []
+
+    # latin-1 maps every byte, names are compared as they were written
+    with open(path, 'r', encoding='latin-1', newline='') as fbx_file:
+        contents = read_fbx(fbx_file)
+
+    return check_contents(contents, expectation)
+
+
+class FbxValidator(object):
+    """
+    validates exported fbx files on a background thread so the next export does not wait on the read. the issues
+    are set on the job (job.issues), wait before reading them
+    """
+    def __init__(self):
+        self.logger = logging.getLogger(scr.logger_name)
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def submit(self, job, expectation, publish=None):
+        """
+        queues the fbx of an exported job
+
+        :param job: exported job
+        :type job: fbx_exporter_planner.ExportJob()
+        :param expectation: what the fbx should hold. must not be edited after it is passed in
+        :type expectation: ExportExpectation()
+        :param publish: future of the publish of the fbx, it is read once it is published. a failed publish is not
+            validated (see fbx_exporter_publish)
+        :type publish: concurrent.futures.Future()
+        """
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='fbx_exporter_validate')
+                self.thread.daemon = True
+                self.thread.start()
+
+        self.queue.put((job, expectation, publish))
+
+    def wait(self):
+        """
+        blocks until every queued fbx is validated
+        """
+        self.queue.join()
+
+    def run(self):
+        while True:
+            job, expectation, publish = self.queue.get()
+            try:
+                if publish is not None and publish.exception() is not None:
+                    continue
+                job.issues = validate_fbx(job.path, expectation)
+            except Exception as e:
+                job.issues = ['could not read the fbx :: {0}: {1}'.format(type(e).__name__, e)]
+            finally:
+                self.queue.task_done()
+
+            if job.issues:
+                self.logger.debug('{0} failed validation :: {1}'.format(job.path, '; '.join(job.issues)))
+
+
+Validator = FbxValidator()
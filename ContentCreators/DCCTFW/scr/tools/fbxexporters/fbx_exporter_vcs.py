@@ -0,0 +1,411 @@
+"""
+version control for exported fbx files. the outputs of an export batch are handled together, a round trip per step
+instead of one per file:
+
+    before the export   one fstat of every output, one edit of the versioned outputs into the batch changelist so
+                        their read only flag is cleared before they are published
+    after the export    one add of the new outputs, one revert of the edited outputs whose publish kept the old file
+
+    batch = VersionControl.open_batch(paths, get_description('hero.ma'))
+    ... export ...
+    batch.close(published_paths)
+
+the changelist is found by its description, every batch from the same scene goes into the same pending changelist.
+when p4 is not installed or has no workspace the batch does nothing. errors are logged, they never fail the export
+
+backends:
+    P4CommandBackend    runs the p4 command line with -G, the paths go through stdin (-x -)
+    FakeBackend         in memory depot for tests, records every call
+this module does not need Maya
+"""
+
+import io
+import logging
+import marshal
+import os
+import shutil
+import subprocess
+
+import scr
+
+
+# seconds a p4 command may take before it is given up on
+command_timeout = 120
+# head actions of files that have to be added again
+deleted_actions = ('delete', 'move/delete', 'purge', 'archive')
+
+
+class VersionControlError(Exception):
+    pass
+
+
+def get_path_key(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def escape_path(path):
+    """
+    :return: local path with the characters p4 reserves for revisions and wildcards escaped
+    :rtype: str
+    """
+    return path.replace('%', '%25').replace('@', '%40').replace('#', '%23').replace('*', '%2A')
+
+
+def parse_records(data):
+    """
+    :param data: output of a p4 -G command, marshalled dicts one after the other
+    :type data: bytes
+    :return: records with str keys and values
+    :rtype: [dict]
+    """
+    records = []
+    stream = io.BytesIO(data)
+    while True:
+        try:
+            record = marshal.load(stream)
+        except (EOFError, ValueError, TypeError):
+            break
+        records.append(dict((key.decode('utf-8', 'replace') if isinstance(key, bytes) else key,
+                             value.decode('utf-8', 'replace') if isinstance(value, bytes) else value)
+                            for key, value in record.items()))
+
+    return records
+
+
+class P4CommandBackend(object):
+    """
+    runs the p4 command line, the workspace is the one p4 picks for the current folder (P4CONFIG, p4 set)
+    """
+    def __init__(self, executable=None, cwd=None):
+        self.executable = executable or shutil.which('p4')
+        self.cwd = cwd
+        # p4 info of the workspace, None until it was asked for
+        self.info = None
+
+    def run(self, args, paths=None, spec=None):
+        """
+        runs one p4 command
+
+        :param args: command and its flags
+        :type args: [str]
+        :param paths: file arguments, sent through stdin
+        :type paths: [str]
+        :param spec: form for commands that read one (-i)
+        :type spec: dict
+        :return: records, errors about single files are records with code error
+        :rtype: [dict]
+        """
+        command = [self.executable, '-G']
+        stdin = None
+        if paths is not None:
+            command.extend(['-x', '-'])
+            stdin = '\n'.join(paths).encode('utf-8')
+        elif spec is not None:
+            stdin = marshal.dumps(spec, 0)
+        command.extend(args)
+
+        try:
+            process = subprocess.run(command, input=stdin, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                     cwd=self.cwd, timeout=command_timeout)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            raise VersionControlError('p4 {0} :: {1}: {2}'.format(args[0], type(e).__name__, e))
+
+        records = parse_records(process.stdout)
+        if not records and process.returncode:
+            raise VersionControlError('p4 {0} :: {1}'.format(args[0], process.stderr.decode('utf-8', 'replace')))
+
+        return records
+
+    def is_configured(self):
+        if not self.executable:
+            return False
+
+        if self.info is None:
+            try:
+                records = self.run(['info'])
+            except VersionControlError:
+                records = []
+            self.info = records[0] if records and records[0].get('code') != 'error' else {}
+
+        return self.info.get('clientName', '*unknown*') != '*unknown*' and 'clientRoot' in self.info
+
+    def fstat(self, paths):
+        """
+        :return: {path key: {'versioned': bool, 'action': opened action or None, 'change': changelist or None}}, files
+            that are not in the depot are left out
+        :rtype: dict
+        """
+        states = {}
+        for record in self.run(['fstat'], [escape_path(path) for path in paths]):
+            if record.get('code') == 'error' or 'clientFile' not in record:
+                continue
+            states[get_path_key(record['clientFile'])] = {
+                'versioned': 'headRev' in record and record.get('headAction') not in deleted_actions,
+                'action': record.get('action'), 'change': record.get('change')}
+
+        return states
+
+    def get_change(self, description):
+        """
+        :return: pending changelist of the workspace with the description, created if there is none
+        :rtype: str
+        """
+        for record in self.run(['changes', '-s', 'pending', '-l', '-c', self.info['clientName']]):
+            if record.get('desc', '').strip() == description.strip():
+                return record['change']
+
+        spec = {'Change': 'new', 'Client': self.info['clientName'], 'User': self.info.get('userName', ''),
+                'Status': 'new', 'Description': description}
+        for record in self.run(['change', '-i'], spec=spec):
+            words = record.get('data', '').split()
+            if len(words) > 1 and words[0] == 'Change' and words[1].isdigit():
+                return words[1]
+
+        raise VersionControlError('could not create a changelist for {0}'.format(description))
+
+    @staticmethod
+    def get_errors(records):
+        return [record.get('data', '').strip() for record in records if record.get('code') == 'error']
+
+    def edit(self, paths, change):
+        return self.get_errors(self.run(['edit', '-c', change], [escape_path(path) for path in paths]))
+
+    def add(self, paths, change):
+        # -f adds files with reserved characters in their names, the paths are not escaped
+        return self.get_errors(self.run(['add', '-f', '-c', change], paths))
+
+    def revert_unchanged(self, paths, change):
+        return self.get_errors(self.run(['revert', '-a', '-c', change], [escape_path(path) for path in paths]))
+
+
+class FakeBackend(object):
+    """
+    in memory depot that behaves like P4CommandBackend. calls holds (command, number of paths) for every call
+    """
+    def __init__(self, versioned=(), configured=True):
+        self.configured = configured
+        # {path key: content when it was last synced or submitted}
+        self.depot = {}
+        for path in versioned:
+            self.depot[get_path_key(path)] = self.read(path)
+        # {path key: (action, change)}
+        self.opened = {}
+        # {change: description}
+        self.changes = {}
+        self.calls = []
+
+    @staticmethod
+    def read(path):
+        if not os.path.isfile(path):
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def is_configured(self):
+        return self.configured
+
+    def fstat(self, paths):
+        self.calls.append(('fstat', len(paths)))
+        states = {}
+        for path in paths:
+            key = get_path_key(path)
+            if key in self.depot or key in self.opened:
+                action, change = self.opened.get(key, (None, None))
+                states[key] = {'versioned': key in self.depot, 'action': action, 'change': change}
+
+        return states
+
+    def get_change(self, description):
+        self.calls.append(('change', 0))
+        for change, change_description in self.changes.items():
+            if change_description == description:
+                return change
+
+        change = str(len(self.changes) + 1)
+        self.changes[change] = description
+        return change
+
+    def edit(self, paths, change):
+        self.calls.append(('edit', len(paths)))
+        errors = []
+        for path in paths:
+            key = get_path_key(path)
+            if key not in self.depot:
+                errors.append('{0} - file(s) not on client.'.format(path))
+            elif key not in self.opened:
+                self.opened[key] = ('edit', change)
+
+        return errors
+
+    def add(self, paths, change):
+        self.calls.append(('add', len(paths)))
+        for path in paths:
+            self.opened.setdefault(get_path_key(path), ('add', change))
+
+        return []
+
+    def revert_unchanged(self, paths, change):
+        self.calls.append(('revert', len(paths)))
+        for path in paths:
+            key = get_path_key(path)
+            if self.opened.get(key, (None,))[0] == 'edit' and self.read(path) == self.depot[key]:
+                del self.opened[key]
+
+        return []
+
+
+def get_description(scene_path):
+    """
+    :return: description of the changelist the exports of a scene go into
+    :rtype: str
+    """
+    scene_name = os.path.basename(scene_path) if scene_path else 'untitled'
+    return 'FBX Exporter :: {0}'.format(scene_name)
+
+
+def get_unique_paths(paths):
+    """
+    :return: paths without the ones that point at the same file as an earlier one
+    :rtype: [str]
+    """
+    unique = []
+    seen = set()
+    for path in paths:
+        key = get_path_key(path)
+        if key not in seen:
+            seen.add(key)
+            unique.append(path)
+
+    return unique
+
+
+class VersionControlBatch(object):
+    """
+    version control of the outputs of one export batch, see the module docs. without a backend it does nothing
+    """
+    def __init__(self, backend, description):
+        self.logger = logging.getLogger(scr.logger_name)
+        self.backend = backend
+        self.description = description
+        self.change = None
+        # {path key: state} from fstat
+        self.states = {}
+        self.edited = []
+        self.added = []
+        self.errors = []
+
+    def log_errors(self, errors):
+        for error in errors:
+            self.logger.warning('P4 :: {0}'.format(error))
+        self.errors.extend(errors)
+
+    def run(self, step, paths):
+        """
+        runs a backend step on paths in the batch changelist, errors are logged and kept
+
+        :return: success
+        :rtype: bool
+        """
+        try:
+            if self.change is None:
+                self.change = self.backend.get_change(self.description)
+            errors = step(paths, self.change)
+        except VersionControlError as e:
+            errors = [str(e)]
+
+        self.log_errors(errors)
+        return not errors
+
+    def open(self, paths):
+        """
+        stats the outputs and opens the versioned ones for edit
+
+        :param paths: every output the batch may write
+        :type paths: [str]
+        :return: self
+        :rtype: VersionControlBatch()
+        """
+        paths = get_unique_paths(paths)
+        if self.backend is None or not paths:
+            return self
+
+        try:
+            self.states = self.backend.fstat(paths)
+        except VersionControlError as e:
+            # p4 is not reachable, the rest of the batch does nothing
+            self.log_errors([str(e)])
+            self.backend = None
+            return self
+
+        self.edited = [path for path in paths if self.is_versioned(path) and
+                       not self.states[get_path_key(path)]['action']]
+        if self.edited:
+            self.run(self.backend.edit, self.edited)
+
+        return self
+
+    def close(self, paths):
+        """
+        adds the new outputs and reverts the edited outputs that did not change
+
+        :param paths: outputs the batch published
+        :type paths: [str]
+        """
+        if self.backend is None:
+            return
+
+        for path in get_unique_paths(paths):
+            state = self.states.get(get_path_key(path))
+            if (state is None or not (state['versioned'] or state['action'])) and os.path.isfile(path):
+                self.added.append(path)
+
+        if self.added:
+            self.run(self.backend.add, self.added)
+        if self.edited:
+            self.run(self.backend.revert_unchanged, self.edited)
+
+    def is_versioned(self, path):
+        """
+        :return: whether the output was in the depot when the batch was opened
+        :rtype: bool
+        """
+        return bool(self.states.get(get_path_key(path), {}).get('versioned'))
+
+
+class ExportVersionControl(object):
+    """
+    finds the backend once and opens batches with it
+    """
+    def __init__(self, backend=None):
+        self.logger = logging.getLogger(scr.logger_name)
+        self.backend = backend
+        self.detected = backend is not None
+
+    def get_backend(self):
+        """
+        :return: backend or None if version control is not configured
+        """
+        if not self.detected:
+            self.detected = True
+            backend = P4CommandBackend()
+            self.backend = backend if backend.is_configured() else None
+            if self.backend is None:
+                self.logger.info('P4 is not configured, exported files are not checked out or added')
+
+        if self.backend is not None and not self.backend.is_configured():
+            return None
+        return self.backend
+
+    def open_batch(self, paths, description):
+        """
+        :param paths: every output the batch may write
+        :type paths: [str]
+        :param description: description of the changelist the outputs go into
+        :type description: str
+        :return: opened batch, close it with the published outputs
+        :rtype: VersionControlBatch()
+        """
+        return VersionControlBatch(self.get_backend(), description).open(paths)
+
+
+VersionControl = ExportVersionControl()
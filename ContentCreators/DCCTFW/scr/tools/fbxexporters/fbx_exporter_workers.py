@@ -0,0 +1,441 @@
+"""
+runs an export plan in a pool of headless mayapy processes instead of the artist's session. the jobs of the plan are
+split between the workers in plan order, so jobs with the same staging and option profile stay together. each worker
+opens the saved scene once, runs its share and streams a result back for every job. workers never save the scene
+
+    results, cancelled = WorkerPool().run(plan, pm.sceneName(), progress)
+
+protocol, one json object per line:
+    parent -> worker stdin, a single request then stdin is closed
+        {"v": 1, "scene": path, "force": bool,
+         "jobs": [{"id", "kind", "layer_key", "name", "path", "options", "staging"}]}
+        options are [[FBX option command, value]] in the order they are sent. force exports jobs whose fingerprint
+        is unchanged (see fbx_exporter_fingerprint)
+    worker -> parent stdout, lines start with message_prefix. anything else (Maya startup output) is ignored
+        {"ready": scene}                           the scene is open
+        {"id": job id, "success": bool, "error": str or null, "skipped": bool, "fingerprint": str or null,
+         "kept": bool, "telemetry": dict}          kept, the export matched the published fbx (fbx_exporter_fbxhash).
+                                                   telemetry, stage timings (fbx_exporter_telemetry.JobRecord)
+        {"job": job id, "issues": [str]}           validation of an exported fbx (fbx_exporter_validate), sent
+                                                   after all results
+        {"error": str}                             the worker can not go on, jobs without a result fail with it
+
+the stand-in worker speaks the protocol without Maya, it writes each job message to the job path:
+    python fbx_exporter_workers.py --stand-in
+"""
+
+import argparse
+import collections
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+
+import scr
+from scr.tools.fbxexporters import fbx_exporter_planner
+from scr.tools.fbxexporters import fbx_exporter_telemetry
+
+
+protocol_version = 1
+message_prefix = 'fbx_export_worker:'
+# seconds between progress calls while waiting for results
+poll_interval = 0.2
+# lines of worker output kept for the error of a worker that exits early
+output_tail = 20
+
+
+def encode_message(data):
+    return message_prefix + json.dumps(data, separators=(',', ':')) + '\n'
+
+
+def decode_message(line):
+    """
+    :return: message or None if the line is not a protocol message
+    :rtype: dict
+    """
+    if not line.startswith(message_prefix):
+        return None
+
+    try:
+        return json.loads(line[len(message_prefix):])
+    except ValueError:
+        return None
+
+
+def write_message(out, data):
+    out.write(encode_message(data))
+    out.flush()
+
+
+def job_to_message(job_id, job):
+    return {'id': job_id, 'kind': job.kind, 'layer_key': job.layer_key, 'name': job.name, 'path': job.path,
+            'options': [[command, value] for command, value in job.options.items()], 'staging': job.staging}
+
+
+def split_jobs(jobs, count):
+    """
+    splits jobs in count contiguous shares of about the same size
+
+    :return: [[job]]
+    :rtype: list
+    """
+    count = max(1, min(count, len(jobs)))
+    size, extra = divmod(len(jobs), count)
+    shares = []
+    start = 0
+    for index in range(count):
+        end = start + size + (1 if index < extra else 0)
+        shares.append(jobs[start:end])
+        start = end
+
+    return [share for share in shares if share]
+
+
+def get_worker_count(job_count, workers=None):
+    """
+    :param job_count: number of jobs to run
+    :type job_count: int
+    :param workers: wanted number of workers, None leaves one core for the artist's session
+    :type workers: int
+    :rtype: int
+    """
+    if workers is None:
+        workers = (os.cpu_count() or 2) - 1
+
+    return max(1, min(workers, job_count))
+
+
+def get_mayapy():
+    """
+    :return: mayapy of the running Maya, or of MAYA_LOCATION
+    :rtype: str
+    """
+    name = 'mayapy.exe' if sys.platform == 'win32' else 'mayapy'
+    location = os.environ.get('MAYA_LOCATION')
+    if location:
+        return os.path.join(location, 'bin', name)
+
+    return os.path.join(os.path.dirname(sys.executable), name)
+
+
+def get_worker_env():
+    """
+    environment of the workers, the framework has to be importable from mayapy
+    """
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(scr.__file__)))
+    paths = [path for path in env.get('PYTHONPATH', '').split(os.pathsep) if path]
+    if root not in paths:
+        paths.insert(0, root)
+    env['PYTHONPATH'] = os.pathsep.join(paths)
+
+    return env
+
+
+class WorkerPool(object):
+    """
+    local pool of headless export workers
+    """
+    def __init__(self, command=None, workers=None):
+        # command that starts one worker, defaults to mayapy running this module
+        self.command = command or [get_mayapy(), os.path.abspath(__file__)]
+        self.workers = workers
+
+    def start_worker(self, index, request, messages):
+        process = subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT, env=get_worker_env(), universal_newlines=True)
+        output = collections.deque(maxlen=output_tail)
+        thread = threading.Thread(target=self.read_worker, args=(index, process, output, messages))
+        thread.daemon = True
+        thread.start()
+
+        try:
+            process.stdin.write(json.dumps(request) + '\n')
+            process.stdin.close()
+        except (IOError, OSError):
+            # the worker already exited, read_worker reports it
+            pass
+
+        return process, output, thread
+
+    @staticmethod
+    def stop_worker(process, thread):
+        """
+        kills a worker that is still running and waits for it, its reader thread and pipes are closed so no zombie
+        process or open file is left behind
+        """
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+        # the reader ends once the pipe hits the end of the output
+        thread.join()
+        for pipe in (process.stdin, process.stdout):
+            try:
+                pipe.close()
+            except (IOError, OSError):
+                # unflushed input to a worker that exited
+                pass
+
+    @staticmethod
+    def read_worker(index, process, output, messages):
+        for line in process.stdout:
+            message = decode_message(line)
+            if message is None:
+                output.append(line.rstrip())
+            else:
+                messages.put((index, message))
+
+        process.wait()
+        messages.put((index, None))
+
+    def run(self, plan, scene, progress=None, force=False):
+        """
+        runs the jobs of a plan in the workers, duplicates get the fbx of their source job once the workers are done
+
+        :param plan: plan
+        :type plan: fbx_exporter_planner.ExportPlan()
+        :param scene: saved scene the workers open
+        :type scene: str
+        :param progress: function(done, total, job) called while the workers run with the last finished job (None
+            before the first one), returning False stops the workers
+        :type progress: function
+        :param force: export jobs whose fingerprint is unchanged, the workers skip them otherwise
+        :type force: bool
+        :return: ([ExportResult()], cancelled) in the order the results came in. jobs that could not run are in the
+            results as failed
+        :rtype: tuple
+        """
+        results = [fbx_exporter_planner.ExportResult(job, False, job.error) for job in plan.get_errors()]
+        jobs = [job for staging, profile, group in plan.get_groups() for job in group]
+        total = len(jobs)
+        if not jobs:
+            return results, False
+
+        messages = queue.Queue()
+        pending = {}
+        workers = []
+        errors = {}
+        cancelled = False
+        last_job = None
+        try:
+            # started inside the try so the workers already running are killed if a later one fails to start
+            shares = split_jobs(list(enumerate(jobs)), get_worker_count(total, self.workers))
+            for index, share in enumerate(shares):
+                for job_id, job in share:
+                    pending[job_id] = (index, job)
+                request = {'v': protocol_version, 'scene': str(scene), 'force': force,
+                           'jobs': [job_to_message(job_id, job) for job_id, job in share]}
+                workers.append(self.start_worker(index, request, messages))
+
+            running = len(workers)
+            while running:
+                if progress is not None and progress(total - len(pending), total, last_job) is False:
+                    cancelled = True
+                    break
+
+                try:
+                    index, message = messages.get(timeout=poll_interval)
+                except queue.Empty:
+                    continue
+
+                if message is None:
+                    # the worker is done, anything it did not answer failed
+                    running -= 1
+                    process, output, thread = workers[index]
+                    error = errors.get(index) or 'worker exited with code {0} :: {1}'.format(
+                        process.returncode, ' | '.join(output))
+                    for job_id, (worker, job) in sorted(pending.items()):
+                        if worker == index:
+                            del pending[job_id]
+                            results.append(fbx_exporter_planner.ExportResult(job, False, error))
+                elif 'issues' in message:
+                    jobs[message['job']].issues = message['issues']
+                elif 'id' in message:
+                    worker, last_job = pending.pop(message['id'])
+                    last_job.skipped = bool(message.get('skipped'))
+                    last_job.fingerprint = message.get('fingerprint')
+                    last_job.kept = bool(message.get('kept'))
+                    last_job.telemetry = fbx_exporter_telemetry.JobRecord.from_dict(message.get('telemetry'))
+                    results.append(fbx_exporter_planner.ExportResult(last_job, bool(message.get('success')),
+                                                                     message.get('error')))
+                elif 'error' in message:
+                    errors[index] = message['error']
+        finally:
+            for process, output, thread in workers:
+                self.stop_worker(process, thread)
+
+        results.extend(fbx_exporter_planner.fan_out_duplicates(plan, results, cancelled))
+        return results, cancelled
+
+
+Pool = WorkerPool()
+
+
+"""
+\/\/\/\/\/\/\/\/    worker    \/\/\/\/\/\/\/\/
+"""
+
+
+def serve(request, run_job, out=None):
+    """
+    runs the jobs of a request and writes a result for each, with the stage timings of the job
+
+    :param request: request read from stdin
+    :type request: dict
+    :param run_job: function(job message, reply) that exports one job and returns success. it can add skipped,
+        fingerprint and kept to the reply
+    :type run_job: function
+    """
+    out = out or sys.stdout
+    for message in request['jobs']:
+        reply = {'id': message['id'], 'skipped': False, 'fingerprint': None, 'kept': False}
+        with fbx_exporter_telemetry.Recorder.job(message['kind'], message['name'], message['path']) as record:
+            try:
+                reply['success'] = bool(run_job(message, reply))
+                reply['error'] = None if reply['success'] else 'export failed'
+            except Exception as e:
+                reply['success'] = False
+                reply['error'] = '{0}: {1}'.format(type(e).__name__, e)
+
+        reply['telemetry'] = record.to_dict()
+        write_message(out, reply)
+
+
+def run_stand_in_worker(request):
+    """
+    answers a request without Maya. each job writes its message to the job path
+    """
+    write_message(sys.stdout, {'ready': request['scene']})
+
+    def run_job(message, reply):
+        with fbx_exporter_telemetry.Recorder.stage(fbx_exporter_telemetry.write_stage):
+            with open(message['path'], 'w') as f:
+                json.dump(dict(message, scene=request['scene'], pid=os.getpid()), f)
+        fbx_exporter_telemetry.Recorder.count(items=1, path=message['path'])
+        return True
+
+    serve(request, run_job)
+
+
+def run_maya_worker(request):
+    import maya.standalone
+    maya.standalone.initialize()
+
+    import pymel.core as pm
+    from scr.tools.fbxexporters import fbx_exporter_data
+    from scr.tools.fbxexporters import fbx_exporter_export
+    from scr.tools.fbxexporters import fbx_exporter_fingerprint
+    from scr.tools.fbxexporters import fbx_exporter_staging
+    from scr.tools.fbxexporters import fbx_exporter_validate
+
+    Exporter = fbx_exporter_export.Exporter
+    Stager = fbx_exporter_staging.Stager
+    Recorder = fbx_exporter_telemetry.Recorder
+    ExportData = fbx_exporter_data.ExporterData
+    scene = request['scene']
+    # the manifests are only read here, the parent records the fingerprints the workers send back
+    incremental = fbx_exporter_fingerprint.IncrementalExport(Stager.get_content_hash, request.get('force', False))
+    # {job id: exported job}
+    exported = {}
+
+    def open_scene():
+        pm.openFile(scene, force=True)
+        ExportData.invalidate_cache()
+
+    def load_job(message):
+        layer, data = ExportData.get_layer_child(message['layer_key'], message['name'])
+        if data is None:
+            raise LookupError('{0} not found in {1}'.format(message['name'], message['layer_key']))
+
+        option_data = None
+        if message['kind'] == fbx_exporter_planner.model_kind:
+            option_data = fbx_exporter_planner.get_option_data(layer, data)
+
+        return fbx_exporter_planner.ExportJob(message['kind'], message['layer_key'], layer, data, message['path'],
+                                              collections.OrderedDict(message['options']), message['staging'],
+                                              option_data)
+
+    def export_job(job):
+        export_dir = os.path.dirname(job.path)
+        if job.kind == fbx_exporter_planner.model_kind:
+            return Exporter.export_model_job(job)
+        elif job.kind == fbx_exporter_planner.animation_kind:
+            return Stager.export_animation(job.data, job.layer, export_dir)
+        elif job.kind == fbx_exporter_planner.rig_kind:
+            mesh, max_influences, over_weighted = Stager.get_over_weighted(job.data)
+            if over_weighted:
+                raise ValueError('{0} verts of {1} have more than {2} influences'.format(
+                    len(over_weighted), job.name, max_influences))
+            try:
+                return Stager.export_rig(job.layer, job.data, export_dir)
+            finally:
+                # the rig staging is rolled back in memory, the scene is only reopened if that did not work
+                if not Stager.restored:
+                    with Recorder.stage(fbx_exporter_telemetry.post_stage):
+                        open_scene()
+
+        raise ValueError('unknown job kind {0}'.format(job.kind))
+
+    def run_job(message, reply):
+        with Recorder.stage(fbx_exporter_telemetry.resolve_stage):
+            job = load_job(message)
+        current = incremental.is_current(job)
+        reply['fingerprint'] = job.fingerprint
+        if current:
+            reply['skipped'] = True
+            return True
+
+        success = export_job(job)
+        if success:
+            # the artist is not waiting on a worker, a job is answered once its fbx is published
+            error = Exporter.wait_for_publishes().get(Exporter.get_output_key(job.path))
+            if error is not None:
+                raise IOError(error)
+        reply['kept'] = bool(success) and Exporter.is_kept(job.path)
+        if success:
+            exported[message['id']] = job
+            Stager.validate(job)
+        return success
+
+    try:
+        pm.loadPlugin('fbxmaya', quiet=True)
+        open_scene()
+    except Exception as e:
+        write_message(sys.stdout, {'error': 'could not open {0} :: {1}: {2}'.format(scene, type(e).__name__, e)})
+        return 1
+
+    write_message(sys.stdout, {'ready': scene})
+    with Exporter.option_batch():
+        serve(request, run_job)
+
+    # the fbx files are validated while the next jobs export, the issues follow the results
+    fbx_exporter_validate.Validator.wait()
+    for job_id, job in sorted(exported.items()):
+        if job.issues is not None:
+            write_message(sys.stdout, {'job': job_id, 'issues': job.issues})
+
+    maya.standalone.uninitialize()
+    return 0
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='fbx exporter worker, reads one request from stdin')
+    parser.add_argument('--stand-in', action='store_true', help='answer without Maya, for testing')
+    args = parser.parse_args(args)
+
+    request = json.loads(sys.stdin.readline())
+    if request.get('v') != protocol_version:
+        write_message(sys.stdout, {'error': 'unsupported protocol version {0}'.format(request.get('v'))})
+        return 1
+
+    if args.stand_in:
+        run_stand_in_worker(request)
+        return 0
+
+    return run_maya_worker(request)
+
+
+if __name__ == '__main__':
+    sys.exit(main())